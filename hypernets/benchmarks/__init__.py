@@ -0,0 +1,6 @@
+# -*- coding:utf-8 -*-
+"""
+Micro-benchmarks for the search infrastructure, run them as modules, e.g.:
+
+    python -m hypernets.benchmarks.trial_history
+"""
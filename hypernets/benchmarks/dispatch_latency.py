@@ -0,0 +1,125 @@
+# -*- coding:utf-8 -*-
+"""
+Benchmark the overhead to dispatch trials with the cluster backend.
+
+A driver service and a few executors run on localhost and pass many dummy trials, which only sleep for a moment,
+through the grpc protocol. The overhead of a trial is the time an executor spends on the trial beyond the trial
+itself: waiting for the next trial after it reported the last one, and the round trips to the driver.
+
+    python -m hypernets.benchmarks.dispatch_latency --trials 500 --executors 4
+"""
+import argparse
+import socket
+import tempfile
+import time
+from threading import Thread
+
+import numpy as np
+
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Int, Real
+from hypernets.dispatchers.cluster.grpc.search_driver_client import SearchDriverClient
+from hypernets.dispatchers.cluster.grpc.search_driver_service import serve
+
+
+def space_fn():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(p1=Int(0, 1000000), p2=Real(0.0, 1.0))
+    return space
+
+
+def _free_address():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f'127.0.0.1:{s.getsockname()[1]}'
+
+
+def _drive(service, samples, queue_size):
+    for trial_no, space_sample in enumerate(samples, start=1):
+        service.add(trial_no, space_sample)
+        service.wait_queue_below(queue_size)
+    service.finish()
+    service.wait_all_reported()
+
+
+def _execute(address, search_id, prefetch, trial_seconds, waits):
+    client = SearchDriverClient(address, search_id)
+    client.ping(wait=True)
+    sch = client.lease(search_id, prefetch)
+    try:
+        item = next(sch)
+        while item is not None and item.is_ok():
+            if trial_seconds > 0:
+                time.sleep(trial_seconds)
+            item.success, item.reward = True, 1.0
+            start = time.perf_counter()
+            try:
+                item = sch.send(item)
+            except StopIteration:
+                break
+            waits.append(time.perf_counter() - start)
+    finally:
+        sch.close()
+        client.close()
+
+
+def run_once(trials, executors, prefetch, trial_seconds=0.001, queue_size=None):
+    address = _free_address()
+    search_id = f'latency-{prefetch}'
+    work_dir = tempfile.mkdtemp()
+    server, service = serve(address, search_id, f'{work_dir}/spaces', f'{work_dir}/models')
+    if queue_size is None:
+        queue_size = executors * prefetch
+
+    # sample ahead, only the dispatch is measured
+    samples = []
+    for _ in range(trials):
+        space_sample = space_fn()
+        space_sample.random_sample()
+        samples.append(space_sample)
+
+    waits = []
+    try:
+        start = time.time()
+        driver = Thread(target=_drive, args=(service, samples, queue_size))
+        driver.start()
+        threads = [Thread(target=_execute, args=(address, search_id, prefetch, trial_seconds, waits))
+                   for _ in range(executors)]
+        for t in threads:
+            t.start()
+        driver.join()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start
+    finally:
+        server.stop(None)
+        service.status_thread.stop()
+
+    overhead = elapsed * executors / trials - trial_seconds
+    waits = np.array(waits) if len(waits) > 0 else np.zeros(1)
+    return dict(prefetch=prefetch, elapsed=elapsed, overhead=overhead,
+                wait_p50=np.percentile(waits, 50), wait_p99=np.percentile(waits, 99))
+
+
+def run(trials=200, executors=2, prefetch=(1, 2, 4), trial_seconds=0.001):
+    return [run_once(trials, executors, p, trial_seconds) for p in prefetch]
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark trial dispatch overhead of the cluster backend')
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--executors', type=int, default=2)
+    parser.add_argument('--trial-seconds', type=float, default=0.001)
+    args = parser.parse_args()
+
+    results = run(args.trials, args.executors, trial_seconds=args.trial_seconds)
+    print(f'trials: {args.trials}, executors: {args.executors}, trial: {args.trial_seconds * 1e3:.1f}ms')
+    print(f'{"prefetch":>8} {"elapsed(s)":>11} {"overhead/trial(ms)":>19} {"wait p50(ms)":>13} {"wait p99(ms)":>13}')
+    for r in results:
+        print(f'{r["prefetch"]:>8} {r["elapsed"]:>11.2f} {r["overhead"] * 1e3:>19.2f} '
+              f'{r["wait_p50"] * 1e3:>13.2f} {r["wait_p99"] * 1e3:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding:utf-8 -*-
+"""
+Compare the time to reach a target reward of HyperbandSearcher (ASHA) and EvolutionSearcher.
+
+Both search the PlainModel space of logistic regressions and neural networks on a bundled dataset in one process.
+The time is the sum of the elapsed time of the trials run until a full budget trial reaches the target, so the
+cheap low budget trials of ASHA are counted as well.
+
+    python -m hypernets.benchmarks.hyperband --dataset heart --trials 60 --target 0.9
+"""
+import argparse
+import tempfile
+
+from hypernets.dispatchers.in_process_dispatcher import InProcessDispatcher
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import make_searcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.utils import logging
+
+_datasets = {
+    'heart': (dsutils.load_heart_disease_uci, 'target'),
+    'blood': (dsutils.load_blood, 'Class'),
+}
+
+
+def load(dataset):
+    fn, target = _datasets[dataset]
+    X = fn()
+    y = X.pop(target)
+    return X, y
+
+
+def run(searcher_name, X, y, max_trials=60, target=0.9, **searcher_kwargs):
+    search_space = PlainSearchSpace(enable_dt=False, enable_lr=True, enable_nn=True)
+    searcher = make_searcher(searcher_name, search_space_fn=search_space, optimize_direction='max',
+                             **searcher_kwargs)
+    dispatcher = InProcessDispatcher(tempfile.mkdtemp(prefix='hyperband_bench_'))
+    hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+    hyper_model.search(X, y, X, y, max_trials=max_trials)
+
+    elapsed, reached = 0.0, None
+    for trial in hyper_model.history.trials:
+        elapsed += trial.elapsed
+        full = trial.memo.get('budget', 1.0) >= 1.0
+        if reached is None and full and trial.succeeded and trial.reward >= target:
+            reached = elapsed
+    best = hyper_model.get_best_trial()
+    return reached, elapsed, len(hyper_model.history.trials), best.reward if best is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark HyperbandSearcher')
+    parser.add_argument('--dataset', choices=list(_datasets.keys()), default='heart')
+    parser.add_argument('--trials', type=int, default=60)
+    parser.add_argument('--target', type=float, default=0.9)
+    parser.add_argument('--min-budget', type=float, default=1 / 9)
+    args = parser.parse_args()
+    logging.set_level('warn')
+
+    X, y = load(args.dataset)
+    settings = {
+        'evolution': ('evolution', {}),
+        'asha': ('hyperband', dict(min_budget=args.min_budget, reduction_factor=3)),
+        'hyperband': ('hyperband', dict(min_budget=args.min_budget, reduction_factor=3, brackets=3)),
+    }
+    print(f'dataset: {args.dataset}, trials: {args.trials}, target reward: {args.target}')
+    print(f'{"searcher":>10} {"to target(s)":>13} {"total(s)":>9} {"trials":>7} {"best":>7}')
+    for name, (searcher_name, kwargs) in settings.items():
+        reached, elapsed, trials, best = run(searcher_name, X, y, args.trials, args.target, **kwargs)
+        reached = f'{reached:.2f}' if reached is not None else '-'
+        print(f'{name:>10} {reached:>13} {elapsed:>9.2f} {trials:>7} {best:>7.4f}')
+
+
+if __name__ == '__main__':
+    main()
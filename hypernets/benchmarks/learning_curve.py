@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+"""
+Compare the compute saved by the discriminators, and the trials they lose.
+
+A search of synthetic trials is replayed: a trial's score at iteration x is `c - a * x ** -alpha` plus noise, with
+the final score `c` and the speed of convergence drawn at random, so some trials start slowly but converge to the
+best scores. Each trial runs one iteration at a time until the discriminator stops it, the cost of the search is the
+number of iterations run, reported in cpu hours with `--iteration-seconds`. The regret is how much the best final
+score found is below the best of all trials, stopped trials don't count.
+
+    python -m hypernets.benchmarks.learning_curve --trials 100 --iterations 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hypernets.core import TrialHistory, Trial
+from hypernets.discriminators import PercentileDiscriminator, ProgressivePercentileDiscriminator, \
+    LearningCurveDiscriminator
+from hypernets.utils import logging
+
+
+def make_curves(n_trials, n_iterations, noise=0.003, seed=9527):
+    rs = np.random.RandomState(seed)
+    x = np.arange(1, n_iterations + 1)
+    c = rs.uniform(0.70, 0.95, n_trials)
+    a = rs.uniform(0.05, 0.5, n_trials)
+    alpha = rs.uniform(0.2, 1.5, n_trials)
+    curves = c[:, None] - a[:, None] * np.power(x[None, :], -alpha[:, None])
+    return curves + rs.normal(scale=noise, size=curves.shape)
+
+
+def run(discriminator, curves, group_id='bench'):
+    history = TrialHistory(optimize_direction='max')
+    if discriminator is not None:
+        discriminator.bind_history(history)
+
+    n_iterations = curves.shape[1]
+    iterations, stopped, best = 0, 0, -np.inf
+    start = time.time()
+    for trial_no, scores in enumerate(curves, start=1):
+        n = n_iterations
+        for i in range(1, n_iterations + 1):
+            if discriminator is not None and not discriminator.is_promising(scores[:i].tolist(), group_id,
+                                                                              n_iterations):
+                n = i
+                break
+        iterations += n
+        succeeded = n == n_iterations
+        trial = Trial(None, trial_no, scores[n - 1], 0, succeeded=succeeded)
+        trial.iteration_scores[group_id] = scores[:n].tolist()
+        trial.memo['early_stopped'] = not succeeded
+        history.append(trial)
+        if succeeded:
+            best = max(best, scores[-1])
+        else:
+            stopped += 1
+    overhead = time.time() - start
+    return iterations, stopped, best, overhead
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark LearningCurveDiscriminator')
+    parser.add_argument('--trials', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--iteration-seconds', type=float, default=36.0)
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=9527)
+    args = parser.parse_args()
+    logging.set_level('warn')
+
+    curves = make_curves(args.trials, args.iterations, seed=args.seed)
+    best_final = curves[:, -1].max()
+    options = dict(min_trials=5, min_steps=10, stride=args.stride, optimize_direction='max')
+    settings = {
+        'none': None,
+        'percentile 50': PercentileDiscriminator(50, **options),
+        'progressive': ProgressivePercentileDiscriminator([20, 40, 60, 80], **options),
+        'learning curve': LearningCurveDiscriminator(threshold=0.05, top_k=3, **options),
+    }
+    print(f'trials: {args.trials}, iterations: {args.iterations}, seconds per iteration: {args.iteration_seconds}')
+    print(f'{"discriminator":>16} {"cpu hours":>10} {"saved":>7} {"stopped":>8} {"regret":>8} {"overhead(s)":>12}')
+    full = args.trials * args.iterations
+    for name, discriminator in settings.items():
+        iterations, stopped, best, overhead = run(discriminator, curves)
+        hours = iterations * args.iteration_seconds / 3600
+        print(f'{name:>16} {hours:>10.2f} {1 - iterations / full:>7.1%} {stopped:>8} '
+              f'{best_final - best:>8.4f} {overhead:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
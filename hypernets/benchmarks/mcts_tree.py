@@ -0,0 +1,156 @@
+# -*- coding:utf-8 -*-
+"""
+Compare the throughput of the tree operations of MCTree (node objects) and ArrayMCTree (structure of arrays) in
+large trees.
+
+A complete tree of `--branching` children per node and `--depth` levels (111,110 nodes by default) is built in
+both structures, every leaf has been visited once, then random descents by UCT (selection), additions of the
+children of a leaf (expansion) and back propagations from a leaf are timed. The end to end throughput of
+MCTSSearcher with both trees is measured on a small space as well.
+
+    python -m hypernets.benchmarks.mcts_tree --branching 10 --depth 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Int, Real
+from hypernets.searchers.mcts_core import MCTree, ArrayMCTree, UCT
+from hypernets.searchers.mcts_searcher import MCTSSearcher
+from hypernets.utils import logging
+
+
+class _Value(object):
+    # what MCNode needs of an assigned parameter
+    def __init__(self, label, value):
+        self.assigned = True
+        self.label = label
+        self.alias = label
+        self.value = value
+
+
+def space_fn():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(p1=Int(0, 1000), p2=Int(0, 1000), p3=Real(0.0, 1.0), p4=Int(0, 1000), p5=Real(0.0, 1.0))
+    return space
+
+
+def build_object_tree(branching, depth, rs):
+    tree = MCTree(space_fn, UCT(), max_node_space=branching)
+    level = [tree.root]
+    for d in range(depth):
+        next_level = []
+        for node in level:
+            for v in range(branching):
+                node.add_child(_Value(f'p{d}', v))
+            next_level.extend(node.children)
+        level = next_level
+    # every leaf visited once
+    for leaf in level:
+        reward = rs.rand()
+        node = leaf
+        while node is not None:
+            node.rewards.append(reward)
+            node = node.parent
+    standby = [tree.root]
+    while standby:
+        node = standby.pop()
+        node.reward, node.visits = np.average(node.rewards), len(node.rewards)
+        standby.extend(node.children)
+    return tree, level
+
+
+def build_array_tree(branching, depth, rs):
+    tree = ArrayMCTree(space_fn, UCT(), max_node_space=branching)
+    level = [tree.root]
+    for d in range(depth):
+        next_level = []
+        for node in level:
+            start = tree._add_nodes(node, list(range(branching)), f'p{d}')
+            next_level.extend(range(start, start + branching))
+        level = next_level
+    for leaf in level:
+        tree.back_propagation(leaf, rs.rand())
+    return tree, level
+
+
+def time_object_tree(tree, leaves, n, branching, rs):
+    start = time.perf_counter()
+    for _ in range(n):
+        node = tree.root
+        while not node.is_leaf:
+            node = tree.policy.selection(node)
+    selection = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for leaf in rs.choice(len(leaves), n):
+        tree.back_propagation(leaves[leaf], rs.rand())
+    back_propagation = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for leaf in rs.choice(len(leaves), n, replace=False):
+        for v in range(branching):
+            leaves[leaf].add_child(_Value('new', v))
+    expansion = n / (time.perf_counter() - start)
+    return selection, expansion, back_propagation
+
+
+def time_array_tree(tree, leaves, n, branching, rs):
+    start = time.perf_counter()
+    for _ in range(n):
+        node = tree.root
+        while tree.child_count[node] > 0:
+            node = tree.select_child(node)
+    selection = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for leaf in rs.choice(len(leaves), n):
+        tree.back_propagation(leaves[leaf], rs.rand())
+    back_propagation = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for leaf in rs.choice(len(leaves), n, replace=False):
+        tree._add_nodes(leaves[leaf], list(range(branching)), 'new')
+    expansion = n / (time.perf_counter() - start)
+    return selection, expansion, back_propagation
+
+
+def time_searcher(array_tree, n):
+    searcher = MCTSSearcher(space_fn, max_node_space=10, use_meta_learner=False, array_tree=array_tree)
+    rs = np.random.RandomState(9527)
+    start = time.perf_counter()
+    for _ in range(n):
+        space_sample = searcher.sample()
+        searcher.update_result(space_sample, rs.rand())
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark ArrayMCTree')
+    parser.add_argument('--branching', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=1000)
+    args = parser.parse_args()
+    logging.set_level('warn')
+
+    print(f'{"tree":>8} {"nodes":>8} {"build(s)":>9} {"selection/s":>12} {"expansion/s":>12} {"backprop/s":>11} '
+          f'{"searcher/s":>11}')
+    for name, build, timing, array_tree in [('object', build_object_tree, time_object_tree, False),
+                                            ('array', build_array_tree, time_array_tree, True)]:
+        rs = np.random.RandomState(9527)
+        start = time.perf_counter()
+        tree, leaves = build(args.branching, args.depth, rs)
+        elapsed = time.perf_counter() - start
+        nodes = tree.size if array_tree else sum(args.branching ** d for d in range(args.depth + 1))
+        selection, expansion, back_propagation = timing(tree, leaves, args.operations, args.branching, rs)
+        searcher = time_searcher(array_tree, args.samples)
+        print(f'{name:>8} {nodes:>8} {elapsed:>9.2f} {selection:>12.0f} {expansion:>12.0f} '
+              f'{back_propagation:>11.0f} {searcher:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding:utf-8 -*-
+"""
+Measure the surrogate (MetaLearner) overhead per trial with different refit schedules.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hypernets.core.meta_learner import MetaLearner
+from hypernets.core.trial import Trial, TrialHistory
+from hypernets.utils import logging
+
+
+class _Sample(object):
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.signature = 'bench'
+
+
+def run(n_trials=1000, n_params=20, candidates_size=100, seed=9527, **meta_learner_kwargs):
+    rs = np.random.RandomState(seed)
+    history = TrialHistory('max')
+    ml = MetaLearner(history, 'bench', None, **meta_learner_kwargs)
+    weights = rs.rand(n_params)
+
+    fit_cost = 0.0
+    predict_cost = 0.0
+    predict_batch_cost = 0.0
+    for i in range(n_trials):
+        candidates = rs.rand(candidates_size, n_params)
+
+        start = time.time()
+        for c in candidates[:10]:
+            ml.predict(_Sample(c.tolist()))
+        predict_cost += (time.time() - start) / 10 * candidates_size
+
+        start = time.time()
+        ml.predict_batch(candidates, 'bench')
+        predict_batch_cost += time.time() - start
+
+        sample = _Sample(candidates[0].tolist())
+        history.append(Trial(sample, i + 1, float(candidates[0] @ weights), 1.0))
+        start = time.time()
+        ml.new_sample(sample)
+        fit_cost += time.time() - start
+
+    return fit_cost / n_trials, predict_cost / n_trials, predict_batch_cost / n_trials, ml.fit_counter
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark MetaLearner')
+    parser.add_argument('--trials', type=int, default=1000)
+    parser.add_argument('--candidates', type=int, default=100)
+    args = parser.parse_args()
+    logging.set_level('warn')
+
+    settings = {
+        'every 1': dict(refit_schedule='every', refit_every=1),
+        'every 10': dict(refit_schedule='every', refit_every=10),
+        'doubling': dict(refit_schedule='doubling'),
+        'every 10, warm': dict(refit_schedule='every', refit_every=10, warm_start=True),
+    }
+    print(f'trials: {args.trials}, candidates per trial: {args.candidates}')
+    print(f'{"schedule":>16} {"fits":>6} {"fit(ms)":>10} {"predict(ms)":>12} {"batch(ms)":>10}')
+    for name, kwargs in settings.items():
+        fit_cost, predict_cost, batch_cost, fits = run(args.trials, candidates_size=args.candidates, **kwargs)
+        print(f'{name:>16} {fits:>6} {fit_cost * 1e3:>10.2f} {predict_cost * 1e3:>12.2f} {batch_cost * 1e3:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# -*- coding:utf-8 -*-
+"""
+Benchmark the latency and throughput of the predict server on localhost.
+
+The same requests, csv chunks of a few rows sent by concurrent clients, are served by the per-chunk subprocess
+design, which runs a predict command for every chunk, and by the resident model pool, with the data in files and
+inline as Arrow IPC (if pyarrow is available).
+
+    python -m hypernets.benchmarks.predict_latency --requests 40 --rows 100 --concurrency 4
+"""
+import argparse
+import importlib.util
+import pickle
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hypernets.dispatchers.predict.grpc.predict_client import PredictClient
+from hypernets.dispatchers.predict.grpc.predict_service import serve
+
+
+def _free_address():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f'127.0.0.1:{s.getsockname()[1]}'
+
+
+def prepare(work_dir, requests, rows, n_features=20, seed=9527):
+    from sklearn.ensemble import RandomForestClassifier
+
+    rs = np.random.RandomState(seed)
+    columns = [f'x{i}' for i in range(n_features)]
+    X = pd.DataFrame(rs.normal(size=(2000, n_features)), columns=columns)
+    y = (X['x0'] + X['x1'] * X['x2'] > 0).astype('int')
+    model = RandomForestClassifier(n_estimators=50, max_depth=8, random_state=seed).fit(X, y)
+    model_file = f'{work_dir}/model.pkl'
+    with open(model_file, 'wb') as f:
+        pickle.dump(model, f)
+
+    chunks = [pd.DataFrame(rs.normal(size=(rows, n_features)), columns=columns) for _ in range(requests)]
+    data_files = []
+    for i, chunk in enumerate(chunks):
+        data_file = f'{work_dir}/chunk_{i:04d}.csv'
+        chunk.to_csv(data_file, index=False)
+        data_files.append(data_file)
+    return model_file, chunks, data_files
+
+
+def _measure(fn, args, concurrency, rows):
+    def timed(a):
+        start = time.perf_counter()
+        fn(a)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = np.array(list(executor.map(timed, args)))
+    elapsed = time.perf_counter() - start
+    return dict(p50=np.percentile(latencies, 50), p99=np.percentile(latencies, 99),
+                rows_per_second=rows * len(args) / elapsed)
+
+
+def run(requests=40, rows=100, concurrency=4, workers=4):
+    work_dir = tempfile.mkdtemp()
+    model_file, chunks, data_files = prepare(work_dir, requests, rows)
+    results = {}
+
+    # a predict command for every chunk
+    address = _free_address()
+    cmd = f'{sys.executable} -m {__name__} --predict {model_file}'
+    server, _ = serve(address, cmd, max_workers=concurrency)
+    client = PredictClient(address)
+    try:
+        results['subprocess'] = _measure(lambda f: client.predict(f, f'{f}.result'), data_files, concurrency, rows)
+    finally:
+        client.close()
+        server.stop(None)
+
+    # the resident model
+    address = _free_address()
+    server, service = serve(address, model_file=model_file, workers=workers, max_workers=concurrency)
+    client = PredictClient(address)
+    try:
+        results['resident-file'] = _measure(lambda f: client.predict_batch(data_file=f), data_files,
+                                            concurrency, rows)
+        if importlib.util.find_spec('pyarrow') is not None:
+            results['resident-arrow'] = _measure(lambda df: client.predict_batch(data=df), chunks,
+                                                 concurrency, rows)
+        results['batches'] = service.pool.batches
+    finally:
+        client.close()
+        server.stop(None)
+        service.pool.close()
+
+    return results
+
+
+def _predict_file(model_file, data_file, result_file):
+    with open(model_file, 'rb') as f:
+        model = pickle.load(f)
+    X = pd.read_csv(data_file)
+    pd.DataFrame(model.predict_proba(X)).to_csv(result_file, index=False, header=False)
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark the predict server')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--predict', nargs=3, metavar=('MODEL', 'DATA', 'RESULT'),
+                        help='predict a data file, the command of the subprocess design')
+    args = parser.parse_args()
+
+    if args.predict:
+        _predict_file(*args.predict)
+        return
+
+    results = run(args.requests, args.rows, args.concurrency, args.workers)
+    print(f'requests: {args.requests}, rows: {args.rows}, concurrency: {args.concurrency}, '
+          f'workers: {args.workers}, batches: {results.pop("batches")}')
+    print(f'{"mode":>16} {"p50(ms)":>10} {"p99(ms)":>10} {"rows/s":>12}')
+    for mode, r in results.items():
+        print(f'{mode:>16} {r["p50"] * 1e3:>10.1f} {r["p99"] * 1e3:>10.1f} {r["rows_per_second"]:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
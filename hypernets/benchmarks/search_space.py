@@ -0,0 +1,88 @@
+# -*- coding:utf-8 -*-
+"""
+Measure the cost of sampling a 200-parameter conditional space, with `HyperSpace.random_sample` and with a
+compiled `SpaceTemplate`.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hypernets.core.ops import Identity, ModuleChoice, Optional
+from hypernets.core.search_space import HyperSpace, Int, Real, Choice
+from hypernets.core.space_template import SpaceTemplate
+
+
+def get_space_fn(branches=4, params_per_branch=45, optionals=4, params_per_optional=5):
+    """
+    A ModuleChoice among `branches` modules followed by `optionals` Optional modules, 200 parameters by default.
+    """
+
+    def params(prefix, n):
+        ps = {}
+        for i in range(n):
+            if i % 3 == 0:
+                ps[f'{prefix}_{i}'] = Int(1, 100)
+            elif i % 3 == 1:
+                ps[f'{prefix}_{i}'] = Real(0.0, 1.0)
+            else:
+                ps[f'{prefix}_{i}'] = Choice(['a', 'b', 'c', 'd'])
+        return ps
+
+    def space_fn():
+        space = HyperSpace()
+        with space.as_default():
+            last = Identity()
+            modules = [Identity(**params(f'b{i}', params_per_branch)) for i in range(branches)]
+            last = ModuleChoice(modules)(last)
+            for i in range(optionals):
+                last = Optional(Identity(**params(f'o{i}', params_per_optional)), keep_link=True)(last)
+            Identity()(last)
+        return space
+
+    return space_fn
+
+
+def run(samples=(100, 1000, 10000), naive_limit=1000, seed=9527):
+    space_fn = get_space_fn()
+    results = []
+
+    start = time.time()
+    template = SpaceTemplate(space_fn, random_state=np.random.RandomState(seed))
+    compile_cost = time.time() - start
+
+    start = time.time()
+    template.materialize(template.sample(1).vectors_of(0))
+    materialize_cost = time.time() - start
+
+    for n in samples:
+        naive = min(n, naive_limit)
+        start = time.time()
+        for _ in range(naive):
+            space = space_fn()
+            space.random_sample()
+        naive_cost = (time.time() - start) / naive
+
+        start = time.time()
+        batch = template.sample(n)
+        batch_cost = (time.time() - start) / n
+        results.append((n, batch.vectors.shape[1], naive_cost, batch_cost))
+
+    return template.params_num, compile_cost, materialize_cost, results
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark search space sampling')
+    parser.add_argument('--naive-limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    params_num, compile_cost, materialize_cost, results = run(naive_limit=args.naive_limit)
+    print(f'parameters: {params_num}, compile: {compile_cost * 1e3:.1f}ms, '
+          f'materialize one sample: {materialize_cost * 1e3:.2f}ms')
+    print(f'{"samples":>10} {"width":>6} {"random_sample(us)":>18} {"template(us)":>14}')
+    for n, width, naive_cost, batch_cost in results:
+        print(f'{n:>10} {width:>6} {naive_cost * 1e6:>18.1f} {batch_cost * 1e6:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
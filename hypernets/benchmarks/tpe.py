@@ -0,0 +1,100 @@
+# -*- coding:utf-8 -*-
+"""
+Measure the time TPESearcher takes to propose a sample as the number of observed trials grows, and the rewards
+it finds compared with RandomSearcher.
+
+The search space has a conditional branch per estimator, as the spaces of tabular searches, and the reward of a
+sample is a synthetic function of its parameters.
+
+    python -m hypernets.benchmarks.tpe --trials 100,1000,10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hypernets.core.ops import Identity, ModuleChoice, HyperInput
+from hypernets.core.search_space import HyperSpace, Int, Real, Choice
+from hypernets.searchers import TPESearcher, RandomSearcher
+from hypernets.utils import logging
+
+
+def space_fn():
+    space = HyperSpace()
+    with space.as_default():
+        hyper_input = HyperInput(name='input1')
+        common = Identity(scale=Real(-5.0, 5.0), bins=Int(2, 256))(hyper_input)
+        branches = [
+            Identity(depth=Int(1, 20), leaves=Int(8, 512, step=8), lr=Real(0.01, 1.0)),
+            Identity(c=Real(0.0, 10.0), penalty=Choice(['l1', 'l2', 'none'])),
+            Identity(layers=Int(1, 5), units=Choice([16, 32, 64, 128, 256]), dropout=Real(0.0, 0.5)),
+        ]
+        ModuleChoice(branches)(common)
+        space.set_inputs(hyper_input)
+    return space
+
+
+def reward_of(space_sample):
+    params = {p.alias.split('.')[-1]: p.value for p in space_sample.get_assigned_params()}
+    reward = -(params['scale'] - 1.5) ** 2 / 10 - abs(np.log2(params['bins']) - 6) / 5
+    if 'depth' in params:
+        reward += 1.0 - abs(params['depth'] - 8) / 10 - abs(params['lr'] - 0.1)
+    elif 'c' in params:
+        reward += 0.5 - abs(params['c'] - 1) / 10 + (0.2 if params['penalty'] == 'l2' else 0.0)
+    else:
+        reward += 0.8 - abs(params['layers'] - 3) / 5 - params['dropout']
+    return reward
+
+
+def latency(n_trials, repeat=20, seed=9527):
+    searcher = TPESearcher(space_fn, optimize_direction='max', random_state=np.random.RandomState(seed))
+    batch = searcher.template.sample(n_trials)
+    for i in range(len(batch)):
+        space_sample = batch.materialize(i)
+        searcher.update_result(space_sample, reward_of(space_sample))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        searcher.sample()
+    single = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    searcher.sample_batch(8)
+    batch_cost = (time.perf_counter() - start) / 8
+    return single, batch_cost
+
+
+def best_reward(searcher, n_trials):
+    best = -np.inf
+    for _ in range(n_trials):
+        space_sample = searcher.sample()
+        reward = reward_of(space_sample)
+        searcher.update_result(space_sample, reward)
+        best = max(best, reward)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark TPESearcher')
+    parser.add_argument('--trials', type=str, default='100,1000,10000')
+    parser.add_argument('--search-trials', type=int, default=200)
+    parser.add_argument('--seeds', type=int, default=5)
+    args = parser.parse_args()
+    logging.set_level('warn')
+
+    print(f'{"trials":>8} {"sample(ms)":>11} {"batch of 8(ms/sample)":>22}')
+    for n in [int(t) for t in args.trials.split(',')]:
+        single, batch_cost = latency(n)
+        print(f'{n:>8} {single * 1e3:>11.2f} {batch_cost * 1e3:>22.2f}')
+
+    tpe, random = [], []
+    for seed in range(args.seeds):
+        tpe.append(best_reward(TPESearcher(space_fn, optimize_direction='max',
+                                           random_state=np.random.RandomState(seed)), args.search_trials))
+        random.append(best_reward(RandomSearcher(space_fn, optimize_direction='max'), args.search_trials))
+    print(f'best reward in {args.search_trials} trials, mean of {args.seeds} seeds: '
+          f'tpe {np.mean(tpe):.4f}, random {np.mean(random):.4f}')
+
+
+if __name__ == '__main__':
+    main()
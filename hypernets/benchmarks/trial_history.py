@@ -0,0 +1,70 @@
+# -*- coding:utf-8 -*-
+"""
+Measure the bookkeeping cost of TrialHistory as the history grows.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hypernets.core.trial import Trial, TrialHistory
+
+
+class _Sample(object):
+    """A light-weight stand-in for a HyperSpace sample, only vectors are used by TrialHistory."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.signature = 'bench'
+
+
+def run(max_trials=100000, checkpoints=10, batch=1000, n_params=20, seed=9527):
+    rs = np.random.RandomState(seed)
+    history = TrialHistory('max')
+    step = max_trials // checkpoints
+    results = []
+
+    trial_no = 0
+    for i in range(checkpoints):
+        while trial_no < (i + 1) * step - batch:
+            trial_no += 1
+            history.append(Trial(_Sample(rs.randint(0, 100, n_params).tolist()), trial_no, rs.rand(), 1.0))
+
+        samples = [_Sample(rs.randint(0, 100, n_params).tolist()) for _ in range(batch)]
+        rewards = rs.rand(batch)
+        start = time.time()
+        for s, r in zip(samples, rewards):
+            trial_no += 1
+            history.append(Trial(s, trial_no, r, 1.0))
+        append_cost = (time.time() - start) / batch
+
+        start = time.time()
+        for s in samples:
+            history.is_existed(s)
+            history.get_trial(s)
+        lookup_cost = (time.time() - start) / batch
+
+        start = time.time()
+        for _ in range(batch):
+            history.get_best()
+            history.get_top(10)
+        top_cost = (time.time() - start) / batch
+
+        results.append((len(history.trials), append_cost, lookup_cost, top_cost))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark TrialHistory')
+    parser.add_argument('--max-trials', type=int, default=100000)
+    parser.add_argument('--checkpoints', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f'{"trials":>10} {"append(us)":>12} {"lookup(us)":>12} {"top10(us)":>12}')
+    for size, append_cost, lookup_cost, top_cost in run(args.max_trials, args.checkpoints):
+        print(f'{size:>10} {append_cost * 1e6:>12.2f} {lookup_cost * 1e6:>12.2f} {top_cost * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
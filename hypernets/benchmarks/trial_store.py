@@ -0,0 +1,68 @@
+# -*- coding:utf-8 -*-
+"""
+Compare get/put/get_all latency of DiskTrialStore and SqliteTrialStore.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from hypernets.core.trial import Trial, DiskTrialStore, SqliteTrialStore
+
+
+class _Sample(object):
+    def __init__(self, vectors, signature='bench'):
+        self.vectors = vectors
+        self.signature = signature
+
+
+def _bench(store, samples, dataset_id='bench_dataset'):
+    start = time.time()
+    for i, s in enumerate(samples):
+        store.put(dataset_id, Trial(s, i + 1, float(i % 97) / 97, 1.0))
+    store.persist()
+    put_cost = (time.time() - start) / len(samples)
+
+    store.reset()
+    start = time.time()
+    for s in samples:
+        store.get(dataset_id, s)
+    get_cost = (time.time() - start) / len(samples)
+
+    start = time.time()
+    trials = store.get_all(dataset_id, samples[0].signature)
+    get_all_cost = time.time() - start
+    assert len(trials) == len(samples)
+
+    return put_cost, get_cost, get_all_cost
+
+
+def run(n_trials=5000, n_params=20, seed=9527):
+    rs = np.random.RandomState(seed)
+    samples = [_Sample(rs.randint(0, 1000, n_params).tolist()) for _ in range(n_trials)]
+
+    work_dir = tempfile.mkdtemp(prefix='hyn_bench_')
+    try:
+        results = {
+            'DiskTrialStore': _bench(DiskTrialStore(f'{work_dir}/disk'), samples),
+            'SqliteTrialStore': _bench(SqliteTrialStore(f'{work_dir}/trials.db', batch_size=100), samples),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark TrialStore backends')
+    parser.add_argument('--trials', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f'{"store":>18} {"put(us)":>10} {"get(us)":>10} {"get_all(ms)":>12}')
+    for name, (put_cost, get_cost, get_all_cost) in run(args.trials).items():
+        print(f'{name:>18} {put_cost * 1e6:>10.1f} {get_cost * 1e6:>10.1f} {get_all_cost * 1e3:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
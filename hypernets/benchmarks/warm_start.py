@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+"""
+Measure how soon a search reaches a good reward on a dataset when it is warm-started from the top configurations
+of the other bundled datasets (`WarmStartCallback`), compared with a cold search.
+
+Each dataset is searched cold first, the index of a dataset holds the cold searches of the other datasets
+(leave one out). A reward is good if it is within `--tolerance` of the best reward of all searches of the dataset,
+the number of trials and the seconds spent in trials until the first good reward are reported.
+
+    python -m hypernets.benchmarks.warm_start --trials 20 --seeds 2
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from hypernets.core import MetaKnowledgeIndex, WarmStartCallback, set_random_state
+from hypernets.dispatchers.in_process_dispatcher import InProcessDispatcher
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import EvolutionSearcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.utils import logging
+
+
+def load_datasets(rows):
+    datasets = {}
+    for name, loader, target in [('heart_disease', dsutils.load_heart_disease_uci, 'target'),
+                                 ('blood', dsutils.load_blood, 'Class'),
+                                 ('telescope', dsutils.load_telescope, 'Class'),
+                                 ('bank', dsutils.load_bank, 'y'),
+                                 ('adult', dsutils.load_adult, 14)]:
+        X = loader()
+        if len(X) > rows:
+            X = X.sample(rows, random_state=9527)
+        X = X.reset_index(drop=True)
+        y = X.pop(target)
+        X.columns = [str(c) for c in X.columns]
+        # the plain model fits the estimators on the raw columns
+        for c in X.select_dtypes(include=['object', 'category']).columns:
+            X[c] = X[c].astype('category').cat.codes
+        datasets[name] = (X, y)
+    return datasets
+
+
+def search(X, y, n_trials, seed, work_dir, index=None):
+    set_random_state(seed)
+    searcher = EvolutionSearcher(PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False),
+                                 population_size=10, sample_size=3, optimize_direction='max',
+                                 use_meta_learner=False)
+    callbacks = [WarmStartCallback(index, n_samples=5, k=2, record=False)] if index is not None else []
+    hyper_model = PlainModel(searcher=searcher, reward_metric='auc', callbacks=callbacks,
+                             dispatcher=InProcessDispatcher(f'{work_dir}/models'))
+    hyper_model.search(X, y, X, y, max_trials=n_trials)
+    trials = sorted(hyper_model.history.trials, key=lambda t: t.trial_no)
+    rewards = np.array([t.reward if t.succeeded else -np.inf for t in trials], dtype='float64')
+    elapsed = np.cumsum([t.elapsed for t in trials])
+    set_random_state(None)
+    return hyper_model, rewards, elapsed
+
+
+def time_to_good(rewards, elapsed, good):
+    hits = np.flatnonzero(rewards >= good)
+    if len(hits) == 0:
+        return np.nan, np.nan
+    return hits[0] + 1, elapsed[hits[0]]
+
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark the warm start of searches from similar datasets')
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--seeds', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=3000)
+    parser.add_argument('--tolerance', type=float, default=0.005)
+    args = parser.parse_args()
+    logging.set_level('warn')
+
+    work_dir = tempfile.mkdtemp(prefix='hyn_warm_start_')
+    datasets = load_datasets(args.rows)
+
+    # cold searches, recorded into the index
+    full = MetaKnowledgeIndex(os.path.join(work_dir, 'index.json'), top_n=10)
+    cold = {}
+    for name, (X, y) in datasets.items():
+        cold[name] = []
+        for seed in range(args.seeds):
+            hyper_model, rewards, elapsed = search(X, y, args.trials, seed, work_dir)
+            cold[name].append((rewards, elapsed))
+            callback = WarmStartCallback(full)
+            callback.on_search_start(hyper_model, X, y, None, None, False, 3, args.trials, name, None)
+            full.add(name, callback.meta_features, hyper_model.history.get_top(), 'max')
+
+    print(f'{"dataset":>14} {"nearest":>26} {"cold trials":>12} {"warm trials":>12} '
+          f'{"cold secs":>10} {"warm secs":>10}')
+    totals = {'cold': [], 'warm': []}
+    for name, (X, y) in datasets.items():
+        index = MetaKnowledgeIndex(os.path.join(work_dir, f'index_{name}.json'))
+        index.datasets = {k: v for k, v in full.datasets.items() if k != name}
+        nearest = ','.join(i for i, _ in index.nearest(full.datasets[name]['meta_features'], k=2))
+
+        warm = [search(X, y, args.trials, seed, work_dir, index)[1:] for seed in range(args.seeds)]
+        best = max(r.max() for r, _ in cold[name] + warm)
+        good = best - args.tolerance * abs(best)
+        cold_hits = np.array([time_to_good(r, e, good) for r, e in cold[name]], dtype='float64')
+        warm_hits = np.array([time_to_good(r, e, good) for r, e in warm], dtype='float64')
+        # searches not reaching a good reward count as the whole budget
+        cold_hits[np.isnan(cold_hits[:, 0])] = [args.trials, np.nan]
+        warm_hits[np.isnan(warm_hits[:, 0])] = [args.trials, np.nan]
+        totals['cold'].append(cold_hits[:, 0].mean())
+        totals['warm'].append(warm_hits[:, 0].mean())
+        print(f'{name:>14} {nearest:>26} {cold_hits[:, 0].mean():>12.1f} {warm_hits[:, 0].mean():>12.1f} '
+              f'{np.nanmean(cold_hits[:, 1]) if not np.isnan(cold_hits[:, 1]).all() else np.nan:>10.2f} '
+              f'{np.nanmean(warm_hits[:, 1]) if not np.isnan(warm_hits[:, 1]).all() else np.nan:>10.2f}')
+    print(f'mean trials to a good reward: cold {np.mean(totals["cold"]):.1f}, warm {np.mean(totals["warm"]):.1f}')
+
+
+if __name__ == '__main__':
+    main()
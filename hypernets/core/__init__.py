@@ -5,7 +5,9 @@
 
 from .searcher import OptimizeDirection
 from .callbacks import Callback, FileStorageLoggingCallback, SummaryCallback, \
-    EarlyStoppingCallback, EarlyStoppingError, NotebookCallback, ProgressiveCallback
-from .trial import Trial, TrialStore, TrialHistory, DiskTrialStore
+    EarlyStoppingCallback, EarlyStoppingError, NotebookCallback, ProgressiveCallback, HistoryFileCallback
+from .trial import Trial, TrialStore, TrialHistory, DiskTrialStore, SqliteTrialStore, TrialHistoryWriter, \
+    TrialHistoryReader
 from .dispatcher import Dispatcher
 from .random_state import set_random_state, get_random_state, randint
+from .meta_knowledge import MetaKnowledgeIndex, WarmStartCallback, get_meta_features
@@ -213,6 +213,53 @@ class FileStorageLoggingCallback(FileLoggingCallback):
         fs.mkdirs(dir_path, exist_ok=exist_ok)
 
 
+class HistoryFileCallback(Callback):
+    """
+    Append trials to a binary trial history file as soon as they are added to the search history.
+    """
+
+    def __init__(self, filepath):
+        super(HistoryFileCallback, self).__init__()
+
+        self.filepath = filepath
+        self.writer = None
+        self.written = 0
+
+    def on_search_start(self, hyper_model, X, y, X_eval, y_eval, cv, num_folds, max_trials, dataset_id, trial_store,
+                        **fit_kwargs):
+        from .trial import TrialHistoryWriter
+
+        self.writer = TrialHistoryWriter(self.filepath, hyper_model.history.optimize_direction)
+        self.written = 0
+        self._write_new_trials(hyper_model)
+
+    def on_trial_end(self, hyper_model, space, trial_no, reward, improved, elapsed):
+        self._write_new_trials(hyper_model)
+
+    def on_trial_error(self, hyper_model, space, trial_no):
+        self._write_new_trials(hyper_model)
+
+    def on_skip_trial(self, hyper_model, space, trial_no, reason, reward, improved, elapsed):
+        self._write_new_trials(hyper_model)
+
+    def on_search_end(self, hyper_model):
+        self._write_new_trials(hyper_model)
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def on_search_error(self, hyper_model):
+        self.on_search_end(hyper_model)
+
+    def _write_new_trials(self, hyper_model):
+        if self.writer is None:
+            return
+        trials = hyper_model.history.trials
+        for trial in trials[self.written:]:
+            self.writer.append(trial)
+        self.written = len(trials)
+
+
 class SummaryCallback(Callback):
     def __init__(self):
         super(SummaryCallback, self).__init__()
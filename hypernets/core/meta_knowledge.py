@@ -0,0 +1,239 @@
+# -*- coding:utf-8 -*-
+"""
+Warm start of a search from the best configurations found on similar datasets.
+
+A trial store answers for the exact dataset only. `MetaKnowledgeIndex` keeps cheap meta-features of every dataset
+searched (shape, the mix of column types and statistics of the target) with the top trials of its search, and
+retrieves the nearest datasets of a new one by the distance of their standardized meta-features. With
+`WarmStartCallback`, the top configurations of the nearest datasets seed the first samples of the searcher (see
+`Searcher.warm_start`) and the training data of the meta learner.
+"""
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from .callbacks import Callback
+from .searcher import OptimizeDirection
+from ..utils import logging, const
+
+logger = logging.get_logger(__name__)
+
+
+def get_meta_features(X, y, task=None):
+    """
+    Meta-features of a dataset which are cheap to compute, from pandas `X` and `y`.
+
+    :return: dict of the feature name and value.
+    """
+    from ..tabular import get_tool_box
+    from ..tabular import column_selector as col_se
+
+    if task is None or task == const.TASK_AUTO:
+        task, _ = get_tool_box(y).infer_task_type(y)
+    if not isinstance(y, pd.Series):
+        y = pd.Series(np.asarray(y).ravel())
+
+    n_rows, n_columns = X.shape
+    columns = max(n_columns, 1)
+    is_classification = task in (const.TASK_BINARY, const.TASK_MULTICLASS)
+    counts = y.value_counts()
+    features = {
+        'log_rows': math.log10(max(n_rows, 1)),
+        'log_columns': math.log10(columns),
+        'continuous_ratio': len(col_se.column_number(X)) / columns,
+        'categorical_ratio': len(col_se.column_object_category_bool(X)) / columns,
+        'datetime_ratio': len(col_se.column_all_datetime(X)) / columns,
+        'text_ratio': len(col_se.column_text(X)) / columns,
+        'missing_ratio': float(X.isnull().values.mean()) if n_rows * n_columns > 0 else 0.0,
+        'binary': float(task == const.TASK_BINARY),
+        'multiclass': float(task == const.TASK_MULTICLASS),
+        'regression': float(task == const.TASK_REGRESSION),
+        'log_classes': math.log10(max(len(counts), 1)) if is_classification else 0.0,
+        'majority_ratio': float(counts.iloc[0] / counts.sum()) if is_classification and len(counts) > 0 else 0.0,
+        'target_skew': 0.0,
+        'target_missing': float(y.isnull().mean()) if len(y) > 0 else 0.0,
+    }
+    if task == const.TASK_REGRESSION:
+        skew = float(pd.to_numeric(y, errors='coerce').skew())
+        features['target_skew'] = float(np.clip(skew, -10, 10)) if math.isfinite(skew) else 0.0
+    return features
+
+
+def _to_json_value(v):
+    return v.item() if hasattr(v, 'item') else v
+
+
+class MetaKnowledgeIndex(object):
+    """
+    Meta-features and top trials of the datasets searched, kept in a JSON file.
+
+    :param path: the file of the index, 'meta_knowledge.json' by default.
+    :param top_n: the number of the top trials kept for a dataset.
+    """
+
+    def __init__(self, path=None, top_n=10):
+        if path is None:
+            path = 'meta_knowledge.json'
+        self.path = os.path.expanduser(path)
+        self.top_n = top_n
+        self.datasets = {}  # dataset_id -> {'meta_features', 'optimize_direction', 'trials'}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.datasets = json.load(f)
+
+    def save(self):
+        home_dir = os.path.dirname(self.path)
+        if home_dir and not os.path.exists(home_dir):
+            os.makedirs(home_dir)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.datasets, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, dataset_id, meta_features, trials, optimize_direction=OptimizeDirection.Minimize):
+        """
+        Record the meta-features of a dataset and the best `top_n` of the succeeded `trials`, along with those
+        recorded for it before.
+        """
+        if isinstance(optimize_direction, OptimizeDirection):
+            optimize_direction = optimize_direction.value
+        dataset = self.datasets.get(dataset_id)
+        entries = list(dataset['trials']) if dataset is not None else []
+        for t in trials:
+            reward = t.reward
+            if not t.succeeded or not isinstance(reward, (int, float, np.number)) or not math.isfinite(reward):
+                continue
+            entries.append({'signature': t.space_sample.signature,
+                            'vectors': [_to_json_value(v) for v in t.space_sample.vectors],
+                            'reward': float(reward)})
+
+        unique = {}
+        for entry in entries:
+            key = (entry['signature'], tuple(entry['vectors']))
+            if key not in unique or self._better(entry['reward'], unique[key]['reward'], optimize_direction):
+                unique[key] = entry
+        entries = sorted(unique.values(), key=lambda e: e['reward'], reverse=optimize_direction == 'max')
+
+        self.datasets[dataset_id] = {
+            'meta_features': {k: float(v) for k, v in meta_features.items()},
+            'optimize_direction': optimize_direction,
+            'trials': entries[:self.top_n],
+        }
+
+    @staticmethod
+    def _better(reward, other, optimize_direction):
+        return reward > other if optimize_direction == 'max' else reward < other
+
+    def nearest(self, meta_features, k=3, exclude=()):
+        """
+        The `k` datasets nearest to `meta_features`, by the euclidean distance of the meta-features standardized
+        over the datasets of the index.
+
+        :return: [(dataset_id, distance)], the nearest first.
+        """
+        ids = [i for i in self.datasets.keys() if i not in exclude]
+        if len(ids) <= 0:
+            return []
+        names = sorted(meta_features.keys())
+        matrix = np.array([[self.datasets[i]['meta_features'].get(n, 0.0) for n in names] for i in ids],
+                          dtype='float64')
+        x = np.array([meta_features[n] for n in names], dtype='float64')
+        scale = matrix.std(axis=0)
+        scale[scale <= 1e-12] = 1.0
+        distances = np.sqrt((((matrix - x) / scale) ** 2).sum(axis=1))
+        order = np.argsort(distances, kind='stable')[:k]
+        return [(ids[i], float(distances[i])) for i in order]
+
+    def suggest(self, meta_features, n=10, k=3, exclude=()):
+        """
+        The top configurations of the `k` nearest datasets, taken from the datasets in turn, the best first.
+
+        :return: [(signature, vectors)], at most `n` of them.
+        """
+        trials = [self.datasets[i]['trials'] for i, _ in self.nearest(meta_features, k, exclude)]
+        suggestions = []
+        seen = set()
+        for rank in range(max([len(t) for t in trials], default=0)):
+            for dataset_trials in trials:
+                if rank >= len(dataset_trials) or len(suggestions) >= n:
+                    continue
+                entry = dataset_trials[rank]
+                key = (entry['signature'], tuple(entry['vectors']))
+                if key not in seen:
+                    seen.add(key)
+                    suggestions.append((entry['signature'], entry['vectors']))
+        return suggestions
+
+    def prior_data(self, meta_features, k=3, exclude=()):
+        """
+        The top trials of the `k` nearest datasets as training data of a surrogate model. The rewards are taken as
+        they are, which suits datasets searched with the same reward metric.
+
+        :return: dict of signature and (vectors, rewards).
+        """
+        data = {}
+        for dataset_id, _ in self.nearest(meta_features, k, exclude):
+            for entry in self.datasets[dataset_id]['trials']:
+                vectors, rewards = data.setdefault(entry['signature'], ([], []))
+                vectors.append(entry['vectors'])
+                rewards.append(entry['reward'])
+        return data
+
+
+class WarmStartCallback(Callback):
+    """
+    Seed the search with the top configurations of the nearest datasets in `index`, and record the meta-features
+    and the top trials of the search into `index` when it ends.
+
+    :param index: MetaKnowledgeIndex.
+    :param n_samples: the number of the configurations to seed the searcher.
+    :param k: the number of the nearest datasets to take the configurations from.
+    :param record: whether to record the search into `index`.
+    """
+
+    def __init__(self, index, n_samples=10, k=3, record=True):
+        super(WarmStartCallback, self).__init__()
+        self.index = index
+        self.n_samples = n_samples
+        self.k = k
+        self.record = record
+        self.dataset_id = None
+        self.meta_features = None
+        self.seeds = []
+
+    def on_search_start(self, hyper_model, X, y, X_eval, y_eval, cv, num_folds, max_trials, dataset_id, trial_store,
+                        **fit_kwargs):
+        self.dataset_id = dataset_id
+        self.meta_features = get_meta_features(X, y, hyper_model.task)
+
+        searcher = hyper_model.searcher
+        self.seeds = []
+        for signature, vectors in self.index.suggest(self.meta_features, self.n_samples, self.k):
+            space_sample = searcher.space_fn()
+            try:
+                space_sample.assign_by_vectors(vectors)
+            except Exception:
+                continue  # not a sample of this search space
+            if space_sample.all_assigned and space_sample.signature == signature:
+                self.seeds.append(space_sample)
+        searcher.warm_start(self.seeds)
+
+        if searcher.meta_learner is not None:
+            for signature, (vectors, rewards) in self.index.prior_data(self.meta_features, self.k).items():
+                searcher.meta_learner.add_prior(signature, vectors, rewards)
+
+        if logger.is_info_enabled():
+            logger.info(f'warm start with {len(self.seeds)} samples of the datasets '
+                        f'{self.index.nearest(self.meta_features, self.k)}')
+
+    def on_search_end(self, hyper_model):
+        if self.record and self.meta_features is not None:
+            self.index.add(self.dataset_id, self.meta_features, hyper_model.history.get_top(),
+                           hyper_model.searcher.optimize_direction)
+            self.index.save()
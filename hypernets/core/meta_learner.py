@@ -5,19 +5,82 @@ __author__ = 'yangjian'
 """
 from lightgbm import LGBMRegressor
 import numpy as np
+
+from ..conf import configure, Configurable, Int, Bool, Enum
 from ..utils import logging
 
 logger = logging.get_logger(__name__)
 
 
+@configure()
+class MetaLearnerCfg(Configurable):
+    refit_schedule = Enum(['every', 'doubling'],
+                          default_value='every',
+                          help='when to refit the surrogate model: every "refit_every" new samples, '
+                               'or each time the number of samples doubles.'
+                          ).tag(config=True)
+    refit_every = Int(1, min=1,
+                      help='refit the surrogate model every n new samples, used if refit_schedule="every".'
+                      ).tag(config=True)
+    warm_start = Bool(False,
+                      help='continue boosting from the previous model instead of fitting from scratch.'
+                      ).tag(config=True)
+    warm_start_rounds = Int(20, min=1,
+                            help='boosting rounds added to the previous model on each warm-started refit.'
+                            ).tag(config=True)
+    max_trees = Int(1000, min=1,
+                    help='fit from scratch once the warm-started model exceeds this number of trees.'
+                    ).tag(config=True)
+
+
+class _TrainingData(object):
+    """
+    Growable training matrix of one space signature.
+    """
+
+    def __init__(self, width, capacity=64):
+        self.X = np.zeros((capacity, width), dtype='float64')
+        self.y = np.zeros(capacity, dtype='float64')
+        self.size = 0
+        self.fitted_size = 0
+        self.new_samples = 0
+
+    def extend(self, X, y):
+        n = len(y)
+        if n <= 0:
+            return
+        if self.size + n > len(self.y):
+            capacity = max(len(self.y) * 2, self.size + n)
+            X_new = np.zeros((capacity, self.X.shape[1]), dtype='float64')
+            X_new[:self.size] = self.X[:self.size]
+            y_new = np.zeros(capacity, dtype='float64')
+            y_new[:self.size] = self.y[:self.size]
+            self.X, self.y = X_new, y_new
+        self.X[self.size:self.size + n] = X
+        self.y[self.size:self.size + n] = y
+        self.size += n
+
+
 class MetaLearner(object):
-    def __init__(self, history, dataset_id, trial_store):
+    def __init__(self, history, dataset_id, trial_store, refit_schedule=None, refit_every=None, warm_start=None,
+                 warm_start_rounds=None, max_trees=None):
         self.trial_store = trial_store
         self.dataset_id = dataset_id
         self.history = history
         self.regressors = {}
         self.store_history = {}
 
+        cfg = MetaLearnerCfg
+        self.refit_schedule = refit_schedule if refit_schedule is not None else cfg.refit_schedule
+        self.refit_every = refit_every if refit_every is not None else cfg.refit_every
+        self.warm_start = warm_start if warm_start is not None else cfg.warm_start
+        self.warm_start_rounds = warm_start_rounds if warm_start_rounds is not None else cfg.warm_start_rounds
+        self.max_trees = max_trees if max_trees is not None else cfg.max_trees
+
+        self._data = {}  # signature -> _TrainingData
+        self._synced = 0  # number of history trials moved into the training data
+        self.fit_counter = 0
+
         if logger.is_info_enabled():
             logger.info(f'Initialize Meta Learner: dataset_id:{dataset_id}')
 
@@ -25,15 +88,91 @@ class MetaLearner(object):
         self.fit(space_sample.signature)
 
     def fit(self, space_signature):
+        self._sync_history()
+        data = self._get_training_data(space_signature)
+        if data is None or data.size < 2 or not self._should_refit(space_signature, data):
+            return
+
+        X, y = data.X[:data.size], data.y[:data.size]
+        regressor = self.regressors.get(space_signature)
+        if self.warm_start and regressor is not None \
+                and regressor.booster_.current_iteration() + self.warm_start_rounds <= self.max_trees:
+            new_regressor = LGBMRegressor(n_estimators=self.warm_start_rounds)
+            new_regressor.fit(X, y, init_model=regressor.booster_)
+        else:
+            new_regressor = LGBMRegressor()
+            new_regressor.fit(X, y)
+
+        self.regressors[space_signature] = new_regressor
+        data.fitted_size = data.size
+        data.new_samples = 0
+        self.fit_counter += 1
+
+    def _should_refit(self, space_signature, data):
+        if space_signature not in self.regressors:
+            return True
+        if data.size <= data.fitted_size:
+            return False
+        if self.refit_schedule == 'doubling':
+            return data.size >= data.fitted_size * 2
+        else:
+            return data.new_samples >= self.refit_every
+
+    def add_prior(self, space_signature, vectors_matrix, rewards):
+        """
+        Add samples observed out of this search, e.g. on similar datasets, to the training data of the surrogate
+        model of `space_signature`.
+        """
+        vectors_matrix = np.asarray(vectors_matrix, dtype='float64')
+        if len(vectors_matrix) <= 0:
+            return
+        data = self._data.get(space_signature)
+        if data is None:
+            data = self._new_training_data(space_signature, vectors_matrix.shape[1])
+        data.extend(vectors_matrix, np.asarray(rewards, dtype='float64'))
+        data.new_samples += len(vectors_matrix)
 
-        features = self.extract_features_and_labels(space_signature)
-        x = []
-        y = []
-        for features, label in features:
-            if label != 0:
-                x.append(features)
-                y.append(label)
+    def _sync_history(self):
+        columns = self.history.columns
+        n = len(columns)
+        if n <= self._synced:
+            return
 
+        rows = np.arange(self._synced, n)
+        codes = columns.signature[rows]
+        rewards = columns.reward[rows]
+        for code in np.unique(codes[codes >= 0]):
+            selected = rows[(codes == code) & (rewards != 0)]
+            if len(selected) <= 0:
+                continue
+            width = int(columns.vectors_len[selected[0]])
+            signature = columns.signatures[code]
+            data = self._data.get(signature)
+            if data is None:
+                data = self._new_training_data(signature, width)
+            data.extend(columns.vectors[selected, :width], columns.reward[selected])
+            data.new_samples += len(selected)
+        self._synced = n
+
+    def _get_training_data(self, space_signature):
+        data = self._data.get(space_signature)
+        if data is None and self.trial_store is not None:
+            data = self._new_training_data(space_signature, None)
+        return data
+
+    def _new_training_data(self, space_signature, width):
+        store_x, store_y = self._load_store_history(space_signature)
+        if width is None:
+            if len(store_x) <= 0:
+                return None
+            width = len(store_x[0])
+        data = _TrainingData(width)
+        if len(store_x) > 0:
+            data.extend(np.array(store_x, dtype='float64'), np.array(store_y, dtype='float64'))
+        self._data[space_signature] = data
+        return data
+
+    def _load_store_history(self, space_signature):
         store_history = self.store_history.get(space_signature)
 
         if self.trial_store is not None and store_history is None:
@@ -48,25 +187,27 @@ class MetaLearner(object):
 
         if store_history is None:
             store_history = ([], [])
-
-        store_x, store_y = store_history
-        x = x + store_x
-        y = y + store_y
-        if len(x) >= 2:
-            regressor = LGBMRegressor()
-            regressor.fit(x, y)
-            #  if logger.is_info_enabled():
-            #      logger.info(regressor.predict(x))
-            self.regressors[space_signature] = regressor
+        return store_history
 
     def predict(self, space_sample, default_value=np.inf):
         regressor = self.regressors.get(space_sample.signature)
         if regressor is not None:
-            score = regressor.predict([space_sample.vectors])
+            score = regressor.predict(np.array([space_sample.vectors], dtype='float64'))
         else:
             score = default_value
         return score
 
+    def predict_batch(self, vectors_matrix, space_signature, default_value=np.inf):
+        """
+        Score the rows of `vectors_matrix`, all of which are vectors of samples with the `space_signature`,
+        in one surrogate call.
+        """
+        vectors_matrix = np.asarray(vectors_matrix, dtype='float64')
+        regressor = self.regressors.get(space_signature)
+        if regressor is None or len(vectors_matrix) <= 0:
+            return np.full(len(vectors_matrix), default_value, dtype='float64')
+        return regressor.predict(vectors_matrix)
+
     def extract_features_and_labels(self, signature):
         features = [(t.space_sample.vectors, t.reward) for t in self.history.trials if
                     t.space_sample.signature == signature]
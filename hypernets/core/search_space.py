@@ -407,11 +407,13 @@ class HyperSpace(Mutable):
 
     def get_unassigned_params(self, traverse_direction='forward'):
         assignables = []
+        seen = set()
 
         def append_params(m):
             ps = m.get_assignable_params()
             for p in ps:
-                if p not in assignables:
+                if p not in seen:
+                    seen.add(p)
                     assignables.append(p)
             return True
 
@@ -3,10 +3,16 @@
 
 """
 import enum
+import math
 
-from hypernets.utils import to_repr
+import numpy as np
+
+from hypernets.utils import to_repr, logging
+from .callbacks import EarlyStoppingError
 from .stateful import Stateful
 
+logger = logging.get_logger(__name__)
+
 
 class OptimizeDirection(enum.Enum):
     Minimize = 'min'
@@ -21,6 +27,10 @@ class Searcher(Stateful):
         self.optimize_direction = optimize_direction
         self.meta_learner = None
         self.space_sample_validation_fn = space_sample_validation_fn
+        self._pending = {}
+        self._seen = set()  # keys of the samples proposed, see `is_seen`
+        self._combinations = None  # counted at the first duplicate
+        self._warm_samples = []
 
     def set_meta_learner(self, meta_learner):
         self.meta_learner = meta_learner
@@ -37,20 +47,127 @@ class Searcher(Stateful):
         space_sample.random_sample()
         return space_sample
 
-    def _sample_and_check(self, sample_fn):
+    def _sample_and_check(self, sample_fn, mark_seen=True, retry_limit=1000):
+        """
+        Call `sample_fn` until it returns a valid sample not seen before.
+
+        `sample_fn` may return None for a sample rejected before it is materialized, see `is_seen_vectors`. The
+        returned sample is marked as seen unless `mark_seen` is False, e.g. for candidates of which only the chosen
+        one is dispatched. EarlyStoppingError is raised once all samples of a finite space are seen.
+        """
         counter = 0
         while True:
             space_sample = sample_fn()
             counter += 1
-            if counter >= 1000:
-                raise ValueError('Unable to take valid sample and exceed the retry limit 1000.')
-            if self.space_sample_validation_fn is not None:
-                if self.space_sample_validation_fn(space_sample):
-                    break
-            else:
+            if space_sample is None or self.is_seen(space_sample):
+                if self.exhausted:
+                    raise EarlyStoppingError(f'the search space is exhausted, all {self._combinations} samples '
+                                             f'are seen.')
+            elif self.space_sample_validation_fn is None or self.space_sample_validation_fn(space_sample):
                 break
+            elif mark_seen:
+                self.mark_seen(space_sample)  # never valid
+            if counter >= retry_limit:
+                raise ValueError(f'Unable to take valid sample and exceed the retry limit {retry_limit}.')
+        if mark_seen:
+            self.mark_seen(space_sample)
         return space_sample
 
+    @staticmethod
+    def _seen_key(signature, vectors):
+        # the exact key, the hashes of numbers collide (e.g. hash(-1) == hash(-2))
+        return signature, tuple(vectors)
+
+    def is_seen(self, space_sample):
+        """
+        Whether `space_sample` is proposed already, including the samples still pending.
+        """
+        return self._seen_key(space_sample.signature, space_sample.vectors) in self._seen
+
+    def is_seen_vectors(self, signature, vectors):
+        """
+        As `is_seen`, for the signature and vectors of a sample before it is materialized as a `HyperSpace`.
+        """
+        return self._seen_key(signature, vectors) in self._seen
+
+    def mark_seen(self, space_sample):
+        self._seen.add(self._seen_key(space_sample.signature, space_sample.vectors))
+
+    @property
+    def seen_count(self):
+        return len(self._seen)
+
+    @property
+    def combinations(self):
+        """
+        The number of distinct samples of the search space, inf if it is continuous or can not be counted.
+        """
+        if self._combinations is None:
+            from .space_template import SpaceTemplate
+            try:
+                n = SpaceTemplate(self.space_fn).combinations()
+            except Exception as e:
+                logger.debug(f'unable to count the combinations of the search space: {e}')
+                n = None
+            self._combinations = n if n is not None else math.inf
+        return self._combinations
+
+    @property
+    def exhausted(self):
+        return self.seen_count >= self.combinations
+
+    def warm_start(self, space_samples):
+        """
+        Propose `space_samples` before the samples of the searcher, e.g. the best samples found on similar
+        datasets. They seed the initial population of `EvolutionSearcher` and the first roll-outs of
+        `MCTSSearcher`, other searchers ignore them.
+        """
+        self._warm_samples.extend(space_samples)
+
+    def _pop_warm_sample(self):
+        while len(self._warm_samples) > 0:
+            space_sample = self._warm_samples.pop(0)
+            if self.is_seen(space_sample):
+                continue
+            if self.space_sample_validation_fn is not None and not self.space_sample_validation_fn(space_sample):
+                continue
+            self.mark_seen(space_sample)
+            return space_sample
+        return None
+
+    def _predict_candidates(self, candidates, default_value):
+        """
+        Score candidate samples with the meta learner, one batch call for each space signature.
+        """
+        scores = np.full(len(candidates), default_value, dtype='float64')
+        groups = {}
+        for i, c in enumerate(candidates):
+            groups.setdefault(c.signature, []).append(i)
+        for signature, indices in groups.items():
+            vectors = [candidates[i].vectors for i in indices]
+            scores[indices] = self.meta_learner.predict_batch(vectors, signature, default_value)
+        return scores
+
+    @property
+    def pending_samples(self):
+        """
+        Samples dispatched to run but whose results are not reported yet.
+        """
+        return list(self._pending.values())
+
+    def add_pending(self, space_sample):
+        self._pending[self._pending_key(space_sample)] = space_sample
+
+    def remove_pending(self, space_sample):
+        self._pending.pop(self._pending_key(space_sample), None)
+
+    def is_pending(self, space_sample):
+        return self._pending_key(space_sample) in self._pending
+
+    @staticmethod
+    def _pending_key(space_sample):
+        return space_sample.signature, tuple(space_sample.vectors)
+
     def get_best(self):
         raise NotImplementedError
 
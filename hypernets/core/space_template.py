@@ -0,0 +1,367 @@
+# -*- coding:utf-8 -*-
+"""
+Compiled sampler of a search space.
+
+`HyperSpace.random_sample` walks the graph again for every parameter it assigns, and searchers build a fresh
+graph with `space_fn()` for every sample. `SpaceTemplate` analyzes the parameter tree of a space once, then draws
+many samples at a time as a matrix of vectors with numpy, a `HyperSpace` is only materialized for the samples
+that are actually used.
+
+The parameter tree is flattened into segments: a segment is a run of parameters which always appear together and
+in the same order, it ends with a structural parameter (one that rewires the graph, e.g. `hp_or` of a
+`ModuleChoice` or `hp_opt` of an `Optional`) and branches on its value, or ends the sample. Parameters that are
+only referenced by ordinary modules are assumed not to change the structure of the space.
+"""
+import hashlib
+
+import numpy as np
+
+from .ops import ConnectionSpace
+from .random_state import get_random_state
+from .search_space import Int, Real, Choice, MultipleChoice, Dynamic, Cascade
+from ..utils import logging
+from ..utils.common import combinations
+
+logger = logging.get_logger(__name__)
+
+
+def _snap(values, grid):
+    """Move every value to the nearest point of the ascending `grid`, the lower one on ties."""
+    pos = np.clip(np.searchsorted(grid, values), 1, max(len(grid) - 1, 1))
+    left = grid[pos - 1]
+    right = grid[np.minimum(pos, len(grid) - 1)]
+    return np.where(values - left <= right - values, left, right)
+
+
+def _int_sampler(p):
+    grid = np.arange(p.low, p.high + p.step, step=p.step) if p.step is not None else None
+
+    def sample(rs, n):
+        values = rs.randint(p.low, p.high, size=n)
+        if grid is not None:
+            values = _snap(values, grid)
+        return values
+
+    return sample
+
+
+def _real_sampler(p):
+    if p.prior == 'uniform':
+        low, high = p.low, p.high
+    elif p.prior == 'log_uniform':
+        low, high = np.exp(p.low), np.exp(p.high)
+    elif p.prior == 'q_uniform':
+        low, high = p.low, p.high
+    else:
+        return None
+    grid = np.round(np.arange(low, high + p.step, step=p.step), 8) if p.step is not None else None
+
+    def sample(rs, n):
+        values = rs.uniform(p.low, p.high, size=n)
+        if p.prior == 'log_uniform':
+            values = np.exp(values)
+        elif p.prior == 'q_uniform':
+            values = np.clip(np.round(values / p.q) * p.q, p.low, p.high)
+        if grid is not None:
+            values = np.minimum(_snap(values, grid), high)
+        return values
+
+    return sample
+
+
+def _choice_sampler(p):
+    def sample(rs, n):
+        return rs.randint(0, len(p.options), size=n)
+
+    return sample
+
+
+def _multiple_choice_sampler(p):
+    m = len(p.options)
+    if m > 52:  # the bit mask does not fit in the mantissa of float64
+        return None
+    high = p.num_chosen_most if p.num_chosen_most > 0 else m
+    weights = 2 ** np.arange(m - 1, -1, -1, dtype='int64')
+
+    def sample(rs, n):
+        chosen_num = rs.randint(p.num_chosen_least, high + 1, size=n)
+        ranks = np.argsort(np.argsort(rs.rand(n, m), axis=1), axis=1)
+        return (ranks < chosen_num[:, None]).astype('int64') @ weights
+
+    return sample
+
+
+def _generic_sampler(p):
+    def sample(rs, n):
+        return np.array([p.value2numeric(p.random_sample(assign=False)) for _ in range(n)], dtype='float64')
+
+    return sample
+
+
+def _get_sampler(p):
+    sampler = None
+    if isinstance(p, Int):
+        sampler = _int_sampler(p)
+    elif isinstance(p, Real):
+        sampler = _real_sampler(p)
+    elif isinstance(p, Choice):
+        sampler = _choice_sampler(p)
+    elif isinstance(p, MultipleChoice):
+        sampler = _multiple_choice_sampler(p)
+    if sampler is None:
+        sampler = _generic_sampler(p)
+    return sampler
+
+
+def _cardinality(p):
+    """The number of values `p` takes when sampled, None if it is continuous."""
+    if isinstance(p, Int):
+        if p.step is None:
+            return p.high - p.low
+        grid = np.arange(p.low, p.high + p.step, step=p.step)
+        if p.high - p.low <= 100000:
+            return len(np.unique(_snap(np.arange(p.low, p.high), grid)))
+        return len(grid)
+    elif isinstance(p, Real):
+        if p.step is None or p.prior not in ('uniform', 'log_uniform', 'q_uniform'):
+            return None
+        low, high = (np.exp(p.low), np.exp(p.high)) if p.prior == 'log_uniform' else (p.low, p.high)
+        grid = np.round(np.arange(low, high + p.step, step=p.step), 8)
+        return len(np.unique(np.minimum(grid, high)))
+    elif isinstance(p, Choice):
+        return len(p.options)
+    elif isinstance(p, MultipleChoice):
+        n = int(combinations(len(p.options), p.num_chosen_most, p.num_chosen_least))
+        return n + 1 if p.num_chosen_least <= 0 else n
+    else:
+        return p.choice_num
+
+
+def expansion_values(param_space, max_space):
+    """
+    The values `param_space.expansion(max_space)` assigns to its copies, without copying the parameter, i.e. the
+    values a tree or grid search enumerates for the parameter.
+    """
+    if isinstance(param_space, Choice):
+        return list(param_space.options)
+    choice_num = param_space.choice_num
+    if isinstance(param_space, Real) and max_space <= 0:
+        sample_num = min(param_space.max_expansion, choice_num)
+    else:
+        sample_num = choice_num if max_space > choice_num or max_space <= 0 else max_space
+    values = []
+    while len(values) < sample_num:
+        v = param_space._random_sample()
+        if v in values:
+            continue
+        values.append(v)
+    if isinstance(param_space, (Int, Real)):
+        values = sorted(values)
+    return values
+
+
+def is_structural_param(p):
+    """
+    Whether assigning `p` may change the structure of the space, which makes the parameters after it depend on
+    its value.
+    """
+    for m in p.references:
+        if isinstance(m, (ConnectionSpace, Cascade)):
+            return True
+        if isinstance(m, Dynamic) and any(isinstance(r, (ConnectionSpace, Cascade)) for r in m.references):
+            return True
+    return False
+
+
+class _Segment(object):
+    def __init__(self, index, params, offset, path, parent=None):
+        self.index = index
+        self.offset = offset
+        self.path = path  # numerics of a sample before the structural parameter, used to analyze the branches
+        self.params = params
+        self.samplers = [_get_sampler(p) for p in params]
+        self.size = len(params)
+        self.end = self.offset + self.size
+        self.branching = self.size > 0 and is_structural_param(params[-1])
+        self.branch_param = params[-1] if self.branching else None
+        self.children = {}
+
+        is_float = [isinstance(p, Real) for p in params]
+        labels = [p.label for p in params]
+        if parent is not None:
+            is_float = parent.is_float + is_float
+            labels = parent.labels + labels
+        self.is_float = is_float
+        self.labels = labels
+        self._signature = None
+
+    @property
+    def signature(self):
+        if self._signature is None:
+            key = ';'.join(self.labels)
+            self._signature = hashlib.md5(key.encode('utf-8')).hexdigest()
+        return self._signature
+
+    def typed(self, row):
+        return [float(v) if f else int(v) for v, f in zip(row, self.is_float)]
+
+
+class SampleBatch(object):
+    """
+    Samples drawn by `SpaceTemplate.sample`.
+
+    `vectors` is a (n, width) float64 matrix padded with nan, row i holds the first `lengths[i]` numerics of
+    sample i, in the order of `HyperSpace.vectors`.
+    """
+
+    def __init__(self, template, vectors, segments):
+        self.template = template
+        self.vectors = vectors
+        self._segments = segments
+
+    def __len__(self):
+        return len(self._segments)
+
+    @property
+    def lengths(self):
+        return np.array([s.end for s in self._segments], dtype='int64')
+
+    def signature(self, i):
+        return self._segments[i].signature
+
+    def vectors_of(self, i):
+        segment = self._segments[i]
+        return segment.typed(self.vectors[i, :segment.end])
+
+    def materialize(self, i):
+        return self.template.materialize(self.vectors_of(i))
+
+
+class SpaceTemplate(object):
+    """
+    A compiled search space, see the module docstring.
+
+    :param space_fn: the function to build the search space, as the one of searchers.
+    :param random_state: numpy RandomState, the hypernets random state is used by default.
+    :param max_segments: the number of segments analyzed up front, branches of structural parameters other than
+        `Choice` and those beyond this number are analyzed when they are sampled at the first time.
+    """
+
+    def __init__(self, space_fn, random_state=None, max_segments=256):
+        self.space_fn = space_fn
+        self.random_state = random_state if random_state is not None else get_random_state()
+        self.segments = []
+        self.width = 0
+        self.root = self._discover([], None)
+        self._expand(max_segments)
+
+    def _discover(self, prefix, parent):
+        space = self.space_fn()
+        params = []
+        path = list(prefix)
+        i = 0
+        for p in space.params_iterator:
+            if i < len(prefix):
+                p.assign(p.numeric2value(prefix[i]))
+                i += 1
+                continue
+            params.append(p)
+            if is_structural_param(p):
+                break
+            path.append(p.value2numeric(p.random_sample()))
+        if i != len(prefix):
+            raise ValueError('`vector` and `space` does not match.')
+
+        segment = _Segment(len(self.segments), params, len(prefix), path, parent)
+        self.segments.append(segment)
+        self.width = max(self.width, segment.end)
+        return segment
+
+    def _expand(self, max_segments):
+        standby = [self.root]
+        while standby and len(self.segments) < max_segments:
+            segment = standby.pop(0)
+            if not isinstance(segment.branch_param, Choice):
+                continue
+            for numeric in range(len(segment.branch_param.options)):
+                if len(self.segments) >= max_segments:
+                    break
+                standby.append(self.get_child(segment, numeric, segment.path + [numeric]))
+
+    def get_child(self, segment, numeric, prefix):
+        """
+        The segment following `segment` when its structural parameter takes `numeric`, analyzed on first use.
+
+        :param prefix: the vectors of the sample up to the end of `segment`.
+        """
+        child = segment.children.get(numeric)
+        if child is None:
+            child = self._discover(segment.typed(prefix), segment)
+            segment.children[numeric] = child
+        return child
+
+    @property
+    def params_num(self):
+        """The number of parameters in the segments analyzed so far."""
+        return sum(s.size for s in self.segments)
+
+    def combinations(self):
+        """
+        The number of distinct samples of the space, counted over the segments analyzed so far.
+
+        :return: int, or None if the space is continuous or not analyzed completely.
+        """
+        counts = {}
+        for segment in reversed(self.segments):  # children are discovered after their parents
+            params = segment.params[:-1] if segment.branching else segment.params
+            count = 1
+            for p in params:
+                n = _cardinality(p)
+                if n is None:
+                    return None
+                count *= n
+            if segment.branching:
+                if not isinstance(segment.branch_param, Choice) \
+                        or len(segment.children) < len(segment.branch_param.options):
+                    return None
+                count *= sum(counts[child.index] for child in segment.children.values())
+            counts[segment.index] = count
+        return counts[self.root.index]
+
+    def sample(self, n):
+        """
+        Draw `n` samples at once.
+
+        :return: SampleBatch
+        """
+        rs = self.random_state
+        vectors = np.full((n, max(self.width, 1)), np.nan, dtype='float64')
+        segments = [None] * n
+        standby = [(self.root, np.arange(n))]
+        while standby:
+            segment, rows = standby.pop()
+            if segment.end > vectors.shape[1]:
+                padding = np.full((n, segment.end - vectors.shape[1]), np.nan, dtype='float64')
+                vectors = np.hstack([vectors, padding])
+            for j, sampler in enumerate(segment.samplers):
+                vectors[rows, segment.offset + j] = sampler(rs, len(rows))
+
+            if not segment.branching:
+                for r in rows:
+                    segments[r] = segment
+                continue
+
+            values = vectors[rows, segment.end - 1]
+            for v in np.unique(values):
+                selected = rows[values == v]
+                numeric = int(v) if not segment.is_float[-1] else float(v)
+                child = self.get_child(segment, numeric, vectors[selected[0], :segment.end])
+                standby.append((child, selected))
+
+        width = max(s.end for s in segments) if n > 0 else 0
+        return SampleBatch(self, vectors[:, :width], segments)
+
+    def materialize(self, vectors):
+        space_sample = self.space_fn()
+        space_sample.assign_by_vectors(vectors)
+        return space_sample
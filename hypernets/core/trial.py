@@ -2,18 +2,30 @@
 """
 
 """
+import bisect
 import datetime
+import json
+import math
+import mmap
 import os
 import pickle
 import shutil
+import sqlite3
+import struct
+import threading
 from collections import OrderedDict
 
+import numpy as np
 import pandas as pd
 
 from hypernets.utils.common import isnotebook, to_repr
+from ..core.search_space import Real
 from ..core.searcher import OptimizeDirection
 
 
+_COLUMN_FIELDS = ('trial_no', 'reward', 'elapsed', 'succeeded')  # the fields kept in TrialColumns
+
+
 class Trial():
     def __init__(self, space_sample, trial_no, reward, elapsed, model_file=None, succeeded=True):
         self.space_sample = space_sample
@@ -26,6 +38,13 @@ class Trial():
         self.memo = {}
         self.iteration_scores = {}
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in _COLUMN_FIELDS:
+            # e.g. the reward of a trial set after it was appended to a history
+            for columns, row in self.__dict__.get('_column_rows', ()):
+                columns.refresh(row, self)
+
     def __repr__(self):
         return to_repr(self)
 
@@ -78,7 +97,7 @@ class Trial():
         except AttributeError:
             state = self.__dict__
 
-        state = {k: v for k, v in state.items() if k != 'memo'}
+        state = {k: v for k, v in state.items() if k not in ('memo', '_column_rows')}
         return state
 
     def to_df(self, include_params=False):
@@ -89,61 +108,360 @@ class Trial():
         return pd.DataFrame({k: [v] for k, v in out.items()})
 
 
+class LazyTrial(Trial):
+    """
+    A trial whose space sample is rebuilt from its vectors only when `space_sample` is accessed.
+    """
+
+    def __init__(self, space_fn, vectors, signature, trial_no, reward, elapsed, model_file=None, succeeded=True,
+                 budget=None):
+        self._space_fn = space_fn
+        self._space_sample = None
+        self.vectors = vectors
+        self.signature = signature
+        self.budget = budget
+        Trial.__init__(self, None, trial_no, reward, elapsed, model_file=model_file, succeeded=succeeded)
+
+    @property
+    def materialized(self):
+        return self._space_sample is not None
+
+    @property
+    def space_sample(self):
+        if self._space_sample is None and self._space_fn is not None:
+            sample = self._space_fn()
+            sample.assign_by_vectors(self.vectors)
+            if self.budget is not None:
+                sample.budget = self.budget
+            self._space_sample = sample
+        return self._space_sample
+
+    @space_sample.setter
+    def space_sample(self, value):
+        self._space_sample = value
+
+
+def _trial_vectors(trial):
+    if isinstance(trial, LazyTrial):
+        return trial.vectors
+    return trial.space_sample.vectors if trial.space_sample is not None else None
+
+
+def _trial_budget(trial):
+    if isinstance(trial, LazyTrial):
+        return trial.budget
+    return getattr(trial.space_sample, 'budget', None)
+
+
+def reported_trial(trial):
+    """
+    A copy of `trial` with what the discriminator needs, without the space sample, to report it to remote workers.
+    """
+    reported = Trial(None, trial.trial_no, trial.reward, trial.elapsed, trial.model_file, trial.succeeded)
+    reported.iteration_scores = trial.iteration_scores
+    return reported
+
+
+def _trial_signature(trial):
+    if isinstance(trial, LazyTrial):
+        return trial.signature
+    return trial.space_sample.signature if trial.space_sample is not None else None
+
+
+class _RankedTrials(object):
+    """
+    Trials ordered by an ascending key, stored as a list of bounded buckets so that
+    insertion stays cheap however many trials there are.
+    """
+    _load = 500
+
+    def __init__(self):
+        self._keys = []
+        self._trials = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def insert(self, key, trial):
+        """
+        Insert trial after the ones with the same key (as a stable sort does),
+        return the global position of the inserted trial if it is the first one, otherwise -1.
+        """
+        self._len += 1
+        if len(self._maxes) == 0:
+            self._keys.append([key])
+            self._trials.append([trial])
+            self._maxes.append(key)
+            return 0
+
+        i = bisect.bisect_right(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+        keys, trials = self._keys[i], self._trials[i]
+        pos = bisect.bisect_right(keys, key)
+        keys.insert(pos, key)
+        trials.insert(pos, trial)
+        self._maxes[i] = keys[-1]
+
+        if len(keys) > self._load * 2:
+            self._keys[i:i + 1] = [keys[:self._load], keys[self._load:]]
+            self._trials[i:i + 1] = [trials[:self._load], trials[self._load:]]
+            self._maxes[i:i + 1] = [keys[self._load - 1], keys[-1]]
+
+        return 0 if i == 0 and pos == 0 else -1
+
+    def first(self):
+        return self._trials[0][0] if self._len > 0 else None
+
+    def last(self):
+        return self._trials[-1][-1] if self._len > 0 else None
+
+    def top(self, n=None):
+        if n is not None and n < 0:
+            n = max(self._len + n, 0)
+        result = []
+        for trials in self._trials:
+            if n is not None and len(result) + len(trials) >= n:
+                result.extend(trials[:n - len(result)])
+                break
+            result.extend(trials)
+        return result
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class TrialColumns(object):
+    """
+    Columnar view of the trials in a TrialHistory, one row per trial in appending order, so the row of a trial is
+    its position in `TrialHistory.trials`. A row is refreshed when a field of its trial is set after appending.
+    Vectors of different lengths are padded with nan in the `vectors` matrix, missing values are nan.
+    """
+
+    def __init__(self, capacity=64):
+        self._len = 0
+        self._trial_no = np.zeros(capacity, dtype='int64')
+        self._reward = np.zeros(capacity, dtype='float64')
+        self._elapsed = np.zeros(capacity, dtype='float64')
+        self._succeeded = np.zeros(capacity, dtype='bool')
+        self._signature = np.zeros(capacity, dtype='int32')
+        self._vectors_len = np.zeros(capacity, dtype='int32')
+        self._vectors = np.full((capacity, 0), np.nan, dtype='float64')
+
+        self.signatures = []  # signature code -> signature
+        self.signature_trials = []  # signature code -> the first trial with the signature
+        self._signature_codes = {}
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def trial_no(self):
+        return self._trial_no[:self._len]
+
+    @property
+    def reward(self):
+        return self._reward[:self._len]
+
+    @property
+    def elapsed(self):
+        return self._elapsed[:self._len]
+
+    @property
+    def succeeded(self):
+        return self._succeeded[:self._len]
+
+    @property
+    def signature(self):
+        return self._signature[:self._len]
+
+    @property
+    def vectors_len(self):
+        return self._vectors_len[:self._len]
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._len]
+
+    def row_of(self, trial):
+        for columns, row in trial.__dict__.get('_column_rows', ()):
+            if columns is self:
+                return row
+        return None
+
+    def refresh(self, row, trial):
+        self._trial_no[row] = trial.trial_no
+        self._reward[row] = _float_or_nan(trial.reward)
+        self._elapsed[row] = _float_or_nan(trial.elapsed)
+        self._succeeded[row] = bool(trial.succeeded)
+
+    def append(self, trial):
+        vectors = _trial_vectors(trial)
+        if vectors is None:
+            vectors = []
+        self._reserve(self._len + 1, len(vectors))
+
+        signature = _trial_signature(trial)
+        if signature is not None:
+            code = self._signature_codes.get(signature)
+            if code is None:
+                code = len(self.signatures)
+                self._signature_codes[signature] = code
+                self.signatures.append(signature)
+                self.signature_trials.append(trial)
+        else:
+            code = -1
+
+        i = self._len
+        self.refresh(i, trial)
+        self._signature[i] = code
+        self._vectors_len[i] = len(vectors)
+        self._vectors[i, :len(vectors)] = vectors
+        trial.__dict__.setdefault('_column_rows', []).append((self, i))
+        self._len += 1
+
+    def _reserve(self, size, width):
+        capacity, max_width = self._vectors.shape
+        if size <= capacity and width <= max_width:
+            return
+
+        new_capacity = max(capacity * 2, size) if size > capacity else capacity
+        new_width = max(max_width, width)
+
+        def grow(a):
+            b = np.zeros(new_capacity, dtype=a.dtype)
+            b[:self._len] = a[:self._len]
+            return b
+
+        self._trial_no = grow(self._trial_no)
+        self._reward = grow(self._reward)
+        self._elapsed = grow(self._elapsed)
+        self._succeeded = grow(self._succeeded)
+        self._signature = grow(self._signature)
+        self._vectors_len = grow(self._vectors_len)
+
+        vectors = np.full((new_capacity, new_width), np.nan, dtype='float64')
+        vectors[:self._len, :max_width] = self._vectors[:self._len]
+        self._vectors = vectors
+
+    def decode(self, code, index, numerics):
+        """
+        Convert the numerics at the vector position `index` of signature `code` to param values.
+        """
+        param = self.signature_trials[code].space_sample.get_assigned_params()[index]
+        cast = float if isinstance(param, Real) else int
+        return [param.numeric2value(cast(n)) for n in numerics]
+
+    def aliases(self, code):
+        return [p.alias for p in self.signature_trials[code].space_sample.get_assigned_params()]
+
+
 class TrialHistory():
     def __init__(self, optimize_direction):
         self.trials = []
         self.optimize_direction = optimize_direction
 
+        # vector key (and budget of multi-fidelity trials) -> first trial with the vectors
+        self._trial_index = {}
+        # vector key -> trials of the vectors at budgets, in order of appending
+        self._budget_trials = {}
+        # succeeded trials ordered by reward, the best first
+        self._ranked_trials = _RankedTrials()
+        self._columns = TrialColumns()
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @staticmethod
+    def _vectors_key(vectors, budget=None):
+        # a sample run at another budget (see `HyperbandSearcher`) is another trial
+        return tuple(vectors) if budget is None else (tuple(vectors), budget)
+
+    def _reward_key(self, trial):
+        if self.optimize_direction in ['max', OptimizeDirection.Maximize]:
+            return -trial.reward
+        else:
+            return trial.reward
+
     def append(self, trial):
-        old_best = self.get_best()
         self.trials.append(trial)
-        new_best = self.get_best()
-        improved = old_best != new_best
+        self._columns.append(trial)
+        vectors = _trial_vectors(trial)
+        if vectors is not None:
+            budget = _trial_budget(trial)
+            self._trial_index.setdefault(self._vectors_key(vectors, budget), trial)
+            if budget is not None:
+                self._budget_trials.setdefault(self._vectors_key(vectors), []).append(trial)
+
+        improved = False
+        if trial.succeeded:
+            improved = self._ranked_trials.insert(self._reward_key(trial), trial) == 0
         return improved
 
     def is_existed(self, space_sample):
-        return space_sample.vectors in [t.space_sample.vectors for t in self.trials]
+        return self._vectors_key(space_sample.vectors, getattr(space_sample, 'budget', None)) in self._trial_index
 
     def get_trial(self, space_sample):
-        all_vectors = [t.space_sample.vectors for t in self.trials]
-        index = all_vectors.index(space_sample.vectors)
-        if index >= 0:
-            return self.trials[index]
-        else:
-            return None
+        return self._trial_index.get(self._vectors_key(space_sample.vectors, getattr(space_sample, 'budget', None)))
+
+    def get_budget_trials(self, space_sample):
+        """
+        :return: the trials of the sample's vectors run at budgets, in order of appending.
+        """
+        return self._budget_trials.get(self._vectors_key(space_sample.vectors), [])
 
     def get_best(self):
-        top1 = self.get_top(1)
-        if len(top1) <= 0:
-            return None
-        else:
-            return top1[0]
+        return self._ranked_trials.first()
 
     def get_worst(self):
-        topn = self.get_top()
-        return topn[-1] if len(topn) > 0 else None
+        return self._ranked_trials.last()
 
     def get_top(self, n=None):
         assert n is None or isinstance(n, int)
 
-        valid_trials = [t for t in self.trials if t.succeeded]
-        if len(valid_trials) <= 0:
-            return []
-        sorted_trials = sorted(valid_trials, key=lambda t: t.reward,
-                               reverse=self.optimize_direction in ['max', OptimizeDirection.Maximize])
-
-        if isinstance(n, int) and n < len(sorted_trials):
-            sorted_trials = sorted_trials[:n]
-
-        return sorted_trials
+        return self._ranked_trials.top(n)
 
     def get_space_signatures(self):
-        signatures = set()
-        for s in [t.space_sample for t in self.trials]:
-            signatures.add(s.signature)
-        return signatures
+        columns = self._columns
+        return set(columns.signatures[c] for c in np.unique(columns.signature) if c >= 0)
 
     def diff(self, trials):
+        columns = self._columns
+        rows = [columns.row_of(t) for t in trials]
+        if any(r is None for r in rows):
+            return self._diff_trials(trials)
+
+        rows = np.array(rows, dtype='int64')
+        codes = columns.signature[rows]
+        rewards = columns.reward[rows]
+        vectors = columns.vectors[rows]
+
+        diffs = {}
+        for code in np.unique(codes[codes >= 0]):
+            mask = codes == code
+            sign_rewards = rewards[mask]
+            sign_vectors = vectors[mask]
+            pv_dict = {}
+            for i, alias in enumerate(columns.aliases(code)):
+                uniques, first_index, inverse = np.unique(sign_vectors[:, i], return_index=True, return_inverse=True)
+                values = columns.decode(code, i, uniques)
+                pv = pv_dict.setdefault(alias, {})
+                # keep the values in order of appearance
+                for u in np.argsort(first_index, kind='stable'):
+                    pv.setdefault(str(values[u]), []).extend(sign_rewards[inverse == u].tolist())
+            diffs[columns.signatures[code]] = pv_dict
+
+        return diffs
+
+    @staticmethod
+    def _diff_trials(trials):
         signatures = set()
         for s in [t.space_sample for t in trials]:
             signatures.add(s.signature)
@@ -167,24 +485,30 @@ class TrialHistory():
         return diffs
 
     def get_trajectories(self):
-        times, best_rewards, rewards = [0.0], [0.0], [0.0]
-        his = sorted(self.trials, key=lambda t: t.trial_no)
+        columns = self._columns
+        order = np.argsort(columns.trial_no, kind='stable')
+        rewards = np.concatenate([[0.0], columns.reward[order]])
+        times = np.concatenate([[0.0], np.cumsum(columns.elapsed[order])])
+        best_rewards = np.fmax.accumulate(rewards)
+
         best_trial_no = 0
         best_elapsed = 0
-        for t in his:
-            rewards.append(t.reward)
-            times.append(t.elapsed + times[-1])
-
-            if t.reward > best_rewards[-1]:
-                best_rewards.append(t.reward)
-                best_trial_no = t.trial_no
-                best_elapsed = times[-1]
-            else:
-                best_rewards.append(best_rewards[-1])
+        if best_rewards[-1] > 0.0:
+            i = int(np.argmax(rewards == best_rewards[-1]))
+            best_trial_no = int(columns.trial_no[order[i - 1]])
+            best_elapsed = float(times[i])
+
+        # the rewards as the trials have them, None if missing
+        rewards = [0.0] + [self.trials[i].reward for i in order]
+        return times.tolist(), best_rewards.tolist(), rewards, best_trial_no, best_elapsed
+
+    def save(self, filepath, binary=False):
+        if binary:
+            with TrialHistoryWriter(filepath, self.optimize_direction, mode='w') as writer:
+                for trial in self.trials:
+                    writer.append(trial)
+            return
 
-        return times, best_rewards, rewards, best_trial_no, best_elapsed
-
-    def save(self, filepath):
         with open(filepath, 'w') as output:
             output.write(f'{self.optimize_direction}\r\n')
             for trial in self.trials:
@@ -194,6 +518,13 @@ class TrialHistory():
 
     @staticmethod
     def load_history(space_fn, filepath):
+        if TrialHistoryReader.is_history_file(filepath):
+            reader = TrialHistoryReader(filepath)
+            history = TrialHistory(reader.optimize_direction)
+            for trial in reader.iter_trials(space_fn):
+                history.append(trial)
+            return history
+
         with open(filepath, 'r') as input:
             line = input.readline()
             history = TrialHistory(line.strip())
@@ -219,22 +550,36 @@ class TrialHistory():
     def __repr__(self):
         out = OrderedDict(direction=self.optimize_direction)
         if len(self.trials) > 0:
-            tops = self.get_top()
             out['size'] = len(self.trials)
-            out['succeeded'] = len(tops)
-            if len(tops) > 0:
-                out['best_reward'] = tops[0].reward
-                out['worst_reward'] = tops[-1].reward
+            out['succeeded'] = len(self._ranked_trials)
+            if len(self._ranked_trials) > 0:
+                out['best_reward'] = self.get_best().reward
+                out['worst_reward'] = self.get_worst().reward
 
         repr_ = ', '.join('%s=%r' % (k, v) for k, v in out.items())
         return f'{type(self).__name__}({repr_})'
 
     def to_df(self, include_params=False):
-        if len(self.trials) > 0:
-            df = pd.concat([t.to_df(include_params) for t in self.trials], axis=0)
-            df.reset_index(drop=True, inplace=True)
-        else:
-            df = pd.DataFrame()
+        columns = self._columns
+        if len(columns) <= 0:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(OrderedDict(trial_no=columns.trial_no.copy(), succeeded=columns.succeeded.copy(),
+                                      reward=columns.reward.copy(), elapsed=columns.elapsed.copy()))
+        if include_params:
+            params = OrderedDict()
+            codes = columns.signature
+            vectors = columns.vectors
+            for code in pd.unique(codes[codes >= 0]):
+                rows = np.where(codes == code)[0]
+                for i, alias in enumerate(columns.aliases(code)):
+                    uniques, inverse = np.unique(vectors[rows, i], return_inverse=True)
+                    values = np.empty(len(uniques), dtype='object')
+                    values[:] = columns.decode(code, i, uniques)
+                    col = params.setdefault(alias, np.full(len(columns), None, dtype='object'))
+                    col[rows] = values[inverse]
+            for alias, values in params.items():
+                df[alias] = pd.Series(values).infer_objects()
 
         return df
 
@@ -341,6 +686,157 @@ class TrialHistory():
             return chart.render(output)
 
 
+class TrialHistoryWriter(object):
+    """
+    Append-only binary trial history file.
+
+    The file starts with a header (magic, format version and a json document with the optimize direction),
+    followed by one record per trial:
+        record_len(uint32) trial_no(int64) reward(float64) elapsed(float64) succeeded(uint8)
+        signature(16 bytes md5 digest) budget(float64, NaN if the trial has no budget)
+        vectors_len(uint16) model_file_len(uint16)
+        vector kinds(vectors_len bytes, 0 for int and 1 for float) vectors(vectors_len float64) model_file(utf-8)
+    A record truncated by a crash is ignored by the reader. Records of version 1 files have no budget, such a file
+    is rewritten in the current version when trials are appended to it.
+    """
+    MAGIC = b'HNTRIALS'
+    VERSION = 2
+    HEADER = struct.Struct('<8sII')
+    RECORD = struct.Struct('<IqddB16sdHH')
+    RECORD_V1 = struct.Struct('<IqddB16sHH')
+
+    def __init__(self, filepath, optimize_direction, mode='a'):
+        assert mode in ('a', 'w')
+        if isinstance(optimize_direction, OptimizeDirection):
+            optimize_direction = optimize_direction.value
+        self.filepath = filepath
+        self.optimize_direction = optimize_direction
+
+        if mode == 'a' and os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+            reader = TrialHistoryReader(filepath)
+            if reader.optimize_direction != optimize_direction:
+                raise ValueError(f'Optimize direction of {filepath} is "{reader.optimize_direction}",'
+                                 f' not "{optimize_direction}".')
+            if reader.version < self.VERSION:
+                records = list(reader.iter_records())
+                self._create(filepath, optimize_direction)
+                for record in records:
+                    self._write(*record)
+                self._file.flush()
+            else:
+                self._file = open(filepath, 'r+b')
+                self._file.truncate(reader.valid_size)  # drop the partial record, if any
+                self._file.seek(0, os.SEEK_END)
+        else:
+            self._create(filepath, optimize_direction)
+
+    def _create(self, filepath, optimize_direction):
+        self._file = open(filepath, 'wb')
+        meta = json.dumps(dict(optimize_direction=optimize_direction)).encode('utf-8')
+        self._file.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(meta)))
+        self._file.write(meta)
+        self._file.flush()
+
+    def _write(self, trial_no, reward, elapsed, succeeded, signature, vectors, model_file, budget):
+        signature = bytes.fromhex(signature) if signature else bytes(16)
+        model_file = model_file.encode('utf-8') if model_file else b''
+        kinds = bytes(0 if isinstance(v, (int, np.integer)) else 1 for v in vectors)
+
+        body = np.array(vectors, dtype='float64').tobytes() + model_file
+        record_len = self.RECORD.size - 4 + len(kinds) + len(body)
+        self._file.write(self.RECORD.pack(record_len, trial_no, reward, elapsed, bool(succeeded), signature,
+                                          budget if budget is not None else float('nan'),
+                                          len(vectors), len(model_file)))
+        self._file.write(kinds)
+        self._file.write(body)
+
+    def append(self, trial):
+        vectors = _trial_vectors(trial)
+        self._write(trial.trial_no, trial.reward, trial.elapsed, trial.succeeded, _trial_signature(trial),
+                    vectors if vectors is not None else [], trial.model_file, _trial_budget(trial))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TrialHistoryReader(object):
+    """
+    Streaming reader of the file written by TrialHistoryWriter, records are read from a memory map.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with open(filepath, 'rb') as f:
+            head = f.read(TrialHistoryWriter.HEADER.size)
+            magic, version, meta_len = TrialHistoryWriter.HEADER.unpack(head)
+            if magic != TrialHistoryWriter.MAGIC:
+                raise ValueError(f'{filepath} is not a trial history file.')
+            if version > TrialHistoryWriter.VERSION:
+                raise ValueError(f'Unsupported trial history file version {version}.')
+            meta = json.loads(f.read(meta_len).decode('utf-8'))
+
+        self.version = version
+        self.optimize_direction = meta['optimize_direction']
+        self.data_offset = TrialHistoryWriter.HEADER.size + meta_len
+        self.valid_size = self.data_offset
+        for _ in self.iter_records():
+            pass
+
+    @staticmethod
+    def is_history_file(filepath):
+        with open(filepath, 'rb') as f:
+            return f.read(len(TrialHistoryWriter.MAGIC)) == TrialHistoryWriter.MAGIC
+
+    def iter_records(self):
+        """
+        Yield tuple (trial_no, reward, elapsed, succeeded, signature, vectors, model_file, budget) for every record.
+        """
+        rec = TrialHistoryWriter.RECORD if self.version > 1 else TrialHistoryWriter.RECORD_V1
+        with open(self.filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= self.data_offset:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = self.data_offset
+                while offset + rec.size <= size:
+                    if self.version > 1:
+                        record_len, trial_no, reward, elapsed, succeeded, signature, budget, n, model_file_len = \
+                            rec.unpack_from(mm, offset)
+                    else:
+                        record_len, trial_no, reward, elapsed, succeeded, signature, n, model_file_len = \
+                            rec.unpack_from(mm, offset)
+                        budget = float('nan')
+                    end = offset + 4 + record_len
+                    if end > size:
+                        break
+                    pos = offset + rec.size
+                    kinds = mm[pos:pos + n]
+                    pos += n
+                    numerics = np.frombuffer(mm, dtype='float64', count=n, offset=pos).tolist()
+                    pos += n * 8
+                    vectors = [int(v) if k == 0 else v for k, v in zip(kinds, numerics)]
+                    model_file = mm[pos:pos + model_file_len].decode('utf-8') if model_file_len > 0 else None
+                    signature = signature.hex() if any(signature) else None
+                    budget = None if math.isnan(budget) else budget
+                    offset = end
+                    self.valid_size = offset
+                    yield trial_no, reward, elapsed, bool(succeeded), signature, vectors, model_file, budget
+
+    def iter_trials(self, space_fn):
+        for trial_no, reward, elapsed, succeeded, signature, vectors, model_file, budget in self.iter_records():
+            yield LazyTrial(space_fn, vectors, signature, trial_no, reward, elapsed,
+                            model_file=model_file, succeeded=succeeded, budget=budget)
+
+
 class TrialStore(object):
     def __init__(self):
         self.reset()
@@ -391,10 +887,17 @@ class TrialStore(object):
         raise NotImplementedError
 
     def persist(self):
-        raise NotImplementedError
+        """
+        Write the buffered trials, called at the end of a search. Stores writing each trial at once need nothing.
+        """
+        pass
 
     def sample2key(self, space_sample):
         key = ','.join([str(f) for f in space_sample.vectors])
+        budget = getattr(space_sample, 'budget', None)
+        if budget is not None:
+            # a sample run at another budget (see `HyperbandSearcher`) is another trial
+            key = f'{key}@{budget!r}'
         return key
 
     def check_trial(self, trial):
@@ -489,6 +992,182 @@ class DiskTrialStore(TrialStore):
         return trials
 
 
+class SqliteTrialStore(TrialStore):
+    """
+    TrialStore backed by a single SQLite database file, indexed by dataset_id, space signature and vector key.
+
+    Trials put into the store are buffered and written in batches of `batch_size`, call `persist` to
+    flush the buffered trials.
+    """
+
+    def __init__(self, db_path=None, batch_size=16):
+        if db_path is None:
+            db_path = 'trial_store.db'
+        db_path = os.path.expanduser(db_path)
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._conn = None
+        self._lock = threading.RLock()
+        self._pending = []
+        TrialStore.__init__(self)
+
+    def load(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('CREATE TABLE IF NOT EXISTS trials ('
+                                   'dataset_id TEXT NOT NULL, signature TEXT NOT NULL, vector_key TEXT NOT NULL, '
+                                   'vectors TEXT NOT NULL, trial_no INTEGER, reward REAL, elapsed REAL, '
+                                   'model_file TEXT, '
+                                   'PRIMARY KEY (dataset_id, signature, vector_key))')
+                self._conn.execute('CREATE INDEX IF NOT EXISTS idx_trials_reward '
+                                   'ON trials (dataset_id, signature, reward)')
+                self._conn.commit()
+
+    def reset(self):
+        self._cache = {}
+
+    def clear_history(self):
+        with self._lock:
+            self._pending = []
+            self._conn.execute('DELETE FROM trials')
+            self._conn.commit()
+        self.reset()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self.persist()
+                self._conn.close()
+                self._conn = None
+
+    def _get(self, dataset_id, space_sample):
+        key = (dataset_id, space_sample.signature, self.sample2key(space_sample))
+        with self._lock:
+            # the buffered trials are usually found in cache, unless the cache was reset
+            pending = [r for r in self._pending if r[:3] == key]
+            if len(pending) > 0:
+                row = pending[-1][3:]
+            else:
+                row = self._conn.execute('SELECT vectors, trial_no, reward, elapsed, model_file FROM trials '
+                                         'WHERE dataset_id=? AND signature=? AND vector_key=?', key).fetchone()
+        if row is None:
+            return None
+        trial = self._row_to_trial(row)
+        trial.space_sample = space_sample
+        return trial
+
+    def _put(self, dataset_id, trial):
+        sample = trial.space_sample
+        record = (dataset_id, sample.signature, self.sample2key(sample), json.dumps(sample.vectors, cls=_NumpyEncoder),
+                  trial.trial_no, trial.reward, trial.elapsed, trial.model_file)
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self.persist()
+
+    def put_many(self, dataset_id, trials):
+        with self._lock:
+            for trial in trials:
+                self.put_to_cache(dataset_id, trial)
+                self._put(dataset_id, trial)
+            self.persist()
+
+    def persist(self):
+        with self._lock:
+            if len(self._pending) > 0:
+                self._conn.executemany('INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._pending)
+                self._conn.commit()
+                self._pending = []
+
+    def get_all(self, dataset_id, space_signature):
+        return self.query(dataset_id, space_signature)
+
+    def query(self, dataset_id, space_signature, min_reward=None, max_reward=None, top_n=None, ascending=False):
+        """
+        Get the trials with reward in [min_reward, max_reward], ordered by reward if `top_n` is specified.
+        """
+        sql = 'SELECT vectors, trial_no, reward, elapsed, model_file FROM trials WHERE dataset_id=? AND signature=?'
+        args = [dataset_id, space_signature]
+        if min_reward is not None:
+            sql += ' AND reward>=?'
+            args.append(min_reward)
+        if max_reward is not None:
+            sql += ' AND reward<=?'
+            args.append(max_reward)
+        if top_n is not None:
+            sql += f' ORDER BY reward {"ASC" if ascending else "DESC"} LIMIT ?'
+            args.append(top_n)
+
+        with self._lock:
+            self.persist()
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._row_to_trial(row) for row in rows]
+
+    def get_datasets(self):
+        with self._lock:
+            self.persist()
+            rows = self._conn.execute('SELECT DISTINCT dataset_id FROM trials').fetchall()
+        return [r[0] for r in rows]
+
+    def get_space_signatures(self, dataset_id):
+        with self._lock:
+            self.persist()
+            rows = self._conn.execute('SELECT DISTINCT signature FROM trials WHERE dataset_id=?',
+                                      (dataset_id,)).fetchall()
+        return [r[0] for r in rows]
+
+    @staticmethod
+    def _row_to_trial(row):
+        vectors, trial_no, reward, elapsed, model_file = row
+        trial = Trial(space_sample=None, trial_no=trial_no, reward=reward, elapsed=elapsed, model_file=model_file)
+        trial.space_sample_vectors = json.loads(vectors)
+        return trial
+
+    def import_disk_store(self, home_dir):
+        """
+        Migrate the trials persisted by DiskTrialStore in `home_dir`, returns the number of imported trials.
+        """
+        home_dir = os.path.expanduser(home_dir)
+        n = 0
+        with self._lock:
+            for dataset_id in sorted(os.listdir(home_dir)):
+                dataset_dir = os.path.join(home_dir, dataset_id)
+                if not os.path.isdir(dataset_dir):
+                    continue
+                for signature in sorted(os.listdir(dataset_dir)):
+                    signature_dir = os.path.join(dataset_dir, signature)
+                    if not os.path.isdir(signature_dir):
+                        continue
+                    for f in os.listdir(signature_dir):
+                        if not f.endswith('.pkl'):
+                            continue
+                        with open(os.path.join(signature_dir, f), 'rb') as fp:
+                            trial = pickle.load(fp)
+                        self._pending.append((dataset_id, signature, f[:-len('.pkl')],
+                                              json.dumps(trial.space_sample_vectors, cls=_NumpyEncoder),
+                                              trial.trial_no, trial.reward, trial.elapsed, trial.model_file))
+                        n += 1
+                        if len(self._pending) >= 1000:
+                            self.persist()
+            self.persist()
+        return n
+
+
+class _NumpyEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return float(o)
+        return super().default(o)
+
+
 default_trial_store = None
 
 
@@ -3,9 +3,14 @@ __author__ = 'yangjian'
 """
 
 """
+import inspect
 
+from hypernets.utils import logging
 from ._base import get_previous_trials_scores, get_percentile_score, UnPromisingTrial, BaseDiscriminator
 from .percentile import PercentileDiscriminator, ProgressivePercentileDiscriminator, OncePercentileDiscriminator
+from .learning_curve import LearningCurveDiscriminator
+
+logger = logging.get_logger(__name__)
 
 _discriminators = {
     'percentile': PercentileDiscriminator,
@@ -14,6 +19,8 @@ _discriminators = {
     'progressive': ProgressivePercentileDiscriminator,
     'progressive_percentile': ProgressivePercentileDiscriminator,
     'progressive_percentile_discriminator': ProgressivePercentileDiscriminator,
+    'learning_curve': LearningCurveDiscriminator,
+    'learning_curve_discriminator': LearningCurveDiscriminator,
 }
 
 
@@ -39,5 +46,15 @@ def make_discriminator(cls, optimize_direction='min', **kwargs):
         default_kwargs = {}
 
     kwargs = {**default_kwargs, **kwargs}
+
+    # the options are shared by all discriminators, e.g. ExperimentCfg.experiment_discriminator_options, drop those
+    # the class doesn't accept
+    params = inspect.signature(cls.__init__).parameters
+    if not any(p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        unused = [k for k in kwargs.keys() if k not in params]
+        if len(unused) > 0:
+            logger.info(f'ignore the options {unused} not accepted by {cls.__name__}.')
+            kwargs = {k: v for k, v in kwargs.items() if k in params}
+
     discriminator = cls(optimize_direction=optimize_direction, **kwargs)
     return discriminator
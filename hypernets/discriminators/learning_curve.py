@@ -0,0 +1,227 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import math
+import warnings
+
+import numpy as np
+from scipy.optimize import curve_fit
+from scipy.stats import norm
+
+from hypernets.utils.logging import get_logger
+from ._base import BaseDiscriminator
+
+logger = get_logger(__name__)
+
+
+# Parametric learning curves of the step x (from 1) increasing to the asymptote c, see Domhan et al. The curves are
+# fitted to the sign-adjusted scores, so a loss curve decreasing to its minimum is an increasing curve as well.
+
+def _pow3(x, c, a, alpha):
+    return c - a * np.power(x, -alpha)
+
+
+def _exp3(x, c, a, b):
+    return c - a * np.exp(-b * x)
+
+
+def _ilog2(x, c, a):
+    return c - a / np.log(x + 1)
+
+
+def _pow4(x, c, a, b, alpha):
+    return c - np.power(a * x + b, -alpha)
+
+
+_curves = {
+    'pow3': (_pow3, lambda y: (y[-1], y[-1] - y[0], 0.5),
+             ([-np.inf, 0, 0], [np.inf, np.inf, 10])),
+    'exp3': (_exp3, lambda y: (y[-1], max(y[-1] - y[0], 1e-6) * 2, 0.1),
+             ([-np.inf, 0, 0], [np.inf, np.inf, 10])),
+    'ilog2': (_ilog2, lambda y: (y[-1], max(y[-1] - y[0], 1e-6)),
+              ([-np.inf, 0], [np.inf, np.inf])),
+    'pow4': (_pow4, lambda y: (y[-1], 1.0, 1.0, 0.5),
+             ([-np.inf, 1e-6, 1e-6, 0], [np.inf, np.inf, np.inf, 10])),
+}
+
+
+def extrapolate(scores, end_step, curves=('pow3', 'exp3', 'ilog2')):
+    """
+    Predict the score at `end_step` (counted from 1) of an increasing learning curve from its first scores.
+
+    Each curve is fitted by least squares, the predictive variance of a curve is the residual variance plus the
+    parameter uncertainty propagated by the gradient at `end_step`. The curves with substantial support (AIC within
+    10 of the best) are combined as an equally weighted mixture, as the Akaike weights of a few early scores trust
+    one curve too much.
+
+    :return: (mean, std) of the prediction, (nan, nan) if no curve can be fitted.
+    """
+    mean, std, _ = _extrapolate(scores, end_step, curves)
+    return mean, std
+
+
+def _extrapolate(scores, end_step, curves, initials=None):
+    """
+    :param initials: dict of curve name and the parameters to start the fit from, e.g. of the fit of fewer scores.
+    :return: (mean, std, dict of curve name and the fitted parameters)
+    """
+    y = np.asarray(scores, dtype='float64')
+    n = len(y)
+    x = np.arange(1, n + 1, dtype='float64')
+    predictions = []
+    fitted = {}
+    for name in curves:
+        fn, p0, bounds = _curves[name]
+        k = len(bounds[0])
+        if n <= k:
+            continue
+        if initials is not None and name in initials:
+            initial = np.clip(initials[name], *bounds)
+        else:
+            initial = np.clip(p0(y), *bounds)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                params, cov = curve_fit(fn, x, y, p0=initial, bounds=bounds, maxfev=2000)
+        except (RuntimeError, ValueError):
+            continue
+        fitted[name] = params
+        residuals = y - fn(x, *params)
+        rss = max(float(residuals @ residuals), 1e-12)
+        mean = float(fn(end_step, *params))
+        if not math.isfinite(mean):
+            continue
+
+        # delta method with a numeric gradient
+        grad = np.zeros(k)
+        for i in range(k):
+            h = 1e-6 * max(abs(params[i]), 1.0)
+            shifted = params.copy()
+            shifted[i] += h
+            grad[i] = (fn(end_step, *shifted) - mean) / h
+        param_var = float(grad @ cov @ grad) if np.all(np.isfinite(cov)) else 0.0
+        var = rss / max(n - k, 1) + max(param_var, 0.0)
+        aic = n * math.log(rss / n) + 2 * k
+        predictions.append((mean, var, aic))
+
+    if len(predictions) == 0:
+        return math.nan, math.nan, fitted
+    means, variances, aics = map(np.array, zip(*predictions))
+    weights = (aics - aics.min() <= 10.0).astype('float64')
+    weights /= weights.sum()
+    mean = float(weights @ means)
+    var = float(weights @ (variances + (means - mean) ** 2))
+    return mean, math.sqrt(var), fitted
+
+
+_MAX_FITS = 16  # the fits kept per group to warm start, of the trials running at the same time
+
+
+class LearningCurveDiscriminator(BaseDiscriminator):
+    """
+    Extrapolate the learning curve of a trial to its last iteration, and stop the trial once the probability that
+    its final score beats the top `top_k` final scores of the previous trials falls under `threshold`.
+
+    Unlike the percentile discriminators, which compare the current score with the scores of earlier trials at the
+    same step, a trial that starts slowly but converges well is kept, and a trial whose curve flattens out below the
+    top trials is stopped early.
+
+    Fitting the curves is far more expensive than a percentile, so the curve of a trial is only refitted when it
+    grew by `growth` times since the last fit (and on the `stride`), each fit starting from the parameters of the
+    previous fit of the same trajectory (the trials of a group may run at the same time). The final scores of the
+    previous trials are collected once per trial, leaving out the trials stopped early.
+
+    References
+    ----------
+        Domhan, Tobias, et al. "Speeding up Automatic Hyperparameter Optimization of Deep Neural Networks by
+        Extrapolation of Learning Curves." IJCAI (2015).
+    """
+
+    def __init__(self, threshold=0.05, top_k=1, curves=('pow3', 'exp3', 'ilog2'), min_trials=5, min_steps=5,
+                 stride=1, growth=1.2, history=None, optimize_direction='min'):
+        assert 0.0 < threshold < 1.0, f'threshold must be between 0 and 1, got {threshold}'
+        assert top_k >= 1
+        assert all(c in _curves for c in curves), f'curves must be in {list(_curves.keys())}, got {curves}'
+        assert growth >= 1.0, f'growth must not be less than 1, got {growth}'
+
+        BaseDiscriminator.__init__(self, min_trials, min_steps, stride, history, optimize_direction)
+        self.threshold = threshold
+        self.top_k = top_k
+        self.curves = tuple(curves)
+        self.growth = growth
+
+        self._finals = {}  # group_id -> (number of trials collected, top k final scores, max trajectory size)
+        self._fits = {}  # group_id -> [(fitted trajectory, dict of curve name and parameters)], the latest last
+
+    def bind_history(self, history):
+        super(LearningCurveDiscriminator, self).bind_history(history)
+        self._finals = {}
+        self._fits = {}
+
+    def _scheduled(self, n_step):
+        # min_steps, then every step grown by `growth` times, on the stride
+        step = self.min_steps
+        stride = max(self.stride, 1)
+        while step < n_step:
+            step += stride * max(1, math.ceil(step * (self.growth - 1.0) / stride))
+        return step == n_step
+
+    def is_promising(self, iteration_trajectory, group_id, end_iteration):
+        if self.history is None:
+            raise ValueError('`history` is not bound')
+        if not self._scheduled(len(iteration_trajectory)):
+            return True
+        return super(LearningCurveDiscriminator, self).is_promising(iteration_trajectory, group_id, end_iteration)
+
+    def _collect(self, group_id):
+        trials = self.history.trials
+        size, finals, max_size = self._finals.get(group_id, (0, [], 0))
+        if size > len(trials):
+            size, finals, max_size = 0, [], 0
+        for trial in trials[size:]:
+            if not trial.succeeded or trial.memo.get('early_stopped'):
+                continue  # the last score of a stopped trial is not a final one
+            trajectory = trial.iteration_scores.get(group_id)
+            if trajectory:
+                finals = sorted(finals + [trajectory[-1] * self._sign], reverse=True)[:self.top_k]
+                max_size = max(max_size, len(trajectory))
+        self._finals[group_id] = (len(trials), finals, max_size)
+        return finals, max_size
+
+    def _is_promising(self, iteration_trajectory, group_id, end_iteration=None):
+        # the score to beat: the k-th best final score, sign-adjusted to be larger the better
+        finals, max_size = self._collect(group_id)
+        if len(finals) < self.top_k:
+            return True
+        if end_iteration is None:
+            # the trials stopped by the discriminator are shorter, the longest one ran to completion
+            end_iteration = max_size
+        if end_iteration <= len(iteration_trajectory):
+            return True
+        target = finals[self.top_k - 1]
+
+        n_step = len(iteration_trajectory)
+        trajectory = list(iteration_trajectory)
+        fits = self._fits.setdefault(group_id, [])
+        initials = None
+        for i in range(len(fits) - 1, -1, -1):
+            # warm start from a fit of the beginning of this trajectory, not of another trial
+            fitted_trajectory, parameters = fits[i]
+            if len(fitted_trajectory) < n_step and trajectory[:len(fitted_trajectory)] == fitted_trajectory:
+                initials = parameters
+                del fits[i]
+                break
+        mean, std, fitted = _extrapolate(np.asarray(trajectory, dtype='float64') * self._sign,
+                                         end_iteration, self.curves, initials)
+        fits.append((trajectory, fitted))
+        del fits[:-_MAX_FITS]
+        if not math.isfinite(mean):
+            return True
+        probability = float(norm.sf(target, loc=mean, scale=max(std, 1e-12)))
+        result = probability >= self.threshold
+        if not result and logger.is_info_enabled():
+            logger.info(f'direction:{self.optimize_direction}, promising:{result}, '
+                        f'probability:{probability:.4f}, predicted final score:{mean * self._sign}+-{std}, '
+                        f'top {self.top_k} score:{target * self._sign}, trajectory size:{n_step}')
+        return result
@@ -11,7 +11,11 @@ def get_dispatcher(hyper_model, **kwargs):
     work_dir = c.work_dir if len(c.work_dir) > 0 else f'{experiment}'
 
     if hyper_model.searcher.parallelizable:
-        if c.backend == 'dask':
+        if c.backend == 'process':
+            from .multi_process_dispatcher import MultiProcessDispatcher
+            models_dir = f'{work_dir}/models'
+            return MultiProcessDispatcher(models_dir)
+        elif c.backend == 'dask':
             from .dask.dask_dispatcher import DaskDispatcher
             return DaskDispatcher(work_dir)
         elif c.backend == 'cluster':
@@ -7,7 +7,7 @@ class DispatchCfg(Configurable):
                         ).tag(config=True)
     work_dir = String(help='storage directory path to store running data.'
                       ).tag(config=True)
-    backend = Enum(['standalone', 'dask', 'cluster', None],
+    backend = Enum(['standalone', 'process', 'dask', 'cluster', None],
                    default_value=None,
                    help='dispatcher backend'
                    ).tag(config=True)
@@ -15,6 +15,35 @@ class DispatchCfg(Configurable):
                             help='maximum retry number to run trial.'
                             ).tag(config=True)
 
+    scheduler = Enum(['fifo', 'cost'],
+                     default_value='fifo',
+                     help='order of trials, "fifo" runs samples as the searcher proposes them, "cost" learns the '
+                          'runtime and memory of trials and packs them onto workers, see CostAwareScheduler; the '
+                          'resources are measured per process, valid if each trial runs in its own process'
+                     ).tag(config=True)
+    scheduler_lookahead = Int(4, min=1,
+                              help='number of samples the cost-aware scheduler chooses from, used if scheduler="cost"'
+                              ).tag(config=True)
+    scheduler_memory_limit = Float(0.0, min=0.0,
+                                   help='MB of memory a trial can use, samples predicted to use more are refused, '
+                                        '0 for no limit, used if scheduler="cost"'
+                                   ).tag(config=True)
+    scheduler_memory_budget = Float(0.0, min=0.0,
+                                    help='MB of memory of all running trials, 0 for no limit, '
+                                         'used if scheduler="cost"'
+                                    ).tag(config=True)
+    scheduler_cpu_budget = Float(0.0, min=0.0,
+                                 help='cpu cores used by all running trials, 0 for no limit, used if scheduler="cost"'
+                                 ).tag(config=True)
+
+    process_workers = Int(0, min=0,
+                          help='number of worker processes, the cpu count if 0, used if backend="process"'
+                          ).tag(config=True)
+    process_trial_timeout = Float(0.0, min=0.0,
+                                  help='seconds a trial can run before its worker is killed, 0 for no limit, '
+                                       'used if backend="process"'
+                                  ).tag(config=True)
+
     cluster_driver = String(help='driver address, used if backend="cluster"'
                             ).tag(config=True)
     cluster_role = Enum(['driver', 'executor'],
@@ -23,6 +52,33 @@ class DispatchCfg(Configurable):
     cluster_search_queue = Int(1, min=1,
                                help='search queue size, used if backend="cluster"'
                                ).tag(config=True)
+    cluster_prefetch = Int(2, min=1,
+                           help='number of trials leased by each executor at a time, used if backend="cluster"'
+                           ).tag(config=True)
+    cluster_wait_timeout = Float(10.0, min=0.1,
+                                 help='seconds the driver holds an idle request before checking its peer again, '
+                                      'used if backend="cluster"'
+                                 ).tag(config=True)
+    cluster_heartbeat_interval = Float(5.0, min=0.0,
+                                       help='seconds between heartbeats of executors, 0 to disable heartbeats, '
+                                            'used if backend="cluster"'
+                                       ).tag(config=True)
+    cluster_heartbeat_timeout = Float(60.0, min=0.0,
+                                      help='seconds without heartbeat before an executor is dropped and its trials '
+                                           'are dispatched again, 0 for no limit, used if backend="cluster"'
+                                      ).tag(config=True)
+    cluster_deadline_factor = Float(3.0, min=1.0,
+                                    help='a trial running longer than this factor of the 90th percentile of past '
+                                         'trial elapsed is a straggler, used if backend="cluster"'
+                                    ).tag(config=True)
+    cluster_deadline_min_trials = Int(5, min=1,
+                                      help='number of reported trials needed to derive the trial deadline, '
+                                           'used if backend="cluster"'
+                                      ).tag(config=True)
+    cluster_speculative_copies = Int(1, min=0,
+                                     help='number of duplicates to run for a straggler at the end of the search, '
+                                          '0 to disable speculative execution, used if backend="cluster"'
+                                     ).tag(config=True)
     cluster_summary_interval = Float(60.0,
                                      help='summary interval seconds',
                                      ).tag(config=True)
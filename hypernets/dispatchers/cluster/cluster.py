@@ -3,7 +3,7 @@
 import os
 import re
 import time
-from threading import Thread
+from threading import Thread, Event
 
 from hypernets.dispatchers.process import GrpcProcess, LocalProcess, SshProcess
 from hypernets.utils import logging
@@ -193,22 +193,21 @@ class ClusterStatusThread(Thread):
         self.processes = processes
         self.interval = interval
         self.running = False
+        self.stopped = Event()
 
     def run(self):
         assert not self.running
 
         self.running = True
-        time.sleep(self.interval)
-
-        while self.running:
+        while not self.stopped.wait(self.interval):
             try:
                 self.report()
-                time.sleep(self.interval)
             except Exception as e:
                 logger.error(e)
+        self.running = False
 
     def stop(self):
-        self.running = False
+        self.stopped.set()
 
     def report(self):
         def summary(p):
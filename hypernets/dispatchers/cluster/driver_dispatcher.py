@@ -7,6 +7,7 @@ from hypernets.core.callbacks import EarlyStoppingError
 from hypernets.core.dispatcher import Dispatcher
 from hypernets.core.trial import Trial
 from hypernets.dispatchers.cfg import DispatchCfg as c
+from hypernets.dispatchers.scheduler import get_scheduler
 from hypernets.utils import logging
 
 logger = logging.get_logger(__name__)
@@ -15,25 +16,32 @@ _search_counter = 0
 
 
 class DriverDispatcher(Dispatcher):
-    def __init__(self, address, work_dir):
+    def __init__(self, address, work_dir, scheduler=None):
         super(DriverDispatcher, self).__init__()
 
         self.address = address
         self.work_dir = work_dir
         self.spaces_dir = f'{work_dir}/spaces'
         self.models_dir = f'{work_dir}/models'
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
 
     def dispatch(self, hyper_model, X, y, X_eval, y_eval, cv, num_folds, max_trials, dataset_id, trial_store,
                  **fit_kwargs):
+        scheduler = self.scheduler
+        scheduler.bind(hyper_model, X)
+
         def on_next_space(item):
             for cb in hyper_model.callbacks:
                 # cb.on_build_estimator(hyper_model, space_sample, estimator, trial_no)
                 cb.on_trial_begin(hyper_model, item.space_sample, item.trial_no)
 
         def on_report_space(item):
+            elapsed = item.elapsed  # measured by the executor, without the time it waited as prefetched
+            hyper_model.searcher.remove_pending(item.space_sample)
+            trial = Trial(item.space_sample, item.trial_no, item.reward, elapsed, succeeded=item.success)
+            trial.memo.update(item.memo)
+            scheduler.observe(trial)
             if item.success:
-                elapsed = item.report_at - item.start_at
-                trial = Trial(item.space_sample, item.trial_no, item.reward, elapsed)
                 # print(f'trial result:{trial}')
 
                 improved = hyper_model.history.append(trial)
@@ -49,7 +57,7 @@ class DriverDispatcher(Dispatcher):
                     cb.on_trial_end(hyper_model, item.space_sample, item.trial_no, item.reward, improved, elapsed)
             else:
                 for cb in hyper_model.callbacks:
-                    cb.on_trial_error(hyper_model, space_sample, item.trial_no)
+                    cb.on_trial_error(hyper_model, item.space_sample, item.trial_no)
 
         def on_summary():
             t = hyper_model.get_best_trial()
@@ -60,6 +68,7 @@ class DriverDispatcher(Dispatcher):
                 return None
 
         def do_clean():
+            scheduler.release()
             # shutdown grpc server
             search_service.status_thread.stop()
             search_service.status_thread.report_summary()
@@ -89,7 +98,21 @@ class DriverDispatcher(Dispatcher):
         queue_size = c.cluster_search_queue
 
         while trial_no <= max_trials:
-            space_sample = hyper_model.searcher.sample()
+            reported = search_service.reported_size()
+            try:
+                space_sample = scheduler.sample()
+            except EarlyStoppingError:
+                break
+            if space_sample is None:
+                # no resources left for another trial, wait for a running one, see `CostAwareScheduler`
+                search_service.wait_reported_above(reported, c.cluster_wait_timeout)
+                continue
+            if getattr(space_sample, 'budget', None) is not None:
+                # the executors rebuild the samples from vectors, they would train every rung at full budget
+                search_service.finish()
+                do_clean()
+                raise ValueError(f'{type(hyper_model.searcher).__name__} proposes samples with budgets, '
+                                 f'which are not supported by the cluster backend.')
             if hyper_model.history.is_existed(space_sample):
                 if retry_counter >= 1000:
                     if logger.is_info_enabled():
@@ -118,11 +141,12 @@ class DriverDispatcher(Dispatcher):
                         trial_no += 1
                         continue
 
+                # running trials are pending in the searcher, the scheduler budgets their resources
+                hyper_model.searcher.add_pending(space_sample)
                 search_service.add(trial_no, space_sample)
 
                 # wait for queued trial
-                while search_service.queue_size() >= queue_size:
-                    time.sleep(0.1)
+                search_service.wait_queue_below(queue_size)
             except EarlyStoppingError:
                 break
                 # TODO: early stopping
@@ -142,11 +166,9 @@ class DriverDispatcher(Dispatcher):
                 retry_counter = 0
         if logger.is_info_enabled():
             logger.info("-" * 20 + 'no more space to search, waiting trials ...')
+        search_service.finish()
         try:
-            while search_service.running_size() > 0:
-                # if logger.is_info_enabled():
-                #    logger.info(f"wait ... {search_service.running_size()} samples found.")
-                time.sleep(0.1)
+            search_service.wait_all_reported()
         except KeyboardInterrupt:
             return trial_no
         finally:
@@ -1,10 +1,11 @@
 # -*- coding:utf-8 -*-
 import copy
-import pickle
 import time
 
 from hypernets.core.dispatcher import Dispatcher
-from hypernets.utils import logging, fs
+from hypernets.core.search_space import Real
+from hypernets.dispatchers.cfg import DispatchCfg as c
+from hypernets.utils import logging
 from .grpc.search_driver_client import SearchDriverClient
 
 logger = logging.get_logger(__name__)
@@ -12,10 +13,28 @@ logger = logging.get_logger(__name__)
 _search_counter = 0
 
 
+def space_from_vectors(space_fn, vectors):
+    """
+    Build a space sample from vectors sent as doubles, the numerics of params other than `Real` are integers.
+    """
+    space_sample = space_fn()
+    i = 0
+    for p in space_sample.params_iterator:
+        if i >= len(vectors):
+            raise ValueError('`vector` and `space` does not match.')
+        v = vectors[i] if isinstance(p, Real) else int(vectors[i])
+        p.assign(p.numeric2value(v))
+        i += 1
+    if len(vectors) != i:
+        raise ValueError('`vector` and `space` does not match.')
+    return space_sample
+
+
 class ExecutorDispatcher(Dispatcher):
-    def __init__(self, driver_address):
+    def __init__(self, driver_address, prefetch=None):
         super(ExecutorDispatcher, self).__init__()
         self.driver_address = driver_address
+        self.prefetch = prefetch if prefetch is not None else c.cluster_prefetch
 
     def dispatch(self, hyper_model, X, y, X_eval, y_eval, cv, num_folds, max_trials, dataset_id, trial_store,
                  **fit_kwargs):
@@ -33,22 +52,26 @@ class ExecutorDispatcher(Dispatcher):
         client = SearchDriverClient(self.driver_address, search_id)
         client.ping(wait=True)
 
-        def response(item_x, success, reward=0.0, message=''):
+        def response(item_x, success, reward=0.0, message='', memo=None, elapsed=None):
             res = copy.copy(item_x)
             res.success = success
             res.reward = reward
             res.message = message
+            res.elapsed = elapsed
+            if memo is not None:
+                res.peak_rss = memo.get('peak_rss')
+                res.cpu_seconds = memo.get('cpu_seconds')
             return res
 
         trial_no = 0
-        sch = client.search(search_id)
+        sch = client.lease(search_id, self.prefetch, heartbeat_interval=c.cluster_heartbeat_interval)
         try:
             item = next(sch)
             while item:
                 if item.is_waiting():
+                    # the driver has held the request for a while, ask again
                     if logger.is_info_enabled():
                         logger.info(f'[{search_id}] not found search, wait and continue')
-                    time.sleep(1)
                     item = sch.send(response(item, True))
                     continue
 
@@ -65,19 +88,20 @@ class ExecutorDispatcher(Dispatcher):
                     break
 
                 trial_no = item.trial_no if item.trial_no is not None else trial_no + 1
-                detail = f'trial_no={trial_no}, space_id={item.space_id}, space_file={item.space_file}'
+                detail = f'trial_no={trial_no}, space_id={item.space_id}, vectors={item.vectors}'
                 if logger.is_info_enabled():
                     logger.info(f'[{search_id}] new trial:' + detail)
+                start_at = time.time()
                 try:
-                    with fs.open(item.space_file, 'rb') as f:
-                        space_sample = pickle.load(f)
+                    space_sample = space_from_vectors(hyper_model.searcher.space_fn, item.vectors)
 
                     for callback in hyper_model.callbacks:
                         # callback.on_build_estimator(hyper_model, space_sample, estimator, trial_no)
                         callback.on_trial_begin(hyper_model, space_sample, trial_no)
 
                     model_file = item.model_file
-                    trial = hyper_model._run_trial(space_sample, trial_no, X, y, X_eval, y_eval, cv, num_folds,
+                    # the searcher of the driver learns the result
+                    trial = hyper_model._fit_trial(space_sample, trial_no, X, y, X_eval, y_eval, cv, num_folds,
                                                    model_file, **fit_kwargs)
                     if trial.reward != 0:
                         improved = hyper_model.history.append(trial)
@@ -91,7 +115,8 @@ class ExecutorDispatcher(Dispatcher):
                     if trial_store is not None:
                         trial_store.put(dataset_id, trial)
 
-                    item = sch.send(response(item, trial.reward != 0.0, trial.reward))
+                    item = sch.send(response(item, trial.reward != 0.0, trial.reward, memo=trial.memo,
+                                             elapsed=trial.elapsed))
                 except StopIteration:
                     break
                 except KeyboardInterrupt:
@@ -102,7 +127,7 @@ class ExecutorDispatcher(Dispatcher):
                     import traceback
                     msg = f'[{search_id}] {e.__class__.__name__}: {e}'
                     logger.error(msg + '\n' + traceback.format_exc())
-                    item = sch.send(response(item, False, 0.0, msg))
+                    item = sch.send(response(item, False, 0.0, msg, elapsed=time.time() - start_at))
         except StopIteration as e:
             pass
         finally:
@@ -20,7 +20,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   package='hypernets.dispatchers.cluster.grpc.proto',
   syntax='proto3',
   serialized_options=None,
-  serialized_pb=_b('\n3hypernets/dispatchers/cluster/grpc/proto/spec.proto\x12(hypernets.dispatchers.cluster.grpc.proto\"\x1e\n\x0bPingMessage\x12\x0f\n\x07message\x18\x01 \x01(\t\"x\n\rSearchRequest\x12\x11\n\tsearch_id\x18\x01 \x01(\t\x12\x10\n\x08trial_no\x18\x02 \x01(\t\x12\x10\n\x08space_id\x18\x03 \x01(\t\x12\x0f\n\x07success\x18\x04 \x01(\x08\x12\x0e\n\x06reward\x18\x05 \x01(\x02\x12\x0f\n\x07message\x18\x06 \x01(\t\"\x8f\x02\n\x0eSearchResponse\x12Y\n\x04\x63ode\x18\x01 \x01(\x0e\x32K.hypernets.dispatchers.cluster.grpc.proto.SearchResponse.SearchResponseCode\x12\x11\n\tsearch_id\x18\x02 \x01(\t\x12\x10\n\x08trial_no\x18\x03 \x01(\t\x12\x10\n\x08space_id\x18\x04 \x01(\t\x12\x12\n\nspace_file\x18\x05 \x01(\t\x12\x12\n\nmodel_file\x18\x06 \x01(\t\"C\n\x12SearchResponseCode\x12\x06\n\x02OK\x10\x00\x12\x0b\n\x07WAITING\x10\x0b\x12\x0c\n\x08\x46INISHED\x10\x0c\x12\n\n\x06\x46\x41ILED\x10\x63\x32\x8a\x02\n\x0cSearchDriver\x12v\n\x04ping\x12\x35.hypernets.dispatchers.cluster.grpc.proto.PingMessage\x1a\x35.hypernets.dispatchers.cluster.grpc.proto.PingMessage\"\x00\x12\x81\x01\n\x06search\x12\x37.hypernets.dispatchers.cluster.grpc.proto.SearchRequest\x1a\x38.hypernets.dispatchers.cluster.grpc.proto.SearchResponse\"\x00(\x01\x30\x01\x62\x06proto3')
+  serialized_pb=_b('\n3hypernets/dispatchers/cluster/grpc/proto/spec.proto\x12(hypernets.dispatchers.cluster.grpc.proto\"\x1e\n\x0bPingMessage\x12\x0f\n\x07message\x18\x01 \x01(\t\"\xe3\x01\n\rSearchRequest\x12\x11\n\tsearch_id\x18\x01 \x01(\t\x12\x10\n\x08trial_no\x18\x02 \x01(\t\x12\x10\n\x08space_id\x18\x03 \x01(\t\x12\x0f\n\x07success\x18\x04 \x01(\x08\x12\x0e\n\x06reward\x18\x05 \x01(\x02\x12\x0f\n\x07message\x18\x06 \x01(\t\x12\r\n\x05lease\x18\x07 \x01(\x05\x12\x11\n\theartbeat\x18\x08 \x01(\x08\x12\x10\n\x08peak_rss\x18\t \x01(\x01\x12\x13\n\x0b\x63pu_seconds\x18\n \x01(\x01\x12\x0f\n\x07\x65lapsed\x18\x0b \x01(\x01\x12\x0f\n\x07started\x18\x0c \x01(\x08\"\xa0\x02\n\x0eSearchResponse\x12Y\n\x04\x63ode\x18\x01 \x01(\x0e\x32K.hypernets.dispatchers.cluster.grpc.proto.SearchResponse.SearchResponseCode\x12\x11\n\tsearch_id\x18\x02 \x01(\t\x12\x10\n\x08trial_no\x18\x03 \x01(\t\x12\x10\n\x08space_id\x18\x04 \x01(\t\x12\x12\n\nspace_file\x18\x05 \x01(\t\x12\x12\n\nmodel_file\x18\x06 \x01(\t\x12\x0f\n\x07vectors\x18\x07 \x03(\x01\"C\n\x12SearchResponseCode\x12\x06\n\x02OK\x10\x00\x12\x0b\n\x07WAITING\x10\x0b\x12\x0c\n\x08\x46INISHED\x10\x0c\x12\n\n\x06\x46\x41ILED\x10\x63\x32\x8a\x02\n\x0cSearchDriver\x12v\n\x04ping\x12\x35.hypernets.dispatchers.cluster.grpc.proto.PingMessage\x1a\x35.hypernets.dispatchers.cluster.grpc.proto.PingMessage\"\x00\x12\x81\x01\n\x06search\x12\x37.hypernets.dispatchers.cluster.grpc.proto.SearchRequest\x1a\x38.hypernets.dispatchers.cluster.grpc.proto.SearchResponse\"\x00(\x01\x30\x01\x62\x06proto3')
 )
 
 
@@ -50,8 +50,8 @@ _SEARCHRESPONSE_SEARCHRESPONSECODE = _descriptor.EnumDescriptor(
   ],
   containing_type=None,
   serialized_options=None,
-  serialized_start=456,
-  serialized_end=523,
+  serialized_start=581,
+  serialized_end=648,
 )
 _sym_db.RegisterEnumDescriptor(_SEARCHRESPONSE_SEARCHRESPONSECODE)
 
@@ -136,6 +136,48 @@ _SEARCHREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='lease', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchRequest.lease', index=6,
+      number=7, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='heartbeat', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchRequest.heartbeat', index=7,
+      number=8, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='peak_rss', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchRequest.peak_rss', index=8,
+      number=9, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='cpu_seconds', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchRequest.cpu_seconds', index=9,
+      number=10, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='elapsed', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchRequest.elapsed', index=10,
+      number=11, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='started', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchRequest.started', index=11,
+      number=12, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -148,8 +190,8 @@ _SEARCHREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=129,
-  serialized_end=249,
+  serialized_start=130,
+  serialized_end=357,
 )
 
 
@@ -202,6 +244,13 @@ _SEARCHRESPONSE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='vectors', full_name='hypernets.dispatchers.cluster.grpc.proto.SearchResponse.vectors', index=6,
+      number=7, type=1, cpp_type=5, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -215,8 +264,8 @@ _SEARCHRESPONSE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=252,
-  serialized_end=523,
+  serialized_start=360,
+  serialized_end=648,
 )
 
 _SEARCHRESPONSE.fields_by_name['code'].enum_type = _SEARCHRESPONSE_SEARCHRESPONSECODE
@@ -255,8 +304,8 @@ _SEARCHDRIVER = _descriptor.ServiceDescriptor(
   file=DESCRIPTOR,
   index=0,
   serialized_options=None,
-  serialized_start=526,
-  serialized_end=792,
+  serialized_start=651,
+  serialized_end=917,
   methods=[
   _descriptor.MethodDescriptor(
     name='ping',
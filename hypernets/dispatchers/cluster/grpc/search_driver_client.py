@@ -1,5 +1,6 @@
 import queue
 import time
+from threading import Thread, Event
 
 import grpc
 
@@ -16,7 +17,7 @@ class SearchDriverClient(object):
 
     class TrialItemWrapper(object):
         def __init__(self, code, search_id, trial_no,
-                     space_id, space_file, model_file):
+                     space_id, space_file, model_file, vectors=None):
             super(SearchDriverClient.TrialItemWrapper, self).__init__()
 
             self.code = code
@@ -28,10 +29,14 @@ class SearchDriverClient(object):
             self.space_id = space_id
             self.space_file = space_file
             self.model_file = model_file
+            self.vectors = list(vectors) if vectors is not None else []
 
             self.success = False
             self.reward = None
             self.message = None
+            self.peak_rss = None
+            self.cpu_seconds = None
+            self.elapsed = None
 
         def is_ok(self):
             return self.code == SearchResponse.OK
@@ -42,13 +47,17 @@ class SearchDriverClient(object):
         def is_finished(self):
             return self.code == SearchResponse.FINISHED
 
-        def to_request(self):
+        def to_request(self, lease=0):
             msg = SearchRequest(search_id=self.search_id,
                                 space_id=self.space_id,
                                 trial_no=str(self.trial_no) if self.trial_no is not None else '',
                                 success=self.success,
                                 reward=self.reward if self.reward is not None else 0.0,
-                                message=self.message if self.message else '')
+                                message=self.message if self.message else '',
+                                lease=lease,
+                                peak_rss=self.peak_rss if self.peak_rss is not None else 0.0,
+                                cpu_seconds=self.cpu_seconds if self.cpu_seconds is not None else 0.0,
+                                elapsed=self.elapsed if self.elapsed is not None else 0.0)
             return msg
 
         @classmethod
@@ -58,7 +67,8 @@ class SearchDriverClient(object):
                        trial_no=msg.trial_no,
                        space_id=msg.space_id,
                        space_file=msg.space_file,
-                       model_file=msg.model_file)
+                       model_file=msg.model_file,
+                       vectors=msg.vectors)
             return item
 
     def __init__(self, server, search_id):
@@ -89,16 +99,11 @@ class SearchDriverClient(object):
 
         if wait:
             start_at = time.time()
-            result = ''
-            while True:
-                try:
-                    result = do_ping()
-                    done_at = time.time()
-                    print(' connected with %.3f seconds.' % (done_at - start_at))
-                    break
-                except grpc.RpcError:
-                    print('.', end='', flush=True)
-                    time.sleep(1)
+            # block until the channel is connected, grpc retries with backoff
+            grpc.channel_ready_future(self.channel).result()
+            result = do_ping()
+            done_at = time.time()
+            print(' connected with %.3f seconds.' % (done_at - start_at))
 
             return result
         else:
@@ -107,7 +112,6 @@ class SearchDriverClient(object):
     def search(self, search_id):
 
         ack_queue = queue.Queue()
-        running = True
 
         def fire_request():
             # fire first msg,
@@ -120,15 +124,13 @@ class SearchDriverClient(object):
             yield msg
 
             # fire response msg and get next trial
-            while running:
+            while True:
                 try:
-                    r = ack_queue.get(block=False)
+                    r = ack_queue.get()
                     if r is None:
                         break
                     msg = r.to_request()
                     yield msg
-                except queue.Empty:
-                    time.sleep(0.1)
                 except Exception:
                     import traceback
                     traceback.print_exc()
@@ -154,4 +156,61 @@ class SearchDriverClient(object):
                 msg = f'RpcError {self.server} {e.__class__.__name__}:\n'
                 logger.error(msg + trace_detail)
             yield None
-        running = False
+        finally:
+            ack_queue.put(None)  # stop the request stream
+
+    def lease(self, search_id, prefetch=1, heartbeat_interval=0):
+        """
+        Lease trials from the driver, keeping `prefetch` trials in flight. This is a generator of
+        `TrialItemWrapper`, send the result of each trial back with `generator.send(result)`, which reports it
+        and leases the next one, while the prefetched trials are already on the way. The driver is told that a
+        trial starts when it's taken from the generator, so the time it waits as prefetched is not counted.
+
+        A heartbeat is sent every `heartbeat_interval` seconds from a background thread, so the driver knows the
+        executor is alive while it runs a long trial.
+        """
+        requests = queue.Queue()
+        stopped = Event()
+
+        def heartbeat():
+            while not stopped.wait(heartbeat_interval):
+                requests.put(SearchRequest(search_id=search_id, heartbeat=True))
+
+        def hello():
+            return SearchRequest(search_id=search_id, trial_no='', space_id='', success=False, reward=0.0,
+                                 message='', lease=prefetch)
+
+        def fire_request():
+            while True:
+                r = requests.get()
+                if r is None:
+                    break
+                yield r
+
+        requests.put(hello())
+        if heartbeat_interval > 0:
+            Thread(target=heartbeat, daemon=True).start()
+        try:
+            response = self.stub.search(fire_request())
+            for res in response:
+                item = SearchDriverClient.TrialItemWrapper.from_response(res)
+                if item.is_ok():
+                    requests.put(SearchRequest(search_id=search_id, space_id=item.space_id, started=True))
+                result = yield item
+                if item.is_waiting():
+                    requests.put(hello())
+                elif result is not None:
+                    requests.put(result.to_request(lease=1))
+        except grpc.RpcError as e:
+            import traceback
+            trace_detail = traceback.format_exc()
+            try:
+                msg = f'RpcError {self.server} {e.__class__.__name__}: {e.code()}'
+                logger.error(msg)
+            except Exception:
+                msg = f'RpcError {self.server} {e.__class__.__name__}:\n'
+                logger.error(msg + trace_detail)
+            yield None
+        finally:
+            stopped.set()
+            requests.put(None)
@@ -1,9 +1,10 @@
-import pickle
-import queue
+import itertools
 import time
-from threading import Thread
+from collections import deque
+from threading import Thread, Condition, Event
 
 import grpc
+import numpy as np
 
 from hypernets.dispatchers.cfg import DispatchCfg as c
 from hypernets.utils import logging, fs
@@ -21,12 +22,22 @@ class TrialItem(object):
         self.space_file = space_file
         self.space_sample = space_sample
         self.space_id = space_sample.space_id
+        self.vectors = space_sample.vectors
         self.model_file = model_file
         self.queue_at = time.time()
+        self.lease_at = None
+        self.start_at = None  # when the executor starts to run it, None while it is prefetched
+        self.report_at = None
+        self.elapsed = None  # seconds the trial ran, measured by the executor
+        self.peer = None
+
+        self.leases = {}  # lease_id -> start time of the running copies, None for the prefetched ones
+        self.straggler = False
 
         self.success = False
         self.reward = float('nan')
         self.message = ''
+        self.memo = {}  # resources used by the trial, reported by the executor
 
     def __str__(self):
         return f'{self.__dict__}'
@@ -50,82 +61,237 @@ class SearchHolder(object):
         self.start_at = time.time()
         self.finish_at = None
 
-        self.queued_pool = queue.Queue()  # TrialItem
+        self.queued_pool = deque()  # TrialItem
         self.running_items = {}  # space_id -> TrialItem
         self.reported_items = {}  # space_id -> TrialItem
         self.all_items = {}  # space_id -> TrialItem
 
+        self.executors = {}  # lease_id -> [grpc context, last seen time]
+        self.elapsed = []  # elapsed seconds of the succeeded trials, as the executors measured them
+
+        self.stragglers = 0
+        self.duplicates = 0
+        self.wasted_seconds = 0.0
+
+        # guards the pools above, notified whenever an item is queued, dispatched or reported
+        self.cond = Condition()
+
     def add(self, trial_no, space_sample):
         space_id = space_sample.space_id
         assert space_id not in self.all_items.keys()
 
-        space_file = f'{self.spaces_dir}/space-{trial_no}.pkl'
-        with fs.open(space_file, 'wb') as f:
-            pickle.dump(space_sample, f)
-
+        space_file = ''  # the space sample is sent inline as vectors
         model_file = '%s/%05d_%s.pkl' % (self.models_dir, trial_no, space_id)
         item = TrialItem(trial_no, space_file, space_sample, model_file)
 
-        detail = f'trial_no={item.trial_no}, space_id={item.space_id}, space_file={space_file}'
+        detail = f'trial_no={item.trial_no}, space_id={item.space_id}, vectors={item.vectors}'
         if logger.is_info_enabled():
             logger.info(f'[{self.search_id}] [search] {detail}')
 
-        self.queued_pool.put(item)
-        self.all_items[space_id] = item
+        with self.cond:
+            self.queued_pool.append(item)
+            self.all_items[space_id] = item
+            self.cond.notify_all()
 
-    def readd(self, item):
+    def readd(self, item, lease_id=None):
+        """
+        Dispatch the item again after the executor holding it is gone, unless a copy of it is still running or it
+        has been reported.
+        """
         space_id = item.space_id
-        space_file = item.space_file
         assert space_id in self.all_items.keys()
 
-        detail = f'trial_no={item.trial_no}' \
-                 + f', space_id={item.space_id}, space_file={space_file}'
-        if logger.is_info_enabled():
-            logger.info(f'[{self.search_id}] [re-push] {detail}')
-
-        if space_id in self.running_items.keys():
-            if logger.is_info_enabled():
-                logger.info(f'[remove running] {detail}')
-            self.running_items.pop(space_id)
+        detail = f'trial_no={item.trial_no}, space_id={item.space_id}'
+        with self.cond:
+            start_at = item.leases.pop(lease_id, None)
+            if item.report_at is not None:
+                if start_at is not None:
+                    self.wasted_seconds += time.time() - start_at
+                return
+            if len(item.leases) > 0:
+                if logger.is_info_enabled():
+                    logger.info(f'[{self.search_id}] [drop copy] [{lease_id}] {detail}')
+                return
 
-        if space_id in self.reported_items.keys():
             if logger.is_info_enabled():
-                logger.info(f'[remove reported] {detail}')
-            self.reported_items.pop(space_id)
-
-        self.queued_pool.put(item)
+                logger.info(f'[{self.search_id}] [re-push] {detail}')
+            if space_id in self.running_items.keys():
+                self.running_items.pop(space_id)
+            item.start_at = None
+            self.queued_pool.append(item)
+            self.cond.notify_all()
 
     def running_size(self):
         return len(self.all_items) - len(self.reported_items)
 
     def queue_size(self):
-        return self.queued_pool.qsize()
+        return len(self.queued_pool)
+
+    def reported_size(self):
+        return len(self.reported_items)
 
     @property
     def running(self):
-        return len(self.all_items) > len(self.reported_items)
+        return self.finish_at is None or len(self.all_items) > len(self.reported_items)
+
+    def finish(self):
+        """No more items will be added, executors are released when all items are reported."""
+        with self.cond:
+            self.finish_at = time.time()
+            self.cond.notify_all()
+
+    def wakeup(self):
+        """Wake up the waiters to check their conditions again, e.g. after a peer disconnected."""
+        with self.cond:
+            self.cond.notify_all()
+
+    def wait_queue_below(self, size, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.queued_pool) < size, timeout)
+
+    def wait_all_reported(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.all_items) <= len(self.reported_items), timeout)
+
+    def wait_reported_above(self, size, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.reported_items) > size, timeout)
+
+    def attach(self, lease_id, context):
+        with self.cond:
+            self.executors[lease_id] = [context, time.time()]
+
+    def detach(self, lease_id):
+        with self.cond:
+            self.executors.pop(lease_id, None)
+
+    def heartbeat(self, lease_id):
+        with self.cond:
+            if lease_id in self.executors.keys():
+                self.executors[lease_id][1] = time.time()
+
+    def expire_executors(self, timeout):
+        """Cancel the streams of executors without heartbeat for `timeout` seconds, their trials are re-pushed."""
+        now = time.time()
+        with self.cond:
+            expired = [(k, ctx) for k, (ctx, last_seen) in self.executors.items() if now - last_seen > timeout]
+            for k, _ in expired:
+                self.executors.pop(k)
+        for k, ctx in expired:
+            logger.warning(f'[{self.search_id}] [expired] [{k}] no heartbeat for {timeout} seconds.')
+            ctx.cancel()
+        return len(expired)
 
-    def get_next_item(self, peer, wait_hook):
-        while self.running:
-            try:
-                item = self.queued_pool.get(False)
-                item.peer = peer
-                item.start_at = time.time()
-                detail = f'trial_no={item.trial_no}, space_id={item.space_id}' \
-                         + f',space_file={item.space_file}'
-                if logger.is_info_enabled():
-                    logger.info(f'[{self.search_id}] [dispatch] [{peer}] {detail}')
-                return item
-            except queue.Empty:
-                time.sleep(0.1)
-                if wait_hook():
+    @property
+    def deadline(self):
+        """Seconds a trial may run before it is a straggler, derived from the elapsed of the reported trials."""
+        if len(self.elapsed) < c.cluster_deadline_min_trials:
+            return None
+        return float(np.percentile(self.elapsed, 90)) * c.cluster_deadline_factor
+
+    def check_stragglers(self):
+        """
+        Mark the running items beyond the deadline as stragglers.
+
+        :return: seconds to the next deadline of the running items, None if no deadline.
+        """
+        deadline = self.deadline
+        if deadline is None:
+            return None
+        now = time.time()
+        next_in = None
+        with self.cond:
+            for item in self.running_items.values():
+                if item.straggler or item.start_at is None:
                     continue
+                remaining = item.start_at + deadline - now
+                if remaining <= 0:
+                    item.straggler = True
+                    self.stragglers += 1
+                    if logger.is_info_enabled():
+                        logger.info(f'[{self.search_id}] [straggler] [{item.peer}] trial_no={item.trial_no}, '
+                                    f'running {now - item.start_at:.3f} seconds, deadline {deadline:.3f} seconds.')
+                else:
+                    next_in = remaining if next_in is None else min(next_in, remaining)
+        return next_in
+
+    def _take_duplicate(self, lease_id):
+        # speculative execution near the end of the search: no more items will come and none is queued
+        if c.cluster_speculative_copies <= 0 or self.finish_at is None or len(self.queued_pool) > 0:
+            return None
+        candidates = [item for item in self.running_items.values()
+                      if item.straggler and item.report_at is None and lease_id not in item.leases
+                      and len(item.leases) <= c.cluster_speculative_copies]
+        if len(candidates) == 0:
+            return None
+        return min(candidates, key=lambda item: item.start_at)
+
+    def get_next_item(self, lease_id, wait_hook, prefetched=False):
+        """
+        Take the next queued item, wait until one is queued while the search is running and `wait_hook()` is
+        true. Call `wakeup` when the result of `wait_hook` changes. At the end of the search, a straggler is
+        returned as a speculative duplicate, the first copy reported wins.
+
+        :param prefetched: whether the executor holds other items leased before, it runs the item after them. The
+            clock of the item starts when the executor says it starts, see `start_item`, else at once.
+        """
+        duplicated = False
+        while True:
+            next_deadline_in = self.check_stragglers()
+            with self.cond:
+                if not self.running:
+                    return None
+                if len(self.queued_pool) > 0:
+                    item = self.queued_pool.popleft()
+                    assert item.space_id not in self.running_items.keys()
+                    self.running_items[item.space_id] = item
                 else:
+                    item = self._take_duplicate(lease_id)
+                    duplicated = item is not None
+                    if duplicated:
+                        self.duplicates += 1
+                if item is not None:
+                    now = time.time()
+                    start_at = None if prefetched else now
+                    item.leases[lease_id] = start_at
+                    if not duplicated:
+                        item.peer = lease_id
+                        item.lease_at = now
+                        item.start_at = start_at
+                    self.cond.notify_all()
                     break
-
-        return None
-
-    def report_item(self, peer, space_id, success, reward, message):
+                if not wait_hook():
+                    return None
+                timeout = c.cluster_wait_timeout
+                if next_deadline_in is not None:
+                    timeout = min(timeout, next_deadline_in)
+                self.cond.wait(timeout)
+
+        detail = f'trial_no={item.trial_no}, space_id={item.space_id}'
+        if logger.is_info_enabled():
+            tag = 'duplicate' if duplicated else 'dispatch'
+            logger.info(f'[{self.search_id}] [{tag}] [{lease_id}] {detail}')
+        return item
+
+    def start_item(self, lease_id, space_id):
+        """
+        The executor `lease_id` starts to run the item, the straggler clock of the item starts now.
+        """
+        with self.cond:
+            item = self.all_items.get(space_id)
+            if item is None or item.report_at is not None or lease_id not in item.leases.keys():
+                return
+            now = time.time()
+            item.leases[lease_id] = now
+            if item.peer == lease_id:
+                item.start_at = now
+            self.cond.notify_all()
+
+    def report_item(self, lease_id, space_id, success, reward, message, memo=None, elapsed=None):
+        """
+        :param elapsed: seconds the trial ran, as measured by the executor. If it's None, it's measured from when
+            the item started, or was leased if the executor never said it started.
+        """
         assert space_id in self.all_items.keys()
 
         item = self.all_items[space_id]
@@ -134,27 +300,56 @@ class SearchHolder(object):
         if not success:
             detail += f', message={message}'
 
-        if space_id not in self.running_items.keys():
-            msg = f'[{self.search_id}] [ignored-not running-report] [{peer}] {detail}'
-            logger.warning(msg)
-        else:
+        with self.cond:
+            now = time.time()
+            leased = lease_id in item.leases.keys()
+            start_at = item.leases.pop(lease_id, None)
+            if item.report_at is not None:
+                # a copy has been reported
+                if leased:
+                    self.wasted_seconds += elapsed if elapsed is not None else now - (start_at or now)
+                    if logger.is_info_enabled():
+                        logger.info(f'[{self.search_id}] [duplicate lost] [{lease_id}] {detail}')
+                else:
+                    logger.warning(f'[{self.search_id}] [ignored-reported] [{lease_id}] {detail}')
+                return
+            if space_id not in self.running_items.keys():
+                logger.warning(f'[{self.search_id}] [ignored-not running-report] [{lease_id}] {detail}')
+                return
+
+            if start_at is not None:
+                item.start_at = start_at  # elapsed of the winning copy
+            if elapsed is None:
+                elapsed = now - (item.start_at if item.start_at is not None else item.lease_at)
+            item.elapsed = elapsed
+            item.peer = lease_id
             item.success = success
             item.reward = reward
             item.message = message
-            item.report_at = time.time()
+            item.memo = memo if memo is not None else {}
+            item.report_at = now
+
+        if logger.is_info_enabled():
+            logger.info(f'[{self.search_id}] [report] [{lease_id}] {detail}')
+
+        # feed the searcher before the waiters are woken up, the driver samples next when it's done
+        if self.on_report:
+            try:
+                self.on_report(item)
+            except Exception:
+                import traceback
+                traceback.print_exc()
 
+        with self.cond:
             self.running_items.pop(space_id)
             self.reported_items[space_id] = item
+            if success:
+                self.elapsed.append(item.elapsed)
+            self.cond.notify_all()
 
-            if logger.is_info_enabled():
-                logger.info(f'[{self.search_id}] [report] [{peer}] {detail}')
-
-            if self.on_report:
-                try:
-                    self.on_report(item)
-                except Exception:
-                    import traceback
-                    traceback.print_exc()
+    @property
+    def stats(self):
+        return dict(stragglers=self.stragglers, duplicates=self.duplicates, wasted_seconds=self.wasted_seconds)
 
 
 class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
@@ -165,6 +360,8 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
         self.models_dir = models_dir
 
         self.searches = []  # SearchHolder
+        self.searches_cond = Condition()
+        self._stream_counter = itertools.count(1)
 
         self.status_thread = DriverStatusThread(self)
         self.status_thread.start()
@@ -178,6 +375,12 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
                 return s
         return None
 
+    def _wait_search(self, search_id, context):
+        """Hold an executor which comes before its search starts, until the search starts or a timeout."""
+        with self.searches_cond:
+            self.searches_cond.wait_for(lambda: self._find_search(search_id) is not None or not context.is_active(),
+                                        c.cluster_wait_timeout)
+
     def ping(self, request, context):
         peer = context.peer()
         message = request.message
@@ -186,32 +389,25 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
         return PingMessage(message=message)
 
     def search(self, request_iterator, context):
+        """
+        Lease trials to an executor. Each request may report the result of a leased trial and asks for `lease`
+        more trials (1 for a report of legacy executors), the trials are streamed back as the executor's credits
+        allow. Requests are consumed by a separate thread, so reports are never held up by a response waiting
+        for the next trial. Executors send heartbeats on the same stream, see `SearchHolder.expire_executors`, and
+        say when they start to run a trial, see `SearchHolder.start_item`.
+        """
+
         def response_with(search_id, item):
             return SearchResponse(code=SearchResponse.OK,
                                   search_id=search_id,
                                   trial_no=str(item.trial_no),
                                   space_id=item.space_id,
                                   space_file=item.space_file,
-                                  model_file=item.model_file)
-
-        def response_finished(search_id):
-            return SearchResponse(code=SearchResponse.FINISHED,
-                                  search_id=search_id,
-                                  trial_no='',
-                                  space_id='',
-                                  space_file='',
-                                  model_file='')
-
-        def response_waiting(search_id):
-            return SearchResponse(code=SearchResponse.WAITING,
-                                  search_id=search_id,
-                                  trial_no='',
-                                  space_id='',
-                                  space_file='',
-                                  model_file='')
+                                  model_file=item.model_file,
+                                  vectors=item.vectors)
 
-        def response_failed(search_id):
-            return SearchResponse(code=SearchResponse.FAILED,
+        def response_code(search_id, code):
+            return SearchResponse(code=code,
                                   search_id=search_id,
                                   trial_no='',
                                   space_id='',
@@ -219,45 +415,94 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
                                   model_file='')
 
         peer = context.peer()
-        running_item = None
+        lease_id = f'{peer}#{next(self._stream_counter)}'  # streams of an executor process may share the peer
+        search = None
+        leased_items = {}  # space_id -> TrialItem
+        credits = 0
+        closed = False
+        cond = Condition()
+
+        def on_request(request):
+            nonlocal credits
+            space_id = request.space_id
+            search.heartbeat(lease_id)
+            if request.heartbeat:
+                return
+            if request.started:
+                search.start_item(lease_id, space_id)
+                return
+            with cond:
+                if space_id:
+                    item = leased_items.pop(space_id, None)
+                    if item is not None:
+                        # 0 from executors which don't measure resources
+                        memo = dict(peak_rss=request.peak_rss if request.peak_rss > 0 else float('nan'),
+                                    cpu_seconds=request.cpu_seconds if request.cpu_seconds > 0 else float('nan'))
+                        search.report_item(lease_id, space_id, request.success, request.reward, request.message,
+                                           memo, request.elapsed if request.elapsed > 0 else None)
+                    else:
+                        logger.warning(f'[{search.search_id}] [ignored-not leased-report] [{lease_id}] {space_id}')
+                credits += request.lease if request.lease > 0 else 1
+                cond.notify_all()
+
+        def on_close():
+            nonlocal closed
+            with cond:
+                closed = True
+                cond.notify_all()
+            search.wakeup()
+
+        def read_requests():
+            try:
+                for request in request_iterator:
+                    on_request(request)
+            except grpc.RpcError:
+                pass
+            except Exception as e:
+                logger.error(f'{e.__class__.__name__}: {e}')
+            finally:
+                on_close()
+
+        def is_active():
+            return context.is_active() and not closed
 
         try:
             for request in request_iterator:
                 search_id = request.search_id
-                space_id = request.space_id
-
-                search = self.current_search
-                if search_id != search.search_id:
-                    assert running_item is None
-
-                    if self._find_search(search_id):
-                        msg = response_finished(search_id)
-                        yield msg
-                        break
-                    else:
-                        # not found, maybe future search, make it wait
-                        msg = response_waiting(search_id)
-                        yield msg
-                        continue
-
-                if running_item:
-                    assert space_id == running_item.space_id
-                    success = request.success
-                    reward = request.reward
-                    message = request.message
-                    search.report_item(peer, space_id, success, reward, message)
-                    running_item = None
-
-                item = search.get_next_item(peer, wait_hook=context.is_active)
-                if item:
-                    assert item.space_id not in search.running_items.keys()
-
-                    msg = response_with(search_id, item)
-                    search.running_items[item.space_id] = item
-                    running_item = item
-                    yield msg
+                self._wait_search(search_id, context)
+                if search_id == self.current_search.search_id:
+                    search = self.current_search
+                    search.attach(lease_id, context)
+                    on_request(request)
+                    break
+                elif self._find_search(search_id):
+                    yield response_code(search_id, SearchResponse.FINISHED)
+                    return
                 else:
+                    # not found, maybe future search, make it wait
+                    yield response_code(search_id, SearchResponse.WAITING)
+            if search is None:
+                return
+
+            context.add_callback(on_close)
+            reader = Thread(target=read_requests, daemon=True)
+            reader.start()
+
+            while True:
+                with cond:
+                    while credits <= 0 and not closed:
+                        cond.wait()
+                    if closed:
+                        break
+                with cond:
+                    prefetched = len(leased_items) > 0
+                item = search.get_next_item(lease_id, wait_hook=is_active, prefetched=prefetched)
+                if item is None:
                     break
+                with cond:
+                    leased_items[item.space_id] = item
+                    credits -= 1
+                yield response_with(search.search_id, item)
         except grpc.RpcError as e:
             # ignore, just log it
             import traceback
@@ -273,8 +518,13 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
             import traceback
             traceback.print_exc()
         finally:
-            if running_item:
-                self.current_search.readd(running_item)
+            if search is not None:
+                search.detach(lease_id)
+                with cond:
+                    items = list(leased_items.values())
+                    leased_items.clear()
+                for item in items:
+                    search.readd(item, lease_id)
 
     def start_search(self, search_id, on_next, on_report, on_summary):
         old_search = self._find_search(search_id)
@@ -283,7 +533,9 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
         search_spaces_dir = f'{self.spaces_dir}/{search_id}'
         search_models_dir = f'{self.models_dir}/{search_id}'
         search = SearchHolder(search_id, search_spaces_dir, search_models_dir, on_next, on_report, on_summary)
-        self.searches.append(search)
+        with self.searches_cond:
+            self.searches.append(search)
+            self.searches_cond.notify_all()
 
         if logger.is_info_enabled():
             logger.info(f'>>>enter {search_id}')
@@ -302,6 +554,21 @@ class SearchDriverService(spec_pb2_grpc.SearchDriverServicer):
     def queue_size(self):
         return self.current_search.queue_size()
 
+    def reported_size(self):
+        return self.current_search.reported_size()
+
+    def wait_queue_below(self, size, timeout=None):
+        return self.current_search.wait_queue_below(size, timeout)
+
+    def finish(self):
+        self.current_search.finish()
+
+    def wait_all_reported(self, timeout=None):
+        return self.current_search.wait_all_reported(timeout)
+
+    def wait_reported_above(self, size, timeout=None):
+        return self.current_search.wait_reported_above(size, timeout)
+
 
 class DriverStatusThread(Thread):
     def __init__(self, service):
@@ -310,29 +577,43 @@ class DriverStatusThread(Thread):
         self.service = service
         self.daemon = True
         self.running = False
+        self.stopped = Event()
         self.summary_interval = c.cluster_summary_interval
+        self.heartbeat_timeout = c.cluster_heartbeat_timeout
 
     def run(self) -> None:
         self.running = True
 
+        intervals = [self.summary_interval]
+        if self.heartbeat_timeout > 0:
+            intervals.append(min(self.heartbeat_timeout / 2, max(c.cluster_heartbeat_interval, 1.0)))
+        intervals = [i for i in intervals if i > 0]
+        interval = min(intervals) if len(intervals) > 0 else None
+
         summary_at = time.time()
-        while self.running:
+        while not self.stopped.wait(interval):
             try:
+                if len(self.service.searches) == 0:
+                    continue
+                search = self.service.current_search
+                if self.heartbeat_timeout > 0:
+                    search.expire_executors(self.heartbeat_timeout)
+                search.check_stragglers()
+
                 now = time.time()
-                if self.report_summary and self.summary_interval > 0 and summary_at + self.summary_interval < now:
+                if self.summary_interval > 0 and summary_at + self.summary_interval <= now:
                     self.report_summary()
                     summary_at = now
-
-                time.sleep(1)
             except Exception:
                 import traceback
                 traceback.print_exc()
 
+        self.running = False
         if logger.is_info_enabled():
             logger.info('SearchDriverService shutdown')
 
     def stop(self):
-        self.running = False
+        self.stopped.set()
 
     def report_summary(self):
         if not logger.is_info_enabled():
@@ -345,7 +626,9 @@ class DriverStatusThread(Thread):
         reported = len(search.reported_items)
         queued = total - running - reported
 
-        msg = f'[{search_id}] [summary] queued={queued}, running={running}, reported={reported}, total={total}'
+        msg = f'[{search_id}] [summary] queued={queued}, running={running}, reported={reported}, total={total}' \
+              f', stragglers={search.stragglers}, duplicates={search.duplicates}' \
+              f', wasted={search.wasted_seconds:.3f} seconds'
         if running > 0:
             detail = [f'trial-{x.trial_no}@{x.peer}' for x in search.running_items.values()]
             msg += '\n\trunning: ' + ','.join(detail)
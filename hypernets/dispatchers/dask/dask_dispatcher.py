@@ -1,17 +1,20 @@
 # -*- coding:utf-8 -*-
 
 import math
-import queue
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import weakref
 
 import dask
-from dask.distributed import Client, default_client
+from dask.distributed import Client, default_client, as_completed, get_worker
+from dask.sizeof import sizeof
 
 from hypernets.core.callbacks import EarlyStoppingError
 from hypernets.core.dispatcher import Dispatcher
-from hypernets.core.trial import Trial
+from hypernets.core.trial import Trial, reported_trial
 from hypernets.dispatchers.cfg import DispatchCfg as c
+from hypernets.dispatchers.scheduler import get_scheduler
+from hypernets.model.fold_executor import set_concurrent_trials
 from hypernets.utils import logging, fs
 from hypernets.utils.common import Counter
 
@@ -39,119 +42,54 @@ class DaskTrialItem(Trial):
                              other.model_file)
 
 
-class DaskExecutorPool(object):
-    def __init__(self, worker_count, queue_size,
-                 on_trial_start, on_trial_done,
-                 fn_run_trial,
-                 X, y, X_val, y_val, trial_kwargs):
-        self.on_trial_start = on_trial_start
-        self.on_trial_done = on_trial_done
-
-        self.fn_run_trial_delayed = dask.delayed(fn_run_trial)
-        self.X_delayed = dask.delayed(X)
-        self.y_delayed = dask.delayed(y)
-        self.X_val_delayed = dask.delayed(X_val)
-        self.y_val_delayed = dask.delayed(y_val)
-        self.trial_kwargs = trial_kwargs
-
-        self.running = False
-        self.interrupted = False
-
-        self.worker_count = worker_count
-        self.queue_size = queue_size
-
-        self.pool = ThreadPoolExecutor(max_workers=worker_count)
-        self.queue = queue.Queue(queue_size)
-        self.tasks = []
-
-    @property
-    def done(self):
-        return all(t.done for t in self.tasks)
-
-    @property
-    def qsize(self):
-        return self.queue.qsize()
-
-    def push(self, trial_item):
-        self.queue.put(trial_item)
-
-    def start(self):
-        assert len(self.tasks) == 0
-
-        self.running = True
-        self.tasks = [self.pool.submit(self._wait_and_run, self.queue, self._run_trial)
-                      for _ in range(self.worker_count)]
-
-        return self.tasks
-
-    def stop(self):
-        self.running = False
-
-    def join(self):
-        for f in as_completed(self.tasks):
-            # logger.info(f'Handle trial count: {f.result()}')
-            pass
-
-    def cancel(self):
-        self.running = False
-        self.pool.shutdown(True)
-
-    def _wait_and_run(self, trial_queue, fn):
-        n = 0
-        while self.running:
-            trial_item = trial_queue.get(block=True)
-            if self.running and trial_item is not None:
-                fn(trial_item)
-                n += 1
-            else:
-                # invoke others
-                self.queue.put(trial_item)
-                break
-
-        return n
-
-    def _run_trial(self, trial_item):
-        try:
-            if self.on_trial_start:
-                self.on_trial_start(trial_item)
-
-            fn = self.fn_run_trial_delayed
-            d = fn(trial_item.space_sample,
-                   trial_item.trial_no,
-                   self.X_delayed, self.y_delayed,
-                   self.X_val_delayed, self.y_val_delayed,
-                   trial_item.model_file,
-                   **self.trial_kwargs)
-            result = d.compute()
-
-            trial_item.reward = result.reward
-            trial_item.elapsed = result.elapsed
-
-            if self.on_trial_done:
-                self.on_trial_done(trial_item)
-
-        except KeyboardInterrupt:
-            self.running = False
-            self.interrupted = True
-            self.queue.put(None)  # mark end
-            print('KeyboardInterrupt')
-        except Exception as e:
-            import traceback
-            msg = f'{">" * 20} Trial {trial_item.trial_no} failed! {"<" * 20}\n' \
-                  + f'{e.__class__.__name__}: {e}\n' \
-                  + traceback.format_exc() \
-                  + '*' * 50
-            logger.error(msg)
-
-            if self.on_trial_done:
-                try:
-                    self.on_trial_done(trial_item)
-                except:
-                    pass
+_sync_lock = threading.Lock()
+_synced = weakref.WeakKeyDictionary()  # scattered HyperModel -> number of trials of the driver's history it has
+
+
+def _sync_history(hyper_model, offset, reported):
+    """
+    Append the trials reported by the driver to the history of the scattered `hyper_model`, `reported` are the
+    trials of the driver's history from position `offset`, those the model already has are skipped.
+
+    :return: the number of trials of the driver's history the model has.
+    """
+    with _sync_lock:  # the threads of a worker share the model
+        synced = _synced.get(hyper_model, len(hyper_model.history.trials))
+        for trial in reported[max(synced - offset, 0):]:
+            hyper_model.history.append(trial)
+        synced = max(synced, offset + len(reported))
+        _synced[hyper_model] = synced
+        return synced
+
+
+def _run_trial(hyper_model, vectors, trial_no, X, y, X_val, y_val, cv, num_folds, model_file, fit_kwargs,
+               budget=None, offset=0, reported=()):
+    """
+    Run a trial on a dask worker with the HyperModel scattered once per search. The space sample is rebuilt from its
+    vectors and the searcher is not touched, results are fed back to the searcher by the driver. The trials reported
+    since the last sync of the worker (`reported` from position `offset` of the driver's history) are appended to
+    the remote history first, for the discriminator.
+    """
+    try:
+        worker = get_worker()
+        # trials run in the threads of the worker at the same time, they share its cores to fit folds
+        set_concurrent_trials(worker.nthreads)
+        address = worker.address
+    except ValueError:
+        address = None  # not in a worker
+    synced = _sync_history(hyper_model, offset, reported)
+    space_sample = hyper_model.searcher.space_fn()
+    space_sample.assign_by_vectors(vectors)
+    hyper_model._set_budget(space_sample, budget)
+    trial = hyper_model._fit_trial(space_sample, trial_no, X, y, X_val, y_val, cv, num_folds, model_file,
+                                   **fit_kwargs)
+    return dict(reward=trial.reward, elapsed=trial.elapsed, model_file=trial.model_file,
+                succeeded=trial.succeeded, iteration_scores=trial.iteration_scores, memo=trial.memo,
+                worker=address, synced=synced)
 
 
 class DaskDispatcher(Dispatcher):
-    def __init__(self, work_dir):
+    def __init__(self, work_dir, scheduler=None):
         try:
             default_client()
         except ValueError:
@@ -164,35 +102,81 @@ class DaskDispatcher(Dispatcher):
 
         self.work_dir = work_dir
         self.models_dir = f'{work_dir}/models'
+        self.stats = {}
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
 
         fs.makedirs(self.models_dir, exist_ok=True)
 
+    @staticmethod
+    def _scatter_data(client, data):
+        """
+        Place the datasets on the workers once. Dask collections are persisted and passed as they are, the others
+        are broadcast to every worker.
+
+        :return: the data (futures or persisted collections) to pass to trials, and the number of bytes scattered.
+        """
+        n_workers = max(len(client.scheduler_info().get('workers', {})), 1)
+        scattered = []
+        scattered_bytes = 0
+        for d in data:
+            if d is None:
+                scattered.append(None)
+            elif dask.is_dask_collection(d):
+                scattered.append(client.persist(d))
+            else:
+                scattered.append(client.scatter([d], broadcast=True, hash=False)[0])
+                scattered_bytes += sizeof(d) * n_workers
+        return scattered, scattered_bytes
+
     def dispatch(self, hyper_model, X, y, X_val, y_val, cv, num_folds, max_trials, dataset_id, trial_store,
                  **fit_kwargs):
-        assert not any(dask.is_dask_collection(i) for i in (X, y, X_val, y_val)), \
-            f'{self.__class__.__name__} does not support to run trial with dask collection.'
-
+        client = default_client()
         queue_size = c.dask_search_queue
         worker_count = c.dask_search_executors
         retry_limit = c.trial_retry_limit
+        searcher = hyper_model.searcher
+        scheduler = self.scheduler
+        scheduler.bind(hyper_model, X)
 
         failed_counter = Counter()
         success_counter = Counter()
 
-        def on_trial_start(trial_item):
-            trial_item.start_at = time.time()
-            if logger.is_info_enabled():
-                msg = f'Start trial {trial_item.trial_no}, space_id={trial_item.space_id}' \
-                      + f',model_file={trial_item.model_file}'
-                logger.info(msg)
-            for callback in hyper_model.callbacks:
-                # callback.on_build_estimator(hyper_model, space_sample, estimator, trial_no) #fixme
-                callback.on_trial_begin(hyper_model, trial_item.space_sample, trial_item.trial_no)
+        running = {}  # future -> DaskTrialItem
+        futures = as_completed()
+
+        (X, y, X_val, y_val), scattered_bytes = self._scatter_data(client, (X, y, X_val, y_val))
+        remote_model = client.scatter([hyper_model], broadcast=True, hash=False)[0]
+        n_workers = max(len(client.scheduler_info().get('workers', {})), 1)
+        # worker address -> number of trials of the history its copy of the model has
+        synced = {}
+        scattered_synced = len(hyper_model.history.trials)
+        trial_bytes = {}
+        self.stats = dict(scattered_bytes=scattered_bytes, trial_bytes=trial_bytes)
+        if logger.is_info_enabled():
+            logger.info(f'Scattered {scattered_bytes} bytes to dask workers.')
 
-        def on_trial_done(trial_item):
+        def on_trial_done(trial_item, result):
             trial_item.done_at = time.time()
+            searcher.remove_pending(trial_item.space_sample)
+
+            if result is not None:
+                trial_bytes[trial_item.trial_no] += sizeof(result)
+                if result['worker'] is not None:
+                    synced[result['worker']] = max(synced.get(result['worker'], 0), result['synced'])
+                trial_item.reward = result['reward']
+                trial_item.elapsed = result['elapsed']
+                trial_item.model_file = result['model_file']
+                trial_item.succeeded = result['succeeded']
+                trial_item.iteration_scores = result['iteration_scores']
+                trial_item.memo.update(result['memo'])
+            else:
+                trial_item.reward = 0
+                trial_item.elapsed = trial_item.done_at - trial_item.start_at
+                trial_item.succeeded = False
 
-            if trial_item.reward != 0 and not math.isnan(trial_item.reward):  # success
+            scheduler.observe(trial_item)
+            hyper_model._update_searcher(trial_item.space_sample, trial_item)
+            if trial_item.succeeded:
                 improved = hyper_model.history.append(trial_item)
                 for callback in hyper_model.callbacks:
                     callback.on_trial_end(hyper_model, trial_item.space_sample,
@@ -200,6 +184,7 @@ class DaskDispatcher(Dispatcher):
                                           improved, trial_item.elapsed)
                 success_counter()
             else:
+                hyper_model.history.append(trial_item)
                 for callback in hyper_model.callbacks:
                     callback.on_trial_error(hyper_model, trial_item.space_sample, trial_item.trial_no)
                 failed_counter()
@@ -207,87 +192,122 @@ class DaskDispatcher(Dispatcher):
             if logger.is_info_enabled():
                 elapsed = '%.3f' % (trial_item.done_at - trial_item.start_at)
                 msg = f'Trial {trial_item.trial_no} done with reward={trial_item.reward}, ' \
-                      f'elapsed {elapsed} seconds\n'
+                      f'elapsed {elapsed} seconds, transferred {trial_bytes[trial_item.trial_no]} bytes\n'
                 logger.info(msg)
-            if trial_store is not None:
+            if trial_store is not None and result is not None:
                 trial_store.put(dataset_id, trial_item)
 
-        pool = DaskExecutorPool(worker_count, queue_size,
-                                on_trial_start, on_trial_done,
-                                hyper_model._run_trial,
-                                X, y, X_val, y_val, fit_kwargs)
-        pool.start()
+        def unsynced():
+            # the trials the copy of the model lagging the most may not have, only the discriminator needs them
+            if hyper_model.discriminator is None:
+                return len(hyper_model.history.trials), []
+            known = list(synced.values())
+            if len(known) < n_workers:
+                known.append(scattered_synced)
+            offset = min(known)
+            return offset, [reported_trial(t) for t in hyper_model.history.trials[offset:]]
+
+        def submit(trial_item):
+            trial_item.start_at = time.time()
+            if logger.is_info_enabled():
+                msg = f'Start trial {trial_item.trial_no}, space_id={trial_item.space_id}' \
+                      + f',model_file={trial_item.model_file}'
+                logger.info(msg)
+            for callback in hyper_model.callbacks:
+                callback.on_trial_begin(hyper_model, trial_item.space_sample, trial_item.trial_no)
+
+            vectors = trial_item.space_sample.vectors
+            offset, reported = unsynced()
+            trial_bytes[trial_item.trial_no] = sizeof((vectors, trial_item.model_file, fit_kwargs, reported))
+
+            future = client.submit(_run_trial, remote_model, vectors, trial_item.trial_no,
+                                   X, y, X_val, y_val, cv, num_folds, trial_item.model_file, fit_kwargs,
+                                   hyper_model._get_budget(trial_item.space_sample), offset, reported,
+                                   pure=False)
+            searcher.add_pending(trial_item.space_sample)
+            running[future] = trial_item
+            futures.add(future)
 
         trial_no = 1
         retry_counter = 0
+        searching = True
 
-        while trial_no <= max_trials and pool.running:
-            if pool.qsize >= queue_size:
-                time.sleep(0.1)
-                continue
-
-            space_sample = hyper_model.searcher.sample()
-            if hyper_model.history.is_existed(space_sample):
-                if retry_counter >= retry_limit:
-                    logger.info(f'Unable to take valid sample and exceed the retry limit 1000.')
-                    break
-                trial = hyper_model.history.get_trial(space_sample)
-                for callback in hyper_model.callbacks:
-                    callback.on_skip_trial(hyper_model, space_sample, trial_no, 'trial_existed', trial.reward, False,
-                                           trial.elapsed)
-                retry_counter += 1
-                continue
-
-            try:
-                if trial_store is not None:
-                    trial = trial_store.get(dataset_id, space_sample)
-                    if trial is not None:
-                        reward = trial.reward
-                        elapsed = trial.elapsed
-                        trial = Trial(space_sample, trial_no, reward, elapsed)
-                        improved = hyper_model.history.append(trial)
-                        hyper_model.searcher.update_result(space_sample, reward)
-                        for callback in hyper_model.callbacks:
-                            callback.on_skip_trial(hyper_model, space_sample, trial_no, 'hit_trial_store', reward,
-                                                   improved,
-                                                   elapsed)
-                        trial_no += 1
+        def propose():
+            # sample new trials until the workers and the queue are busy
+            nonlocal trial_no, retry_counter, searching
+            while searching and trial_no <= max_trials and len(running) < worker_count + queue_size:
+                try:
+                    space_sample = scheduler.sample()
+                    if space_sample is None:
+                        break  # no resources left, wait for a running trial
+                    if hyper_model.history.is_existed(space_sample) or searcher.is_pending(space_sample):
+                        if retry_counter >= retry_limit:
+                            logger.info(f'Unable to take valid sample and exceed the retry limit {retry_limit}.')
+                            searching = False
+                            break
+                        trial = hyper_model.history.get_trial(space_sample)
+                        if trial is not None:
+                            for callback in hyper_model.callbacks:
+                                callback.on_skip_trial(hyper_model, space_sample, trial_no, 'trial_existed',
+                                                       trial.reward, False, trial.elapsed)
+                        retry_counter += 1
                         continue
-
-                model_file = '%s/%05d_%s.pkl' % (self.models_dir, trial_no, space_sample.space_id)
-
-                item = DaskTrialItem(space_sample, trial_no, model_file=model_file)
-                pool.push(item)
-
-                if logger.is_info_enabled():
-                    logger.info(f'Found trial {trial_no}, queue size: {pool.qsize}')
-            except EarlyStoppingError:
-                pool.stop()
-                break
-            except KeyboardInterrupt:
-                pool.stop()
-                pool.interrupted = True
-                print('KeyboardInterrupt')
-                break
-            except Exception as e:
-                import traceback
-                msg = f'{">" * 20} Search trial {trial_no} failed! {"<" * 20}\n' \
-                      + f'{e.__class__.__name__}: {e}\n' \
-                      + traceback.format_exc() \
-                      + '*' * 50
-                logger.error(msg)
-            finally:
+                    retry_counter = 0
+
+                    if trial_store is not None:
+                        trial = trial_store.get(dataset_id, space_sample)
+                        if trial is not None:
+                            reward = trial.reward
+                            elapsed = trial.elapsed
+                            trial = Trial(space_sample, trial_no, reward, elapsed)
+                            improved = hyper_model.history.append(trial)
+                            searcher.update_result(space_sample, reward)
+                            for callback in hyper_model.callbacks:
+                                callback.on_skip_trial(hyper_model, space_sample, trial_no, 'hit_trial_store', reward,
+                                                       improved,
+                                                       elapsed)
+                            trial_no += 1
+                            continue
+
+                    model_file = '%s/%05d_%s.pkl' % (self.models_dir, trial_no, space_sample.space_id)
+                    submit(DaskTrialItem(space_sample, trial_no, model_file=model_file))
+                except EarlyStoppingError:
+                    searching = False
+                    break
+                except Exception as e:
+                    import traceback
+                    msg = f'{">" * 20} Search trial {trial_no} failed! {"<" * 20}\n' \
+                          + f'{e.__class__.__name__}: {e}\n' \
+                          + traceback.format_exc() \
+                          + '*' * 50
+                    logger.error(msg)
                 trial_no += 1
-                retry_counter = 0
 
-        # wait trials
-        if pool.running:
-            logger.info('Search done, wait trial tasks.')
-        pool.push(None)  # mark end
-        pool.join()
+        try:
+            propose()
+            for future in futures:
+                trial_item = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f'Trial {trial_item.trial_no} failed, {e.__class__.__name__}: {e}')
+                    result = None
+
+                try:
+                    on_trial_done(trial_item, result)
+                except EarlyStoppingError:
+                    searching = False
+                propose()
+        except KeyboardInterrupt:
+            for future in running.keys():
+                future.cancel()
+            print('KeyboardInterrupt')
+        finally:
+            scheduler.release()
 
         if logger.is_info_enabled():
             logger.info(f'Search and all trials done, {success_counter.value} success, '
-                        f'{failed_counter.value} failed.')
+                        f'{failed_counter.value} failed, scattered {scattered_bytes} bytes, '
+                        f'transferred {sum(trial_bytes.values())} bytes by trials.')
 
         return trial_no
@@ -0,0 +1,285 @@
+# -*- coding:utf-8 -*-
+"""
+Run trials in a pool of local worker processes.
+
+The training data is placed in shared memory once (python 3.8+, else it is pickled to each worker), workers attach
+to it when they start and then only receive the vectors of the space samples. Results are sent back to the driver,
+which feeds the searcher, the trial history and the callbacks, so the search state lives in one process. The trials
+reported since the last task of a worker are sent along with its next task (without their space samples), so the
+discriminator in the worker sees them. A worker that crashes or runs a trial longer than
+`DispatchCfg.process_trial_timeout` is killed and replaced, and its trial is reported as failed.
+"""
+import multiprocessing as mp
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from .cfg import DispatchCfg as c
+from .scheduler import get_scheduler
+from ..core.callbacks import EarlyStoppingError
+from ..core.dispatcher import Dispatcher
+from ..core.trial import Trial, reported_trial
+from ..model.fold_executor import set_concurrent_trials
+from ..utils import logging, fs
+from ..utils.shared_data import SharedData
+
+logger = logging.get_logger(__name__)
+
+
+def _worker_main(conn, hyper_model, data_descriptor, cv, num_folds, fit_kwargs, concurrent_trials=1):
+    set_concurrent_trials(concurrent_trials)  # share the cores with the other workers to fit folds
+    (X, y, X_eval, y_eval), shm = SharedData.attach(data_descriptor)
+    space_fn = hyper_model.searcher.space_fn
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+
+        trial_no, vectors, model_file, budget, reported = task
+        for trial in reported:
+            hyper_model.history.append(trial)
+
+        start_time = time.time()
+        try:
+            space_sample = space_fn()
+            space_sample.assign_by_vectors(vectors)
+            hyper_model._set_budget(space_sample, budget)
+            trial = hyper_model._fit_trial(space_sample, trial_no, X, y, X_eval, y_eval, cv, num_folds, model_file,
+                                           **fit_kwargs)
+            result = dict(reward=trial.reward, elapsed=trial.elapsed, model_file=trial.model_file,
+                          succeeded=trial.succeeded, iteration_scores=trial.iteration_scores, memo=trial.memo)
+        except Exception as e:
+            logger.error(f'Trial {trial_no} failed in worker {os.getpid()}, {e.__class__.__name__}: {e}\n'
+                         + traceback.format_exc())
+            result = dict(reward=0, elapsed=time.time() - start_time, model_file=None, succeeded=False)
+        conn.send((trial_no, result))
+
+    del X, y, X_eval, y_eval
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # some objects still refer to the shared memory, it is released on exit
+
+
+class _Worker(object):
+    def __init__(self, ctx, args, history):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,) + args, daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.history = history
+        self.synced = len(history.trials)  # the trials of the history copied to the worker
+        self.trial = None
+        self.started_at = None
+
+    @property
+    def idle(self):
+        return self.trial is None
+
+    def submit(self, trial, budget=None):
+        self.trial = trial
+        self.started_at = time.time()
+        reported = [reported_trial(t) for t in self.history.trials[self.synced:]]
+        self.synced = len(self.history.trials)
+        self.conn.send((trial.trial_no, trial.space_sample.vectors, trial.model_file, budget, reported))
+
+    def release(self):
+        trial, self.trial, self.started_at = self.trial, None, None
+        return trial
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()  # Process.kill is python 3.7+
+        self.process.join()
+        self.conn.close()
+
+
+class MultiProcessDispatcher(Dispatcher):
+    def __init__(self, models_dir, workers=None, trial_timeout=None, scheduler=None):
+        super(MultiProcessDispatcher, self).__init__()
+
+        self.models_dir = models_dir
+        self.workers = workers if workers is not None else c.process_workers
+        self.trial_timeout = trial_timeout if trial_timeout is not None else c.process_trial_timeout
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        fs.makedirs(models_dir, exist_ok=True)
+
+    def dispatch(self, hyper_model, X, y, X_eval, y_eval, cv, num_folds, max_trials, dataset_id, trial_store,
+                 **fit_kwargs):
+        retry_limit = c.trial_retry_limit
+        worker_count = self.workers if self.workers > 0 else os.cpu_count()
+        worker_count = max(min(worker_count, max_trials), 1)
+
+        if 'fork' in mp.get_all_start_methods():
+            ctx = mp.get_context('fork')
+        else:
+            ctx = mp.get_context()
+
+        scheduler = self.scheduler
+        scheduler.bind(hyper_model, X)
+
+        data = SharedData((X, y, X_eval, y_eval))
+        worker_args = (hyper_model, data.descriptor, cv, num_folds, fit_kwargs, worker_count)
+        if logger.is_info_enabled():
+            logger.info(f'Start {worker_count} worker processes, shared data {data.nbytes} bytes.')
+        workers = [_Worker(ctx, worker_args, hyper_model.history) for _ in range(worker_count)]
+
+        def report(worker, result=None, reason=None):
+            trial = worker.release()
+            space_sample = trial.space_sample
+            if result is not None:
+                trial.reward = result['reward']
+                trial.elapsed = result['elapsed']
+                trial.model_file = result['model_file']
+                trial.succeeded = result['succeeded']
+                trial.iteration_scores = result.get('iteration_scores', {})
+                trial.memo.update(result.get('memo', {}))
+            else:
+                trial.reward = 0
+                trial.elapsed = time.time() - trial.memo.pop('dispatched_at')
+                trial.succeeded = False
+                logger.error(f'Trial {trial.trial_no} failed, {reason}.')
+            trial.memo.pop('dispatched_at', None)
+            hyper_model.searcher.remove_pending(space_sample)
+            scheduler.observe(trial)
+
+            hyper_model._update_searcher(space_sample, trial)
+            if trial.succeeded:
+                improved = hyper_model.history.append(trial)
+                for callback in hyper_model.callbacks:
+                    callback.on_trial_end(hyper_model, space_sample, trial.trial_no, trial.reward,
+                                          improved, trial.elapsed)
+            else:
+                hyper_model.history.append(trial)
+                for callback in hyper_model.callbacks:
+                    callback.on_trial_error(hyper_model, space_sample, trial.trial_no)
+
+            if logger.is_info_enabled():
+                msg = f'Trial {trial.trial_no} done, reward: {trial.reward}, ' \
+                      f'best_trial_no:{hyper_model.best_trial_no}, best_reward:{hyper_model.best_reward}\n'
+                logger.info(msg)
+            if trial_store is not None and result is not None:
+                trial_store.put(dataset_id, trial)
+
+        def replace(worker):
+            worker.kill()
+            workers[workers.index(worker)] = _Worker(ctx, worker_args, hyper_model.history)
+
+        trial_no = 1
+        retry_counter = 0
+        searching = True
+        try:
+            while True:
+                # feed the idle workers
+                for worker in workers:
+                    if not searching or not worker.idle:
+                        continue
+                    while trial_no <= max_trials:
+                        try:
+                            space_sample = scheduler.sample()
+                            if space_sample is None:
+                                break  # no resources left, wait for a running trial
+                            if hyper_model.history.is_existed(space_sample) \
+                                    or hyper_model.searcher.is_pending(space_sample):
+                                if retry_counter >= retry_limit:
+                                    logger.info(f'Unable to take valid sample and exceed the retry limit '
+                                                f'{retry_limit}.')
+                                    searching = False
+                                    break
+                                trial = hyper_model.history.get_trial(space_sample)
+                                if trial is not None:
+                                    for callback in hyper_model.callbacks:
+                                        callback.on_skip_trial(hyper_model, space_sample, trial_no, 'trial_existed',
+                                                               trial.reward, False, trial.elapsed)
+                                retry_counter += 1
+                                continue
+                            retry_counter = 0
+
+                            if trial_store is not None:
+                                trial = trial_store.get(dataset_id, space_sample)
+                                if trial is not None:
+                                    reward = trial.reward
+                                    elapsed = trial.elapsed
+                                    trial = Trial(space_sample, trial_no, reward, elapsed)
+                                    improved = hyper_model.history.append(trial)
+                                    hyper_model.searcher.update_result(space_sample, reward)
+                                    for callback in hyper_model.callbacks:
+                                        callback.on_skip_trial(hyper_model, space_sample, trial_no, 'hit_trial_store',
+                                                               reward, improved, elapsed)
+                                    trial_no += 1
+                                    continue
+
+                            for callback in hyper_model.callbacks:
+                                callback.on_trial_begin(hyper_model, space_sample, trial_no)
+
+                            model_file = '%s/%05d_%s.pkl' % (self.models_dir, trial_no, space_sample.space_id)
+                            trial = Trial(space_sample, trial_no, 0, 0, model_file)
+                            trial.memo['dispatched_at'] = time.time()
+                            worker.submit(trial, hyper_model._get_budget(space_sample))
+                            hyper_model.searcher.add_pending(space_sample)
+                            trial_no += 1
+                            break
+                        except EarlyStoppingError:
+                            searching = False
+                            break
+                        except Exception as e:
+                            msg = f'{">" * 20} Search trial {trial_no} failed! {"<" * 20}\n' \
+                                  + f'{e.__class__.__name__}: {e}\n' \
+                                  + traceback.format_exc() \
+                                  + '*' * 50
+                            logger.error(msg)
+                            trial_no += 1
+                    if trial_no > max_trials:
+                        searching = False
+
+                busy = [w for w in workers if not w.idle]
+                if len(busy) <= 0:
+                    break
+
+                timeout = None
+                if self.trial_timeout > 0:
+                    now = time.time()
+                    timeout = max(min(w.started_at + self.trial_timeout - now for w in busy), 0)
+                ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], timeout)
+
+                for worker in busy:
+                    try:
+                        if worker.conn in ready or worker.conn.poll():
+                            _, result = worker.conn.recv()
+                            report(worker, result)
+                        elif worker.process.sentinel in ready:
+                            report(worker, reason=f'worker exited with code {worker.process.exitcode}')
+                            replace(worker)
+                        elif self.trial_timeout > 0 and time.time() - worker.started_at >= self.trial_timeout:
+                            report(worker, reason=f'timeout after {self.trial_timeout} seconds')
+                            replace(worker)
+                    except EOFError:
+                        report(worker, reason=f'worker exited with code {worker.process.exitcode}')
+                        replace(worker)
+                    except EarlyStoppingError:
+                        searching = False
+        except KeyboardInterrupt:
+            logger.warning('KeyboardInterrupt, stop searching.')
+        finally:
+            scheduler.release()
+            for worker in workers:
+                worker.stop()
+            for worker in workers:
+                worker.process.join(1.0)
+                worker.kill()
+            data.close()
+
+        return trial_no
@@ -0,0 +1,21 @@
+# -*- coding:utf-8 -*-
+"""
+Pass DataFrames inline in predict requests as Arrow IPC streams, pyarrow is required.
+"""
+
+
+def to_arrow_ipc(df):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def from_arrow_ipc(data):
+    import pyarrow as pa
+
+    with pa.ipc.open_stream(data) as reader:
+        return reader.read_pandas()
@@ -1,7 +1,8 @@
 import grpc
+import numpy as np
 
 from hypernets.dispatchers.predict.grpc.proto import predict_pb2_grpc
-from hypernets.dispatchers.predict.grpc.proto.predict_pb2 import PredictRequest
+from hypernets.dispatchers.predict.grpc.proto.predict_pb2 import PredictRequest, BatchPredictRequest
 from hypernets.utils import logging
 
 logger = logging.get_logger(__name__)
@@ -36,3 +37,38 @@ class PredictClient(object):
             logger.error(msg + traceback.format_exc())
 
             return 98 if isinstance(e, grpc.RpcError) else 99
+
+    def predict_batch(self, data=None, data_file=None, result_file=None, proba=True, csv=None, csv_result=False):
+        """
+        Predict with the resident model of the server, the data is a DataFrame sent inline as Arrow IPC, a csv
+        file readable by the server, or `csv` text (bytes) with the header sent inline.
+
+        :param csv_result: return the predictions as csv text (bytes) without header, as the predict command of
+            the server writes them, or as pandas formats them.
+        :return: the predictions as numpy array, or the result file if `result_file` is given.
+        """
+        assert sum(x is not None for x in (data, data_file, csv)) == 1
+
+        if data is not None:
+            from hypernets.dispatchers.predict.arrow_ipc import to_arrow_ipc
+            arrow_ipc = to_arrow_ipc(data)
+        else:
+            arrow_ipc = b''
+        request = BatchPredictRequest(data_file=data_file if data_file else '',
+                                      arrow_ipc=arrow_ipc,
+                                      result_file=result_file if result_file else '',
+                                      proba=proba,
+                                      csv=csv if csv else b'',
+                                      csv_result=csv_result)
+        response = self.stub.predict_batch(request)
+        if response.code != 0:
+            raise RuntimeError(f'[Predict {self.server}] failed with code {response.code}, {response.message}')
+
+        if result_file:
+            return response.result_file
+        if csv_result:
+            return response.csv
+        result = np.array(response.values, dtype='float64').reshape(response.rows, response.columns)
+        if not proba and response.columns == 1:
+            result = result.ravel()
+        return result
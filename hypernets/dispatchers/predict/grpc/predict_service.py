@@ -1,7 +1,12 @@
+import io
+import os
+import tempfile
 import time
 
+import pandas as pd
+
 from hypernets.dispatchers.predict.grpc.proto import predict_pb2_grpc
-from hypernets.dispatchers.predict.grpc.proto.predict_pb2 import PredictResponse
+from hypernets.dispatchers.predict.grpc.proto.predict_pb2 import PredictResponse, BatchPredictResponse
 from hypernets.dispatchers.process import LocalProcess
 from hypernets.utils import logging
 
@@ -9,16 +14,25 @@ logger = logging.get_logger(__name__)
 
 
 class PredictService(predict_pb2_grpc.PredictServiceServicer):
-    def __init__(self, cmd):
+    """
+    Run `cmd` to predict each data file, or serve with a resident `ModelPool` if `pool` is given.
+    """
+
+    def __init__(self, cmd=None, pool=None):
         super(PredictService, self).__init__()
-        assert cmd
+        assert cmd or pool is not None
 
         self.cmd = cmd
+        self.pool = pool
 
     def predict(self, request, context):
         data_file = request.data_file
         result_file = request.result_file
 
+        if self.pool is not None:
+            res = self._predict_batch(data_file, b'', result_file, True)
+            return PredictResponse(data_file=data_file, result_file=result_file, code=res.code, message=res.message)
+
         start_at = time.time()
 
         if logger.is_info_enabled():
@@ -37,15 +51,93 @@ class PredictService(predict_pb2_grpc.PredictServiceServicer):
             print(' done, elapsed %.3f seconds.' % (done_at - start_at))
         return res
 
-
-def serve(addr, cmd):
+    def predict_batch(self, request, context):
+        if self.pool is None and not request.csv:
+            return BatchPredictResponse(code=1, message='no resident model, start the server with a model file.')
+        return self._predict_batch(request.data_file, request.arrow_ipc, request.result_file, request.proba,
+                                   request.csv, request.csv_result)
+
+    def _predict_batch(self, data_file, arrow_ipc, result_file, proba, csv=b'', csv_result=False):
+        try:
+            if self.pool is None:
+                text = self._predict_by_cmd(csv)
+                if csv_result:
+                    # verbatim, the values may be labels or formatted by the command
+                    return BatchPredictResponse(code=0, rows=_count_lines(text), csv=text)
+                result = pd.read_csv(io.BytesIO(text), header=None).values
+            else:
+                if arrow_ipc:
+                    from hypernets.dispatchers.predict.arrow_ipc import from_arrow_ipc
+                    X = from_arrow_ipc(arrow_ipc)
+                elif csv:
+                    X = pd.read_csv(io.BytesIO(csv))
+                else:
+                    X = pd.read_csv(data_file)
+                result = self.pool.predict(X, proba)
+
+            if result.ndim == 1:
+                result = result.reshape(-1, 1)
+            rows, columns = result.shape
+
+            if csv_result:
+                text = pd.DataFrame(result).to_csv(index=False, header=False).encode('utf-8')
+                return BatchPredictResponse(code=0, rows=rows, columns=columns, csv=text)
+            elif result_file:
+                pd.DataFrame(result).to_csv(result_file, index=False, header=False)
+                return BatchPredictResponse(code=0, rows=rows, columns=columns, result_file=result_file)
+            else:
+                return BatchPredictResponse(code=0, rows=rows, columns=columns, values=result.ravel().tolist())
+        except Exception as e:
+            import traceback
+            msg = f'{e.__class__.__name__}: {e}'
+            logger.error(msg + '\n' + traceback.format_exc())
+            return BatchPredictResponse(code=99, message=msg)
+
+    def _predict_by_cmd(self, csv):
+        # the command predicts files only, pass the csv text through a temporary pair of them
+        temp_dir = tempfile.mkdtemp(prefix='predict_')
+        data_file, result_file = f'{temp_dir}/data.csv', f'{temp_dir}/result.csv'
+        try:
+            with open(data_file, 'wb') as f:
+                f.write(csv)
+            p = LocalProcess(f'{self.cmd} {data_file} {result_file}', None, None, None)
+            p.start()
+            p.join()
+            if p.exitcode != 0:
+                raise RuntimeError(f'predict command exited with code {p.exitcode}')
+            with open(result_file, 'rb') as f:
+                text = f.read()
+            if len(text) > 0 and not text.endswith(b'\n'):
+                text += b'\n'
+            return text
+        finally:
+            for f in (data_file, result_file):
+                if os.path.exists(f):
+                    os.remove(f)
+            os.rmdir(temp_dir)
+
+
+def _count_lines(text):
+    return text.count(b'\n')
+
+
+def serve(addr, cmd=None, model_file=None, workers=0, max_batch_rows=10000, batch_wait=0.0, max_workers=10):
+    """
+    Start the predict server, which runs `cmd` for each data file, or keeps `model_file` loaded in `workers`
+    processes if it's given, see `ModelPool`.
+    """
     import grpc
     from concurrent import futures
 
     if logger.is_info_enabled():
         logger.info(f'start predict service at {addr}')
-    service = PredictService(cmd)
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    if model_file:
+        from hypernets.dispatchers.predict.model_pool import ModelPool
+        pool = ModelPool(model_file, workers=workers, max_batch_rows=max_batch_rows, batch_wait=batch_wait)
+    else:
+        pool = None
+    service = PredictService(cmd, pool)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
     predict_pb2_grpc.add_PredictServiceServicer_to_server(service, server)
 
     server.add_insecure_port(addr)
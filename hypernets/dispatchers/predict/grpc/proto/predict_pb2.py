@@ -20,7 +20,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   package='hypernets.dispatchers.predict.grpc.proto',
   syntax='proto3',
   serialized_options=None,
-  serialized_pb=_b('\n6hypernets/dispatchers/predict/grpc/proto/predict.proto\x12(hypernets.dispatchers.predict.grpc.proto\"8\n\x0ePredictRequest\x12\x11\n\tdata_file\x18\x01 \x01(\t\x12\x13\n\x0bresult_file\x18\x02 \x01(\t\"X\n\x0fPredictResponse\x12\x11\n\tdata_file\x18\x01 \x01(\t\x12\x13\n\x0bresult_file\x18\x02 \x01(\t\x12\x0c\n\x04\x63ode\x18\x03 \x01(\x05\x12\x0f\n\x07message\x18\x04 \x01(\t2\x93\x01\n\x0ePredictService\x12\x80\x01\n\x07predict\x12\x38.hypernets.dispatchers.predict.grpc.proto.PredictRequest\x1a\x39.hypernets.dispatchers.predict.grpc.proto.PredictResponse\"\x00\x62\x06proto3')
+  serialized_pb=_b('\n6hypernets/dispatchers/predict/grpc/proto/predict.proto\x12(hypernets.dispatchers.predict.grpc.proto\"8\n\x0ePredictRequest\x12\x11\n\tdata_file\x18\x01 \x01(\t\x12\x13\n\x0bresult_file\x18\x02 \x01(\t\"X\n\x0fPredictResponse\x12\x11\n\tdata_file\x18\x01 \x01(\t\x12\x13\n\x0bresult_file\x18\x02 \x01(\t\x12\x0c\n\x04\x63ode\x18\x03 \x01(\x05\x12\x0f\n\x07message\x18\x04 \x01(\t\"\x80\x01\n\x13\x42\x61tchPredictRequest\x12\x11\n\tdata_file\x18\x01 \x01(\t\x12\x11\n\tarrow_ipc\x18\x02 \x01(\x0c\x12\x13\n\x0bresult_file\x18\x03 \x01(\t\x12\r\n\x05proba\x18\x04 \x01(\x08\x12\x0b\n\x03\x63sv\x18\x05 \x01(\x0c\x12\x12\n\ncsv_result\x18\x06 \x01(\x08\"\x86\x01\n\x14\x42\x61tchPredictResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0c\n\x04rows\x18\x03 \x01(\x05\x12\x0f\n\x07\x63olumns\x18\x04 \x01(\x05\x12\x0e\n\x06values\x18\x05 \x03(\x01\x12\x13\n\x0bresult_file\x18\x06 \x01(\t\x12\x0b\n\x03\x63sv\x18\x07 \x01(\x0c\x32\xa6\x02\n\x0ePredictService\x12\x80\x01\n\x07predict\x12\x38.hypernets.dispatchers.predict.grpc.proto.PredictRequest\x1a\x39.hypernets.dispatchers.predict.grpc.proto.PredictResponse\"\x00\x12\x90\x01\n\rpredict_batch\x12=.hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest\x1a>.hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse\"\x00\x62\x06proto3')
 )
 
 
@@ -115,8 +115,149 @@ _PREDICTRESPONSE = _descriptor.Descriptor(
   serialized_end=246,
 )
 
+
+_BATCHPREDICTREQUEST = _descriptor.Descriptor(
+  name='BatchPredictRequest',
+  full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='data_file', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest.data_file', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='arrow_ipc', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest.arrow_ipc', index=1,
+      number=2, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b(""),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='result_file', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest.result_file', index=2,
+      number=3, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='proba', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest.proba', index=3,
+      number=4, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='csv', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest.csv', index=4,
+      number=5, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b(""),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='csv_result', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest.csv_result', index=5,
+      number=6, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=249,
+  serialized_end=377,
+)
+
+
+_BATCHPREDICTRESPONSE = _descriptor.Descriptor(
+  name='BatchPredictResponse',
+  full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='code', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.code', index=0,
+      number=1, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='message', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.message', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='rows', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.rows', index=2,
+      number=3, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='columns', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.columns', index=3,
+      number=4, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='values', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.values', index=4,
+      number=5, type=1, cpp_type=5, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='result_file', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.result_file', index=5,
+      number=6, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='csv', full_name='hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse.csv', index=6,
+      number=7, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b(""),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=380,
+  serialized_end=514,
+)
+
 DESCRIPTOR.message_types_by_name['PredictRequest'] = _PREDICTREQUEST
 DESCRIPTOR.message_types_by_name['PredictResponse'] = _PREDICTRESPONSE
+DESCRIPTOR.message_types_by_name['BatchPredictRequest'] = _BATCHPREDICTREQUEST
+DESCRIPTOR.message_types_by_name['BatchPredictResponse'] = _BATCHPREDICTRESPONSE
 _sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
 PredictRequest = _reflection.GeneratedProtocolMessageType('PredictRequest', (_message.Message,), {
@@ -133,6 +274,20 @@ PredictResponse = _reflection.GeneratedProtocolMessageType('PredictResponse', (_
   })
 _sym_db.RegisterMessage(PredictResponse)
 
+BatchPredictRequest = _reflection.GeneratedProtocolMessageType('BatchPredictRequest', (_message.Message,), {
+  'DESCRIPTOR' : _BATCHPREDICTREQUEST,
+  '__module__' : 'hypernets.dispatchers.predict.grpc.proto.predict_pb2'
+  # @@protoc_insertion_point(class_scope:hypernets.dispatchers.predict.grpc.proto.BatchPredictRequest)
+  })
+_sym_db.RegisterMessage(BatchPredictRequest)
+
+BatchPredictResponse = _reflection.GeneratedProtocolMessageType('BatchPredictResponse', (_message.Message,), {
+  'DESCRIPTOR' : _BATCHPREDICTRESPONSE,
+  '__module__' : 'hypernets.dispatchers.predict.grpc.proto.predict_pb2'
+  # @@protoc_insertion_point(class_scope:hypernets.dispatchers.predict.grpc.proto.BatchPredictResponse)
+  })
+_sym_db.RegisterMessage(BatchPredictResponse)
+
 
 
 _PREDICTSERVICE = _descriptor.ServiceDescriptor(
@@ -141,8 +296,8 @@ _PREDICTSERVICE = _descriptor.ServiceDescriptor(
   file=DESCRIPTOR,
   index=0,
   serialized_options=None,
-  serialized_start=249,
-  serialized_end=396,
+  serialized_start=517,
+  serialized_end=811,
   methods=[
   _descriptor.MethodDescriptor(
     name='predict',
@@ -153,6 +308,15 @@ _PREDICTSERVICE = _descriptor.ServiceDescriptor(
     output_type=_PREDICTRESPONSE,
     serialized_options=None,
   ),
+  _descriptor.MethodDescriptor(
+    name='predict_batch',
+    full_name='hypernets.dispatchers.predict.grpc.proto.PredictService.predict_batch',
+    index=1,
+    containing_service=None,
+    input_type=_BATCHPREDICTREQUEST,
+    output_type=_BATCHPREDICTRESPONSE,
+    serialized_options=None,
+  ),
 ])
 _sym_db.RegisterServiceDescriptor(_PREDICTSERVICE)
 
@@ -19,6 +19,11 @@ class PredictServiceStub(object):
         request_serializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.PredictRequest.SerializeToString,
         response_deserializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.PredictResponse.FromString,
         )
+    self.predict_batch = channel.unary_unary(
+        '/hypernets.dispatchers.predict.grpc.proto.PredictService/predict_batch',
+        request_serializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.BatchPredictRequest.SerializeToString,
+        response_deserializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.BatchPredictResponse.FromString,
+        )
 
 
 class PredictServiceServicer(object):
@@ -32,6 +37,13 @@ class PredictServiceServicer(object):
     context.set_details('Method not implemented!')
     raise NotImplementedError('Method not implemented!')
 
+  def predict_batch(self, request, context):
+    # missing associated documentation comment in .proto file
+    pass
+    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+    context.set_details('Method not implemented!')
+    raise NotImplementedError('Method not implemented!')
+
 
 def add_PredictServiceServicer_to_server(servicer, server):
   rpc_method_handlers = {
@@ -40,6 +52,11 @@ def add_PredictServiceServicer_to_server(servicer, server):
           request_deserializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.PredictRequest.FromString,
           response_serializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.PredictResponse.SerializeToString,
       ),
+      'predict_batch': grpc.unary_unary_rpc_method_handler(
+          servicer.predict_batch,
+          request_deserializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.BatchPredictRequest.FromString,
+          response_serializer=hypernets_dot_dispatchers_dot_predict_dot_grpc_dot_proto_dot_predict__pb2.BatchPredictResponse.SerializeToString,
+      ),
   }
   generic_handler = grpc.method_handlers_generic_handler(
       'hypernets.dispatchers.predict.grpc.proto.PredictService', rpc_method_handlers)
@@ -0,0 +1,237 @@
+# -*- coding:utf-8 -*-
+"""
+Serve a model from a pool of long-lived worker processes.
+
+Every worker loads the model once when it starts, so a request only pays for the prediction rather than the
+python startup, the imports and the unpickling of the model. Requests waiting in the queue when a worker gets
+free are concatenated into one batch, up to `max_batch_rows` rows, so many small concurrent requests are served
+with a few calls of the model.
+"""
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import time
+import traceback
+from concurrent.futures import Future
+from threading import Thread
+
+import numpy as np
+import pandas as pd
+
+from hypernets.utils import logging
+
+logger = logging.get_logger(__name__)
+
+
+def load_model(model_file):
+    with open(model_file, 'rb') as f:
+        return pickle.load(f)
+
+
+def _worker_main(conn, model_file):
+    try:
+        model = load_model(model_file)
+    except Exception as e:
+        conn.send(f'{e.__class__.__name__}: {e}')
+        return
+    conn.send(None)  # ready
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+
+        X, proba = task
+        try:
+            result = model.predict_proba(X) if proba else model.predict(X)
+            conn.send((True, np.asarray(result)))
+        except Exception as e:
+            logger.error(f'predict failed in worker {os.getpid()}, {e.__class__.__name__}: {e}\n'
+                         + traceback.format_exc())
+            conn.send((False, f'{e.__class__.__name__}: {e}'))
+
+
+class _Request(object):
+    def __init__(self, X, proba):
+        self.X = X
+        self.proba = proba
+        self.future = Future()
+
+
+class _Worker(object):
+    def __init__(self, ctx, model_file):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, model_file), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        error = self.conn.recv()
+        if error is not None:
+            self.process.join()
+            raise RuntimeError(f'failed to load model {model_file}, {error}')
+
+    def predict(self, X, proba):
+        self.conn.send((X, proba))
+        return self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+class ModelPool(object):
+    """
+    :param model_file: a pickled model with `predict` (and `predict_proba`) of DataFrames.
+    :param workers: number of worker processes, the cpu count if 0.
+    :param max_batch_rows: requests are batched until the batch reaches this number of rows.
+    :param batch_wait: seconds to wait for more requests before a batch is predicted, batches are made only of the
+        requests queued already if 0.
+    """
+
+    def __init__(self, model_file, workers=0, max_batch_rows=10000, batch_wait=0.0):
+        super(ModelPool, self).__init__()
+
+        self.model_file = model_file
+        self.workers = workers if workers > 0 else os.cpu_count()
+        self.max_batch_rows = max_batch_rows
+        self.batch_wait = batch_wait
+
+        # counted by each feeder thread apart, so they don't race
+        self._batches = [0] * self.workers
+        self._requests = [0] * self.workers
+
+        # spawn the workers, forking a process with grpc threads is unsafe
+        self._ctx = mp.get_context('spawn')
+        self._queue = queue.Queue()  # _Request
+        start_at = time.time()
+        self._workers = [_Worker(self._ctx, model_file) for _ in range(self.workers)]
+        self._threads = [Thread(target=self._feed, args=(i,), daemon=True) for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+        if logger.is_info_enabled():
+            logger.info(f'model pool started with {self.workers} workers in {time.time() - start_at:.3f} seconds, '
+                        f'model: {model_file}')
+
+    @property
+    def batches(self):
+        return sum(self._batches)
+
+    @property
+    def requests(self):
+        return sum(self._requests)
+
+    def submit(self, X, proba=True):
+        """
+        :return: a Future of the predictions of `X`.
+        """
+        request = _Request(X, proba)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, X, proba=True):
+        return self.submit(X, proba).result()
+
+    def _take_batch(self, carry):
+        first = carry if carry is not None else self._queue.get()
+        if first is None:
+            return None, None
+
+        batch = [first]
+        rows = len(first.X)
+        deadline = time.time() + self.batch_wait
+        while rows < self.max_batch_rows:
+            try:
+                timeout = deadline - time.time()
+                r = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get(False)
+            except queue.Empty:
+                break
+            if r is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            if r.proba != first.proba:
+                return batch, r  # starts the next batch
+            batch.append(r)
+            rows += len(r.X)
+        return batch, None
+
+    def _feed(self, i):
+        carry = None
+        while True:
+            batch, carry = self._take_batch(carry)
+            if batch is None:
+                break
+
+            if len(batch) > 1:
+                X = pd.concat([r.X for r in batch], axis=0, ignore_index=True)
+            else:
+                X = batch[0].X
+            self._requests[i] += len(batch)
+            ok, result = self._predict(i, batch, X)
+            if ok:
+                offsets = np.cumsum([len(r.X) for r in batch])[:-1]
+                for r, part in zip(batch, np.split(result, offsets)):
+                    r.future.set_result(part)
+            elif len(batch) > 1 and not any(r.future.done() for r in batch):
+                # one request may fail (or change) the concatenated batch, predict each of them alone
+                logger.warning(f'predict of a batch of {len(batch)} requests failed, {result}, '
+                               f'retry them one by one.')
+                for r in batch:
+                    ok, result = self._predict(i, [r], r.X)
+                    if ok:
+                        r.future.set_result(result)
+                    elif not r.future.done():
+                        r.future.set_exception(RuntimeError(result))
+            else:
+                for r in batch:
+                    if not r.future.done():
+                        r.future.set_exception(RuntimeError(result))
+
+    def _predict(self, i, batch, X):
+        self._batches[i] += 1
+
+        worker = self._workers[i]
+        if worker is None:
+            worker = self._restart(i)
+            if worker is None:
+                return False, 'no worker available, failed to restart it'
+        try:
+            return worker.predict(X, batch[0].proba)
+        except (EOFError, OSError):
+            error = f'worker exited with code {worker.process.exitcode}'
+            logger.error(f'predict failed, {error}, restart it.')
+            # fail the requests before restarting, the restart may fail or take long
+            for r in batch:
+                r.future.set_exception(RuntimeError(error))
+            worker.stop()
+            self._workers[i] = None
+            self._restart(i)
+            return False, error
+
+    def _restart(self, i):
+        try:
+            self._workers[i] = _Worker(self._ctx, self.model_file)
+        except Exception as e:
+            logger.error(f'failed to restart worker, {e.__class__.__name__}: {e}')
+            self._workers[i] = None
+        return self._workers[i]
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        for w in self._workers:
+            if w is not None:
+                w.stop()
@@ -1,11 +1,28 @@
 #
+"""
+Predict a large csv file (plain or gzip) with a group of predict servers.
 
+The data file must start with a header line. It is split into chunks by byte offsets, a chunk ends at the first
+line end after `chunk_bytes` bytes (or has `chunk_line_limit` lines), and every chunk is read once and sent inline
+(with the header line) to a server, no chunk file is written. At most `max_in_flight` chunks are read ahead of the
+servers.
+
+Chunks are predicted with the `predict_batch` rpc, servers of versions without it are not supported.
+
+Results are kept as the servers return them, byte for byte: the csv text written by the predict command of a
+server, or the predictions formatted by pandas for a resident model. They are appended to `<result_file>.part` as
+soon as they are predicted, in any order, and copied to the result file in the order of the chunks at the end.
+
+Completed chunks, with the position of their results in the part file, are recorded in `<result_file>.progress`,
+a predict interrupted by a crash skips them when it runs again with the same arguments.
+"""
 import gzip
+import itertools
+import json
 import os
 import queue
-import time
-from os.path import exists
-from threading import Thread
+import warnings
+from threading import Thread, Lock
 
 from hypernets.dispatchers.predict.grpc.predict_client import PredictClient
 from hypernets.utils import logging
@@ -13,184 +30,277 @@ from hypernets.utils import logging
 logger = logging.get_logger(__name__)
 
 
-class ChunkFile(object):
-    def __init__(self, data_file, result_file):
-        super(ChunkFile, self).__init__()
+def _open(file_name, mode='rb'):
+    return gzip.open(file_name, mode) if file_name.endswith('.gz') else open(file_name, mode)
 
-        self.data_file = data_file
-        self.result_file = result_file
-        self.try_count = 0
 
-    @property
-    def data_ready_tag_file(self):
-        return f'{self.data_file}.done'
+class Chunk(object):
+    def __init__(self, index, start, end, row_offset, data):
+        super(Chunk, self).__init__()
+
+        self.index = index
+        self.start = start  # byte offsets in the (uncompressed) data, after the header
+        self.end = end
+        self.row_offset = row_offset
+        self.data = data
 
     @property
-    def result_ready_tag_file(self):
-        return f'{self.result_file}.done'
+    def rows(self):
+        return count_rows(self.data)
+
+
+def count_rows(data):
+    if len(data) == 0:
+        return 0
+    return data.count(b'\n') + (0 if data.endswith(b'\n') else 1)
+
+
+class _Progress(object):
+    """
+    The completed chunks of a predict, kept in a journal of json lines next to the result file.
+    """
+
+    def __init__(self, journal_file, meta):
+        super(_Progress, self).__init__()
+
+        self.journal_file = journal_file
+        self.meta = meta
+        self.chunks = {}  # start -> record of the completed chunk
+
+        if os.path.exists(journal_file):
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if len(lines) > 0 and lines[0] == meta:
+                for r in lines[1:]:
+                    self.chunks[r['start']] = r
+            else:
+                lines = []
+        else:
+            lines = []
+
+        self._file = open(journal_file, 'a' if len(lines) > 0 else 'w', encoding='utf-8')
+        if len(lines) == 0:
+            self._append(meta)
 
     @property
-    def data_ready(self):
-        return exists(self.data_file) and exists(self.data_ready_tag_file)
+    def resumed(self):
+        return len(self.chunks) > 0
+
+    def _append(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
 
     @property
-    def result_ready(self):
-        return exists(self.result_file) and exists(self.result_ready_tag_file)
+    def result_bytes(self):
+        """The size of the part file with the results of the completed chunks."""
+        return max([r['offset'] + r['nbytes'] for r in self.chunks.values()], default=0)
+
+    def done(self, chunk, rows, offset, nbytes):
+        record = dict(index=chunk.index, start=chunk.start, end=chunk.end, row_offset=chunk.row_offset,
+                      rows=rows, offset=offset, nbytes=nbytes)
+        self._append(record)
+        self.chunks[chunk.start] = record
+
+    def close(self, remove=False):
+        self._file.close()
+        if remove:
+            os.remove(self.journal_file)
+
+
+class _ResultWriter(object):
+    """
+    Append the results of the chunks to the part file as they come, and copy them to the result file in the order
+    of the chunks at the end.
+    """
+
+    def __init__(self, part_file, progress):
+        super(_ResultWriter, self).__init__()
+
+        self.part_file = part_file
+        self.progress = progress
+        self.lock = Lock()
+        self.size = progress.result_bytes if progress.resumed else 0
+        self.file = open(part_file, 'r+b' if progress.resumed and os.path.exists(part_file) else 'w+b')
+        self.file.truncate(self.size)  # drop the result of a chunk not recorded before a crash
+
+    def write(self, chunk, data):
+        rows = chunk.rows
+        if len(data) > 0 and not data.endswith(b'\n'):
+            data += b'\n'
+        if count_rows(data) != rows:
+            raise ValueError(f'chunk {chunk.index} has {rows} rows, but got {count_rows(data)} rows of result.')
+
+        with self.lock:
+            offset = self.size
+            self.file.seek(offset)
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())  # the result must be on disk before the chunk is recorded as done
+            self.size += len(data)
+            self.progress.done(chunk, rows, offset, len(data))
+
+    def merge(self, result_file, buffer_size=1 << 20):
+        with _open(result_file, 'wb') as dst:
+            for r in sorted(self.progress.chunks.values(), key=lambda x: x['start']):
+                self.file.seek(r['offset'])
+                remaining = r['nbytes']
+                while remaining > 0:
+                    data = self.file.read(min(remaining, buffer_size))
+                    dst.write(data)
+                    remaining -= len(data)
+
+    def close(self, remove=False):
+        self.file.close()
+        if remove:
+            os.remove(self.part_file)
 
 
 class PredictHelper(object):
-    def __init__(self, servers):
+    """
+    :param servers: addresses of the predict servers.
+    :param max_in_flight: max number of chunks read but not predicted yet, twice the number of servers if None.
+    :param retry_limit: number of attempts to predict a chunk, the chunk fails after that.
+    """
+
+    def __init__(self, servers, max_in_flight=None, retry_limit=3):
         super(PredictHelper, self).__init__()
         assert isinstance(servers, (list, tuple)) and len(servers) > 0
 
         self.servers = [s for s in servers if len(s) > 0]
         assert len(self.servers) > 0
 
-    def predict(self, data_file, result_file, chunk_line_limit):
-        chunks = []
-        q = queue.Queue()
-        status = {'running': True}
-
-        pts = [Thread(target=self.do_predict, args=[s, q, status]) for s in self.servers]
+        self.max_in_flight = max_in_flight if max_in_flight else len(self.servers) * 2
+        self.retry_limit = retry_limit
+
+    def predict(self, data_file, result_file, chunk_line_limit=None, chunk_bytes=None):
+        """
+        Predict the probabilities of the rows in `data_file`, a csv file with header, and write them to
+        `result_file` as csv without header, as the servers return them.
+
+        :param chunk_line_limit: number of lines of a chunk, deprecated for `chunk_bytes`.
+        :param chunk_bytes: number of bytes of a chunk, 1 MiB if neither is given.
+        :return: 0 if all chunks are predicted, else 1 and the completed chunks are kept to resume.
+        """
+        if chunk_line_limit is not None:
+            assert chunk_bytes is None, 'only one of chunk_line_limit and chunk_bytes is allowed.'
+            warnings.warn('chunk_line_limit is deprecated, use chunk_bytes instead.', DeprecationWarning)
+        elif chunk_bytes is None:
+            chunk_bytes = 1 << 20
+
+        stat = os.stat(data_file)
+        meta = dict(data_file=os.path.abspath(data_file), size=stat.st_size, mtime=stat.st_mtime,
+                    chunk_bytes=chunk_bytes, chunk_line_limit=chunk_line_limit)
+        progress = _Progress(f'{result_file}.progress', meta)
+        if progress.resumed and logger.is_info_enabled():
+            logger.info(f'[Predict] resume with {len(progress.chunks)} chunks done.')
+        writer = _ResultWriter(f'{result_file}.part', progress)
+
+        q = queue.Queue(maxsize=self.max_in_flight)  # bounded, reading blocks when servers are busy
+        failed = []
+        header, total_rows = None, 0
+        pts = [Thread(target=self.do_predict, args=[s, q, writer, failed, self.retry_limit]) for s in self.servers]
         for p in pts:
             p.start()
 
-        mt = Thread(target=self.merge, args=[chunks, result_file], name='MergeThread')
-        mt.start()
-
-        for chunk_file_name in self.split(data_file, chunk_line_limit):
-            chunk = ChunkFile(chunk_file_name, f'{chunk_file_name}.result')
-            self.touch(chunk.data_ready_tag_file)
-            if exists(chunk.result_ready_tag_file):
-                os.remove(chunk.result_ready_tag_file)
-            chunks.append(chunk)
-            q.put(chunk)
-            while q.qsize() >= len(self.servers):
-                time.sleep(1)
-
-        # mark for last chunk
-        chunks.append(ChunkFile('', ''))
-
-        # wait merge
-        while mt.is_alive():
-            time.sleep(1)
-
-        status['running'] = False
-        time.sleep(0.1)
+        try:
+            for header, chunk in self.split(data_file, chunk_bytes, progress.chunks, chunk_line_limit):
+                total_rows = chunk.row_offset + (chunk.rows if chunk.data is not None
+                                                 else progress.chunks[chunk.start]['rows'])
+                if chunk.data is not None:
+                    q.put((header, chunk))
+        finally:
+            for _ in pts:
+                q.put(None)
+            for p in pts:
+                p.join()
+
+        if len(failed) > 0:
+            writer.close()
+            progress.close()
+            logger.error(f'[Predict] {len(failed)} chunks failed, run it again to resume.')
+            return 1
+
+        writer.merge(result_file)
+        writer.close(remove=True)
+        progress.close(remove=True)
 
         if logger.is_info_enabled():
-            logger.info('-' * 20, 'predict done.')
+            logger.info('-' * 20 + f' predict done, {total_rows} rows.')
 
         return 0
 
     @staticmethod
-    def do_predict(server, chunk_queue, status):
+    def do_predict(server, chunk_queue, writer, failed, retry_limit=3):
         client = PredictClient(server)
         count = 0
 
-        while status['running']:
-            try:
-                chunk = chunk_queue.get(block=False)
-                if logger.is_info_enabled():
-                    logger.info(f'[Predict] predict {chunk.data_file} started')
-                count += 1
-                code = client.predict(chunk.data_file, chunk.result_file)
-                if code == 0:
-                    PredictHelper.touch(chunk.result_ready_tag_file)
-                    if logger.is_info_enabled():
-                        logger.info(f'[Predict] predict {chunk.data_file} success')
-                else:
-                    if logger.is_info_enabled():
-                        logger.info(f'[Predict] predict {chunk.data_file} failed, code={code}, try={chunk.try_count}')
-                    chunk.try_count += 1
-                    chunk_queue.put(chunk)
-            except queue.Empty:
-                time.sleep(0.1)
-            except KeyboardInterrupt:
+        while True:
+            task = chunk_queue.get()
+            if task is None:
                 break
+            header, chunk = task
+            for try_count in range(retry_limit):
+                try:
+                    result = client.predict_batch(csv=header + chunk.data, proba=True, csv_result=True)
+                    writer.write(chunk, result)
+                    count += 1
+                    if logger.is_info_enabled():
+                        logger.info(f'[Predict] chunk {chunk.index} success, rows = {chunk.rows}')
+                    break
+                except Exception as e:
+                    logger.error(f'[Predict] chunk {chunk.index} failed on {server}, try={try_count}, '
+                                 f'{e.__class__.__name__}: {e}')
+            else:
+                failed.append(chunk)
+            chunk.data = None  # release the memory of the chunk
+
         client.close()
         if logger.is_info_enabled():
             logger.info(f'[Predict] do_predict done, {count} chunks predicted.')
 
     @staticmethod
-    def touch(file_name):
-        with open(file_name, 'w'):
-            pass
-
-    @staticmethod
-    def split(data_file, chunk_line_limit):
-        total_line_number = 0
-        chunk_index = 0
-
-        if data_file.endswith('.gz'):
-            op = gzip.open
-        else:
-            op = open
-
-        with op(data_file, 'rt', encoding='utf-8') as   df:
-            line = df.readline()
-            while line and len(line) > 0:
-                chunk_index += 1
-                chunk_file_name = '%s.%04d' % (data_file, chunk_index)
-                chunk_line_number = 0
-                with op(chunk_file_name, 'wt', encoding='utf-8') as cf:
-                    while line and len(line) > 0 and chunk_line_number < chunk_line_limit:
-                        #         if logger.is_info_enabled():
-                        #             logger.info(line,end='')
-                        cf.write(line)
-                        chunk_line_number += 1
-                        line = df.readline()
-                    cf.flush()
-
-                total_line_number += chunk_line_number
-                if logger.is_info_enabled():
-                    logger.info(f'[Split] {chunk_file_name} is ready, lines = {chunk_line_number}.')
-                yield chunk_file_name
-
-        if logger.is_info_enabled():
-            msg = f'[Split] >>> split {data_file} into {chunk_index} files, total line number is {total_line_number}.'
-            logger.info(msg)
-        return chunk_index
-
-    @staticmethod
-    def merge(chunks, result_file):
-        total_line_number = 0
-        chunk_index = 0
-
-        def wait_chunk():
-            while len(chunks) <= chunk_index:
-                time.sleep(1)
-            c = chunks[chunk_index]
-
-            return len(c.result_file) > 0
+    def split(data_file, chunk_bytes, done=None, chunk_line_limit=None):
+        """
+        Read `data_file` chunk by chunk, a chunk has about `chunk_bytes` bytes and ends with a whole line, or has
+        `chunk_line_limit` lines if given.
+
+        :param done: dict of completed chunks, start offset -> record with `end` and `rows`. They are seeked over
+            rather than read (a gzip file is still decompressed), and yielded with `data` None.
+        :return: generator of (header line, Chunk).
+        """
+        done = done if done is not None else {}
+        index, row_offset = 0, 0
+
+        with _open(data_file, 'rb') as f:
+            header = f.readline()
+            if len(header) > 0 and not header.endswith(b'\n'):
+                header += b'\n'
+            start = f.tell()
+            while True:
+                if start in done:
+                    r = done[start]
+                    chunk = Chunk(index, start, r['end'], row_offset, None)
+                    f.seek(r['end'])
+                    rows = r['rows']
+                else:
+                    if chunk_line_limit is not None:
+                        data = b''.join(itertools.islice(f, chunk_line_limit))
+                    else:
+                        data = f.read(chunk_bytes)
+                    if len(data) == 0:
+                        break
+                    if not data.endswith(b'\n'):
+                        data += f.readline()
+                    chunk = Chunk(index, start, start + len(data), row_offset, data)
+                    rows = chunk.rows
+                    if logger.is_info_enabled():
+                        logger.info(f'[Split] chunk {index} is ready, bytes = {start}-{chunk.end}, rows = {rows}.')
+                yield header, chunk
 
-        if result_file.endswith('.gz'):
-            op = gzip.open
-        else:
-            op = open
-        with op(result_file, 'wt', encoding='utf-8') as rf:
-            while wait_chunk():
-                chunk = chunks[chunk_index]
-                while not chunk.result_ready:  # wait ready
-                    time.sleep(1)
-                #         if logger.is_info_enabled():
-                #             logger.info(f'{chunk.result_file} is ready')
-
-                chunk_line_number = 0
-                with op(chunk.result_file, 'rt', encoding='utf-8') as cf:
-                    line = cf.readline()
-                    while line and len(line) > 0:
-                        rf.write(line)
-                        line = cf.readline()
-                        chunk_line_number += 1
-                if logger.is_info_enabled():
-                    msg = f'[Merge] merge {chunk.result_file} into {result_file}, line number is {chunk_line_number}'
-                    logger.info(msg)
-                total_line_number += chunk_line_number
-
-                chunk_index += 1
-            rf.flush()
+                index += 1
+                row_offset += rows
+                start = chunk.end
 
         if logger.is_info_enabled():
-            msg = '[Merge] >>> all chunk is merged into  {result_file}, total line number is {total_line_number}'
-            logger.info(msg)
+            logger.info(f'[Split] >>> split {data_file} into {index} chunks, total row number is {row_offset}.')
@@ -11,6 +11,9 @@ from hypernets.utils import logging
 
 logger = logging.get_logger(__name__)
 
+_EOF = object()  # put by a reader when its stream is closed
+_CANCELLED = object()  # put when the peer is gone
+
 
 class ProcessBrokerService(proc_pb2_grpc.ProcessBrokerServicer):
     def __init__(self):
@@ -30,6 +33,8 @@ class ProcessBrokerService(proc_pb2_grpc.ProcessBrokerServicer):
                 data = f.read(buffer_size)
         except ValueError as e:
             logger.error(e)
+        finally:
+            q.put(_EOF)
 
     def run(self, request_iterator, context):
         it = iter(request_iterator)
@@ -64,6 +69,8 @@ class ProcessBrokerService(proc_pb2_grpc.ProcessBrokerServicer):
                            args=(p.stderr, data_queue, buffer_size, encoding, DataChunk.ERR))
             t_out.start()
             t_err.start()
+            readers = 2
+            context.add_callback(lambda: data_queue.put(_CANCELLED))
 
             # report pid to client
             yield DataChunk(kind=DataChunk.ERR, data=f'pid: {pid}\n'.encode())
@@ -71,14 +78,14 @@ class ProcessBrokerService(proc_pb2_grpc.ProcessBrokerServicer):
             try:
                 while next(it):
                     chunk = None
-                    while context.is_active() and \
-                            (t_out.is_alive() or t_err.is_alive() or not data_queue.empty()):
-                        try:
-                            chunk = data_queue.get(False)
+                    while context.is_active() and (readers > 0 or not data_queue.empty()):
+                        x = data_queue.get()
+                        if x is _EOF:
+                            readers -= 1
+                        elif x is not _CANCELLED:
+                            chunk = x
                             yield chunk
                             break
-                        except queue.Empty:
-                            time.sleep(0.1)
                     if not context.is_active():
                         p.kill()
                         code = 'killed (peer shutdown)'
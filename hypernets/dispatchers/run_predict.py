@@ -10,8 +10,14 @@ def main():
                         default='127.0.0.1:8030',
                         help='predict server address, separated by comma')
     parser.add_argument('--chunk-size', '-chunk-size',
-                        type=int, default=1000,
-                        help='chunk line number')
+                        type=int, default=None,
+                        help='chunk line number, deprecated for --chunk-bytes')
+    parser.add_argument('--chunk-bytes', '-chunk-bytes',
+                        type=int, default=None,
+                        help='chunk size in bytes, a chunk ends with a whole line, 1 MiB by default')
+    parser.add_argument('--max-in-flight', '-max-in-flight',
+                        type=int, default=0,
+                        help='max number of chunks read ahead of the servers, twice the server number if 0')
     parser.add_argument('data_file',
                         help='data file path')
     parser.add_argument('result_file',
@@ -19,13 +25,16 @@ def main():
     args = parser.parse_args()
 
     servers = list(filter(lambda s: len(s) > 0, args.server.split(',')))
-    ph = PredictHelper(servers)
-    ph.predict(args.data_file, args.result_file, args.chunk_size)
+    ph = PredictHelper(servers, max_in_flight=args.max_in_flight)
+    if args.chunk_size is not None and args.chunk_bytes is not None:
+        parser.error('only one of --chunk-size and --chunk-bytes is allowed')
+    return ph.predict(args.data_file, args.result_file, chunk_line_limit=args.chunk_size,
+                      chunk_bytes=args.chunk_bytes)
 
 
 if __name__ == '__main__':
     try:
-        main()
-        print('done')
+        code = main()
+        print('done' if code == 0 else 'failed, run again to resume')
     except KeyboardInterrupt as e:
         print(e)
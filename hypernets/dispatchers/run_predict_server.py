@@ -9,9 +9,24 @@ def main():
     parser.add_argument('--port', '-port',
                         type=int, default=8030,
                         help='tcp port of the predict server')
+    parser.add_argument('--model', '-model',
+                        default=None,
+                        help='pickled model file to keep loaded in worker processes, '
+                             'the remaining arguments are the predict command if not set')
+    parser.add_argument('--workers', '-workers',
+                        type=int, default=0,
+                        help='number of worker processes of the model, the cpu count if 0')
+    parser.add_argument('--max-batch-rows', '-max-batch-rows',
+                        type=int, default=10000,
+                        help='maximum number of rows to predict at once')
+    parser.add_argument('--batch-wait-ms', '-batch-wait-ms',
+                        type=float, default=0.0,
+                        help='milliseconds to wait for more requests to batch together')
     args, argv = parser.parse_known_args()
 
-    server, _ = serve(f'0.0.0.0:{args.port}', ' '.join(argv))
+    server, _ = serve(f'0.0.0.0:{args.port}', ' '.join(argv),
+                      model_file=args.model, workers=args.workers,
+                      max_batch_rows=args.max_batch_rows, batch_wait=args.batch_wait_ms / 1000)
     server.wait_for_termination()
 
 
@@ -0,0 +1,294 @@
+# -*- coding:utf-8 -*-
+"""
+Choose which sample runs next.
+
+`TrialScheduler` runs samples in the order the searcher proposes them. `CostAwareScheduler` learns the runtime,
+the peak RSS and the cpu cores of trials from the history (`Trial.elapsed` and the resources recorded by
+`HyperModel._fit_trial`), draws a few samples ahead, and starts the longest ones first so they don't form the tail
+of the search, as long as they fit the memory and cpu budgets left by the running trials. Samples predicted to use
+more memory than a trial can have are refused, they are fed back to the searcher as failed trials.
+
+The resources are measured for the whole process running a trial (see `ResourceMonitor`), so they are only valid
+if trials run alone in their processes, as with the "process" and "cluster" backends. Trials run by threads of one
+process, e.g. the threads of a dask worker, record the resources of each other.
+"""
+import math
+
+import numpy as np
+
+from hypernets.core.trial import Trial
+from hypernets.dispatchers.cfg import DispatchCfg as c
+from hypernets.utils import logging
+
+logger = logging.get_logger(__name__)
+
+_MB = 1024 * 1024
+
+
+def _sample_key(space_sample):
+    return space_sample.signature, tuple(space_sample.vectors)
+
+
+class TrialCostModel(object):
+    """
+    Ridge regressions of log(runtime), log(peak RSS) and the cpu cores of a trial, on the assigned params of the
+    sample (numbers as they are, other values one-hot encoded) and the data shape.
+
+    :param min_trials: number of observed trials needed to predict, nan is predicted before that.
+    :param alpha: l2 regularization strength.
+    """
+
+    def __init__(self, min_trials=5, alpha=1.0):
+        super(TrialCostModel, self).__init__()
+
+        self.min_trials = min_trials
+        self.alpha = alpha
+        self.data_shape = (0, 0)
+
+        self._rows = []  # feature dicts
+        self._targets = []  # (log elapsed, log peak rss, cores)
+        self._model = None
+
+    @property
+    def ready(self):
+        return len(self._rows) >= self.min_trials
+
+    def features(self, space_sample):
+        out = {'_log_rows': math.log1p(self.data_shape[0]), '_log_columns': math.log1p(self.data_shape[1])}
+        for p in space_sample.get_assigned_params():
+            v = p.value
+            if isinstance(v, (int, float, np.number)) and not isinstance(v, bool):
+                out[p.alias] = float(v)
+            else:
+                out[f'{p.alias}={v!r}'] = 1.0
+        return out
+
+    def observe(self, space_sample, elapsed, peak_rss=math.nan, cpu_seconds=math.nan):
+        if elapsed is None or not math.isfinite(elapsed) or elapsed <= 0:
+            return
+        cores = cpu_seconds / elapsed if cpu_seconds is not None and math.isfinite(cpu_seconds) else math.nan
+        rss = math.log(peak_rss) if peak_rss is not None and math.isfinite(peak_rss) and peak_rss > 0 else math.nan
+        self._rows.append(self.features(space_sample))
+        self._targets.append((math.log(elapsed), rss, cores))
+        self._model = None
+
+    def _fit(self):
+        columns = sorted({k for row in self._rows for k in row.keys()})
+        index = {k: i for i, k in enumerate(columns)}
+        A = np.zeros((len(self._rows), len(columns)))
+        for i, row in enumerate(self._rows):
+            for k, v in row.items():
+                A[i, index[k]] = v
+        mean, std = A.mean(axis=0), A.std(axis=0)
+        std[std == 0] = 1.0
+        A = (A - mean) / std
+
+        targets = np.array(self._targets, dtype='float64')
+        weights = []
+        for j in range(targets.shape[1]):
+            known = np.isfinite(targets[:, j])
+            if known.sum() == 0:
+                weights.append(None)
+                continue
+            a, t = A[known], targets[known, j]
+            w = np.linalg.solve(a.T @ a + self.alpha * np.eye(a.shape[1]), a.T @ (t - t.mean()))
+            weights.append((w, t.mean()))
+        self._model = (index, mean, std, weights)
+
+    def predict(self, space_sample):
+        """
+        :return: predicted (runtime seconds, peak RSS bytes, cpu cores) of the sample, nan if unknown.
+        """
+        if not self.ready:
+            return math.nan, math.nan, math.nan
+        if self._model is None:
+            self._fit()
+
+        index, mean, std, weights = self._model
+        x = np.zeros(len(index))
+        for k, v in self.features(space_sample).items():
+            if k in index:
+                x[index[k]] = v
+        x = (x - mean) / std
+
+        out = []
+        for w in weights:
+            out.append(float(x @ w[0] + w[1]) if w is not None else math.nan)
+        elapsed, log_rss, cores = out
+        return math.exp(elapsed), math.exp(log_rss) if math.isfinite(log_rss) else math.nan, max(cores, 0.0)
+
+
+class TrialScheduler(object):
+    """
+    Run samples in the order the searcher proposes them.
+    """
+    uses_resources = False  # whether the resources used by trials are read, else they are not measured
+
+    def __init__(self):
+        super(TrialScheduler, self).__init__()
+        self.hyper_model = None
+
+    def bind(self, hyper_model, X=None):
+        """
+        Start to schedule the trials of `hyper_model` on data `X`, called by dispatchers before the search and
+        before the hyper model is sent to the workers.
+        """
+        self.hyper_model = hyper_model
+        hyper_model.monitor_resources = self.uses_resources
+
+    def sample(self):
+        """
+        :return: the sample to run next, or None to wait for running trials (only if some are pending in the
+            searcher).
+        """
+        return self.hyper_model.searcher.sample()
+
+    def observe(self, trial):
+        """
+        Learn from a finished trial.
+        """
+        pass
+
+    def release(self):
+        """
+        Drop the samples drawn but not run, called by dispatchers after the search.
+        """
+        pass
+
+
+class CostAwareScheduler(TrialScheduler):
+    """
+    :param memory_limit: bytes of memory a trial can use, samples predicted to use more are refused. 0 for no limit.
+    :param memory_budget: bytes of memory of all running trials (the samples pending in the searcher). 0 for no
+        limit.
+    :param cpu_budget: cpu cores of all running trials, 0 for no limit.
+    :param lookahead: number of samples drawn from the searcher to choose from.
+    :param cost_model: a TrialCostModel, until it's ready samples run in the order they are proposed.
+    """
+    uses_resources = True
+
+    def __init__(self, memory_limit=0, memory_budget=0, cpu_budget=0, lookahead=4, cost_model=None):
+        super(CostAwareScheduler, self).__init__()
+
+        self.memory_limit = memory_limit
+        self.memory_budget = memory_budget
+        self.cpu_budget = cpu_budget
+        self.lookahead = lookahead
+        self.cost_model = cost_model if cost_model is not None else TrialCostModel()
+
+        self.refused = []
+        self._refused_keys = set()
+        self._buffer = []  # [space_sample, (elapsed, peak_rss, cores)]
+        self._costs = {}  # key -> predicted cost of samples returned by `sample`
+
+    def bind(self, hyper_model, X=None):
+        super(CostAwareScheduler, self).bind(hyper_model, X)
+
+        if X is not None and hasattr(X, 'shape'):
+            shape = X.shape
+            rows = shape[0] if isinstance(shape[0], int) else 0  # unknown for dask collections
+            self.cost_model.data_shape = (rows, shape[1] if len(shape) > 1 else 1)
+        for trial in hyper_model.history.trials:
+            self.observe(trial)
+
+    def observe(self, trial):
+        self._costs.pop(_sample_key(trial.space_sample), None)
+        if not trial.succeeded:
+            return  # failed trials stop early, their cost says little
+        self.cost_model.observe(trial.space_sample, trial.elapsed,
+                                trial.memo.get('peak_rss', math.nan), trial.memo.get('cpu_seconds', math.nan))
+
+    def _refuse(self, space_sample, cost):
+        if logger.is_info_enabled():
+            logger.info(f'Refuse sample {space_sample.vectors}, predicted peak RSS {cost[1] / _MB:.1f}MB exceeds '
+                        f'the limit {self.memory_limit / _MB:.1f}MB.')
+        self.refused.append(space_sample)
+        self._refused_keys.add(_sample_key(space_sample))
+        trial = Trial(space_sample, 0, 0, 0, succeeded=False)
+        trial.memo['refused'] = cost
+        self.hyper_model._update_searcher(space_sample, trial)
+
+    def _fill(self):
+        searcher = self.hyper_model.searcher
+        keys = {_sample_key(s) for s, _ in self._buffer}
+        attempts = 0
+        while len(self._buffer) < self.lookahead and attempts < self.lookahead * 10:
+            attempts += 1
+            try:
+                space_sample = searcher.sample()
+            except Exception:
+                if len(self._buffer) > 0:
+                    break
+                raise
+            key = _sample_key(space_sample)
+            if key in keys or key in self._refused_keys:
+                continue
+            cost = self.cost_model.predict(space_sample)
+            if self.memory_limit > 0 and cost[1] > self.memory_limit:
+                self._refuse(space_sample, cost)
+                continue
+            keys.add(key)
+            searcher.add_pending(space_sample)  # proposed samples are not proposed again
+            self._buffer.append([space_sample, cost])
+
+    def _running_cost(self):
+        buffered = {_sample_key(s) for s, _ in self._buffer}
+        memory, cores, running = 0.0, 0.0, 0
+        for s in self.hyper_model.searcher.pending_samples:
+            key = _sample_key(s)
+            if key in buffered or key not in self._costs:
+                continue
+            _, rss, n = self._costs[key]
+            running += 1
+            memory += rss if math.isfinite(rss) else 0.0
+            cores += n if math.isfinite(n) else 0.0
+        return memory, cores, running
+
+    def sample(self):
+        if not self.cost_model.ready and len(self._buffer) == 0:
+            return super(CostAwareScheduler, self).sample()
+
+        self._fill()
+        if len(self._buffer) == 0:
+            return super(CostAwareScheduler, self).sample()
+
+        memory, cores, running = self._running_cost()
+
+        def fits(cost):
+            _, rss, n = cost
+            if self.memory_budget > 0 and math.isfinite(rss) and memory + rss > self.memory_budget:
+                return False
+            if self.cpu_budget > 0 and math.isfinite(n) and cores + n > self.cpu_budget:
+                return False
+            return True
+
+        candidates = [i for i, (_, cost) in enumerate(self._buffer) if fits(cost)]
+        if len(candidates) == 0:
+            if running > 0:
+                return None  # wait for running trials to release their resources
+            candidates = list(range(len(self._buffer)))
+
+        # the longest first, unknown runtime ranks last
+        i = max(candidates, key=lambda i: self._buffer[i][1][0] if math.isfinite(self._buffer[i][1][0]) else -1.0)
+        space_sample, cost = self._buffer.pop(i)
+        self.hyper_model.searcher.remove_pending(space_sample)  # pending again once dispatched
+        self._costs[_sample_key(space_sample)] = cost
+        return space_sample
+
+    def release(self):
+        for space_sample, _ in self._buffer:
+            self.hyper_model.searcher.remove_pending(space_sample)
+        self._buffer = []
+        self._costs = {}
+
+
+def get_scheduler():
+    """
+    Create the scheduler configured in `DispatchCfg`.
+    """
+    if c.scheduler == 'cost':
+        return CostAwareScheduler(memory_limit=c.scheduler_memory_limit * _MB,
+                                  memory_budget=c.scheduler_memory_budget * _MB,
+                                  cpu_budget=c.scheduler_cpu_budget,
+                                  lookahead=c.scheduler_lookahead)
+    return TrialScheduler()
@@ -13,6 +13,7 @@ from hypernets.core import set_random_state, randint
 from hypernets.core.ops import ModuleChoice, HyperInput, ModuleSpace
 from hypernets.core.search_space import HyperSpace, Choice, Int, Real, Cascade, Constant, HyperNode
 from hypernets.model import Estimator, HyperModel
+from hypernets.model.fold_executor import get_fold_executor
 from hypernets.tabular import get_tool_box
 from hypernets.utils import fs, logging, const
 
@@ -126,6 +127,20 @@ class PlainSearchSpace(object):
         return space
 
 
+def _fit_fold(X, y, train_idx, valid_idx, model, task, kwargs):
+    x_train_fold, y_train_fold = X.iloc[train_idx], y[train_idx]
+    x_val_fold = X.iloc[valid_idx]
+
+    logger.info(f'fit fold with {len(train_idx)} rows')
+    fold_model = copy.deepcopy(model)
+    fold_model.fit(x_train_fold, y_train_fold, **kwargs)
+    if task == const.TASK_REGRESSION:
+        proba = fold_model.predict(x_val_fold)
+    else:
+        proba = fold_model.predict_proba(x_val_fold)
+    return fold_model, proba
+
+
 class PlainEstimator(Estimator):
     def __init__(self, space_sample, task=const.TASK_BINARY, transformer=None):
         assert task in {const.TASK_BINARY, const.TASK_MULTICLASS, const.TASK_REGRESSION}
@@ -151,6 +166,29 @@ class PlainEstimator(Estimator):
     def summary(self):
         pass
 
+    def set_budget(self, budget, checkpoint=None):
+        """
+        Scale `max_iter` of the model by the budget. If the model supports warm start, continue to train the model of
+        the checkpoint for the iterations of the extra budget.
+        """
+        max_iter = self.model_args.get('max_iter')
+        if max_iter is None:
+            return False  # e.g. DecisionTreeClassifier
+
+        start = 0.0
+        if checkpoint is not None and 'warm_start' in self.model.get_params():
+            previous = PlainEstimator.load(checkpoint)
+            previous_budget = getattr(previous, 'budget', None)
+            if previous.cls is self.cls and previous_budget is not None and previous_budget < budget \
+                    and hasattr(previous.model, 'classes_'):
+                logger.info(f'warm start from {checkpoint} at budget {previous_budget}')
+                self.model = previous.model
+                self.model.set_params(warm_start=True)
+                start = previous_budget
+        self.model.set_params(max_iter=max(int(round(max_iter * (budget - start))), 1))
+        self.budget = budget
+        return True
+
     def fit(self, X, y, **kwargs):
         eval_set = kwargs.pop('eval_set', None)  # ignore
 
@@ -192,25 +230,21 @@ class PlainEstimator(Estimator):
         if isinstance(y, (pd.Series, pd.DataFrame)):
             y = y.values
 
+        folds = list(iterators.split(X, y))
         oof_ = None
-        oof_scores = []
-        cv_models = []
-        logger.info('start training')
-        for n_fold, (train_idx, valid_idx) in enumerate(iterators.split(X, y)):
-            x_train_fold, y_train_fold = X.iloc[train_idx], y[train_idx]
-            x_val_fold, y_val_fold = X.iloc[valid_idx], y[valid_idx]
-
-            logger.info(f'fit fold {n_fold}')
-            fold_model = copy.deepcopy(self.model)
-            fold_model.fit(x_train_fold, y_train_fold, **kwargs)
+        oof_scores = [None] * len(folds)
+        cv_models = [None] * len(folds)
+        executor = get_fold_executor(num_folds)
+        logger.info(f'start training with {executor}')
+        for n_fold, (fold_model, proba) in executor.map(_fit_fold, X, y, folds, self.model, self.task, kwargs):
+            valid_idx = folds[n_fold][1]
+            y_val_fold = y[valid_idx]
 
             # calc fold oof and score
             logger.info(f'calc fold {n_fold} score')
             if self.task == const.TASK_REGRESSION:
-                proba = fold_model.predict(x_val_fold)
                 preds = proba
             else:
-                proba = fold_model.predict_proba(x_val_fold)
                 if self.task == const.TASK_BINARY:
                     proba = tb.fix_binary_predict_proba_result(proba)
 
@@ -230,8 +264,8 @@ class PlainEstimator(Estimator):
 
             # save fold result
             oof_[valid_idx] = proba
-            oof_scores.append(fold_scores)
-            cv_models.append(fold_model)
+            oof_scores[n_fold] = fold_scores
+            cv_models[n_fold] = fold_model
 
         self.classes_ = getattr(cv_models[0], 'classes_', None)
         self.cv_models_ = cv_models
@@ -362,7 +396,7 @@ class PlainModel(HyperModel):
     def __init__(self, searcher, dispatcher=None, callbacks=None, reward_metric=None, task=None,
                  discriminator=None, transformer=None):
         super(PlainModel, self).__init__(searcher, dispatcher=dispatcher, callbacks=callbacks,
-                                         reward_metric=reward_metric, task=task)
+                                         reward_metric=reward_metric, task=task, discriminator=discriminator)
         self.transformer = transformer
 
     def _get_estimator(self, space_sample):
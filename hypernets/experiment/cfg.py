@@ -42,7 +42,7 @@ class ExperimentCfg(Configurable):
     experiment_discriminator = \
         String('once_percentile',
                allow_none=True, config=True,
-               help='discriminator identity, "percentile" or "progressive"',
+               help='discriminator identity, "percentile", "progressive" or "learning_curve"',
                )
     experiment_discriminator_options = \
         Dict(default_value={'percentile': 50, 'min_trials': 5, 'min_steps': 5, 'stride': 1},
@@ -0,0 +1,14 @@
+from hypernets.conf import configure, Configurable, Int, Enum
+
+
+@configure()
+class ModelCfg(Configurable):
+    fold_backend = Enum(['serial', 'thread', 'process'],
+                        default_value='serial',
+                        help='how the folds of a cross validation are fitted, one by one, or in a pool of threads '
+                             'or processes, see `FoldExecutor`'
+                        ).tag(config=True)
+    fold_cores = Int(0, min=0,
+                     help='cpu cores of a trial to fit folds in parallel, 0 for the cpu count divided by the number '
+                          'of trials running at the same time in this machine'
+                     ).tag(config=True)
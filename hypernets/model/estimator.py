@@ -7,6 +7,8 @@ import copy
 import numpy as np
 from sklearn.model_selection import KFold, StratifiedKFold
 
+from .fold_executor import get_fold_executor
+
 
 class Estimator():
     def __init__(self, space_sample, task='binary', discriminator=None):
@@ -20,6 +22,15 @@ class Estimator():
     def summary(self):
         raise NotImplementedError
 
+    def set_budget(self, budget, checkpoint=None):
+        """
+        Train with a fraction `budget` of the full fidelity, e.g. of the boosting rounds or epochs, continuing from
+        the estimator saved in `checkpoint` (trained with a lower budget) if it's given and warm start is supported.
+
+        :return: True if the budget is applied, else the HyperModel trains on the fraction `budget` of the rows.
+        """
+        return False
+
     def fit(self, X, y, **kwargs):
         raise NotImplementedError
 
@@ -58,14 +69,35 @@ class Estimator():
         return []
 
 
+def _fit_cv_fold(X, y, train_idx, valid_idx, base_estimator, task, sample_weight, kwargs):
+    x_train_fold, y_train_fold = X.iloc[train_idx], y[train_idx]
+    x_val_fold, y_val_fold = X.iloc[valid_idx], y[valid_idx]
+
+    kwargs = dict(kwargs, eval_set=[(x_val_fold, y_val_fold)])
+    if sample_weight is not None:
+        kwargs['sample_weight'] = sample_weight[train_idx]
+    fold_est = copy.deepcopy(base_estimator)
+    fold_est.fit(x_train_fold, y_train_fold, **kwargs)
+    if task == 'regression':
+        proba = fold_est.predict(x_val_fold)
+    else:
+        proba = fold_est.predict_proba(x_val_fold)
+    return fold_est, proba
+
+
 class CrossValidationEstimator():
-    def __init__(self, base_estimator, task, num_folds=3, stratified=False, shuffle=False, random_state=None):
+    def __init__(self, base_estimator, task, num_folds=3, stratified=False, shuffle=False, random_state=None,
+                 fold_executor=None):
+        """
+        :param fold_executor: a `FoldExecutor` to fit the folds, the one configured in `ModelCfg` if None.
+        """
         self.base_estimator = base_estimator
         self.num_folds = num_folds
         self.stratified = stratified
         self.shuffle = shuffle
         self.random_state = random_state
         self.task = task
+        self.fold_executor = fold_executor
         self.oof_ = None
         self.classes_ = None
         self.estimators_ = []
@@ -79,32 +111,25 @@ class CrossValidationEstimator():
             iterators = KFold(n_splits=self.num_folds, shuffle=self.shuffle, random_state=self.random_state)
 
         y = np.array(y)
-        sample_weight = kwargs.get('sample_weight')
-
-        for n_fold, (train_idx, valid_idx) in enumerate(iterators.split(X, y)):
-            x_train_fold, y_train_fold = X.iloc[train_idx], y[train_idx]
-            x_val_fold, y_val_fold = X.iloc[valid_idx], y[valid_idx]
-
-            kwargs['eval_set'] = [(x_val_fold, y_val_fold)]
-            if sample_weight is not None:
-                sw_fold = sample_weight[train_idx]
-                kwargs['sample_weight'] = sw_fold
-            fold_est = copy.deepcopy(self.base_estimator)
-            fold_est.fit(x_train_fold, y_train_fold, **kwargs)
-            if self.classes_ is None:
-                self.classes_ = fold_est.classes_
-            if self.task == 'regression':
-                proba = fold_est.predict(x_val_fold)
-            else:
-                proba = fold_est.predict_proba(x_val_fold)
-
+        sample_weight = kwargs.pop('sample_weight', None)
+        kwargs.pop('eval_set', None)
+        executor = self.fold_executor if self.fold_executor is not None else get_fold_executor(self.num_folds)
+
+        folds = list(iterators.split(X, y))
+        estimators = [None] * len(folds)
+        for n_fold, (fold_est, proba) in executor.map(_fit_cv_fold, X, y, folds, self.base_estimator, self.task,
+                                                      sample_weight, kwargs):
             if self.oof_ is None:
                 if len(proba.shape) == 1:
                     self.oof_ = np.zeros(y.shape, proba.dtype)
                 else:
                     self.oof_ = np.zeros((y.shape[0], proba.shape[-1]), proba.dtype)
-            self.oof_[valid_idx] = proba
-            self.estimators_.append(fold_est)
+            self.oof_[folds[n_fold][1]] = proba
+            estimators[n_fold] = fold_est
+
+        self.estimators_ = estimators
+        if self.classes_ is None:
+            self.classes_ = getattr(estimators[0], 'classes_', None)
 
         return self
 
@@ -0,0 +1,131 @@
+# -*- coding:utf-8 -*-
+"""
+Fit the folds of a cross validation in parallel.
+
+A fold is fitted by a module-level function `fn(X, y, train_idx, valid_idx, *args)`. Threads share the training
+data as it is. Processes attach to one copy of it in shared memory (see `SharedData`), placed once for all the
+folds, so a fold only receives its indices; before python 3.8 the data is pickled to each fold instead. Results
+are yielded as soon as the folds are done, callers assemble the out-of-fold predictions in place with the indices.
+
+The folds of a trial use at most `ModelCfg.fold_cores` cores. By default the cpu count is divided by the number of
+trials running at the same time, which dispatchers running trials in parallel declare with
+`set_concurrent_trials`, so both levels of parallelism don't oversubscribe the machine.
+"""
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from hypernets.utils import logging
+from .cfg import ModelCfg as c
+
+logger = logging.get_logger(__name__)
+
+_concurrent_trials = 1
+
+_fold_data = None  # (X, y), attached in a process of the pool
+_fold_shm = None
+
+
+def set_concurrent_trials(n):
+    """
+    Declare the number of trials running at the same time in this machine.
+    """
+    global _concurrent_trials
+    _concurrent_trials = max(int(n), 1)
+
+
+def get_fold_executor(num_folds):
+    """
+    Create the executor configured in `ModelCfg` for `num_folds` folds.
+    """
+    cores = c.fold_cores if c.fold_cores > 0 else max(os.cpu_count() // _concurrent_trials, 1)
+    n_jobs = min(cores, num_folds)
+    if c.fold_backend == 'serial' or n_jobs <= 1:
+        return FoldExecutor()
+    elif c.fold_backend == 'process' and not mp.current_process().daemon:
+        return ProcessFoldExecutor(n_jobs)
+    else:
+        # daemonic processes, e.g. the workers of MultiProcessDispatcher, can't have children
+        return ThreadFoldExecutor(n_jobs)
+
+
+class FoldExecutor(object):
+    """
+    Fit the folds one by one in this process.
+    """
+
+    def __init__(self, n_jobs=1):
+        super(FoldExecutor, self).__init__()
+        self.n_jobs = n_jobs
+
+    def map(self, fn, X, y, folds, *args):
+        """
+        :param folds: iterable of (train_idx, valid_idx).
+        :return: generator of (fold index, result of `fn`), in the order the folds are done.
+        """
+        for i, (train_idx, valid_idx) in enumerate(folds):
+            yield i, fn(X, y, train_idx, valid_idx, *args)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(n_jobs={self.n_jobs})'
+
+
+class ThreadFoldExecutor(FoldExecutor):
+    """
+    Fit the folds in a pool of threads, which share the data. Fits benefit if they release the GIL, as the numeric
+    libraries mostly do.
+    """
+
+    def map(self, fn, X, y, folds, *args):
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            futures = {executor.submit(fn, X, y, train_idx, valid_idx, *args): i
+                       for i, (train_idx, valid_idx) in enumerate(folds)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _attach(descriptor):
+    from hypernets.utils.shared_data import SharedData
+
+    global _fold_data, _fold_shm
+    _fold_data, _fold_shm = SharedData.attach(descriptor)
+
+
+def _run_fold(fn, train_idx, valid_idx, args):
+    X, y = _fold_data
+    return fn(X, y, train_idx, valid_idx, *args)
+
+
+class ProcessFoldExecutor(FoldExecutor):
+    """
+    Fit the folds in a pool of processes, which read the data from shared memory, or get a pickled copy of it
+    before python 3.8.
+    """
+
+    def map(self, fn, X, y, folds, *args):
+        if 'fork' in mp.get_all_start_methods():
+            ctx = mp.get_context('fork')
+        else:
+            ctx = mp.get_context()
+        pool_kwargs = dict(mp_context=ctx) if sys.version_info >= (3, 7) else {}
+
+        from hypernets.utils.shared_data import SharedData, shared_memory
+        if shared_memory is None:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, **pool_kwargs) as executor:
+                futures = {executor.submit(fn, X, y, train_idx, valid_idx, *args): i
+                           for i, (train_idx, valid_idx) in enumerate(folds)}
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            return
+
+        data = SharedData((X, y))
+        try:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_attach, initargs=(data.descriptor,),
+                                     **pool_kwargs) as executor:
+                futures = {executor.submit(_run_fold, fn, train_idx, valid_idx, args): i
+                           for i, (train_idx, valid_idx) in enumerate(folds)}
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+        finally:
+            data.close()
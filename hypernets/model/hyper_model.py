@@ -6,12 +6,16 @@ import time
 import traceback
 from collections import UserDict
 
+import numpy as np
+import pandas as pd
+
 from ..core.meta_learner import MetaLearner
 from ..core.trial import *
 from ..discriminators import UnPromisingTrial
 from ..dispatchers import get_dispatcher
 from ..tabular import get_tool_box
 from ..utils import logging, const, to_repr
+from ..utils.common import ResourceMonitor
 
 logger = logging.get_logger(__name__)
 
@@ -35,6 +39,8 @@ class HyperModel:
         self.discriminator = discriminator
         if self.discriminator:
             self.discriminator.bind_history(self.history)
+        # whether to record the resources used by trials, set by the scheduler of the dispatcher, see `_fit_trial`
+        self.monitor_resources = None
 
     def _get_estimator(self, space_sample):
         raise NotImplementedError
@@ -44,28 +50,45 @@ class HyperModel:
 
     def _run_trial(self, space_sample, trial_no, X, y, X_eval, y_eval, cv=False, num_folds=3, model_file=None,
                    **fit_kwargs):
+        trial = self._fit_trial(space_sample, trial_no, X, y, X_eval, y_eval, cv, num_folds, model_file,
+                                **fit_kwargs)
+        self._update_searcher(space_sample, trial)
+        return trial
 
+    def _fit_trial(self, space_sample, trial_no, X, y, X_eval, y_eval, cv=False, num_folds=3, model_file=None,
+                   **fit_kwargs):
+        """
+        Fit and evaluate the estimator of `space_sample`, without feeding the result back to the searcher.
+        """
         start_time = time.time()
         estimator = self._get_estimator(space_sample)
         if self.discriminator:
             estimator.set_discriminator(self.discriminator)
+        budget = self._get_budget(space_sample)
+        if budget is not None and not estimator.set_budget(*budget):
+            X, y = self._subsample(X, y, budget[0])
 
         for callback in self.callbacks:
             callback.on_build_estimator(self, space_sample, estimator, trial_no)
         succeeded = False
+        early_stopped = False
         scores = None
         oof = None
         oof_scores = None
+        monitor = ResourceMonitor(enabled=self._monitor_resources())
         try:
-            if cv:
-                scores, oof, oof_scores = estimator.fit_cross_validation(X, y, stratified=True, num_folds=num_folds,
-                                                                         shuffle=False, random_state=9527,
-                                                                         metrics=[self.reward_metric],
-                                                                         **fit_kwargs)
-            else:
-                estimator.fit(X, y, **fit_kwargs)
+            with monitor:
+                if cv:
+                    scores, oof, oof_scores = estimator.fit_cross_validation(X, y, stratified=True,
+                                                                             num_folds=num_folds,
+                                                                             shuffle=False, random_state=9527,
+                                                                             metrics=[self.reward_metric],
+                                                                             **fit_kwargs)
+                else:
+                    estimator.fit(X, y, **fit_kwargs)
             succeeded = True
         except UnPromisingTrial as e:
+            early_stopped = True
             logger.info(f'{e}')
         except Exception as e:
             logger.error(f'run_trail failed! trail_no={trial_no}')
@@ -91,19 +114,73 @@ class HyperModel:
                 trial.memo['oof_scores'] = oof_scores
 
             # improved = self.history.append(trial)
-
-            self.searcher.update_result(space_sample, reward)
         else:
             elapsed = time.time() - start_time
             trial = Trial(space_sample, trial_no, 0, elapsed, succeeded=succeeded)
 
-            if self.history is not None:
-                t = self.history.get_worst()
-                if t is not None:
-                    self.searcher.update_result(space_sample, t.reward)
-
+        if monitor.enabled:
+            # resources used by the fitting, to learn the cost of trials, see `CostAwareScheduler`
+            trial.memo['peak_rss'] = monitor.peak_rss
+            trial.memo['cpu_seconds'] = monitor.cpu_seconds
+        if budget is not None:
+            trial.memo['budget'] = budget[0]
+        if early_stopped:
+            trial.memo['early_stopped'] = True
         return trial
 
+    def _monitor_resources(self):
+        monitor_resources = getattr(self, 'monitor_resources', None)
+        if monitor_resources is not None:
+            return monitor_resources
+        # e.g. a cluster executor, the scheduler of the driver is configured alike
+        from ..dispatchers.cfg import DispatchCfg
+        return DispatchCfg.scheduler == 'cost'
+
+    def _get_budget(self, space_sample):
+        """
+        :return: (budget, checkpoint) of a sample proposed by a multi-fidelity searcher, e.g. `HyperbandSearcher`,
+            the checkpoint is the model file of the sample trained with the largest lower budget, or None. None if
+            the sample has no budget.
+        """
+        budget = getattr(space_sample, 'budget', None)
+        if budget is None:
+            return None
+        checkpoint = getattr(space_sample, 'checkpoint', None)
+        if checkpoint is None and self.history is not None:
+            trials = [t for t in self.history.get_budget_trials(space_sample)
+                      if t.succeeded and t.model_file and getattr(t.space_sample, 'budget', budget) < budget]
+            if len(trials) > 0:
+                checkpoint = max(trials, key=lambda t: t.space_sample.budget).model_file
+        return budget, checkpoint
+
+    @staticmethod
+    def _set_budget(space_sample, budget):
+        """
+        Restore the budget got by `_get_budget` on a sample rebuilt from its vectors, e.g. in a remote worker.
+        """
+        if budget is not None:
+            space_sample.budget, space_sample.checkpoint = budget
+        return space_sample
+
+    @staticmethod
+    def _subsample(X, y, budget, min_rows=100, random_state=9527):
+        # the fidelity of estimators which don't support budgets is the number of training rows
+        if budget >= 1.0 or not isinstance(X, pd.DataFrame):
+            return X, y
+        n = max(int(len(X) * budget), min(len(X), min_rows))
+        index = np.sort(np.random.RandomState(random_state).permutation(len(X))[:n])
+        X = X.iloc[index]
+        y = y.iloc[index] if hasattr(y, 'iloc') else np.asarray(y)[index]
+        return X, y
+
+    def _update_searcher(self, space_sample, trial):
+        if trial.succeeded:
+            self.searcher.update_result(space_sample, trial.reward)
+        elif self.history is not None:
+            t = self.history.get_worst()
+            if t is not None:
+                self.searcher.update_result(space_sample, t.reward)
+
     def _get_reward(self, value, key=None):
         def cast_float(value):
             try:
@@ -192,6 +269,8 @@ class HyperModel:
             trial_no = dispatcher.dispatch(self, X, y, X_eval, y_eval,
                                            cv, num_folds, max_trials, dataset_id, trial_store,
                                            **fit_kwargs)
+            if trial_store is not None:
+                trial_store.persist()
 
             for callback in self.callbacks:
                 callback.on_search_end(self)
@@ -9,6 +9,8 @@ from .mcts_searcher import MCTSSearcher
 from .random_searcher import RandomSearcher
 from .playback_searcher import PlaybackSearcher
 from .grid_searcher import GridSearcher
+from .hyperband_searcher import HyperbandSearcher
+from .tpe_searcher import TPESearcher
 from ..core.searcher import Searcher
 
 searcher_dict = {
@@ -26,7 +28,14 @@ searcher_dict = {
     'GridSearcher': GridSearcher,
     'playback': PlaybackSearcher,
     'PlaybackSearcher': PlaybackSearcher,
-    'Playback': PlaybackSearcher
+    'Playback': PlaybackSearcher,
+    'hyperband': HyperbandSearcher,
+    'Hyperband': HyperbandSearcher,
+    'HyperbandSearcher': HyperbandSearcher,
+    'asha': HyperbandSearcher,
+    'tpe': TPESearcher,
+    'TPE': TPESearcher,
+    'TPESearcher': TPESearcher,
 }
 
 
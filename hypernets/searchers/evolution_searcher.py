@@ -2,52 +2,260 @@
 """
 
 """
+import heapq
+import math
+from collections import namedtuple
+from collections.abc import MutableSequence
+
+import numpy as np
 
 from ..core import get_random_state
 from ..core.searcher import Searcher, OptimizeDirection
+from ..core.space_template import SpaceTemplate
 from ..utils import logging
 
 logger = logging.get_logger(__name__)
 
+_Candidate = namedtuple('_Candidate', ['signature', 'vectors'])  # an offspring not materialized yet
+
 
 class Individual(object):
     def __init__(self, space_sample, reward):
         self.space_sample = space_sample
         self.reward = reward
+        self.id = None
+        self.position = None
 
     def mutate(self):
         pass
 
 
+class _Individuals(MutableSequence):
+    """
+    The live list of the individuals of a `Population`, in the order they were appended (or shuffled). It can be
+    changed like a list, the changes are applied to the population.
+    """
+
+    def __init__(self, population):
+        self._population = population
+
+    def __len__(self):
+        return self._population._count
+
+    def __iter__(self):
+        return (i for i in self._population._slots if i is not None)
+
+    def _slot(self, index):
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('population index out of range')
+        return self._population._find(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self._population._slots[self._slot(index)]
+
+    def __setitem__(self, index, individual):
+        if isinstance(index, slice):
+            individuals = list(self)
+            individuals[index] = individual
+            self._population._reset(individuals)
+        else:
+            self._population._replace(self._slot(index), individual)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            for individual in list(self)[index]:
+                self._population.remove(individual)
+        else:
+            self._population.remove(self[index])
+
+    def insert(self, index, individual):
+        if index >= len(self):
+            self._population._add(individual)
+        else:
+            individuals = list(self)
+            individuals.insert(index, individual)
+            self._population._reset(individuals)
+
+    def remove(self, individual):
+        if not self._population._is_alive(individual):
+            raise ValueError('the individual is not in the population')
+        self._population.remove(individual)
+
+    def sort(self, key=None, reverse=False):
+        self._population._reset(sorted(self, key=key, reverse=reverse))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, _Individuals)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class Population(object):
+    """
+    The individuals of the evolution.
+
+    The individuals are held in an append-only array, in the order they were appended (or shuffled), where a
+    removed one leaves a hole. A Fenwick tree counts the individuals of the array, so the i-th one is found in
+    O(log n) time and the seeded draws are the same as of a plain list; the array is compacted when half of it are
+    holes. They are also kept in a heap of their ages for the regularized (aging) elimination, and in a heap with
+    the worst on top for the elimination of the worst, whose entries of removed individuals are dropped when they
+    come to the top. So appending and eliminating take amortized O(log n) time instead of sorting the population.
+
+    `populations` is the live list of the individuals, changing it (or assigning a list to it) updates the array
+    and the heaps.
+    """
+
     def __init__(self, size=50, optimize_direction=OptimizeDirection.Minimize, random_state=None):
         assert isinstance(size, int)
         assert size > 0
         self.size = size
-        self.populations = []
         self.optimize_direction = optimize_direction
         self.random_state = random_state if random_state is not None else get_random_state()
+        self._next_id = 0
+        self._reset([])
 
     @property
     def initializing(self):
-        return not len(self.populations) >= self.size
+        return not self._count >= self.size
 
     @property
     def length(self):
-        return len(self.populations)
+        return self._count
+
+    @property
+    def populations(self):
+        """The individuals, in the order they were appended (or shuffled)."""
+        return _Individuals(self)
+
+    @populations.setter
+    def populations(self, individuals):
+        self._reset(list(individuals))
+
+    def _key(self, reward):
+        # the smaller the worse
+        try:
+            reward = float(reward)
+        except (TypeError, ValueError):
+            return -math.inf
+        if math.isnan(reward):
+            return -math.inf
+        return reward if self.optimize_direction in ['max', OptimizeDirection.Maximize] else -reward
+
+    def _prefix(self, i):
+        # the number of individuals in the first i slots
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _find(self, rank):
+        # the slot of the individual of `rank`, from 0
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step > 0:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= rank:
+                pos = nxt
+                rank -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+    def _push_slot(self, individual):
+        individual.position = len(self._slots)
+        self._slots.append(individual)
+        i = len(self._slots)
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        self._count += 1
+
+    def _rebuild(self, individuals):
+        self._slots = []
+        self._tree = [0]
+        self._count = 0
+        for individual in individuals:
+            self._push_slot(individual)
+
+    def _is_alive(self, individual):
+        return self._alive.get(getattr(individual, 'id', None)) is individual
+
+    def _register(self, individual):
+        # an individual keeps its id, and so its age, when it is put back after a swap of the live list
+        if individual.id is None or individual.id in self._alive:
+            individual.id = self._next_id
+            self._next_id += 1
+        self._alive[individual.id] = individual
+        heapq.heappush(self._age_heap, individual.id)
+        heapq.heappush(self._heap, (self._key(individual.reward), individual.id))
+
+    def _add(self, individual):
+        self._push_slot(individual)
+        self._register(individual)
+
+    def _replace(self, slot, individual):
+        old = self._slots[slot]
+        if old is individual:
+            return
+        self._slots[slot] = individual
+        individual.position = slot
+        if old.position == slot:  # not placed in another slot
+            self._alive.pop(old.id, None)
+        if not self._is_alive(individual):
+            self._register(individual)
+
+    def _reset(self, individuals):
+        self._alive = {}  # id -> individual
+        self._age_heap = []  # ids, the oldest first
+        self._heap = []  # (key, id), the worst first
+        self._rebuild(individuals)
+        for individual in individuals:
+            self._register(individual)
 
     def append(self, space_sample, reward):
         individual = Individual(space_sample, reward)
-        self.populations.append(individual)
+        self._add(individual)
+        return individual
+
+    def remove(self, individual):
+        if not self._is_alive(individual):
+            return
+        del self._alive[individual.id]
+        self._slots[individual.position] = None
+        i = individual.position + 1
+        while i < len(self._tree):
+            self._tree[i] -= 1
+            i += i & -i
+        self._count -= 1
+        if len(self._slots) > 2 * self._count + 16:
+            self._rebuild([i for i in self._slots if i is not None])
+        if len(self._heap) > 2 * self._count + 16 or len(self._age_heap) > 2 * self._count + 16:
+            self._heap = [(self._key(i.reward), i.id) for i in self._alive.values()]
+            heapq.heapify(self._heap)
+            self._age_heap = list(self._alive.keys())
+            heapq.heapify(self._age_heap)
+
+    def _pop_alive(self, heap, get_id):
+        while True:
+            individual = self._alive.get(get_id(heapq.heappop(heap)))
+            if individual is not None:
+                return individual
 
     def sample_best(self, sample_size):
         if sample_size > self.length:
             sample_size = self.length
         indices = sorted(self.random_state.choice(range(self.length), sample_size))
-        samples = [self.populations[i] for i in indices]
-        best = \
-            sorted(samples,
-                   key=lambda i: i.reward, reverse=self.optimize_direction in ['max', OptimizeDirection.Maximize])[0]
+        best = None
+        for i in indices:
+            individual = self._slots[self._find(i)]
+            if best is None or self._key(individual.reward) > self._key(best.reward):
+                best = individual
         return best
 
     def eliminate(self, num=1, regularized=False):
@@ -57,17 +265,18 @@ class Population(object):
                 break
             if regularized:
                 # eliminate oldest
-                eliminates.append(self.populations.pop(0))
+                individual = self._pop_alive(self._age_heap, lambda id: id)
             else:
                 # eliminate worst
-                worst = sorted(self.populations, key=lambda i: i.reward,
-                               reverse=self.optimize_direction in ['min', OptimizeDirection.Minimize])[0]
-                self.populations.remove(worst)
-                eliminates.append(worst)
+                individual = self._pop_alive(self._heap, lambda entry: entry[1])
+            self.remove(individual)
+            eliminates.append(individual)
         return eliminates
 
     def shuffle(self):
-        self.random_state.shuffle(self.populations)
+        individuals = [i for i in self._slots if i is not None]
+        self.random_state.shuffle(individuals)
+        self._rebuild(individuals)
 
     def mutate(self, parent_space, offspring_space):
         assert parent_space.all_assigned
@@ -91,14 +300,17 @@ class EvolutionSearcher(Searcher):
     """
     Evolutionary Algorithm
 
+    Offspring are mutated on the vectors of their parents with the samplers of a `SpaceTemplate`, a `HyperSpace` is
+    only materialized for the offspring chosen.
+
     References
     ----------
         Real, Esteban, et al. "Regularized evolution for image classifier architecture search." Proceedings of the aaai conference on artificial intelligence. Vol. 33. 2019.
     """
 
     def __init__(self, space_fn, population_size, sample_size, regularized=False,
-                 candidates_size=10, optimize_direction=OptimizeDirection.Minimize, use_meta_learner=True,
-                 space_sample_validation_fn=None, random_state=None):
+                 candidates_size=10, candidates_top_ratio=0.3, optimize_direction=OptimizeDirection.Minimize,
+                 use_meta_learner=True, space_sample_validation_fn=None, random_state=None):
         """
         :param space_fn: callable, required
             A search space function which when called returns a `HyperSpace` instance
@@ -109,7 +321,10 @@ class EvolutionSearcher(Searcher):
         :param regularized: bool
             (default=False), Whether to enable regularized
         :param candidates_size: int, (default=10)
-            The number of samples for the meta-learner to evaluate candidate paths when roll out
+            The number of mutated candidates generated for each offspring, they are scored by the meta-learner
+            in one batch.
+        :param candidates_top_ratio: float, (default=0.3)
+            The offspring is picked randomly from this top fraction of the candidates ranked by the meta-learner.
         :param optimize_direction: 'min' or 'max', (default='min')
             Whether the search process is approaching the maximum or minimum reward value.
         :param use_meta_learner: bool, (default=True)
@@ -128,6 +343,8 @@ class EvolutionSearcher(Searcher):
         self.sample_size = sample_size
         self.regularized = regularized
         self.candidates_size = candidates_size
+        self.candidates_top_ratio = candidates_top_ratio
+        self._template = None
 
     @property
     def population_size(self):
@@ -137,54 +354,115 @@ class EvolutionSearcher(Searcher):
     def parallelizable(self):
         return True
 
+    @property
+    def template(self):
+        if self._template is None:
+            self._template = SpaceTemplate(self.space_fn, random_state=self.random_state)
+        return self._template
+
     def sample(self):
-        if self.population.initializing:
-            space_sample = self._sample_and_check(self._random_sample)
-            return space_sample
-        else:
-            best = self.population.sample_best(self.sample_size)
-            offspring = self._get_offspring(best.space_sample)
-            if offspring is not None:
-                return offspring
+        return self._sample_batch(1)[0]
+
+    def sample_batch(self, k):
+        """
+        Propose `k` distinct samples at once, for dispatchers running trials in parallel.
+        """
+        return self._sample_batch(k)
+
+    def _sample_batch(self, k):
+        samples = []
+        for _ in range(k):
+            if self.population.initializing:
+                space_sample = self._pop_warm_sample()
+                if space_sample is None:
+                    space_sample = self._sample_and_check(self._random_sample)
             else:
-                self.population.populations.remove(best)
-                space_sample = self._sample_and_check(self._random_sample)
-                return space_sample
+                space_sample = self._evolve()
+            samples.append(space_sample)
+        return samples
 
-    def _get_offspring(self, space_sample):
-        if self.use_meta_learner and self.meta_learner is not None:
-            candidates = []
-            scores = []
-            no = 0
-            for i in range(self.candidates_size):
-                new_space = self.space_fn()
-                try:
-                    candidate = self._sample_and_check(lambda: self.population.mutate(space_sample, new_space))
-                    candidates.append(candidate)
-                    scores.append((no, self.meta_learner.predict(candidate)))
-                    no += 1
-                except:
-                    pass
-            if len(candidates) <= 0:
-                return None
-
-            topn = sorted(scores,
-                          key=lambda s: s[1],
-                          reverse=self.optimize_direction in ['max', OptimizeDirection.Maximize])[
-                   :int(len(candidates) * 0.3)]
-            best = topn[self.random_state.choice(range(len(topn)))]
+    def _evolve(self):
+        best = self.population.sample_best(self.sample_size)
+        try:
+            return self._sample_and_check(lambda: self._get_offspring(best.space_sample.vectors), retry_limit=10)
+        except ValueError:
+            # the neighbours of the parent are all seen
+            self.population.remove(best)
+            return self._sample_and_check(self._random_sample)
 
-            if logger.is_info_enabled():
-                logger.info(f'get_offspring scores:{best[1]}, index:{best[0]}')
+    def _mutate_vectors(self, vectors):
+        """
+        Mutate one parameter of `vectors` as `Population.mutate` does, on the compiled space. The parameters after a
+        mutated structural parameter keep their values if the new branch has them at the same positions, the others
+        are drawn.
 
-            return candidates[best[0]]
+        :return: _Candidate, or None if the parameter drawn to mutate has no other value.
+        """
+        template = self.template
+        rs = self.random_state
+        chain = [template.root]
+        while chain[-1].branching and chain[-1].end <= len(vectors):
+            segment = chain[-1]
+            prefix = segment.typed(vectors[:segment.end])
+            chain.append(template.get_child(segment, prefix[-1], prefix))
+        parent = chain[-1]
+
+        pos = rs.randint(0, len(vectors))
+        segment = [s for s in chain if s.offset <= pos < s.end][0]
+        sampler = segment.samplers[pos - segment.offset]
+        for _ in range(10):
+            value = sampler(rs, 1)[0]
+            if value != vectors[pos]:
+                break
         else:
-            new_space = self.space_fn()
-            try:
-                candidate = self._sample_and_check(lambda: self.population.mutate(space_sample, new_space))
-                return candidate
-            except:
-                return None
+            return None
+
+        offspring = list(vectors[:pos]) + [value]
+        if not (segment.branching and pos == segment.end - 1):
+            return _Candidate(parent.signature, parent.typed(offspring + list(vectors[pos + 1:])))
+        while segment.branching and len(offspring) == segment.end:
+            segment = template.get_child(segment, segment.typed(offspring)[-1], offspring)
+            for j in range(segment.size):
+                i = segment.offset + j
+                if i < len(vectors) and parent.labels[i] == segment.labels[i]:
+                    offspring.append(vectors[i])
+                else:
+                    offspring.append(segment.samplers[j](rs, 1)[0])
+        return _Candidate(segment.signature, segment.typed(offspring))
+
+    def _get_offspring(self, vectors):
+        n = self.candidates_size if self.use_meta_learner and self.meta_learner is not None else 1
+        candidates = []
+        keys = set()
+        for _ in range(n * 3):
+            if len(candidates) >= n:
+                break
+            candidate = self._mutate_vectors(vectors)
+            if candidate is None:
+                continue
+            key = (candidate.signature, tuple(candidate.vectors))
+            if key in keys or self.is_seen_vectors(candidate.signature, candidate.vectors):
+                continue
+            keys.add(key)
+            candidates.append(candidate)
+        if len(candidates) <= 0:
+            return None
+
+        best = 0
+        if len(candidates) > 1:
+            scores = self._predict_candidates(candidates, np.inf)
+            keys = -scores if self.optimize_direction in ['max', OptimizeDirection.Maximize] else scores
+            top_n = max(1, int(len(candidates) * self.candidates_top_ratio))
+            if top_n < len(candidates):
+                top_indices = np.argpartition(keys, top_n - 1)[:top_n]
+            else:
+                top_indices = np.arange(len(candidates))
+            best = top_indices[self.random_state.choice(range(top_n))]
+
+            if logger.is_info_enabled():
+                logger.info(f'get_offspring scores:{scores[best]}, index:{best}')
+
+        return self.template.materialize(candidates[best].vectors)
 
     def update_result(self, space_sample, result):
         if not self.population.initializing:
@@ -3,28 +3,181 @@ __author__ = 'yangjian'
 """
 
 """
-from ..core.searcher import Searcher, OptimizeDirection
+import bisect
+import functools
+import operator
+
+import numpy as np
+
 from ..core import EarlyStoppingError
-from sklearn.model_selection import ParameterGrid
+from ..core.random_state import get_random_state
+from ..core.searcher import Searcher, OptimizeDirection
+from ..core.space_template import is_structural_param, expansion_values
+
+
+class _GridNode(object):
+    """
+    The grid of a run of parameters which always appear together, as a segment of `SpaceTemplate`. If the last one
+    is a structural parameter, each of its values leads to the sub-grid of its branch.
+    """
+
+    def __init__(self, params, grid):
+        self.ids = [p.id for p in params]
+        self.values = grid
+        self.numerics = [[p.value2numeric(v) for v in values] for p, values in zip(params, grid)]
+        self.branching = len(params) > 0 and is_structural_param(params[-1])
+        self.radices = [len(values) for values in (grid[:-1] if self.branching else grid)]
+        self.children = []
+        self.offsets = [0]  # cumulative sizes of the children
+        self.block = 1  # the number of combinations of the branches, for each combination of the radices
+        self.size = functools.reduce(operator.mul, self.radices, 1)
+
+    def set_children(self, children):
+        self.children = children
+        for child in children:
+            self.offsets.append(self.offsets[-1] + child.size)
+        self.block = self.offsets[-1]
+        self.size = functools.reduce(operator.mul, self.radices, 1) * self.block
+
+
+def _mix(x):
+    """
+    The finalizer of splitmix64, a fixed mixing of 64-bit integers, the same on every interpreter.
+    """
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & 0xffffffffffffffff
+    x = (x ^ (x >> 27)) * 0x94d049bb133111eb & 0xffffffffffffffff
+    return x ^ (x >> 31)
+
+
+class _Permutation(object):
+    """
+    A seeded bijection of range(n) evaluated index by index: a Feistel network on the bits of the index, walking
+    the cycle until the result falls in range.
+    """
+
+    def __init__(self, n, random_state, rounds=4):
+        bits = max((n - 1).bit_length(), 2)
+        bits += bits % 2
+        self.n = n
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [int(k) for k in random_state.randint(0, 2 ** 31 - 1, size=rounds)]
+
+    def __call__(self, index):
+        x = index
+        while True:
+            left, right = x >> self.half, x & self.mask
+            for key in self.keys:
+                left, right = right, left ^ (_mix((key << 32) | right) & self.mask)
+            x = (left << self.half) | right
+            if x < self.n:
+                return x
 
 
 class GridSearcher(Searcher):
+    """
+    Grid search over `n_expansion` values of each parameter, all values of a `Choice`.
+
+    The combinations are not built up front: the i-th one is decoded from its index as a mixed-radix number, in
+    the order of the parameters with the last one varying fastest. The grid follows the structure of the space, so
+    the parameters of a branch (e.g. of a `ModuleChoice`) only vary in the combinations taking the branch.
+
+    :param shuffle: visit the combinations in a random order, without repeats.
+    :param random_state: numpy RandomState or int seed to shuffle, the hypernets random state is used by default.
+    :param partition: the index of the part of the combinations visited by this searcher, of `num_partitions`
+        disjoint parts, to run independent searchers in parallel. The partitions of shuffled searchers are disjoint
+        only if they shuffle alike, so an explicit `random_state` of the same seed is required.
+    """
+
     def __init__(self, space_fn, optimize_direction=OptimizeDirection.Minimize, space_sample_validation_fn=None,
-                 n_expansion=5):
+                 n_expansion=5, shuffle=False, random_state=None, partition=0, num_partitions=1):
         Searcher.__init__(self, space_fn, optimize_direction, space_sample_validation_fn=space_sample_validation_fn)
-        space = space_fn()
-        assignable_params = space.get_unassigned_params()
-        self.grid = {}
+        assert 0 <= partition < num_partitions
+        if shuffle and num_partitions > 1 and random_state is None:
+            raise ValueError('an explicit random_state is required to shuffle the partitions alike.')
+
         self.n_expansion = n_expansion
-        for p in assignable_params:
-            self.grid[p.id] = [s.value for s in p.expansion(n_expansion)]
-        self.all_combinations = list(ParameterGrid(self.grid))
+        self.shuffle = shuffle
+        self.partition = partition
+        self.num_partitions = num_partitions
+        self.root = self._discover([])
+        self.grid = dict(zip(self.root.ids, self.root.values))
+
+        n = self.root.size
+        self.start = n * partition // num_partitions
+        self.end = n * (partition + 1) // num_partitions
+        if shuffle and n > 0:
+            if random_state is None:
+                random_state = get_random_state()
+            elif isinstance(random_state, int):
+                random_state = np.random.RandomState(random_state)
+            self._permutation = _Permutation(n, random_state)
+        else:
+            self._permutation = None
         self.position_ = -1
 
+    def _discover(self, prefix):
+        space = self.space_fn()
+        params = []
+        grid = []
+        i = 0
+        for p in space.params_iterator:
+            if i < len(prefix):
+                p.assign(p.numeric2value(prefix[i]))
+                i += 1
+                continue
+            values = expansion_values(p, self.n_expansion)
+            params.append(p)
+            grid.append(values)
+            if is_structural_param(p):
+                break
+            p.assign(values[0])  # not structural, any value leads to the same parameters
+
+        node = _GridNode(params, grid)
+        if node.branching:
+            base = prefix + [numerics[0] for numerics in node.numerics[:-1]]
+            node.set_children([self._discover(base + [numeric]) for numeric in node.numerics[-1]])
+        return node
+
     @property
     def parallelizable(self):
         return True
 
+    @property
+    def size(self):
+        """The number of combinations of the grid, in all partitions."""
+        return self.root.size
+
+    def _decode(self, index):
+        """
+        :return: [(node, j, k)], the k-th value of the j-th parameter of the nodes, for the combination `index`.
+        """
+        decoded = []
+        node = self.root
+        while True:
+            digits, rest = divmod(index, node.block)
+            path = []
+            for j in range(len(node.radices) - 1, -1, -1):
+                digits, k = divmod(digits, node.radices[j])
+                path.append((node, j, k))
+            decoded += reversed(path)
+            if not node.branching:
+                return decoded
+            k = bisect.bisect_right(node.offsets, rest) - 1
+            decoded.append((node, len(node.ids) - 1, k))
+            index = rest - node.offsets[k]
+            node = node.children[k]
+
+    def combination(self, index):
+        """
+        The combination `index` as a dict of parameter id and value.
+        """
+        return {node.ids[j]: node.values[j][k] for node, j, k in self._decode(index)}
+
+    @property
+    def all_combinations(self):
+        return [self.combination(i) for i in range(self.size)]
+
     def sample(self):
         sample = self._sample_and_check(self._get_sample)
         return sample
@@ -32,11 +185,13 @@ class GridSearcher(Searcher):
     def _get_sample(self):
         self.position_ += 1
 
-        if self.position_ >= len(self.all_combinations):
+        position = self.start + self.position_
+        if position >= self.end:
             raise EarlyStoppingError('no more samples.')
+        index = self._permutation(position) if self._permutation is not None else position
+        vectors = [node.numerics[j][k] for node, j, k in self._decode(index)]
         sample = self.space_fn()
-        for k, v in self.all_combinations[self.position_].items():
-            sample.__dict__[k].assign(v)
+        sample.assign_by_vectors(vectors)
         assert sample.all_assigned == True
         return sample
 
@@ -51,17 +206,3 @@ class GridSearcher(Searcher):
 
     def export(self):
         raise NotImplementedError
-
-
-def test_parameter_grid(self):
-    space = self.get_space()
-    ps = space.get_unassigned_params()
-    grid = {}
-    for p in ps:
-        grid[p.name] = [s.value for s in p.expansion(2)]
-    all_vectors = list(ParameterGrid(grid))
-    for ps in all_vectors:
-        space = self.get_space()
-        for k, v in ps.items():
-            space.__dict__[k].assign(v)
-        assert space.all_assigned == True
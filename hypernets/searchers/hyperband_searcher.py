@@ -0,0 +1,161 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import math
+
+import numpy as np
+
+from ..core.searcher import Searcher, OptimizeDirection
+from ..utils import logging
+
+logger = logging.get_logger(__name__)
+
+
+class _Rung(object):
+    def __init__(self, budget):
+        self.budget = budget
+        self.results = {}  # key -> (reward, space_sample)
+        self.promoted = set()  # keys promoted to the next rung
+
+
+class HyperbandSearcher(Searcher):
+    """
+    Asynchronous successive halving (ASHA) in the brackets of Hyperband.
+
+    A sample is proposed with a `budget` attribute, the fraction of the full fidelity (boosting rounds, epochs, or
+    rows of the training data, see `Estimator.set_budget`) to train with. New samples start at the lowest rung of a
+    bracket, a sample in the top `1 / reduction_factor` of the results of its rung is proposed again with a
+    `reduction_factor` times larger budget, as soon as a worker asks for a sample, so no trial waits for a rung to
+    complete. The trial of a promoted sample continues from the model of its last rung if the estimator supports warm
+    start, see `HyperModel._get_budget`.
+
+    The trials of a sample at other budgets are distinct trials, also in a trial store. The cluster backend, whose
+    executors rebuild the samples from their vectors, is not supported.
+
+    References
+    ----------
+        Li, Liam, et al. "A System for Massively Parallel Hyperparameter Tuning." Proceedings of Machine Learning and Systems 2 (2020).
+        Li, Lisha, et al. "Hyperband: A Novel Bandit-Based Approach to Hyperparameter Optimization." Journal of Machine Learning Research 18 (2018).
+    """
+
+    def __init__(self, space_fn, min_budget=1 / 27, max_budget=1.0, reduction_factor=3, brackets=1,
+                 optimize_direction=OptimizeDirection.Minimize, space_sample_validation_fn=None):
+        """
+        :param space_fn: callable, required
+            A search space function which when called returns a `HyperSpace` instance
+        :param min_budget: float, (default=1/27)
+            Budget of the lowest rung, a fraction of `max_budget`.
+        :param max_budget: float, (default=1.0)
+            Budget of the highest rung, the full fidelity.
+        :param reduction_factor: int, (default=3)
+            Only the top `1 / reduction_factor` samples of a rung are promoted to the next rung, whose budget is
+            `reduction_factor` times larger.
+        :param brackets: int, (default=1)
+            Number of Hyperband brackets, bracket `s` starts at rung `s`, new samples are assigned to the brackets
+            in turn. 1 for ASHA only.
+        """
+        Searcher.__init__(self, space_fn=space_fn, optimize_direction=optimize_direction, use_meta_learner=False,
+                          space_sample_validation_fn=space_sample_validation_fn)
+        assert 0 < min_budget <= max_budget
+        assert reduction_factor >= 2
+
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.reduction_factor = reduction_factor
+
+        n_rungs = int(math.floor(math.log(max_budget / min_budget, reduction_factor) + 1e-9)) + 1
+        self.budgets = [max_budget / reduction_factor ** (n_rungs - 1 - k) for k in range(n_rungs)]
+        self.brackets = max(min(brackets, n_rungs), 1)
+        self._rungs = [[_Rung(b) for b in self.budgets[s:]] for s in range(self.brackets)]
+        self._running = {}  # (key, budget) -> (bracket, rung)
+        self._next_bracket = 0
+
+    @property
+    def parallelizable(self):
+        return True
+
+    @staticmethod
+    def _key(space_sample):
+        return space_sample.signature, tuple(space_sample.vectors)
+
+    def _order(self, rewards):
+        # indices of rewards from the best
+        rewards = np.array(rewards, dtype='float64')
+        if self.optimize_direction in ['max', OptimizeDirection.Maximize]:
+            rewards = -rewards
+        return np.argsort(rewards, kind='stable')
+
+    def _promotable(self, rung):
+        n = len(rung.results) // self.reduction_factor
+        if n <= 0:
+            return None
+        keys = list(rung.results.keys())
+        for i in self._order([rung.results[k][0] for k in keys])[:n]:
+            if keys[i] not in rung.promoted:
+                return keys[i]
+        return None
+
+    def _propose(self, space_sample, bracket, rung):
+        budget = self._rungs[bracket][rung].budget
+        space_sample.budget = budget
+        space_sample.checkpoint = None
+        self._running[(self._key(space_sample), budget)] = (bracket, rung)
+        return space_sample
+
+    def sample(self):
+        # promote the best sample of the highest rung possible
+        for rung in range(len(self.budgets) - 2, -1, -1):
+            for bracket in range(self.brackets):
+                rungs = self._rungs[bracket]
+                if rung >= len(rungs) - 1:
+                    continue
+                key = self._promotable(rungs[rung])
+                if key is not None:
+                    rungs[rung].promoted.add(key)
+                    _, parent = rungs[rung].results[key]
+                    space_sample = self.space_fn()
+                    space_sample.assign_by_vectors(parent.vectors)
+                    if logger.is_info_enabled():
+                        logger.info(f'promote {parent.vectors} to budget {rungs[rung + 1].budget} '
+                                    f'in bracket {bracket}')
+                    return self._propose(space_sample, bracket, rung + 1)
+
+        # a new sample in the next bracket, promoted samples are seen already as they are run again on purpose
+        space_sample = self._sample_and_check(self._random_sample)
+        bracket = self._next_bracket
+        self._next_bracket = (self._next_bracket + 1) % self.brackets
+        return self._propose(space_sample, bracket, 0)
+
+    def update_result(self, space_sample, result):
+        key = self._key(space_sample)
+        budget = getattr(space_sample, 'budget', None)
+        located = self._running.pop((key, budget), None)
+        if located is None:
+            logger.warning(f'sample {space_sample.vectors} at budget {budget} is not proposed by the searcher')
+            return
+        bracket, rung = located
+        self._rungs[bracket][rung].results[key] = (result, space_sample)
+
+    def get_best(self):
+        best = None
+        for rungs in self._rungs:
+            results = list(rungs[-1].results.values())
+            if len(results) > 0:
+                i = self._order([r for r, _ in results])[0]
+                if best is None or self._order([best[0], results[i][0]])[0] == 1:
+                    best = results[i]
+        return best[1] if best is not None else None
+
+    def summary(self):
+        lines = []
+        for s, rungs in enumerate(self._rungs):
+            detail = ', '.join(f'{r.budget:.4g}: {len(r.results)}' for r in rungs)
+            lines.append(f'bracket {s}, samples of budgets: {detail}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        raise NotImplementedError
+
+    def export(self):
+        raise NotImplementedError
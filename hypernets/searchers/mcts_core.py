@@ -7,6 +7,8 @@ import math
 from collections import OrderedDict
 from ..utils.common import generate_id
 from ..core import get_random_state
+from ..core.search_space import Real
+from ..core.space_template import expansion_values
 
 
 class MCNode(object):
@@ -163,6 +165,9 @@ class MCTree(object):
             node.reward, node.visits = self.policy.back_propagation(node, reward, is_simulation)
             node = node.parent
 
+    def summary(self):
+        return str(self.root)
+
     def roll_out(self, space_sample, node):
         # print(f'Tree roll out:{node.info()}')
         terminal = True
@@ -174,6 +179,200 @@ class MCTree(object):
         return space_sample
 
 
+class ArrayMCTree(object):
+    """
+    A Monte Carlo tree stored as a structure of arrays, node `i` is the i-th entry of every array.
+
+    The children of a node are expanded at once, so they are the contiguous range `child_start[i]` to
+    `child_start[i] + child_count[i]`, and UCT scores them with one vectorized expression. A node keeps the
+    running count, sum and sum of squares of its rewards and simulation rewards, so back propagation does constant
+    work at each ancestor. Nodes are integers, the root is 0.
+
+    It behaves as `MCTree` with the `UCT` policy, the policy must support `select_child`.
+    """
+
+    ROOT = 0
+
+    def __init__(self, space_fn, policy, max_node_space, capacity=1024, random_state=None):
+        self.space_fn = space_fn
+        self.policy = policy
+        self.max_node_space = max_node_space
+        self.random_state = random_state if random_state is not None else get_random_state()
+
+        self.size = 0
+        self.parent = np.empty(0, dtype='int64')
+        self.depth = np.empty(0, dtype='int32')
+        self.numeric = np.empty(0, dtype='float64')  # value2numeric of the value assigned by the node
+        self.label = np.empty(0, dtype='int32')  # index in `labels` of the param label
+        self.child_start = np.empty(0, dtype='int64')
+        self.child_count = np.empty(0, dtype='int32')
+        self.terminal = np.empty(0, dtype=bool)
+        self.reward_count = np.empty(0, dtype='int64')
+        self.reward_sum = np.empty(0, dtype='float64')
+        self.reward_sum2 = np.empty(0, dtype='float64')
+        self.simulation_count = np.empty(0, dtype='int64')
+        self.simulation_sum = np.empty(0, dtype='float64')
+        self.simulation_sum2 = np.empty(0, dtype='float64')
+        self.reward = np.empty(0, dtype='float64')
+        self.visits = np.empty(0, dtype='int64')
+        self.labels = []
+        self._label_index = {}
+        self._grow(capacity)
+        self._add_nodes(-1, [np.nan], 'ROOT')
+
+    _arrays = ('parent', 'depth', 'numeric', 'label', 'child_start', 'child_count', 'terminal',
+               'reward_count', 'reward_sum', 'reward_sum2', 'simulation_count', 'simulation_sum',
+               'simulation_sum2', 'reward', 'visits')
+
+    @property
+    def root(self):
+        return self.ROOT
+
+    def _grow(self, capacity):
+        for name in self._arrays:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _add_nodes(self, parent, numerics, label):
+        n = len(numerics)
+        if self.size + n > len(self.parent):
+            self._grow(max(len(self.parent) * 2, self.size + n))
+        label_id = self._label_index.get(label)
+        if label_id is None:
+            label_id = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+
+        start, end = self.size, self.size + n
+        self.parent[start:end] = parent
+        self.depth[start:end] = self.depth[parent] + 1 if parent >= 0 else 0
+        self.numeric[start:end] = numerics
+        self.label[start:end] = label_id
+        self.child_start[start:end] = 0
+        self.child_count[start:end] = 0
+        self.size = end
+        if parent >= 0:
+            self.child_start[parent] = start
+            self.child_count[parent] = n
+        return start
+
+    def children(self, node):
+        start = self.child_start[node]
+        return range(start, start + self.child_count[node])
+
+    def is_leaf(self, node):
+        return self.child_count[node] <= 0
+
+    def path_to_node(self, node):
+        nodes = []
+        while node != self.ROOT:
+            nodes.append(node)
+            node = self.parent[node]
+        nodes.reverse()
+        return nodes
+
+    def _assign_path(self, space_sample, nodes):
+        # replay the values of the path, returns the first param not on the path or None
+        i = 0
+        for hp in space_sample.params_iterator:
+            if i >= len(nodes):
+                return hp
+            numeric = self.numeric[nodes[i]]
+            hp.assign(hp.numeric2value(float(numeric) if isinstance(hp, Real) else int(numeric)))
+            i += 1
+        return None
+
+    def node_to_space(self, node):
+        space_sample = self.space_fn()
+        self._assign_path(space_sample, self.path_to_node(node))
+        return space_sample
+
+    def select_child(self, node):
+        start = self.child_start[node]
+        end = start + self.child_count[node]
+        return start + self.policy.select_child(self.reward[start:end], self.visits[start:end], self.visits[node])
+
+    def selection_and_expansion(self):
+        node = self.ROOT
+        while not self.terminal[node]:
+            if self.child_count[node] <= 0:
+                space_sample, child = self.expansion(node)
+                if child != node:
+                    return space_sample, child
+            else:
+                node = self.select_child(node)
+                if self.visits[node] <= 0:
+                    break
+        return self.node_to_space(node), node
+
+    def expansion(self, node):
+        space_sample = self.space_fn()
+        hp = self._assign_path(space_sample, self.path_to_node(node))
+        if hp is None:
+            self.terminal[node] = True
+            return space_sample, node
+
+        values = expansion_values(hp, self.max_node_space)
+        start = self._add_nodes(node, [hp.value2numeric(v) for v in values], hp.label)
+        i = self.random_state.randint(len(values))
+        hp.assign(values[i])
+        return space_sample, start + i
+
+    def back_propagation(self, node, reward, is_simulation=False):
+        while node >= 0:
+            if is_simulation:
+                self.simulation_count[node] += 1
+                self.simulation_sum[node] += reward
+                self.simulation_sum2[node] += reward * reward
+            else:
+                self.reward_count[node] += 1
+                self.reward_sum[node] += reward
+                self.reward_sum2[node] += reward * reward
+
+            n = self.reward_count[node]
+            avg_reward = self.reward_sum[node] / n if n > 0 else 0.0
+            m = self.simulation_count[node]
+            if m > 0:
+                self.reward[node] = (avg_reward + self.simulation_sum[node] / m) / 2
+                self.visits[node] = m
+            else:
+                self.reward[node] = avg_reward
+                self.visits[node] = n
+            node = self.parent[node]
+
+    def reward_std(self, node):
+        n = self.reward_count[node]
+        if n <= 0:
+            return 0.0
+        mean = self.reward_sum[node] / n
+        return math.sqrt(max(self.reward_sum2[node] / n - mean * mean, 0.0))
+
+    def roll_out(self, space_sample, node):
+        terminal = True
+        for hp in space_sample.params_iterator:
+            terminal = False
+            hp.random_sample()
+        if terminal:
+            self.terminal[node] = True
+        return space_sample
+
+    def info(self, node):
+        return f'Reward:{self.reward[node]}, Visits:{self.visits[node]}, Name:{self.labels[self.label[node]]}, ' \
+               f'numeric:{self.numeric[node]}, depth:{self.depth[node]}, children:{self.child_count[node]}, ' \
+               f'is_terminal:{self.terminal[node]}'
+
+    def summary(self, max_depth=2):
+        lines = []
+        standby = [self.ROOT]
+        while standby:
+            node = standby.pop()
+            lines.append('\t' * int(self.depth[node]) + self.info(node))
+            if self.depth[node] < max_depth:
+                standby.extend(reversed(self.children(node)))
+        return '\n'.join(lines)
+
+
 class BasePolicy(object):
     def selection(self, node):
         raise NotImplementedError
@@ -181,6 +380,14 @@ class BasePolicy(object):
     def back_propagation(self, node, reward):
         raise NotImplementedError
 
+    def select_child(self, rewards, visits, parent_visits):
+        """
+        Select a child by the arrays of the rewards and visits of the children, for `ArrayMCTree`.
+
+        :return: index of the selected child.
+        """
+        raise NotImplementedError
+
 
 class UCT(BasePolicy):
     def __init__(self, exploration_bonus=0.6):
@@ -202,6 +409,13 @@ class UCT(BasePolicy):
 
         return selected
 
+    def select_child(self, rewards, visits, parent_visits):
+        node_log_nt = 0 if parent_visits <= 0 else math.log10(parent_visits)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = rewards + self.exploration_bonus * np.sqrt(node_log_nt / visits)
+        scores[visits <= 0] = np.inf
+        return int(np.argmax(scores))
+
     def back_propagation(self, node, reward, is_simulation=False):
         if is_simulation:
             node.simulation_rewards.append(reward)
@@ -3,8 +3,14 @@ __author__ = 'yangjian'
 """
 
 """
+import math
+
 from .mcts_core import *
 from ..core.searcher import Searcher, OptimizeDirection
+from ..core.space_template import SpaceTemplate
+from ..utils import logging
+
+logger = logging.get_logger(__name__)
 
 
 class MCTSSearcher(Searcher):
@@ -16,7 +22,8 @@ class MCTSSearcher(Searcher):
     """
 
     def __init__(self, space_fn, policy=None, max_node_space=10, candidates_size=10,
-                 optimize_direction=OptimizeDirection.Minimize, use_meta_learner=True, space_sample_validation_fn=None):
+                 optimize_direction=OptimizeDirection.Minimize, use_meta_learner=True, space_sample_validation_fn=None,
+                 array_tree=False, retry_limit=1000):
         """
         :param space_fn: Callable
             A search space function which when called returns a `HyperSpace` object.
@@ -25,21 +32,31 @@ class MCTSSearcher(Searcher):
         :param max_node_space: int, (default=10)
             Maximum space for node expansion
         :param candidates_size: int, (default=10)
-            The number of samples for the meta-learner to evaluate candidate paths when roll out
+            The number of samples for the meta-learner to evaluate candidate paths when roll out, they are scored
+            in one batch
         :param optimize_direction: 'min' or 'max', (default='min')
             Whether the search process is approaching the maximum or minimum reward value
         :param use_meta_learner: bool, (default=True)
             Meta-learner aims to evaluate the performance of unseen samples based on previously evaluated samples. It provides a practical solution to accurately estimate a search branch with many simulations without involving the actual training
         :param space_sample_validation_fn: Callable or None, (default=None)
             Used to verify the validity of samples from the search space, and can be used to add specific constraint rules to the search space to reduce the size of the space
+        :param array_tree: bool, (default=False)
+            Store the tree as arrays (`ArrayMCTree`) instead of node objects, for large trees
+        :param retry_limit: int, (default=1000)
+            Maximum roll-outs of a node to take a valid sample not seen before, unless all samples of the node are seen
         """
         if policy is None:
             policy = UCT()
-        self.tree = MCTree(space_fn, policy, max_node_space=max_node_space)
+        if array_tree:
+            self.tree = ArrayMCTree(space_fn, policy, max_node_space=max_node_space)
+        else:
+            self.tree = MCTree(space_fn, policy, max_node_space=max_node_space)
         Searcher.__init__(self, space_fn, optimize_direction, use_meta_learner=use_meta_learner,
                           space_sample_validation_fn=space_sample_validation_fn)
         self.nodes_map = {}
         self.candidates_size = candidates_size
+        self.retry_limit = retry_limit
+        self._subtree_combinations = {}  # vectors of the path to a node -> the number of samples of the node
 
     @property
     def max_node_space(self):
@@ -49,37 +66,81 @@ class MCTSSearcher(Searcher):
         return self.use_meta_learner and self.meta_learner is not None
 
     def sample(self):
+        space_sample = self._pop_warm_sample()
+        if space_sample is not None:
+            # a seed of the warm start, credited to the root as its path is not expanded in the tree
+            self.nodes_map[space_sample.space_id] = self.tree.root
+            return space_sample
+
         # print('Sample')
         _, best_node = self.tree.selection_and_expansion()
         # print(f'Sample: {best_node.info()}')
 
         if self.use_meta_learner and self.meta_learner is not None:
             space_sample, candidate_sim_score, candidates_avg_score = self._select_best_candidate(best_node)
-            # support for parallelize sampling
-            self.tree.back_propagation(best_node, candidates_avg_score, is_simulation=True)
+            if space_sample is not None:
+                # support for parallelize sampling
+                self.tree.back_propagation(best_node, candidates_avg_score, is_simulation=True)
         else:
             space_sample = self._roll_out(best_node)
 
+        if space_sample is None:
+            # the roll-outs of the node are all seen, take a random sample credited to the root instead
+            space_sample = self._sample_and_check(self._random_sample)
+            best_node = self.tree.root
+
         self.nodes_map[space_sample.space_id] = best_node
         return space_sample
 
-    def _roll_out(self, node):
+    def _roll_out(self, node, mark_seen=True):
         def sample():
             space_sample = self.tree.node_to_space(node)
             space_sample = self.tree.roll_out(space_sample, node)
             return space_sample
 
-        space_sample = self._sample_and_check(sample_fn=sample)
-        return space_sample
+        # a few roll-outs first, the samples of the node are counted only if they are mostly seen
+        try:
+            return self._sample_and_check(sample_fn=sample, mark_seen=mark_seen, retry_limit=self.max_node_space)
+        except ValueError:
+            pass
+        if self._subtree_exhausted(node):
+            return None
+        try:
+            return self._sample_and_check(sample_fn=sample, mark_seen=mark_seen, retry_limit=self.retry_limit)
+        except ValueError:
+            if self._subtree_exhausted(node):
+                return None
+            raise
+
+    def _subtree_exhausted(self, node):
+        """
+        Whether all samples of the subtree of `node` are seen.
+        """
+        space_sample = self.tree.node_to_space(node)
+        prefix = tuple(p.value2numeric(p.value) for p in space_sample._assigned_params_stack)
+        n = self._subtree_combinations.get(prefix)
+        if n is None:
+            try:
+                n = SpaceTemplate(lambda: self.tree.node_to_space(node)).combinations()
+            except Exception as e:
+                logger.debug(f'unable to count the samples of the node: {e}')
+                n = None
+            n = n if n is not None else math.inf
+            self._subtree_combinations[prefix] = n
+        if n == math.inf:
+            return False
+        k = len(prefix)
+        seen = sum(1 for _, vectors in self._seen if vectors[:k] == prefix)
+        return seen >= n
 
     def _select_best_candidate(self, node):
-        candidates = []
-        scores = []
-        for i in range(self.candidates_size):
-            candidate = self._roll_out(node)
-            candidates.append(candidate)
-            scores.append(self.meta_learner.predict(candidate, 0.5))
+        candidates = [self._roll_out(node, mark_seen=False) for _ in range(self.candidates_size)]
+        candidates = [c for c in candidates if c is not None]
+        if len(candidates) == 0:
+            return None, None, None
+        scores = self._predict_candidates(candidates, 0.5)
         index = np.argmax(scores)
+        self.mark_seen(candidates[index])
         candidate_sim_score = scores[index]
         candidates_avg_score = np.average(scores)
         # print(f'selected candidates scores:{scores}, argmax:{index}')
@@ -99,7 +160,7 @@ class MCTSSearcher(Searcher):
             self.meta_learner.new_sample(space_sample)
 
     def summary(self):
-        return str(self.tree.root)
+        return self.tree.summary()
 
     def reset(self):
         raise NotImplementedError
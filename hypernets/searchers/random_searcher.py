@@ -6,17 +6,41 @@ from ..core.searcher import Searcher, OptimizeDirection
 
 
 class RandomSearcher(Searcher):
-    def __init__(self, space_fn, optimize_direction=OptimizeDirection.Minimize, space_sample_validation_fn=None):
+    """
+    :param sample_batch_size: if greater than 0, compile the space into a `SpaceTemplate` and draw vectors of this
+        number of samples at a time, a space sample is materialized from the vectors on each call of `sample`.
+    """
+
+    def __init__(self, space_fn, optimize_direction=OptimizeDirection.Minimize, space_sample_validation_fn=None,
+                 sample_batch_size=0):
         Searcher.__init__(self, space_fn, optimize_direction, space_sample_validation_fn=space_sample_validation_fn)
+        self.sample_batch_size = sample_batch_size
+        self._template = None
+        self._batch = None
+        self._batch_pos = 0
 
     @property
     def parallelizable(self):
         return True
 
     def sample(self):
-        sample = self._sample_and_check(self._random_sample)
+        sample_fn = self._template_sample if self.sample_batch_size > 0 else self._random_sample
+        sample = self._sample_and_check(sample_fn)
         return sample
 
+    def _template_sample(self):
+        if self._template is None:
+            from ..core.space_template import SpaceTemplate
+            self._template = SpaceTemplate(self.space_fn)
+        if self._batch is None or self._batch_pos >= len(self._batch):
+            self._batch = self._template.sample(self.sample_batch_size)
+            self._batch_pos = 0
+        i = self._batch_pos
+        self._batch_pos += 1
+        if self.is_seen_vectors(self._batch.signature(i), self._batch.vectors_of(i)):
+            return None
+        return self._batch.materialize(i)
+
     def get_best(self):
         raise NotImplementedError
 
@@ -0,0 +1,414 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import math
+
+import numpy as np
+from scipy.special import ndtr
+
+from ..core import get_random_state
+from ..core.search_space import Int, Real, Choice, MultipleChoice
+from ..core.searcher import Searcher, OptimizeDirection
+from ..core.space_template import SpaceTemplate
+from ..utils import logging
+
+logger = logging.get_logger(__name__)
+
+_LOG_SQRT_2PI = 0.5 * math.log(2 * math.pi)
+
+
+def _logsumexp(a):
+    m = a.max(axis=1, keepdims=True)
+    return np.log(np.exp(a - m).sum(axis=1)) + m[:, 0]
+
+
+class _Column(object):
+    """
+    A growable array of the values of a parameter, and the indices of the trials they are observed in.
+    """
+
+    def __init__(self, capacity=64):
+        self._values = np.empty(capacity, dtype='float64')
+        self._trials = np.empty(capacity, dtype='int64')
+        self.size = 0
+
+    def append(self, value, trial):
+        if self.size >= len(self._values):
+            self._values = np.concatenate([self._values, np.empty_like(self._values)])
+            self._trials = np.concatenate([self._trials, np.empty_like(self._trials)])
+        self._values[self.size] = value
+        self._trials[self.size] = trial
+        self.size += 1
+
+    @property
+    def values(self):
+        return self._values[:self.size]
+
+    @property
+    def trials(self):
+        return self._trials[:self.size]
+
+
+class _NumericModel(object):
+    """
+    Parzen estimator of an Int or Real parameter: a mixture of normal kernels truncated to the range of the
+    parameter, one at every observation plus a wide one for the prior. Log-uniform parameters are modeled in the log
+    space. Beyond `max_kernels` observations the kernels are placed at the centers of a histogram with a common
+    bandwidth, so the cost of the density doesn't grow with the number of trials.
+    """
+
+    def __init__(self, p, prior_weight=1.0, max_kernels=128, bins=256):
+        self.prior_weight = prior_weight
+        self.max_kernels = max_kernels
+        self.bins = bins
+        self.log = isinstance(p, Real) and p.prior == 'log_uniform'
+        self.integer = isinstance(p, Int)
+        self.q = p.q if isinstance(p, Real) and p.prior == 'q_uniform' else None
+        self.low, self.high = float(p.low), float(p.high)  # in the log space for log-uniform
+
+        grid = None
+        if p.step is not None:
+            if self.log:
+                grid = np.round(np.arange(np.exp(p.low), np.exp(p.high) + p.step, step=p.step), 8)
+                grid = grid[grid <= np.exp(p.high)]
+            elif self.integer:
+                # the native sampler draws from [low, high) and moves the value to the nearest step
+                grid = np.arange(p.low, p.high, step=p.step)
+                if len(grid) > 0 and grid[-1] + p.step - (p.high - 1) < p.high - 1 - grid[-1]:
+                    grid = np.append(grid, grid[-1] + p.step)
+            else:
+                grid = np.round(np.arange(p.low, p.high + p.step, step=p.step), 8)
+                grid = grid[grid <= p.high]
+        self.grid = grid if grid is not None and len(grid) > 0 else None
+
+    def _to_internal(self, values):
+        return np.log(values) if self.log else values
+
+    def _to_value(self, x):
+        values = np.exp(x) if self.log else x
+        if self.q is not None:
+            values = np.round(values / self.q) * self.q
+        if self.grid is not None:
+            pos = np.clip(np.searchsorted(self.grid, values), 1, max(len(self.grid) - 1, 1))
+            left, right = self.grid[pos - 1], self.grid[np.minimum(pos, len(self.grid) - 1)]
+            values = np.where(values - left <= right - values, left, right)
+            return values
+        elif self.integer:
+            return np.clip(np.round(values), self.low, self.high - 1)  # high is exclusive
+        low, high = (np.exp(self.low), np.exp(self.high)) if self.log else (self.low, self.high)
+        return np.clip(values, low, high)
+
+    def estimator(self, values):
+        width = self.high - self.low
+        x = self._to_internal(np.asarray(values, dtype='float64'))
+        n = len(x)
+        if n > self.max_kernels:
+            index = np.clip(((x - self.low) / width * self.bins).astype('int64'), 0, self.bins - 1)
+            counts = np.bincount(index, minlength=self.bins)
+            nonzero = counts > 0
+            mus = self.low + (np.arange(self.bins)[nonzero] + 0.5) * width / self.bins
+            weights = counts[nonzero].astype('float64')
+            bandwidth = 1.06 * max(x.std(), width / self.bins) * n ** -0.2
+            sigmas = np.full(len(mus), np.clip(bandwidth, width / self.bins, width))
+        elif n > 0:
+            # the bandwidth of a kernel is the larger distance to its neighbors
+            order = np.argsort(x)
+            sorted_x = x[order]
+            points = np.concatenate([[self.low], sorted_x, [self.high]])
+            gaps = np.diff(points)
+            sigmas = np.empty(n)
+            sigmas[order] = np.maximum(gaps[:-1], gaps[1:])
+            sigmas = np.clip(sigmas, width / min(100.0, 1.0 + n), width)
+            mus, weights = x, np.ones(n)
+        else:
+            mus, sigmas, weights = np.empty(0), np.empty(0), np.empty(0)
+
+        mus = np.append(mus, (self.low + self.high) / 2)
+        sigmas = np.append(sigmas, width)
+        weights = np.append(weights, self.prior_weight)
+        weights /= weights.sum()
+        log_z = np.log(np.maximum(ndtr((self.high - mus) / sigmas) - ndtr((self.low - mus) / sigmas), 1e-12))
+        return mus, sigmas, np.log(weights) - np.log(sigmas) - log_z - _LOG_SQRT_2PI
+
+    def sample(self, rs, estimator, n):
+        mus, sigmas, log_w = estimator
+        w = np.exp(log_w + np.log(sigmas))
+        w /= w.sum()
+        components = rs.choice(len(mus), size=n, p=w)
+        x = np.clip(rs.normal(mus[components], sigmas[components]), self.low, self.high)
+        return self._to_value(x)
+
+    def log_pdf(self, values, estimator):
+        mus, sigmas, log_w = estimator
+        x = self._to_internal(np.asarray(values, dtype='float64'))
+        z = (x[:, None] - mus[None, :]) / sigmas[None, :]
+        return _logsumexp(log_w[None, :] - 0.5 * z * z)
+
+
+class _CategoricalModel(object):
+    """
+    Smoothed frequencies of the options of a Choice parameter.
+    """
+
+    def __init__(self, p, prior_weight=1.0):
+        self.prior_weight = prior_weight
+        self.k = len(p.options)
+
+    def estimator(self, values):
+        counts = np.bincount(np.asarray(values, dtype='int64'), minlength=self.k).astype('float64')
+        counts += self.prior_weight / self.k
+        return counts / counts.sum()
+
+    def sample(self, rs, estimator, n):
+        return rs.choice(self.k, size=n, p=estimator)
+
+    def log_pdf(self, values, estimator):
+        return np.log(estimator[np.asarray(values, dtype='int64')])
+
+
+class _SparseCategoricalModel(object):
+    """
+    Smoothed frequencies of the observed codes of a parameter with many possible values, e.g. MultipleChoice,
+    unseen values are drawn from the prior.
+    """
+
+    def __init__(self, p, sampler, prior_weight=1.0):
+        self.prior_weight = prior_weight
+        self.sampler = sampler
+        if isinstance(p, MultipleChoice):
+            self.k = 2.0 ** len(p.options)
+        else:
+            try:
+                self.k = float(max(p.choice_num, 1))
+            except Exception:
+                self.k = 1e6
+
+    def estimator(self, values):
+        codes, counts = np.unique(np.asarray(values, dtype='float64'), return_counts=True)
+        return codes, counts.astype('float64'), float(len(values))
+
+    def sample(self, rs, estimator, n):
+        codes, counts, total = estimator
+        out = np.asarray(self.sampler(rs, n), dtype='float64')
+        if total > 0:
+            observed = rs.rand(n) < total / (total + self.prior_weight)
+            out[observed] = codes[rs.choice(len(codes), size=observed.sum(), p=counts / total)]
+        return out
+
+    def log_pdf(self, values, estimator):
+        codes, counts, total = estimator
+        values = np.asarray(values, dtype='float64')
+        c = np.zeros(len(values))
+        if len(codes) > 0:
+            pos = np.clip(np.searchsorted(codes, values), 0, len(codes) - 1)
+            c = np.where(codes[pos] == values, counts[pos], 0.0)
+        return np.log((c + self.prior_weight / self.k) / (total + self.prior_weight))
+
+
+class TPESearcher(Searcher):
+    """
+    Tree-structured Parzen estimator.
+
+    The observed trials are split into the good ones, the best `gamma` of them (at most `max_good`), and the others.
+    A sample is proposed parameter by parameter along the tree of the search space (see `SpaceTemplate`): for each
+    active parameter, `n_candidates` values are drawn from the density l(x) of the good trials, and the one with the
+    largest l(x) / g(x) over the density g(x) of the other trials is assigned. A structural parameter, e.g. the
+    choice of a `ModuleChoice`, selects the branch whose parameters are proposed next. The densities of a parameter
+    are estimated from the trials in which it is active only, so conditional parameters are modeled within their
+    branches.
+
+    For parallel dispatchers, the samples pending in the searcher and those proposed earlier in a `sample_batch` are
+    counted as bad trials (a constant liar), which keeps parallel proposals apart.
+
+    References
+    ----------
+        Bergstra, James, et al. "Algorithms for Hyper-Parameter Optimization." Advances in Neural Information Processing Systems 24 (2011).
+    """
+
+    def __init__(self, space_fn, n_startup_trials=10, n_candidates=24, gamma=0.1, max_good=25, prior_weight=1.0,
+                 optimize_direction=OptimizeDirection.Minimize, space_sample_validation_fn=None, random_state=None):
+        """
+        :param space_fn: callable, required
+            A search space function which when called returns a `HyperSpace` instance
+        :param n_startup_trials: int, (default=10)
+            Number of random samples before the estimators are used.
+        :param n_candidates: int, (default=24)
+            Number of candidate values drawn from l(x) for a parameter.
+        :param gamma: float, (default=0.1)
+            Fraction of the trials which are the good ones.
+        :param max_good: int, (default=25)
+            Maximum number of the good trials.
+        :param prior_weight: float, (default=1.0)
+            Weight of the prior in the estimators, as the weight of one observation.
+        """
+        Searcher.__init__(self, space_fn=space_fn, optimize_direction=optimize_direction, use_meta_learner=False,
+                          space_sample_validation_fn=space_sample_validation_fn)
+        assert 0 < gamma < 1
+
+        self.n_startup_trials = n_startup_trials
+        self.n_candidates = n_candidates
+        self.gamma = gamma
+        self.max_good = max_good
+        self.prior_weight = prior_weight
+        self.random_state = random_state if random_state is not None else get_random_state()
+
+        self._template = None
+        self._models = {}  # label -> estimator model
+        self._columns = {}  # label -> _Column
+        self._rewards = _Column()
+        self._lies = {}  # key of pending samples -> [(label, value)]
+        self._best = None
+
+    @property
+    def parallelizable(self):
+        return True
+
+    @property
+    def template(self):
+        if self._template is None:
+            self._template = SpaceTemplate(self.space_fn, random_state=self.random_state)
+        return self._template
+
+    @staticmethod
+    def _key(space_sample):
+        return space_sample.signature, tuple(space_sample.vectors)
+
+    @staticmethod
+    def _labeled_vectors(space_sample):
+        return [(p.label, v) for p, v in zip(space_sample.get_assigned_params(), space_sample.vectors)]
+
+    def _model(self, label, p, sampler):
+        model = self._models.get(label)
+        if model is None:
+            if isinstance(p, Int) or (isinstance(p, Real) and p.prior in ('uniform', 'log_uniform', 'q_uniform')):
+                model = _NumericModel(p, self.prior_weight)
+            elif isinstance(p, Choice):
+                model = _CategoricalModel(p, self.prior_weight)
+            else:
+                model = _SparseCategoricalModel(p, sampler, self.prior_weight)
+            self._models[label] = model
+        return model
+
+    def _good_mask(self):
+        rewards = self._rewards.values
+        n = len(rewards)
+        n_good = min(max(int(math.ceil(self.gamma * n)), 1), self.max_good)
+        signed = rewards if self.optimize_direction in ['max', OptimizeDirection.Maximize] else -rewards
+        signed = np.nan_to_num(signed, nan=-np.inf)
+        mask = np.zeros(n, dtype=bool)
+        mask[np.argpartition(-signed, n_good - 1)[:n_good]] = True
+        return mask
+
+    def _liar_values(self, extra=()):
+        lies = {}
+        for space_sample in self.pending_samples:
+            key = self._key(space_sample)
+            if key not in self._lies:
+                self._lies[key] = self._labeled_vectors(space_sample)
+        keys = {self._key(s) for s in self.pending_samples}
+        for key in list(self._lies.keys()):
+            if key not in keys:
+                del self._lies[key]
+        for labeled in list(self._lies.values()) + list(extra):
+            for label, value in labeled:
+                lies.setdefault(label, []).append(value)
+        return lies
+
+    def _propose(self, good_mask, lies):
+        rs = self.random_state
+        template = self.template
+        segment = template.root
+        vectors = []
+        while True:
+            for j, p in enumerate(segment.params):
+                label = segment.labels[segment.offset + j]
+                model = self._model(label, p, segment.samplers[j])
+                column = self._columns.get(label)
+                if column is not None and column.size > 0:
+                    is_good = good_mask[column.trials]
+                    good, bad = column.values[is_good], column.values[~is_good]
+                else:
+                    good, bad = np.empty(0), np.empty(0)
+                if label in lies:
+                    bad = np.concatenate([bad, lies[label]])
+
+                if len(good) == 0:
+                    value = segment.samplers[j](rs, 1)[0]
+                else:
+                    l_estimator, g_estimator = model.estimator(good), model.estimator(bad)
+                    candidates = model.sample(rs, l_estimator, self.n_candidates)
+                    scores = model.log_pdf(candidates, l_estimator) - model.log_pdf(candidates, g_estimator)
+                    value = candidates[np.argmax(scores)]
+                vectors.append(value)
+
+            if not segment.branching:
+                break
+            numeric = segment.typed(vectors)[-1]
+            segment = template.get_child(segment, numeric, vectors)
+        return segment.signature, segment.typed(vectors)
+
+    def _template_sample(self):
+        batch = self.template.sample(1)
+        if self.is_seen_vectors(batch.signature(0), batch.vectors_of(0)):
+            return None
+        return batch.materialize(0)
+
+    def _tpe_sample(self, extra_lies=()):
+        if self._rewards.size < self.n_startup_trials:
+            return self._template_sample()
+
+        good_mask = self._good_mask()
+        lies = self._liar_values(extra_lies)
+        for _ in range(10):
+            signature, vectors = self._propose(good_mask, lies)
+            if not self.is_seen_vectors(signature, vectors):
+                return self.template.materialize(vectors)
+        return self._template_sample()  # the estimators insist on seen samples
+
+    def sample(self):
+        return self._sample_batch(1)[0]
+
+    def sample_batch(self, k):
+        """
+        Propose `k` samples at once, for dispatchers running trials in parallel.
+        """
+        return self._sample_batch(k)
+
+    def _sample_batch(self, k):
+        samples = []
+        extra_lies = []
+        for _ in range(k):
+            space_sample = self._sample_and_check(lambda: self._tpe_sample(extra_lies))
+            samples.append(space_sample)
+            extra_lies.append(self._labeled_vectors(space_sample))
+        return samples
+
+    def update_result(self, space_sample, result):
+        trial = self._rewards.size
+        reward = float(result) if result is not None else math.nan
+        self._rewards.append(reward, trial)
+        self.mark_seen(space_sample)
+        for label, value in self._labeled_vectors(space_sample):
+            column = self._columns.get(label)
+            if column is None:
+                column = self._columns[label] = _Column()
+            column.append(value, trial)
+
+        if not math.isnan(reward):
+            if self._best is None \
+                    or (self.optimize_direction in ['max', OptimizeDirection.Maximize] and reward > self._best[0]) \
+                    or (self.optimize_direction not in ['max', OptimizeDirection.Maximize] and reward < self._best[0]):
+                self._best = (reward, space_sample)
+
+    def get_best(self):
+        return self._best[1] if self._best is not None else None
+
+    def summary(self):
+        return f'TPESearcher, trials: {self._rewards.size}, parameters modeled: {len(self._models)}'
+
+    def reset(self):
+        raise NotImplementedError
+
+    def export(self):
+        raise NotImplementedError
@@ -0,0 +1,141 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import numpy as np
+
+from hypernets.core import MetaKnowledgeIndex, WarmStartCallback, get_meta_features
+from hypernets.core.meta_learner import MetaLearner
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Int, Choice
+from hypernets.core.trial import TrialHistory, Trial
+from hypernets.dispatchers.in_process_dispatcher import InProcessDispatcher
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import EvolutionSearcher, MCTSSearcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.tests import test_output_dir
+
+
+def get_space():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(p1=Int(1, 100), p2=Choice(['a', 'b', 'c']))
+    return space
+
+
+def make_trials(values):
+    trials = []
+    for i, (p1, p2, reward) in enumerate(values):
+        sample = get_space()
+        sample.assign_by_vectors([p1, p2])
+        trials.append(Trial(sample, i + 1, reward, 1.0))
+    return trials
+
+
+def make_index(path, top_n=2):
+    index = MetaKnowledgeIndex(path, top_n=top_n)
+    index.add('small', {'log_rows': 2.0, 'binary': 1.0},
+              make_trials([(10, 0, 0.7), (20, 1, 0.9), (30, 2, 0.8)]), 'max')
+    index.add('medium', {'log_rows': 3.0, 'binary': 1.0},
+              make_trials([(40, 0, 0.6), (50, 1, 0.5)]), 'max')
+    index.add('large', {'log_rows': 5.0, 'binary': 0.0},
+              make_trials([(60, 2, 0.1)]), 'max')
+    return index
+
+
+def test_meta_features():
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+    features = get_meta_features(X, y)
+    assert features['binary'] == 1.0 and features['regression'] == 0.0
+    assert abs(features['log_rows'] - np.log10(len(X))) < 1e-9
+    assert features['continuous_ratio'] == 1.0
+    assert 0.5 < features['majority_ratio'] < 0.6
+
+    X = dsutils.load_bank().head(1000)
+    y = X.pop('y')
+    features = get_meta_features(X, y)
+    assert 0 < features['categorical_ratio'] < 1
+    assert abs(features['categorical_ratio'] + features['continuous_ratio'] - 1) < 1e-9
+
+
+def test_index():
+    path = f'{test_output_dir}/meta_knowledge/index.json'
+    index = make_index(path)
+    assert [t['vectors'] for t in index.datasets['small']['trials']] == [[20, 1], [30, 2]]
+
+    query = {'log_rows': 2.2, 'binary': 1.0}
+    assert [i for i, _ in index.nearest(query, k=2)] == ['small', 'medium']
+    # the best of the nearest datasets in turn
+    assert index.suggest(query, n=3, k=2) == [(index.datasets['small']['trials'][0]['signature'], [20, 1]),
+                                              (index.datasets['medium']['trials'][0]['signature'], [40, 0]),
+                                              (index.datasets['small']['trials'][1]['signature'], [30, 2])]
+    prior = index.prior_data(query, k=1)
+    assert len(prior) == 1 and list(prior.values())[0] == ([[20, 1], [30, 2]], [0.9, 0.8])
+
+    # merged with the trials recorded before
+    index.add('small', {'log_rows': 2.0, 'binary': 1.0}, make_trials([(70, 0, 0.85)]), 'max')
+    assert [t['vectors'] for t in index.datasets['small']['trials']] == [[20, 1], [70, 0]]
+
+    index.save()
+    loaded = MetaKnowledgeIndex(path)
+    assert loaded.datasets == index.datasets
+    assert loaded.nearest(query) == index.nearest(query)
+
+
+def test_searchers_warm_start():
+    seeds = []
+    for vectors in [[20, 1], [40, 0]]:
+        sample = get_space()
+        sample.assign_by_vectors(vectors)
+        seeds.append(sample)
+
+    for searcher in [EvolutionSearcher(get_space, 5, 3, use_meta_learner=False),
+                     MCTSSearcher(get_space, use_meta_learner=False)]:
+        searcher.warm_start(seeds)
+        samples = [searcher.sample() for _ in range(4)]
+        assert [s.vectors for s in samples[:2]] == [[20, 1], [40, 0]]
+        assert all(searcher.is_seen(s) for s in samples)
+        for s in samples:
+            searcher.update_result(s, 0.5)
+
+
+def test_meta_learner_prior():
+    history = TrialHistory('max')
+    meta_learner = MetaLearner(history, 'test_meta_learner_prior', None)
+    sample = get_space()
+    sample.assign_by_vectors([20, 1])
+    meta_learner.add_prior(sample.signature, [[20, 1], [40, 0], [60, 2]], [0.9, 0.6, 0.3])
+    meta_learner.fit(sample.signature)
+    assert sample.signature in meta_learner.regressors
+
+
+def test_warm_start_callback():
+    path = f'{test_output_dir}/meta_knowledge/plain_model.json'
+    index = MetaKnowledgeIndex(path, top_n=3)
+
+    def search(X, y, max_trials):
+        searcher = EvolutionSearcher(PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False), 5, 3,
+                                     optimize_direction='max', use_meta_learner=False)
+        callback = WarmStartCallback(index, n_samples=3)
+        dispatcher = InProcessDispatcher(f'{test_output_dir}/meta_knowledge_models')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher,
+                                 callbacks=[callback])
+        hyper_model.search(X, y, X, y, max_trials=max_trials)
+        return hyper_model, callback
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+    hyper_model, callback = search(X, y, 6)
+    assert len(callback.seeds) == 0
+    assert len(index.datasets) == 1
+    top = [t['vectors'] for t in index.datasets[callback.dataset_id]['trials']]
+    assert len(top) == 3
+
+    X = dsutils.load_blood()
+    y = X.pop('Class')
+    hyper_model, callback = search(X, y, 4)
+    assert [s.vectors for s in callback.seeds] == top
+    # the seeds are the first trials
+    assert [t.space_sample.vectors for t in hyper_model.history.trials[:3]] == top
+    assert len(MetaKnowledgeIndex(path).datasets) == 2
@@ -0,0 +1,55 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import numpy as np
+
+from hypernets.core.meta_learner import MetaLearner
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Int, Real
+from hypernets.core.trial import TrialHistory, Trial
+
+
+def get_space():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(p1=Int(1, 100), p2=Real(0, 1.0))
+    return space
+
+
+def run_trials(meta_learner, history, n):
+    for i in range(n):
+        sample = get_space()
+        sample.random_sample()
+        p1, p2 = sample.vectors
+        history.append(Trial(sample, i + 1, p1 / 100 + p2, 1.0))
+        meta_learner.new_sample(sample)
+    return sample
+
+
+def test_refit_every():
+    history = TrialHistory('max')
+    ml = MetaLearner(history, 'test_dataset', None, refit_schedule='every', refit_every=5)
+    sample = run_trials(ml, history, 30)
+
+    # the trial is appended to history before new_sample, so the first fit happens at the 2nd trial
+    assert ml.fit_counter == 1 + (30 - 2) // 5
+    assert ml.predict(sample).shape == (1,)
+
+    vectors = np.array([[10, 0.1], [90, 0.9]])
+    scores = ml.predict_batch(vectors, sample.signature)
+    assert scores.shape == (2,)
+    assert scores[0] == ml.predict_batch(vectors[:1], sample.signature)[0]
+    assert (ml.predict_batch(vectors, 'not_existed', default_value=0.5) == 0.5).all()
+
+
+def test_refit_doubling_warm_start():
+    history = TrialHistory('max')
+    ml = MetaLearner(history, 'test_dataset', None, refit_schedule='doubling', warm_start=True,
+                     warm_start_rounds=10)
+    sample = run_trials(ml, history, 150)
+
+    # fitted at 2, 4, 8, 16, 32, 64, 128 samples
+    assert ml.fit_counter == 7
+    regressor = ml.regressors[sample.signature]
+    assert regressor.booster_.current_iteration() > 10
@@ -0,0 +1,79 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import numpy as np
+
+from hypernets.core.ops import Identity, ModuleChoice, Optional, Repeat, HyperInput
+from hypernets.core.search_space import HyperSpace, Int, Real, Choice, MultipleChoice, Bool
+from hypernets.core.space_template import SpaceTemplate
+from hypernets.searchers.random_searcher import RandomSearcher
+
+
+def get_space():
+    space = HyperSpace()
+    with space.as_default():
+        id1 = Identity(p1=Int(1, 10, step=3))
+        id2 = Identity(p2=Real(0.1, 1.0), p3=MultipleChoice(['x', 'y', 'z']))
+        id3 = Identity(p4=Choice(['u', 'v', 'w']), p5=Real(1, 3, prior='log_uniform', step=0.5))
+        id4 = Identity(p6=Real(0, 1, q=0.2, prior='q_uniform'))
+        mc = ModuleChoice([id2, id3])(id1)
+        opt = Optional(id4, keep_link=True)(mc)
+        id5 = Identity(p7=Bool())(opt)
+        Repeat(lambda step: Identity(p8=Int(0, 5)), repeat_times=[1, 2, 3])(id5)
+    return space
+
+
+def get_discrete_space():
+    space = HyperSpace()
+    with space.as_default():
+        hyper_input = HyperInput(name='input1')
+        id1 = Identity(a=Choice(['x', 'y', 'z']))
+        id2 = Identity(b=Int(0, 10, step=3), c=Bool(), d=MultipleChoice(['p', 'q'], num_chosen_least=0))
+        ModuleChoice([id1, id2])(hyper_input)
+        space.set_inputs(hyper_input)
+    return space
+
+
+class Test_SpaceTemplate():
+    def test_sample(self):
+        template = SpaceTemplate(get_space, random_state=np.random.RandomState(9527))
+        batch = template.sample(300)
+
+        assert len(batch) == 300
+        assert batch.vectors.shape == (300, batch.lengths.max())
+        assert len(set(batch.lengths)) > 1
+        assert len(set(batch.signature(i) for i in range(len(batch)))) == 3
+
+        for i in range(len(batch)):
+            sample = batch.materialize(i)
+            assert sample.all_assigned
+            assert sample.vectors == batch.vectors_of(i)
+            assert sample.signature == batch.signature(i)
+
+    def test_values(self):
+        template = SpaceTemplate(get_space, random_state=np.random.RandomState(1))
+        batch = template.sample(1000)
+        # the first parameter is Int(1, 10, step=3)
+        assert set(batch.vectors[:, 0]) <= {1, 4, 7, 10}
+        # the second parameter is Real(0.1, 1.0) with step 0.01
+        assert batch.vectors[:, 1].min() >= 0.1 and batch.vectors[:, 1].max() <= 1.0
+        assert np.allclose(batch.vectors[:, 1], np.round(batch.vectors[:, 1], 2))
+
+    def test_random_searcher(self):
+        searcher = RandomSearcher(get_space, sample_batch_size=16)
+        signatures = set()
+        for _ in range(40):
+            sample = searcher.sample()
+            assert sample.all_assigned
+            signatures.add(sample.signature)
+        assert len(signatures) > 1
+
+    def test_combinations(self):
+        template = SpaceTemplate(get_discrete_space, random_state=np.random.RandomState(1))
+        # 3 options in one branch, 4 values of b (0, 3, 6, 9) x 2 x 4 subsets of d in the other
+        assert template.combinations() == 3 + 4 * 2 * 4
+
+        batch = template.sample(2000)
+        keys = {(batch.signature(i), tuple(batch.vectors_of(i))) for i in range(len(batch))}
+        assert len(keys) == 35
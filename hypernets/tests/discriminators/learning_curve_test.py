@@ -0,0 +1,157 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import numpy as np
+
+from hypernets.core import TrialHistory, Trial
+from hypernets.discriminators import LearningCurveDiscriminator, PercentileDiscriminator, make_discriminator
+from hypernets.discriminators import learning_curve as learning_curve_module
+from hypernets.discriminators.learning_curve import extrapolate
+
+
+def curve(c, a, alpha, steps=100):
+    x = np.arange(1, steps + 1)
+    return c - a * np.power(x, -alpha)
+
+
+def make_history(group_id, optimize_direction='max'):
+    # fast starters converging to 0.80 - 0.84
+    history = TrialHistory(optimize_direction=optimize_direction)
+    sign = 1 if optimize_direction == 'max' else -1
+    for i in range(6):
+        scores = curve(0.80 + i * 0.008, 0.1, 1.5) * sign
+        trial = Trial(None, i, scores[-1], 0, succeeded=True)
+        trial.iteration_scores[group_id] = scores.tolist()
+        history.append(trial)
+    return history
+
+
+def test_extrapolate():
+    scores = curve(0.9, 0.4, 0.6)
+    mean, std = extrapolate(scores[:20], 100)
+    assert abs(mean - scores[-1]) < 0.01
+    assert std < 0.05
+
+    rs = np.random.RandomState(9527)
+    noisy = scores + rs.normal(scale=0.01, size=len(scores))
+    mean, noisy_std = extrapolate(noisy[:20], 100)
+    assert noisy_std > std
+    assert abs(mean - scores[-1]) < 3 * noisy_std
+
+
+def test_late_bloomer():
+    group_id = 'lr'
+    history = make_history(group_id)
+    slow = curve(0.9, 0.5, 0.5)  # below the others at first, the best at last
+    hopeless = curve(0.7, 0.1, 1.5)
+
+    percentile = PercentileDiscriminator(50, history=history, optimize_direction='max')
+    learning_curve = make_discriminator('learning_curve', history=history, optimize_direction='max')
+    assert isinstance(learning_curve, LearningCurveDiscriminator)
+
+    trajectory = slow[:10].tolist()
+    assert not percentile.is_promising(trajectory, group_id, 100)
+    assert learning_curve.is_promising(trajectory, group_id, 100)
+
+    trajectory = hopeless[:10].tolist()
+    assert not learning_curve.is_promising(trajectory, group_id, 100)
+
+    # the number of iterations of previous trials is used if unknown
+    assert learning_curve.is_promising(slow[:10].tolist(), group_id, None)
+    assert not learning_curve.is_promising(hopeless[:10].tolist(), group_id, None)
+
+
+def test_minimize():
+    group_id = 'loss'
+    history = make_history(group_id, 'min')
+    d = LearningCurveDiscriminator(threshold=0.05, top_k=3, history=history, optimize_direction='min')
+    assert d.is_promising((-curve(0.9, 0.5, 0.5)[:10]).tolist(), group_id, 100)
+    assert not d.is_promising((-curve(0.7, 0.1, 1.5)[:10]).tolist(), group_id, 100)
+
+    # not enough steps or trials
+    assert d.is_promising((-curve(0.7, 0.1, 1.5)[:3]).tolist(), group_id, 100)
+    d.bind_history(TrialHistory(optimize_direction='min'))
+    assert d.is_promising((-curve(0.7, 0.1, 1.5)[:10]).tolist(), group_id, 100)
+
+
+def test_refit_schedule(monkeypatch):
+    group_id = 'lr'
+    history = make_history(group_id)
+    d = LearningCurveDiscriminator(history=history, optimize_direction='max')
+
+    fits = []
+    _extrapolate = learning_curve_module._extrapolate
+
+    def counting(scores, end_step, curves, initials=None):
+        fits.append((len(scores), initials is not None))
+        return _extrapolate(scores, end_step, curves, initials)
+
+    monkeypatch.setattr(learning_curve_module, '_extrapolate', counting)
+    slow = curve(0.9, 0.5, 0.5, steps=1000)
+    for n in range(1, 1000):
+        assert d.is_promising(slow[:n].tolist(), group_id, 1000)
+    # refitted on a geometric schedule, from the previous fit
+    assert fits[0][0] == d.min_steps
+    assert len(fits) < 40
+    assert all(warm for _, warm in fits[1:])
+
+    # a new trial starts from the guesses
+    d.is_promising(slow[:5].tolist(), group_id, 1000)
+    assert fits[-1] == (5, False)
+
+
+def test_end_iteration_of_complete_trials():
+    group_id = 'lr'
+    history = make_history(group_id)
+    # a trial stopped early by the discriminator
+    trial = Trial(None, 6, 0.5, 0, succeeded=True)
+    trial.iteration_scores[group_id] = curve(0.6, 0.1, 1.5, steps=10).tolist()
+    trial.memo['early_stopped'] = True
+    history.append(trial)
+
+    d = LearningCurveDiscriminator(history=history, optimize_direction='max')
+    d.is_promising(curve(0.7, 0.1, 1.5)[:10].tolist(), group_id, None)
+    assert d._finals[group_id][2] == 100
+
+    # its truncated score is not a final one
+    d = LearningCurveDiscriminator(top_k=10, history=history, optimize_direction='max')
+    assert d.is_promising(curve(0.7, 0.1, 1.5)[:10].tolist(), group_id, 100)
+    assert len(d._finals[group_id][1]) == 6
+
+
+def test_concurrent_trials_warm_start(monkeypatch):
+    group_id = 'lr'
+    history = make_history(group_id)
+    d = LearningCurveDiscriminator(history=history, optimize_direction='max')
+
+    fits = []
+    _extrapolate = learning_curve_module._extrapolate
+
+    def recording(scores, end_step, curves, initials=None):
+        result = _extrapolate(scores, end_step, curves, initials)
+        fits.append((scores[0], initials, result[2]))
+        return result
+
+    monkeypatch.setattr(learning_curve_module, '_extrapolate', recording)
+    a = curve(0.9, 0.5, 0.5)
+    b = curve(0.85, 0.3, 0.8)
+    # two trials of the group running at the same time, each fit starts from the previous fit of its trial
+    for n in (5, 6, 7):
+        d.is_promising(a[:n].tolist(), group_id, 100)
+        d.is_promising(b[:n].tolist(), group_id, 100)
+    assert fits[0][1] is None and fits[1][1] is None
+    for i in range(2, len(fits)):
+        assert fits[i][0] == fits[i - 2][0]
+        assert fits[i][1] is fits[i - 2][2]
+
+
+def test_make_discriminator_with_default_options():
+    # ExperimentCfg.experiment_discriminator_options
+    options = {'percentile': 50, 'min_trials': 5, 'min_steps': 5, 'stride': 1}
+    learning_curve = make_discriminator('learning_curve', optimize_direction='max', **options)
+    assert isinstance(learning_curve, LearningCurveDiscriminator)
+    assert learning_curve.min_trials == 5 and learning_curve.optimize_direction == 'max'
+
+    progressive = make_discriminator('progressive', **options)
+    assert progressive.percentile_list == [0]
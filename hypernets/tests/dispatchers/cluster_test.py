@@ -0,0 +1,265 @@
+import os
+import socket
+import tempfile
+import time
+from threading import Thread
+
+import pytest
+
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Choice, Int, Real
+from hypernets.dispatchers.cfg import DispatchCfg as c
+from hypernets.dispatchers.cluster.executor_dispatcher import space_from_vectors
+from hypernets.dispatchers.cluster.grpc.search_driver_client import SearchDriverClient
+from hypernets.dispatchers.cluster.grpc.search_driver_service import serve
+from hypernets.searchers import RandomSearcher, HyperbandSearcher
+
+
+def get_space():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(a=Int(1, 100), b=Real(0.0, 1.0), c=Choice(['x', 'y', 'z']))
+    return space
+
+
+def _free_address():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f'127.0.0.1:{s.getsockname()[1]}'
+
+
+def test_lease():
+    work_dir = tempfile.mkdtemp()
+    spaces_dir = f'{work_dir}/spaces'
+    address = _free_address()
+    reported = []
+    server, service = serve(address, 'search-lease', spaces_dir, f'{work_dir}/models',
+                            on_report=lambda item: reported.append(item.space_id))
+    try:
+        searcher = RandomSearcher(get_space)
+        samples = {}
+        for i in range(5):
+            space_sample = searcher.sample()
+            samples[space_sample.space_id] = space_sample
+            service.add(i + 1, space_sample)
+        service.finish()
+
+        client = SearchDriverClient(address, 'search-lease')
+        client.ping(wait=True)
+        sch = client.lease('search-lease', prefetch=2)
+        item = next(sch)
+        leased = 0
+        while item is not None and item.is_ok():
+            leased += 1
+            # the next trial is leased before this one is reported, but no more than prefetched
+            assert len(service.current_search.running_items) <= 2
+
+            space_sample = space_from_vectors(get_space, item.vectors)
+            assert space_sample.vectors == samples[item.space_id].vectors
+            assert space_sample.signature == samples[item.space_id].signature
+
+            item.success, item.reward = True, 0.5
+            try:
+                item = sch.send(item)
+            except StopIteration:
+                break
+        sch.close()
+
+        assert leased == 5
+        assert not os.path.exists(spaces_dir) or len(os.listdir(spaces_dir)) == 0
+    finally:
+        server.stop(None)
+
+
+def test_prefetched_elapsed():
+    work_dir = tempfile.mkdtemp()
+    address = _free_address()
+    reported = {}
+    server, service = serve(address, 'search-elapsed', f'{work_dir}/spaces', f'{work_dir}/models',
+                            on_report=lambda item: reported.update({item.trial_no: item.elapsed}))
+    try:
+        searcher = RandomSearcher(get_space)
+        for i in range(4):
+            service.add(i + 1, searcher.sample())
+        service.finish()
+
+        client = SearchDriverClient(address, 'search-elapsed')
+        client.ping(wait=True)
+        sch = client.lease('search-elapsed', prefetch=2)
+        item = next(sch)
+        while item is not None and item.is_ok():
+            time.sleep(0.2)
+            item.success, item.reward = True, 0.5
+            if item.trial_no == 1:
+                item.elapsed = 0.123  # measured by the executor
+            try:
+                item = sch.send(item)
+            except StopIteration:
+                break
+        sch.close()
+        client.close()
+    finally:
+        server.stop(None)
+
+    assert sorted(reported.keys()) == [1, 2, 3, 4]
+    assert abs(reported[1] - 0.123) < 1e-9
+    # the time waiting as prefetched behind the trial before is not counted
+    assert all(0.15 < reported[i] < 0.35 for i in [2, 3, 4])
+    assert len(service.current_search.elapsed) == 4
+
+
+def test_no_duplicate_of_reported():
+    address, server, service = _serve(1)
+    search = service.current_search
+    try:
+        item = search.get_next_item('executor-1', wait_hook=lambda: True)
+        item.straggler = True
+        assert search._take_duplicate('executor-2') is item
+        # reported, but the report is still being handled
+        item.report_at = time.time()
+        assert search._take_duplicate('executor-2') is None
+    finally:
+        server.stop(None)
+
+
+def _run_executor(address, search_id, durations, received, heartbeat_interval=0):
+    client = SearchDriverClient(address, search_id)
+    client.ping(wait=True)
+    sch = client.lease(search_id, prefetch=1, heartbeat_interval=heartbeat_interval)
+    try:
+        item = next(sch)
+        while item is not None and item.is_ok():
+            received.append(item.trial_no)
+            time.sleep(durations(item.trial_no, received.count(item.trial_no)))
+            item.success, item.reward = True, 0.5
+            try:
+                item = sch.send(item)
+            except StopIteration:
+                break
+    finally:
+        sch.close()
+        client.close()
+
+
+def _serve(n):
+    work_dir = tempfile.mkdtemp()
+    address = _free_address()
+    server, service = serve(address, 'search-x', f'{work_dir}/spaces', f'{work_dir}/models')
+    searcher = RandomSearcher(get_space)
+    for i in range(n):
+        service.add(i + 1, searcher.sample())
+    service.finish()
+    return address, server, service
+
+
+def test_speculative():
+    options = dict(cluster_deadline_min_trials=3, cluster_deadline_factor=2.0, cluster_speculative_copies=1)
+    saved = {k: getattr(c, k) for k in options.keys()}
+    for k, v in options.items():
+        setattr(c, k, v)
+    try:
+        address, server, service = _serve(6)
+
+        def durations(trial_no, copy_no):
+            # the first copy of the last trial straggles
+            return 2.0 if trial_no == 6 and copy_no == 1 else 0.05
+
+        received = []
+        executors = [Thread(target=_run_executor, args=(address, 'search-x', durations, received))
+                     for _ in range(2)]
+        for t in executors:
+            t.start()
+
+        # the duplicate finishes the search before the straggler
+        assert service.wait_all_reported(timeout=1.5)
+        for t in executors:
+            t.join()
+        server.stop(None)
+
+        stats = service.current_search.stats
+        assert received.count(6) == 2
+        assert stats['stragglers'] >= 1
+        assert stats['duplicates'] == 1
+        assert stats['wasted_seconds'] > 1.0
+    finally:
+        for k, v in saved.items():
+            setattr(c, k, v)
+
+
+def test_heartbeat_expire():
+    saved = c.cluster_heartbeat_timeout
+    c.cluster_heartbeat_timeout = 0.5
+    try:
+        address, server, service = _serve(2)
+        received = []
+
+        # a hung executor: no heartbeat and never reports
+        hung = Thread(target=_run_executor, args=(address, 'search-x', lambda *args: 3.0, []), daemon=True)
+        hung.start()
+        time.sleep(0.2)
+        alive = Thread(target=_run_executor, args=(address, 'search-x', lambda *args: 0.05, received, 0.1))
+        alive.start()
+
+        # the trial of the hung executor is dispatched again
+        assert service.wait_all_reported(timeout=2.5)
+        alive.join()
+        server.stop(None)
+        assert len(received) == 2
+    finally:
+        c.cluster_heartbeat_timeout = saved
+
+
+def test_driver_pending():
+    from hypernets.dispatchers.cluster.driver_dispatcher import DriverDispatcher
+    from hypernets.dispatchers.cluster.executor_dispatcher import ExecutorDispatcher
+    from hypernets.dispatchers.scheduler import TrialScheduler
+    from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+    from hypernets.tabular.datasets import dsutils
+
+    class RecordingScheduler(TrialScheduler):
+        def __init__(self):
+            super(RecordingScheduler, self).__init__()
+            self.pending = []
+
+        def sample(self):
+            self.pending.append(len(self.hyper_model.searcher.pending_samples))
+            return super(RecordingScheduler, self).sample()
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+    address = _free_address()
+    work_dir = tempfile.mkdtemp()
+
+    def search(dispatcher):
+        searcher = RandomSearcher(PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False),
+                                  optimize_direction='max')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+        hyper_model.search(X, y, X, y, max_trials=4, search_id='search-pending')
+        return hyper_model
+
+    scheduler = RecordingScheduler()
+    executor = Thread(target=search, args=(ExecutorDispatcher(address),))
+    executor.start()
+    hyper_model = search(DriverDispatcher(address, work_dir, scheduler=scheduler))
+    executor.join()
+
+    assert len(hyper_model.history.trials) == 4
+    # the trials dispatched are pending until they are reported, the scheduler budgets them
+    assert max(scheduler.pending) > 0
+    assert len(hyper_model.searcher.pending_samples) == 0
+
+
+def test_driver_refuses_budgets():
+    from hypernets.dispatchers.cluster.driver_dispatcher import DriverDispatcher
+    from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+    from hypernets.tabular.datasets import dsutils
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+    searcher = HyperbandSearcher(PlainSearchSpace(enable_dt=True, enable_lr=False, enable_nn=False),
+                                 optimize_direction='max')
+    dispatcher = DriverDispatcher(_free_address(), tempfile.mkdtemp())
+    hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+    # the executors would train every rung at full budget
+    with pytest.raises(ValueError, match='budgets'):
+        hyper_model.search(X, y, X, y, max_trials=4, search_id='search-budgets')
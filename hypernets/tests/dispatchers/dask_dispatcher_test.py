@@ -0,0 +1,97 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import make_searcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.tests import test_output_dir
+from hypernets.tests.tabular.tb_dask import if_dask_ready
+
+
+@if_dask_ready
+def test_searcher_feedback():
+    from dask.distributed import Client, LocalCluster
+    from hypernets.dispatchers.dask.dask_dispatcher import DaskDispatcher
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+    searcher = make_searcher('evolution', search_space_fn=search_space, optimize_direction='max',
+                             population_size=4, sample_size=2)
+
+    with LocalCluster(processes=False, n_workers=1, threads_per_worker=2) as cluster, Client(cluster):
+        dispatcher = DaskDispatcher(f'{test_output_dir}/dask_dispatcher')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+        hyper_model.search(X, y, X, y, max_trials=8)
+
+    trials = hyper_model.history.trials
+    assert len(trials) >= 6
+    assert len(set(tuple(t.space_sample.vectors) for t in trials)) == len(trials)
+    # results are fed back to the searcher of the driver
+    assert searcher.population.length == min(len([t for t in trials if t.succeeded]), 4)
+    assert len(searcher.pending_samples) == 0
+
+
+@if_dask_ready
+def test_scatter_once():
+    import dask.dataframe as dd
+    from dask.distributed import Client, LocalCluster
+    from hypernets.dispatchers.dask.dask_dispatcher import DaskDispatcher
+    from hypernets.tests.model.plain_model_test import create_plain_model
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    with LocalCluster(processes=False, n_workers=2, threads_per_worker=1) as cluster, Client(cluster):
+        dispatcher = DaskDispatcher(f'{test_output_dir}/dask_dispatcher')
+        hyper_model = create_plain_model()
+        hyper_model.dispatcher = dispatcher
+        hyper_model.search(X, y, X, y, max_trials=4)
+
+        stats = dispatcher.stats
+        assert stats['scattered_bytes'] > X.memory_usage().sum() * 2
+        assert len(stats['trial_bytes']) == len(hyper_model.history.trials)
+        # only vectors and results are transferred for trials
+        assert max(stats['trial_bytes'].values()) < X.memory_usage().sum()
+
+        ddf_X = dd.from_pandas(X, npartitions=2)
+        ddf_y = dd.from_pandas(y, npartitions=2)
+        hyper_model = create_plain_model(with_dask=True, with_encoder=True)
+        hyper_model.dispatcher = DaskDispatcher(f'{test_output_dir}/dask_dispatcher')
+        hyper_model.search(ddf_X, ddf_y, ddf_X, ddf_y, max_trials=2)
+        assert any(t.succeeded for t in hyper_model.history.trials)
+
+
+@if_dask_ready
+def test_discriminator_history():
+    from dask.distributed import Client, LocalCluster
+    from hypernets.core.trial import Trial
+    from hypernets.discriminators import PercentileDiscriminator
+    from hypernets.dispatchers.dask.dask_dispatcher import DaskDispatcher, _sync_history
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+    searcher = make_searcher('random', search_space_fn=search_space, optimize_direction='max')
+    discriminator = PercentileDiscriminator(50, min_trials=3, optimize_direction='max')
+
+    with LocalCluster(processes=False, n_workers=2, threads_per_worker=1) as cluster, Client(cluster):
+        dispatcher = DaskDispatcher(f'{test_output_dir}/dask_dispatcher')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher,
+                                 discriminator=discriminator)
+        hyper_model.search(X, y, X, y, max_trials=6)
+
+        # the model is scattered once, trials only carry the trials reported since the last sync
+        assert len(hyper_model.history.trials) >= 4
+        assert max(dispatcher.stats['trial_bytes'].values()) < X.memory_usage().sum()
+
+    # the remote history is rebuilt from the reported trials, the ones it has are skipped
+    remote = PlainModel(searcher=make_searcher('random', search_space_fn=search_space), discriminator=None)
+    trials = [Trial(None, i + 1, 0.5, 1) for i in range(4)]
+    assert _sync_history(remote, 0, trials[:2]) == 2
+    assert _sync_history(remote, 1, trials[1:3]) == 3
+    assert _sync_history(remote, 3, trials[3:]) == 4
+    assert [t.trial_no for t in remote.history.trials] == [1, 2, 3, 4]
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import os
+import time
+
+from hypernets.core import TrialHistory
+from hypernets.dispatchers.multi_process_dispatcher import MultiProcessDispatcher
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import make_searcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.tests import test_output_dir
+
+
+class FaultyPlainModel(PlainModel):
+    def _fit_trial(self, space_sample, trial_no, *args, **kwargs):
+        if trial_no == 2:
+            os._exit(1)
+        if trial_no == 3:
+            time.sleep(30)
+        return super()._fit_trial(space_sample, trial_no, *args, **kwargs)
+
+
+class HistoryPlainModel(PlainModel):
+    def _fit_trial(self, space_sample, trial_no, *args, **kwargs):
+        trial = super()._fit_trial(space_sample, trial_no, *args, **kwargs)
+        trial.memo['history_size'] = len(self.history.trials)
+        return trial
+
+
+def run_search(model_cls, max_trials, trial_timeout=0):
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+    searcher = make_searcher('random', search_space_fn=search_space, optimize_direction='max')
+    dispatcher = MultiProcessDispatcher(f'{test_output_dir}/multi_process_models', workers=2,
+                                        trial_timeout=trial_timeout)
+    hyper_model = model_cls(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+    hyper_model.search(X, y, X, y, max_trials=max_trials)
+    return hyper_model
+
+
+def test_search():
+    hyper_model = run_search(PlainModel, 6)
+    history = hyper_model.history
+
+    assert isinstance(history, TrialHistory)
+    assert sorted(t.trial_no for t in history.trials) == list(range(1, len(history.trials) + 1))
+    assert len(history.trials) >= 5
+    assert all(t.succeeded for t in history.trials)
+    assert hyper_model.get_best_trial().reward > 0.5
+    assert hyper_model.load_estimator(hyper_model.get_best_trial().model_file) is not None
+
+
+def test_worker_history():
+    hyper_model = run_search(HistoryPlainModel, 8)
+    # the discriminator in a worker sees the trials reported before its task, two workers run at most one other
+    for trial in hyper_model.history.trials:
+        assert trial.memo['history_size'] >= trial.trial_no - 2
+
+
+def test_crash_and_timeout():
+    start = time.time()
+    hyper_model = run_search(FaultyPlainModel, 5, trial_timeout=5)
+    trials = {t.trial_no: t for t in hyper_model.history.trials}
+
+    assert time.time() - start < 25
+    assert not trials[2].succeeded
+    assert not trials[3].succeeded
+    assert trials[1].succeeded
+    assert sum(t.succeeded for t in trials.values()) >= 2
+
+
+def test_search_without_shared_memory(monkeypatch):
+    # python < 3.8, the data is pickled to each worker
+    from hypernets.utils import shared_data
+    monkeypatch.setattr(shared_data, 'shared_memory', None)
+
+    hyper_model = run_search(PlainModel, 3)
+    assert all(t.succeeded for t in hyper_model.history.trials)
+    assert hyper_model.get_best_trial().reward > 0.5
@@ -0,0 +1,145 @@
+import gzip
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hypernets.dispatchers.predict.grpc.predict_client import PredictClient
+from hypernets.dispatchers.predict.grpc.predict_service import serve
+from hypernets.dispatchers.predict.predict_helper import PredictHelper
+from hypernets.tests.dispatchers.cluster_test import _free_address
+from hypernets.tests.dispatchers.predict_service_test import _prepare
+
+
+def _predict(data_file, result_file, chunk_bytes=1000, chunk_line_limit=None, **kwargs):
+    X, model, model_file, temp_dir = _prepare()
+    address = _free_address()
+    server, service = serve(address, model_file=model_file, workers=2)
+    try:
+        data_file, result_file = f'{temp_dir}/{data_file}', f'{temp_dir}/{result_file}'
+        X.to_csv(data_file, index=False)
+        code = PredictHelper([address, address], **kwargs).predict(data_file, result_file, chunk_line_limit, chunk_bytes)
+        return code, result_file, X, model, address
+    finally:
+        server.stop(None)
+        service.pool.close()
+
+
+def test_predict():
+    for data_file, result_file in [('data.csv', 'result.csv'), ('data.csv.gz', 'result.csv.gz')]:
+        code, result_file, X, model, _ = _predict(data_file, result_file, max_in_flight=2)
+        assert code == 0
+        assert not os.path.exists(f'{result_file}.progress')
+
+        result = pd.read_csv(result_file, header=None).values
+        assert np.allclose(result, model.predict_proba(X))
+        assert not os.path.exists(f'{result_file}.part')
+
+        # as pandas formats the predictions, without loss of precision
+        assert np.allclose(result, model.predict_proba(X), rtol=1e-12, atol=0)
+        with (gzip.open if result_file.endswith('.gz') else open)(result_file, 'rb') as f:
+            assert not f.readline().startswith(b' ')
+
+
+_PREDICT_SCRIPT = """
+import csv
+import sys
+
+with open(sys.argv[1], newline='') as f, open(sys.argv[2], 'w', newline='') as r:
+    rows = csv.reader(f)
+    next(rows)
+    for row in rows:
+        r.write(row[0] + (',pos' if float(row[0]) + float(row[1]) > 0 else ',neg') + '\\n')
+"""
+
+
+def test_predict_cmd():
+    X, _, _, temp_dir = _prepare()
+    script = f'{temp_dir}/predict.py'
+    with open(script, 'w') as f:
+        f.write(_PREDICT_SCRIPT)
+    data_file, result_file = f'{temp_dir}/data.csv', f'{temp_dir}/result.csv'
+    X.to_csv(data_file, index=False)
+
+    address = _free_address()
+    server, service = serve(address, cmd=f'{sys.executable} {script}')
+    try:
+        code = PredictHelper([address, address], max_in_flight=4).predict(data_file, result_file, chunk_bytes=1000)
+    finally:
+        server.stop(None)
+    assert code == 0
+
+    # the results of the command are merged verbatim, labels and all
+    with open(data_file, 'rb') as f:
+        f.readline()
+        lines = f.read().splitlines()
+    with open(result_file, 'rb') as f:
+        result = f.read().splitlines()
+    assert len(result) == len(X)
+    assert [r.split(b',')[0] for r in result] == [line.split(b',')[0] for line in lines]
+    assert [r.split(b',')[1] for r in result] == [b'pos' if a + b > 0 else b'neg' for a, b in X[['a', 'b']].values]
+
+
+def test_split():
+    X, _, _, temp_dir = _prepare()
+    data_file = f'{temp_dir}/data.csv'
+    X.to_csv(data_file, index=False)
+
+    chunks = [chunk for _, chunk in PredictHelper.split(data_file, 1000)]
+    assert len(chunks) > 1
+    assert sum(c.rows for c in chunks) == len(X)
+    assert all(c.data.endswith(b'\n') for c in chunks)
+    assert [c.start for c in chunks[1:]] == [c.end for c in chunks[:-1]]
+    with open(data_file, 'rb') as f:
+        content = f.read()
+    assert content[chunks[3].start:chunks[3].end] == chunks[3].data
+
+    # chunks of lines, as before chunk_bytes
+    chunks = [chunk for _, chunk in PredictHelper.split(data_file, None, chunk_line_limit=7)]
+    assert [c.rows for c in chunks] == [7] * (len(X) // 7) + ([len(X) % 7] if len(X) % 7 else [])
+    assert b''.join(c.data for c in chunks) == content[chunks[0].start:]
+
+
+def test_predict_line_chunks():
+    with pytest.warns(DeprecationWarning):
+        code, result_file, X, model, _ = _predict('data.csv', 'result.csv', chunk_bytes=None, chunk_line_limit=50)
+    assert code == 0
+    assert np.allclose(pd.read_csv(result_file, header=None).values, model.predict_proba(X))
+
+
+def test_resume(monkeypatch):
+    predict_batch = PredictClient.predict_batch
+    calls = []
+
+    def failing_predict_batch(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) > 5:
+            raise RuntimeError('crashed')
+        return predict_batch(self, *args, **kwargs)
+
+    monkeypatch.setattr(PredictClient, 'predict_batch', failing_predict_batch)
+    code, result_file, X, model, _ = _predict('data.csv', 'result.csv', retry_limit=1)
+    assert code == 1
+    assert os.path.exists(f'{result_file}.progress')
+
+    calls.clear()
+    monkeypatch.setattr(PredictClient, 'predict_batch', predict_batch)
+    temp_dir = os.path.dirname(result_file)
+    _, model, model_file, _ = _prepare()
+    address = _free_address()
+    server, service = serve(address, model_file=model_file, workers=1)
+    try:
+        chunks = len(list(PredictHelper.split(f'{temp_dir}/data.csv', 1000)))
+        monkeypatch.setattr(PredictClient, 'predict_batch',
+                            lambda self, *a, **kw: calls.append(1) or predict_batch(self, *a, **kw))
+        code = PredictHelper([address]).predict(f'{temp_dir}/data.csv', result_file, chunk_bytes=1000)
+    finally:
+        server.stop(None)
+        service.pool.close()
+
+    assert code == 0
+    assert len(calls) == chunks - 5  # the chunks done before the crash are skipped
+    result = pd.read_csv(result_file, header=None).values
+    assert np.allclose(result, model.predict_proba(X))
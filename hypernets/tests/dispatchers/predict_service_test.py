@@ -0,0 +1,132 @@
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from hypernets.dispatchers.predict.grpc.predict_client import PredictClient
+from hypernets.dispatchers.predict.grpc.predict_service import serve
+from hypernets.dispatchers.predict.model_pool import ModelPool
+from hypernets.tests.dispatchers.cluster_test import _free_address
+
+
+def _prepare():
+    rs = np.random.RandomState(9527)
+    X = pd.DataFrame(rs.normal(size=(300, 4)), columns=['a', 'b', 'c', 'd'])
+    y = (X['a'] + X['b'] > 0).astype('int')
+    model = LogisticRegression().fit(X, y)
+
+    temp_dir = tempfile.mkdtemp()
+    model_file = f'{temp_dir}/model.pkl'
+    with open(model_file, 'wb') as f:
+        pickle.dump(model, f)
+    return X, model, model_file, temp_dir
+
+
+def test_model_pool_batching():
+    X, model, model_file, _ = _prepare()
+    pool = ModelPool(model_file, workers=1)
+    try:
+        chunks = [X.iloc[i:i + 10] for i in range(0, len(X), 10)]
+        futures = [pool.submit(chunk) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            assert np.allclose(future.result(), model.predict_proba(chunk))
+        # requests queued while the worker was busy are predicted together
+        assert pool.requests == len(chunks)
+        assert pool.batches < len(chunks)
+
+        assert (pool.predict(X, proba=False) == model.predict(X)).all()
+    finally:
+        pool.close()
+
+
+class _CrashModel(object):
+    def predict_proba(self, X):
+        if 'crash' in X.columns:
+            os._exit(3)
+        return np.zeros((len(X), 2))
+
+
+def test_model_pool_batch_with_bad_request():
+    X, model, model_file, _ = _prepare()
+    pool = ModelPool(model_file, workers=1, batch_wait=0.5)
+    try:
+        chunks = [X.iloc[i:i + 10] for i in range(0, 50, 10)]
+        bad = X.iloc[:10].drop(columns=['d'])
+        futures = [pool.submit(chunk) for chunk in chunks[:2]] + [pool.submit(bad)] \
+                  + [pool.submit(chunk) for chunk in chunks[2:]]
+        with pytest.raises(RuntimeError):
+            futures[2].result()
+        # the other requests of the batch are predicted alone
+        for chunk, future in zip(chunks, futures[:2] + futures[3:]):
+            assert np.allclose(future.result(), model.predict_proba(chunk))
+    finally:
+        pool.close()
+
+
+def test_model_pool_worker_crash():
+    temp_dir = tempfile.mkdtemp()
+    model_file = f'{temp_dir}/model.pkl'
+    with open(model_file, 'wb') as f:
+        pickle.dump(_CrashModel(), f)
+
+    X = pd.DataFrame({'a': [1.0, 2.0]})
+    pool = ModelPool(model_file, workers=1)
+    try:
+        with pytest.raises(RuntimeError, match='exited'):
+            pool.predict(X.rename(columns={'a': 'crash'}))
+        assert pool.predict(X).shape == (2, 2)  # restarted
+
+        # the restart fails, the requests fail rather than hang
+        os.remove(model_file)
+        with pytest.raises(RuntimeError, match='exited'):
+            pool.submit(X.rename(columns={'a': 'crash'})).result(timeout=60)
+        with pytest.raises(RuntimeError, match='restart'):
+            pool.submit(X).result(timeout=60)
+    finally:
+        pool.close()
+
+
+def test_predict_batch():
+    X, model, model_file, temp_dir = _prepare()
+    address = _free_address()
+    server, service = serve(address, model_file=model_file, workers=2)
+    try:
+        data_files = []
+        for i in range(0, len(X), 50):
+            data_file = f'{temp_dir}/data_{i}.csv'
+            X.iloc[i:i + 50].to_csv(data_file, index=False)
+            data_files.append(data_file)
+
+        client = PredictClient(address)
+        with ThreadPoolExecutor(max_workers=len(data_files)) as executor:
+            results = list(executor.map(lambda f: client.predict_batch(data_file=f), data_files))
+        assert np.allclose(np.vstack(results), model.predict_proba(X))
+
+        # the legacy request with files
+        code = client.predict(data_files[0], f'{temp_dir}/result.csv')
+        assert code == 0
+        result = pd.read_csv(f'{temp_dir}/result.csv', header=None).values
+        assert np.allclose(result, model.predict_proba(X.iloc[:50]))
+    finally:
+        server.stop(None)
+        service.pool.close()
+
+
+def test_predict_arrow():
+    pytest.importorskip('pyarrow')
+
+    X, model, model_file, temp_dir = _prepare()
+    address = _free_address()
+    server, service = serve(address, model_file=model_file, workers=1)
+    try:
+        client = PredictClient(address)
+        assert np.allclose(client.predict_batch(data=X), model.predict_proba(X))
+        assert (client.predict_batch(data=X, proba=False) == model.predict(X)).all()
+    finally:
+        server.stop(None)
+        service.pool.close()
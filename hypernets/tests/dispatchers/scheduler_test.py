@@ -0,0 +1,156 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import math
+
+from hypernets.core import TrialHistory
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Int, Choice
+from hypernets.core.trial import Trial
+from hypernets.dispatchers.in_process_dispatcher import InProcessDispatcher
+from hypernets.dispatchers.scheduler import CostAwareScheduler, TrialCostModel
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.model import HyperModel
+from hypernets.searchers import make_searcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.tests import test_output_dir
+
+MB = 1024 * 1024
+
+
+def space_fn():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(n=Int(1, 100), kind=Choice(['small', 'large']))
+    return space
+
+
+def cost_of(space_sample):
+    # a synthetic cost: runtime and memory grow with `n`, 'large' doubles them
+    params = {p.alias.split('.')[-1]: p.value for p in space_sample.get_assigned_params()}
+    factor = 2.0 if params['kind'] == 'large' else 1.0
+    return params['n'] * factor, params['n'] * factor * 10 * MB
+
+
+def make_scheduler(**kwargs):
+    searcher = make_searcher('random', search_space_fn=space_fn)
+    hyper_model = HyperModel(searcher)
+    scheduler = CostAwareScheduler(cost_model=TrialCostModel(min_trials=10), **kwargs)
+    scheduler.bind(hyper_model)
+    for i in range(40):
+        space_sample = searcher.sample()
+        elapsed, rss = cost_of(space_sample)
+        trial = Trial(space_sample, i, 0.5, elapsed)
+        trial.memo.update(peak_rss=rss, cpu_seconds=elapsed)
+        scheduler.observe(trial)
+    return scheduler, hyper_model
+
+
+def test_cost_model():
+    scheduler, hyper_model = make_scheduler()
+    errors = []
+    for _ in range(20):
+        space_sample = hyper_model.searcher.sample()
+        elapsed, rss, cores = scheduler.cost_model.predict(space_sample)
+        expected_elapsed, expected_rss = cost_of(space_sample)
+        errors.append(abs(math.log(elapsed) - math.log(expected_elapsed)))
+        assert abs(cores - 1.0) < 0.2
+    assert sum(errors) / len(errors) < 0.5
+
+
+def test_longest_first():
+    scheduler, hyper_model = make_scheduler(lookahead=8)
+    scheduler._fill()
+    predicted = sorted(cost[0] for _, cost in scheduler._buffer)
+    space_sample = scheduler.sample()
+    assert scheduler.cost_model.predict(space_sample)[0] == predicted[-1]
+    assert not hyper_model.searcher.is_pending(space_sample)  # pending once dispatched
+    scheduler.release()
+    assert len(hyper_model.searcher.pending_samples) == 0
+
+
+def test_refuse_and_pack():
+    scheduler, hyper_model = make_scheduler(lookahead=4, memory_limit=500 * MB, memory_budget=1000 * MB)
+    running = []
+    while True:
+        space_sample = scheduler.sample()
+        if space_sample is None:
+            break
+        hyper_model.searcher.add_pending(space_sample)
+        running.append(space_sample)
+        assert len(running) < 100
+
+    # the running trials fit the budget, and nothing predicted over the limit is run
+    predicted = [scheduler.cost_model.predict(s)[1] for s in running]
+    assert max(predicted) <= 500 * MB
+    assert sum(predicted) <= 1000 * MB
+    assert len(scheduler.refused) > 0
+    assert all(cost_of(s)[1] > 300 * MB for s in scheduler.refused)
+
+    # resources are released by finished trials
+    for s in running:
+        hyper_model.searcher.remove_pending(s)
+        trial = Trial(s, 0, 0.5, cost_of(s)[0])
+        scheduler.observe(trial)
+    assert scheduler.sample() is not None
+
+
+def test_in_process_search():
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+    searcher = make_searcher('random', search_space_fn=search_space, optimize_direction='max')
+    scheduler = CostAwareScheduler(cost_model=TrialCostModel(min_trials=3))
+    dispatcher = InProcessDispatcher(f'{test_output_dir}/scheduler_models', scheduler=scheduler)
+    hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+    hyper_model.search(X, y, X, y, max_trials=8)
+
+    history = hyper_model.history
+    assert isinstance(history, TrialHistory)
+    assert len(history.trials) >= 6
+    assert all(t.memo['peak_rss'] > 0 for t in history.trials)
+    assert scheduler.cost_model.ready
+    assert len(searcher.pending_samples) == 0
+
+
+def test_fifo_no_monitor():
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+    searcher = make_searcher('random', search_space_fn=search_space, optimize_direction='max')
+    dispatcher = InProcessDispatcher(f'{test_output_dir}/scheduler_models')
+    hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+    hyper_model.search(X, y, X, y, max_trials=3)
+
+    # the resources are only measured for the cost-aware scheduler
+    assert hyper_model.monitor_resources is False
+    assert all('peak_rss' not in t.memo for t in hyper_model.history.trials)
+
+
+class InterruptedPlainModel(PlainModel):
+    def _run_trial(self, space_sample, trial_no, *args, **kwargs):
+        if trial_no == 5:
+            raise KeyboardInterrupt()
+        return super()._run_trial(space_sample, trial_no, *args, **kwargs)
+
+
+def test_release_on_interrupt():
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+    searcher = make_searcher('random', search_space_fn=search_space, optimize_direction='max')
+    scheduler = CostAwareScheduler(cost_model=TrialCostModel(min_trials=3))
+    dispatcher = InProcessDispatcher(f'{test_output_dir}/scheduler_models', scheduler=scheduler)
+    hyper_model = InterruptedPlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+    try:
+        hyper_model.search(X, y, X, y, max_trials=8)
+    except KeyboardInterrupt:
+        pass
+
+    # the samples buffered by the scheduler are not left pending
+    assert len(hyper_model.history.trials) == 4
+    assert len(searcher.pending_samples) == 0
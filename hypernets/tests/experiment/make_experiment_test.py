@@ -14,6 +14,23 @@ def test_experiment_with_blood_simple():
     assert estimator is not None
 
 
+def test_experiment_with_learning_curve_discriminator():
+    from hypernets.discriminators import LearningCurveDiscriminator
+    from hypernets.experiment.cfg import ExperimentCfg
+
+    df = dsutils.load_blood()
+    discriminator = ExperimentCfg.experiment_discriminator
+    try:
+        # with the default experiment_discriminator_options
+        ExperimentCfg.experiment_discriminator = 'learning_curve'
+        experiment = make_experiment(PlainModel, df, target='Class', search_space=PlainSearchSpace())
+    finally:
+        ExperimentCfg.experiment_discriminator = discriminator
+    assert isinstance(experiment.hyper_model.discriminator, LearningCurveDiscriminator)
+    estimator = experiment.run(max_trials=3)
+    assert estimator is not None
+
+
 def test_experiment_with_blood_down_sample():
     df = dsutils.load_blood()
     experiment = make_experiment(PlainModel, df, target='Class', search_space=PlainSearchSpace(),
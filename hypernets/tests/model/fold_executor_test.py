@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.model import CrossValidationEstimator
+from hypernets.model.cfg import ModelCfg
+from hypernets.model.fold_executor import FoldExecutor, ThreadFoldExecutor, ProcessFoldExecutor, \
+    get_fold_executor, set_concurrent_trials
+from hypernets.searchers import make_searcher
+from hypernets.tabular.datasets import dsutils
+
+
+class EvalSetLogisticRegression(LogisticRegression):
+    def fit(self, X, y, eval_set=None, **kwargs):
+        return super().fit(X, y, **kwargs)
+
+
+def _data():
+    rs = np.random.RandomState(9527)
+    X = pd.DataFrame(rs.normal(size=(500, 5)), columns=list('abcde'))
+    y = (X['a'] + X['b'] > 0).astype('int')
+    return X, y
+
+
+def test_cross_validation_estimator():
+    X, y = _data()
+    results = []
+    for executor in (FoldExecutor(), ThreadFoldExecutor(3), ProcessFoldExecutor(3)):
+        est = CrossValidationEstimator(EvalSetLogisticRegression(), 'binary', num_folds=5, fold_executor=executor)
+        est.fit(X, y)
+        results.append((est.oof_, est.predict_proba(X)))
+        assert len(est.estimators_) == 5
+        assert list(est.classes_) == [0, 1]
+
+    oof, proba = results[0]
+    for other_oof, other_proba in results[1:]:
+        assert np.allclose(oof, other_oof)
+        assert np.allclose(proba, other_proba)
+
+
+def test_process_fold_executor_without_shared_memory(monkeypatch):
+    # python < 3.8, the data is pickled to each fold
+    from hypernets.utils import shared_data
+    monkeypatch.setattr(shared_data, 'shared_memory', None)
+
+    X, y = _data()
+    expected = CrossValidationEstimator(EvalSetLogisticRegression(), 'binary', num_folds=3,
+                                        fold_executor=FoldExecutor()).fit(X, y).oof_
+    est = CrossValidationEstimator(EvalSetLogisticRegression(), 'binary', num_folds=3,
+                                   fold_executor=ProcessFoldExecutor(3))
+    est.fit(X, y)
+    assert np.allclose(est.oof_, expected)
+
+
+def test_get_fold_executor():
+    backend, cores = ModelCfg.fold_backend, ModelCfg.fold_cores
+    try:
+        ModelCfg.fold_backend, ModelCfg.fold_cores = 'process', 4
+        executor = get_fold_executor(3)
+        assert isinstance(executor, ProcessFoldExecutor) and executor.n_jobs == 3
+        assert type(get_fold_executor(1)) is FoldExecutor
+
+        ModelCfg.fold_cores = 0
+        set_concurrent_trials(10000)  # no cores left for folds
+        assert type(get_fold_executor(3)) is FoldExecutor
+    finally:
+        ModelCfg.fold_backend, ModelCfg.fold_cores = backend, cores
+        set_concurrent_trials(1)
+
+
+def test_plain_model_parallel_folds():
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    backend, cores = ModelCfg.fold_backend, ModelCfg.fold_cores
+    try:
+        ModelCfg.fold_backend, ModelCfg.fold_cores = 'process', 3
+        search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+        searcher = make_searcher('random', search_space_fn=search_space, optimize_direction='max')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc')
+        hyper_model.search(X, y, X, y, cv=True, num_folds=3, max_trials=3)
+    finally:
+        ModelCfg.fold_backend, ModelCfg.fold_cores = backend, cores
+
+    trial = hyper_model.get_best_trial()
+    assert trial.reward > 0.5
+    oof = trial.memo['oof']
+    assert oof.shape == (len(X), 2) and not np.isnan(oof).any()
@@ -34,3 +34,27 @@ def test_train_heart_disease():
 
 def test_train_heart_disease_with_cv():
     train_heart_disease(cv=True, max_trials=5)
+
+
+def test_history_file_callback():
+    from hypernets.core import HistoryFileCallback, TrialHistory
+    from hypernets.tabular.datasets import dsutils
+    from hypernets.tests import test_output_dir
+
+    X = dsutils.load_heart_disease_uci()
+    y = X.pop('target')
+
+    filepath = f'{test_output_dir}/plain_model_history.bin'
+    hyper_model = create_plain_model()
+    hyper_model.callbacks.append(HistoryFileCallback(filepath))
+    hyper_model.search(X, y, X, y, max_trials=3)
+
+    history = TrialHistory.load_history(PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False), filepath)
+    assert [t.trial_no for t in history.trials] == [t.trial_no for t in hyper_model.history.trials]
+    assert history.get_best().reward == hyper_model.get_best_trial().reward
+    assert history.get_best().space_sample.vectors == hyper_model.get_best_trial().space_sample.vectors
+
+    # the search failed before the file was opened, or ended already
+    callback = HistoryFileCallback(filepath)
+    callback.on_search_error(hyper_model)
+    callback.on_search_end(hyper_model)
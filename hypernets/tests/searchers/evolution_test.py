@@ -7,7 +7,7 @@ import numpy as np
 from hypernets.core.ops import Identity
 from hypernets.core.search_space import HyperSpace, Int, Real, Choice, Bool
 from hypernets.core.searcher import OptimizeDirection
-from hypernets.searchers.evolution_searcher import Population, EvolutionSearcher
+from hypernets.searchers.evolution_searcher import Population, EvolutionSearcher, Individual
 
 
 def get_space():
@@ -139,6 +139,138 @@ class Test_Evolution():
 
         set_random_state(None)
 
+    def test_searcher_with_meta_learner(self):
+        from hypernets.core.meta_learner import MetaLearner
+        from hypernets.core.trial import TrialHistory, Trial
+
+        searcher = EvolutionSearcher(get_space, 10, 3, regularized=True, candidates_size=200,
+                                     candidates_top_ratio=0.05, optimize_direction=OptimizeDirection.Maximize)
+        history = TrialHistory(OptimizeDirection.Maximize)
+        searcher.set_meta_learner(MetaLearner(history, 'test_evolution_meta_learner', None))
+
+        for i in range(30):
+            sample = searcher.sample()
+            assert sample.all_assigned
+            reward = sample.vectors[0] / 100 + sample.vectors[3]
+            history.append(Trial(sample, i + 1, reward, 1))
+            searcher.update_result(sample, reward)
+
+        assert searcher.population.length == 10
+
+    def test_population_heap(self):
+        rs = np.random.RandomState(1)
+        population = Population(size=20, optimize_direction='min', random_state=rs)
+        reference = []
+        for i in range(200):
+            reward = rs.randint(0, 50)
+            population.append(i, reward)
+            reference.append((i, reward))
+            if i % 3 == 0:
+                eliminated = population.eliminate(regularized=i % 2 == 0)[0]
+                if i % 2 == 0:
+                    expected = reference[0]
+                else:
+                    # the worst, the oldest of the ties
+                    expected = sorted(reference, key=lambda t: -t[1])[0]
+                assert (eliminated.space_sample, eliminated.reward) == expected
+                reference.remove(expected)
+            assert population.length == len(reference)
+
+        assert [(i.space_sample, i.reward) for i in population.populations] == reference
+        best = population.sample_best(population.length * 10)
+        assert best.reward == min(r for _, r in reference)
+
+        # the draws are of the individuals in the order they were appended, as of a plain list
+        for seed in range(5):
+            population.random_state = np.random.RandomState(seed)
+            indices = sorted(np.random.RandomState(seed).choice(range(len(reference)), 3))
+            expected = sorted([reference[i] for i in indices], key=lambda t: t[1])[0]
+            best = population.sample_best(3)
+            assert (best.space_sample, best.reward) == expected
+
+    def test_population_draws(self):
+        # the individuals are drawn in the order of a plain list, after many removals (and compactions)
+        rs = np.random.RandomState(2)
+        population = Population(size=10, optimize_direction='max')
+        reference = []
+        for i in range(300):
+            population.append(i, rs.rand())
+            reference.append(i)
+            if i % 4 != 0:
+                eliminated = population.eliminate(regularized=i % 3 == 0)[0]
+                reference.remove(eliminated.space_sample)
+            if i % 50 == 0:
+                population.random_state = np.random.RandomState(i)
+                population.shuffle()
+                np.random.RandomState(i).shuffle(reference)
+            assert [population._slots[population._find(j)].space_sample for j in range(population.length)] \
+                   == reference
+
+            population.random_state = np.random.RandomState(i)
+            indices = np.random.RandomState(i).choice(range(len(reference)), min(3, len(reference)))
+            assert population.sample_best(3).space_sample in {reference[j] for j in indices}
+        assert len(population._slots) <= 2 * population.length + 16
+
+    def test_population_live_list(self):
+        # changes made to `populations` as to a list are applied to the population
+        population = Population(size=10, optimize_direction='min', random_state=np.random.RandomState(3))
+        for i in range(6):
+            population.append(i, 10 - i)
+        individuals = population.populations
+
+        individuals.pop(0)
+        individuals.remove(individuals[-1])
+        assert [i.space_sample for i in population.populations] == [1, 2, 3, 4]
+        assert population.length == 4
+
+        np.random.RandomState(3).shuffle(individuals)
+        reference = [1, 2, 3, 4]
+        np.random.RandomState(3).shuffle(reference)
+        assert [i.space_sample for i in individuals] == reference
+        # ages are kept across swaps, the oldest is eliminated first
+        assert population.eliminate(regularized=True)[0].space_sample == 1
+
+        individuals.append(Individual(9, 100))
+        assert population.length == 4
+        assert population.eliminate()[0].space_sample == 9
+        assert population.eliminate(regularized=True)[0].space_sample == 2
+
+        population.populations = [Individual(20, 5), Individual(21, 1)]
+        assert population.length == 2
+        assert population.eliminate()[0].space_sample == 20
+
+    def test_mutate_vectors(self):
+        searcher = EvolutionSearcher(get_space, 5, 3, random_state=np.random.RandomState(1))
+        parent = get_space()
+        parent.random_sample()
+        for _ in range(20):
+            candidate = searcher._mutate_vectors(parent.vectors)
+            assert candidate.signature == parent.signature
+            assert sum(a != b for a, b in zip(candidate.vectors, parent.vectors)) == 1
+
+    def test_sample_batch(self):
+        from hypernets.tests.searchers.tpe_test import get_space as get_conditional_space, objective
+
+        searcher = EvolutionSearcher(get_conditional_space, 10, 3, optimize_direction='min',
+                                     random_state=np.random.RandomState(9527))
+        for _ in range(10):
+            space_sample = searcher.sample()
+            searcher.update_result(space_sample, objective(space_sample))
+        assert not searcher.population.initializing
+
+        signatures = set()
+        for _ in range(5):
+            batch = searcher.sample_batch(8)
+            assert len({(s.signature, tuple(s.vectors)) for s in batch}) == 8
+            for space_sample in batch:
+                assert space_sample.all_assigned
+                assert searcher.is_seen(space_sample)
+                signatures.add(space_sample.signature)
+                searcher.update_result(space_sample, objective(space_sample))
+        # the branches are mutated as well
+        assert len(signatures) == 2
+        assert searcher.population.length == 10
+
     # def test_searcher_with_hp(self):
     #     def get_space():
     #         space = HyperSpace()
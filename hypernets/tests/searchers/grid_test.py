@@ -14,6 +14,7 @@ import pytest
 from hypernets.core.ops import *
 from hypernets.core.search_space import *
 from hypernets.searchers import GridSearcher
+from hypernets.searchers.grid_searcher import _Permutation
 from hypernets.core import EarlyStoppingError
 
 
@@ -66,3 +67,90 @@ class Test_GridSearcher():
         with pytest.raises(EarlyStoppingError) as ese:
             searcher.sample()
         assert ese.value.args[0] == 'no more samples.'
+
+    def test_lazy(self):
+        def large_space():
+            space = HyperSpace()
+            with space.as_default():
+                Identity(**{f'p{i}': Int(0, 100) for i in range(20)})
+            return space
+
+        searcher = GridSearcher(large_space, n_expansion=5)
+        assert searcher.size == 5 ** 20
+        first = searcher.sample().vectors
+        second = searcher.sample().vectors
+        assert first[:-1] == second[:-1] and first[-1] < second[-1]
+
+        last = GridSearcher(large_space, n_expansion=5, partition=1, num_partitions=2)
+        last.position_ = last.end - last.start - 2
+        assert last.sample().vectors == [max(values) for values in last.grid.values()]
+
+    def test_shuffle(self):
+        searcher = GridSearcher(get_space, n_expansion=3, shuffle=True, random_state=np.random.RandomState(1))
+        assert searcher.size == 18
+        keys = [tuple(searcher.sample().vectors) for _ in range(18)]
+        assert len(set(keys)) == 18
+        ordered = GridSearcher(get_space, n_expansion=3)
+        assert set(keys) == {tuple(ordered.sample().vectors) for _ in range(18)}
+        assert keys != sorted(keys)
+        with pytest.raises(EarlyStoppingError):
+            searcher.sample()
+
+        # the same order with the same seed
+        again = GridSearcher(get_space, n_expansion=3, shuffle=True, random_state=np.random.RandomState(1))
+        assert keys == [tuple(again.sample().vectors) for _ in range(18)]
+
+    def test_conditional(self):
+        def conditional_space():
+            space = HyperSpace()
+            with space.as_default():
+                hyper_input = HyperInput(name='input1')
+                id1 = Identity(p1=Choice(['a', 'b']))(hyper_input)
+                id2 = Identity(p2=Int(0, 100), p3=Bool())
+                id3 = Identity(p4=Choice(['x', 'y', 'z']))
+                ModuleChoice([id2, id3])(id1)
+                space.set_inputs(hyper_input)
+            return space
+
+        searcher = GridSearcher(conditional_space, n_expansion=4)
+        # p1 x (p2 x p3 in one branch + p4 in the other)
+        assert searcher.size == 2 * (4 * 2 + 3)
+
+        samples = []
+        while True:
+            try:
+                samples.append(searcher.sample())
+            except EarlyStoppingError:
+                break
+        assert len(samples) == 22
+        assert len({(s.signature, tuple(s.vectors)) for s in samples}) == 22
+        assert len({s.signature for s in samples}) == 2
+        assert {len(s.vectors) for s in samples} == {4, 3}
+
+    def test_partitions(self):
+        searchers = [GridSearcher(get_space, n_expansion=3, shuffle=True, random_state=np.random.RandomState(9527),
+                                  partition=i, num_partitions=4) for i in range(4)]
+        keys = []
+        for searcher in searchers:
+            while True:
+                try:
+                    keys.append(tuple(searcher.sample().vectors))
+                except EarlyStoppingError:
+                    break
+        assert len(keys) == 18
+        assert len(set(keys)) == 18
+
+        # an int seed shuffles alike
+        again = GridSearcher(get_space, n_expansion=3, shuffle=True, random_state=9527, partition=1, num_partitions=4)
+        assert [tuple(again.sample().vectors) for _ in range(again.end - again.start)] == \
+               keys[searchers[1].start:searchers[1].end]
+
+    def test_partitions_require_seed(self):
+        with pytest.raises(ValueError):
+            GridSearcher(get_space, n_expansion=3, shuffle=True, partition=0, num_partitions=2)
+
+    def test_permutation_stable(self):
+        # the same order on every interpreter, not depending on hash()
+        permutation = _Permutation(24, np.random.RandomState(9527))
+        assert [permutation(i) for i in range(24)] == \
+               [12, 14, 15, 20, 0, 7, 3, 19, 2, 8, 18, 1, 16, 4, 21, 23, 5, 13, 11, 10, 9, 6, 22, 17]
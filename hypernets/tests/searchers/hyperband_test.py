@@ -0,0 +1,103 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import pytest
+
+from hypernets.core.ops import Identity
+from hypernets.core.search_space import HyperSpace, Int, Choice
+from hypernets.dispatchers.in_process_dispatcher import InProcessDispatcher
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import HyperbandSearcher, make_searcher
+from hypernets.tabular.datasets import dsutils
+from hypernets.tests import test_output_dir
+
+
+def space_fn():
+    space = HyperSpace()
+    with space.as_default():
+        Identity(n=Int(1, 1000), kind=Choice(['a', 'b']))
+    return space
+
+
+def reward_of(space_sample):
+    # larger `n` is better, the reward approaches it as the budget grows
+    n = space_sample.get_assigned_params()[0].value
+    return n * space_sample.budget
+
+
+class Test_HyperbandSearcher():
+    def test_budgets(self):
+        searcher = HyperbandSearcher(space_fn, min_budget=1 / 27, reduction_factor=3, brackets=4)
+        assert searcher.budgets == pytest.approx([1 / 27, 1 / 9, 1 / 3, 1.0])
+        assert [len(rungs) for rungs in searcher._rungs] == [4, 3, 2, 1]
+
+        # new samples start at the lowest rung of the brackets in turn
+        budgets = [searcher.sample().budget for _ in range(4)]
+        assert budgets == pytest.approx([1 / 27, 1 / 9, 1 / 3, 1.0])
+
+    def test_promotion(self):
+        searcher = HyperbandSearcher(space_fn, min_budget=1 / 9, reduction_factor=3,
+                                     optimize_direction='max')
+        seen = {}
+        promoted = []
+        for _ in range(60):
+            space_sample = searcher.sample()
+            key = tuple(space_sample.vectors)
+            if space_sample.budget > 1 / 9 + 1e-9:
+                # promoted from the rung below, and only once
+                assert seen[key] == pytest.approx(space_sample.budget / 3)
+                promoted.append(space_sample)
+            seen[key] = space_sample.budget
+            searcher.update_result(space_sample, reward_of(space_sample))
+
+        rungs = searcher._rungs[0]
+        assert len(rungs[0].results) > len(rungs[1].results) > len(rungs[2].results) > 0
+        for lower, upper in zip(rungs[:-1], rungs[1:]):
+            assert set(upper.results.keys()) <= lower.promoted
+            # promoted while in the top 1/eta of the rung, which grows later
+            assert 0 < len(lower.promoted) < len(lower.results)
+
+        best = searcher.get_best()
+        assert best.budget == 1.0
+        best_n = best.get_assigned_params()[0].value
+        assert all(best_n >= r / 1.0 for r, _ in rungs[2].results.values())
+
+    def test_no_duplicates(self):
+        def small_space():
+            space = HyperSpace()
+            with space.as_default():
+                Identity(kind=Choice(['a', 'b', 'c', 'd', 'e', 'f']))
+            return space
+
+        searcher = HyperbandSearcher(small_space, min_budget=1 / 3, reduction_factor=3)
+        keys = [tuple(searcher.sample().vectors) for _ in range(6)]
+        assert len(set(keys)) == 6
+
+    def test_plain_model(self):
+        X = dsutils.load_heart_disease_uci()
+        y = X.pop('target')
+
+        search_space = PlainSearchSpace(enable_dt=False, enable_lr=True, enable_nn=True)
+        searcher = make_searcher('hyperband', search_space_fn=search_space, optimize_direction='max',
+                                 min_budget=1 / 9, reduction_factor=3)
+        dispatcher = InProcessDispatcher(f'{test_output_dir}/hyperband_models')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+        hyper_model.search(X, y, X, y, max_trials=15)
+
+        trials = hyper_model.history.trials
+        budgets = {t.memo.get('budget') for t in trials}
+        assert len(budgets) >= 2
+        assert None not in budgets
+
+        # promoted samples are run again at larger budgets, not skipped as existing trials
+        vectors = [tuple(t.space_sample.vectors) for t in trials]
+        assert len(set(vectors)) < len(vectors)
+        for t in trials:
+            assert hyper_model.history.get_trial(t.space_sample) is t
+
+        # promoted models continue from their checkpoints if the estimator can warm start
+        warm = [t for t in trials if t.memo.get('budget', 0) > 1 / 9 + 1e-9]
+        assert len(warm) > 0
+        assert any(hyper_model._get_budget(t.space_sample)[1] is not None for t in warm)
+        assert hyper_model.get_best_trial().reward > 0.5
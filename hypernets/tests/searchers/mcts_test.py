@@ -14,6 +14,9 @@ from hypernets.core.trial import TrialHistory, DiskTrialStore, Trial
 from hypernets.tests import test_output_dir
 
 import numpy as np
+import pytest
+
+from hypernets.core import EarlyStoppingError
 
 
 class Test_MCTS():
@@ -83,6 +86,45 @@ class Test_MCTS():
         assert searcher.tree.root.visits == 1000
         assert len(searcher.nodes_map.items()) == 1000
 
+    def test_mcts_searcher_rejected_roll_outs(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']))
+                Identity(p2=Int(0, 200))(id1)
+            return space
+
+        def valid(space_sample):
+            return space_sample.get_assigned_params()[-1].value < 5
+
+        searcher = MCTSSearcher(get_space, max_node_space=10, use_meta_learner=False,
+                                space_sample_validation_fn=valid)
+        space_sample = searcher.sample()
+        node = searcher.nodes_map[space_sample.space_id]
+        assert node.param_sample.label.startswith('Param_Choice')
+        # most roll-outs of the node are rejected, it takes a valid sample rather than giving up
+        for i in range(4):
+            space_sample = searcher._roll_out(node)
+            assert space_sample is not None and valid(space_sample)
+
+    def test_mcts_searcher_exhausted_node(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']))
+                Identity(p2=Choice(['u', 'v']))(id1)
+            return space
+
+        searcher = MCTSSearcher(get_space, max_node_space=10, use_meta_learner=False)
+        keys = set()
+        for i in range(4):
+            space_sample = searcher.sample()
+            keys.add(tuple(space_sample.vectors))
+            searcher.update_result(space_sample, np.random.uniform(0.1, 0.9))
+        assert len(keys) == 4
+        with pytest.raises(EarlyStoppingError):
+            searcher.sample()
+
     def test_mcts_searcher_parallelize(self):
         searcher = MCTSSearcher(self.get_space, max_node_space=10)
         history = TrialHistory(OptimizeDirection.Maximize)
@@ -126,35 +168,105 @@ class Test_MCTS():
         vectors = []
         for i in range(1, 10):
             vectors.append(searcher.sample().vectors)
-        assert vectors == [[98, 0, 1, 0.86], [2, 0, 1, 0.58], [2, 0, 1, 0.73], [2, 0, 1, 0.58], [2, 1, 0, 0.67],
-                           [2, 0, 1, 0.01], [2, 0, 1, 0.22], [2, 0, 1, 0.55], [2, 0, 1, 0.32]]
+        assert vectors == [[98, 0, 1, 0.86], [2, 0, 1, 0.58], [2, 0, 1, 0.73], [2, 1, 0, 0.64], [2, 1, 0, 0.14],
+                           [2, 1, 1, 0.49], [2, 1, 1, 0.12], [2, 1, 1, 0.58], [2, 1, 0, 0.4]]
 
         set_random_state(None)
         searcher = MCTSSearcher(self.get_space, max_node_space=10)
         vectors = []
         for i in range(1, 10):
             vectors.append(searcher.sample().vectors)
-        assert vectors != [[98, 0, 1, 0.86], [2, 0, 1, 0.58], [2, 0, 1, 0.73], [2, 0, 1, 0.58], [2, 1, 0, 0.67],
-                           [2, 0, 1, 0.01], [2, 0, 1, 0.22], [2, 0, 1, 0.55], [2, 0, 1, 0.32]]
+        assert vectors != [[98, 0, 1, 0.86], [2, 0, 1, 0.58], [2, 0, 1, 0.73], [2, 1, 0, 0.64], [2, 1, 0, 0.14],
+                           [2, 1, 1, 0.49], [2, 1, 1, 0.12], [2, 1, 1, 0.58], [2, 1, 0, 0.4]]
 
         set_random_state(9527)
         searcher = MCTSSearcher(self.get_space, max_node_space=10)
         vectors = []
         for i in range(1, 10):
             vectors.append(searcher.sample().vectors)
-        assert vectors == [[98, 0, 1, 0.86], [2, 0, 1, 0.58], [2, 0, 1, 0.73], [2, 0, 1, 0.58], [2, 1, 0, 0.67],
-                           [2, 0, 1, 0.01], [2, 0, 1, 0.22], [2, 0, 1, 0.55], [2, 0, 1, 0.32]]
+        assert vectors == [[98, 0, 1, 0.86], [2, 0, 1, 0.58], [2, 0, 1, 0.73], [2, 1, 0, 0.64], [2, 1, 0, 0.14],
+                           [2, 1, 1, 0.49], [2, 1, 1, 0.12], [2, 1, 1, 0.58], [2, 1, 0, 0.4]]
 
         set_random_state(1)
         searcher = MCTSSearcher(self.get_space, max_node_space=10)
         vectors = []
         for i in range(1, 10):
             vectors.append(searcher.sample().vectors)
-        assert vectors == [[73, 1, 0, 0.4], [2, 0, 0, 0.42], [2, 0, 0, 0.2], [2, 0, 0, 0.03], [2, 0, 0, 0.42],
-                           [2, 1, 1, 0.14], [2, 0, 0, 0.8], [2, 1, 1, 0.31], [2, 0, 1, 0.88]]
+        assert vectors == [[73, 1, 0, 0.4], [2, 0, 0, 0.42], [2, 0, 0, 0.2], [2, 0, 0, 0.03], [2, 1, 1, 0.31],
+                           [2, 0, 1, 0.88], [2, 0, 1, 0.09], [2, 1, 1, 0.17], [2, 1, 0, 0.1]]
 
         set_random_state(None)
 
+    def test_array_mctree(self):
+        tree = ArrayMCTree(self.get_space, policy=UCT(), max_node_space=2)
+        space_sample, node = tree.selection_and_expansion()
+        assert tree.labels[tree.label[node]] == 'Param_Int_1-1-100-1'
+        assert list(tree.children(tree.root)) == [1, 2]
+        assert space_sample.all_assigned == False
+
+        tree.back_propagation(node, 0.3)
+        assert tree.visits[node] == 1
+        assert tree.visits[tree.root] == 1
+
+        space_sample, other = tree.selection_and_expansion()
+        assert other != node and tree.labels[tree.label[other]] == 'Param_Int_1-1-100-1'
+        tree.back_propagation(other, 0.5)
+        assert tree.visits[tree.root] == 2
+        assert tree.reward[tree.root] == 0.4
+        assert abs(tree.reward_std(tree.root) - 0.1) < 1e-9
+
+        space_sample, node = tree.selection_and_expansion()
+        assert tree.labels[tree.label[node]] == 'Param_Choice_1-[\'a\', \'b\']'
+        assert tree.depth[node] == 2
+        tree.back_propagation(node, 0.7, is_simulation=True)
+        assert tree.visits[node] == 1 and tree.reward[node] == 0.35
+        assert tree.visits[tree.root] == 1  # visits of simulations take over
+
+        space_sample = tree.roll_out(space_sample, node)
+        assert space_sample.all_assigned == True
+        assert [p.value for p in tree.node_to_space(node).assigned_params_stack] == \
+               [p.value for p in space_sample.assigned_params_stack[:2]]
+        assert tree.summary()
+
+    def test_select_child(self):
+        policy = UCT()
+        rs = np.random.RandomState(9527)
+        tree = MCTree(self.get_space, policy, max_node_space=10)
+        tree.expansion(tree.root)
+        for _ in range(100):
+            for child in tree.root.children:
+                child.reward, child.visits = rs.rand(), rs.randint(0, 5)
+            tree.root.visits = sum(c.visits for c in tree.root.children)
+            rewards = np.array([c.reward for c in tree.root.children])
+            visits = np.array([c.visits for c in tree.root.children])
+            index = policy.select_child(rewards, visits, tree.root.visits)
+            assert tree.root.children[index] is policy.selection(tree.root)
+
+    def test_array_mcts_searcher(self):
+        searcher = MCTSSearcher(self.get_space, max_node_space=10, array_tree=True)
+        rewards = []
+        keys = set()
+        for i in range(1000):
+            space_sample = searcher.sample()
+            assert space_sample.all_assigned == True
+            keys.add(tuple(space_sample.vectors))
+            reward = np.random.uniform(0.1, 0.9)
+            searcher.update_result(space_sample, reward)
+            rewards.append(reward)
+        assert len(keys) == 1000
+
+        tree = searcher.tree
+        assert tree.visits[tree.root] == 1000
+        assert abs(tree.reward[tree.root] - np.average(rewards)) < 1e-9
+        assert abs(tree.reward_std(tree.root) - np.std(rewards)) < 1e-9
+        assert len(searcher.nodes_map.items()) == 1000
+        # the visits of the children add up to the visits of the parent, but for the random samples taken once the
+        # roll-outs of a node are all seen
+        children = list(tree.children(tree.root))
+        from_root = sum(1 for node in searcher.nodes_map.values() if node == tree.root)
+        assert from_root > 0
+        assert tree.visits[children].sum() + from_root == 1000
+
     # def test_searcher_with_hp(self):
     #     def get_space():
     #         space = HyperSpace()
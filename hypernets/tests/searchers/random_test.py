@@ -81,3 +81,45 @@ class Test_RandomSearcher():
                            [29, 1, 0, 0.67], [88, 1, 1, 0.43], [95, 0, 0, 0.8], [10, 1, 1, 0.09]]
 
         set_random_state(None)
+
+    def test_no_duplicates(self):
+        from hypernets.core import EarlyStoppingError
+
+        def small_space():
+            space = HyperSpace()
+            with space.as_default():
+                Identity(p1=Choice(['a', 'b', 'c']), p2=Bool())
+            return space
+
+        for sample_batch_size in [0, 4]:
+            searcher = RandomSearcher(small_space, sample_batch_size=sample_batch_size)
+            keys = {tuple(searcher.sample().vectors) for _ in range(6)}
+            assert len(keys) == 6
+            assert searcher.combinations == 6
+            # exhausted, detected by the count rather than the retry limit
+            with pytest.raises(EarlyStoppingError):
+                searcher.sample()
+
+        # invalid samples are used up as well
+        searcher = RandomSearcher(small_space, space_sample_validation_fn=lambda s: s.Param_Bool_1.value)
+        samples = [searcher.sample() for _ in range(3)]
+        assert all(s.Param_Bool_1.value for s in samples)
+        with pytest.raises(EarlyStoppingError):
+            searcher.sample()
+
+    def test_no_duplicates_negative_values(self):
+        from hypernets.core import EarlyStoppingError
+
+        def negative_space():
+            space = HyperSpace()
+            with space.as_default():
+                Identity(p1=Int(-3, 3), p2=Choice([-1, -2]))
+            return space
+
+        searcher = RandomSearcher(negative_space)
+        keys = {tuple(searcher.sample().vectors) for _ in range(12)}
+        # hash(-1) == hash(-2), the seen-set must not take them for the same sample
+        assert len(keys) == 12
+        assert {k[0] for k in keys} == {-3, -2, -1, 0, 1, 2}
+        with pytest.raises(EarlyStoppingError):
+            searcher.sample()
@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+"""
+
+"""
+import time
+
+import numpy as np
+
+from hypernets.core.ops import Identity, ModuleChoice, HyperInput
+from hypernets.core.search_space import HyperSpace, Int, Real, Choice, MultipleChoice
+from hypernets.dispatchers.in_process_dispatcher import InProcessDispatcher
+from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+from hypernets.searchers import TPESearcher, RandomSearcher, make_searcher
+from hypernets.searchers.tpe_searcher import _NumericModel
+from hypernets.tabular.datasets import dsutils
+from hypernets.tests import test_output_dir
+
+
+def get_space():
+    space = HyperSpace()
+    with space.as_default():
+        hyper_input = HyperInput(name='input1')
+        id1 = Identity(x=Real(-5.0, 5.0))(hyper_input)
+        id2 = Identity(a=Int(0, 100, step=5), m=MultipleChoice(['p', 'q', 'r']))
+        id3 = Identity(b=Real(1, 3, prior='log_uniform', step=0.5), c=Choice(['u', 'v', 'w']))
+        ModuleChoice([id2, id3])(id1)
+        space.set_inputs(hyper_input)
+    return space
+
+
+def params_of(space_sample):
+    return {p.alias.split('.')[-1]: p.value for p in space_sample.get_assigned_params()}
+
+
+def objective(space_sample):
+    # the best is the first branch, with x = 1 and a = 70
+    params = params_of(space_sample)
+    loss = (params['x'] - 1.0) ** 2
+    if 'a' in params:
+        loss += abs(params['a'] - 70) / 10
+    else:
+        loss += 3.0 + (0.0 if params['c'] == 'v' else 1.0)
+    return loss
+
+
+def search(searcher, n):
+    losses = []
+    for _ in range(n):
+        space_sample = searcher.sample()
+        loss = objective(space_sample)
+        searcher.update_result(space_sample, loss)
+        losses.append(loss)
+    return np.array(losses)
+
+
+class Test_TPESearcher():
+    def test_better_than_random(self):
+        tpe, random = [], []
+        for seed in range(3):
+            searcher = TPESearcher(get_space, n_startup_trials=10, random_state=np.random.RandomState(seed))
+            tpe.append(search(searcher, 80)[40:].mean())
+            random.append(search(RandomSearcher(get_space), 80)[40:].mean())
+        assert np.mean(tpe) < np.mean(random) * 0.6
+
+    def test_conditional(self):
+        searcher = TPESearcher(get_space, n_startup_trials=10, random_state=np.random.RandomState(9527))
+        search(searcher, 60)
+
+        # parameters of the branches are modeled with the trials they are active in
+        sizes = sorted(c.size for c in searcher._columns.values())
+        assert len(sizes) == 6
+        # x and the choice of the branch are always active, a and m in one branch, b and c in the other
+        assert sizes[-2:] == [60, 60]
+        assert sizes[0] == sizes[1] and sizes[2] == sizes[3] and sizes[0] + sizes[2] == 60
+        assert sizes[0] > 0
+
+        best = params_of(searcher.get_best())
+        assert 'a' in best and abs(best['x'] - 1.0) < 1.0
+
+    def test_sample_batch(self):
+        searcher = TPESearcher(get_space, n_startup_trials=10, random_state=np.random.RandomState(1))
+        search(searcher, 30)
+
+        batch = searcher.sample_batch(8)
+        keys = {(s.signature, tuple(s.vectors)) for s in batch}
+        assert len(keys) == 8
+        xs = sorted(params_of(s)['x'] for s in batch)
+        assert xs[-1] - xs[0] > 0.1  # kept apart by the liar
+
+        for space_sample in batch:
+            assert searcher.is_seen(space_sample)
+
+    def test_int_values(self):
+        # the draws keep to the values of the native sampler, whose high is exclusive
+        rs = np.random.RandomState(9527)
+        for p in [Int(0, 10), Int(0, 10, step=3), Int(0, 4, step=5), Int(-3, 3, step=2)]:
+            native = {p.random_sample(assign=False) for _ in range(500)}
+            model = _NumericModel(p)
+            drawn = set(model.sample(rs, model.estimator([p.high - 1] * 20), 500).tolist())
+            assert drawn <= native, p
+            assert max(drawn) == max(native)
+
+    def test_latency(self):
+        searcher = TPESearcher(get_space, n_startup_trials=10, random_state=np.random.RandomState(1))
+        template = searcher.template
+        batch = template.sample(5000)
+        for i in range(len(batch)):
+            space_sample = batch.materialize(i)
+            searcher.update_result(space_sample, objective(space_sample))
+
+        start = time.time()
+        for _ in range(10):
+            searcher.sample()
+        assert (time.time() - start) / 10 < 0.1
+
+    def test_plain_model(self):
+        X = dsutils.load_heart_disease_uci()
+        y = X.pop('target')
+
+        search_space = PlainSearchSpace(enable_dt=True, enable_lr=True, enable_nn=False)
+        searcher = make_searcher('tpe', search_space_fn=search_space, optimize_direction='max', n_startup_trials=3)
+        dispatcher = InProcessDispatcher(f'{test_output_dir}/tpe_models')
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc', dispatcher=dispatcher)
+        hyper_model.search(X, y, X, y, max_trials=8)
+
+        assert len(hyper_model.history.trials) >= 6
+        assert searcher.get_best() is not None
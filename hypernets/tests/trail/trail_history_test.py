@@ -3,9 +3,13 @@ __author__ = 'yangjian'
 """
 
 """
+import json
+
+import numpy as np
+
 from hypernets.core.ops import Identity, Choice
 from hypernets.core.search_space import HyperSpace, Int, Real
-from hypernets.core.trial import TrialHistory, Trial
+from hypernets.core.trial import TrialHistory, Trial, TrialHistoryWriter, TrialHistoryReader
 from .. import test_output_dir
 
 
@@ -78,3 +82,198 @@ class Test_TrialHistory():
 
         trajectories = history.get_trajectories()
         assert trajectories == ([0.0, 100.0, 150.0, 350.0], [0.0, 0.99, 0.99, 0.99], [0.0, 0.99, 0.9, 0.7], 1, 100.0)
+
+    def test_top_and_index(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']), p2=Int(1, 100), p3=Real(0, 1.0))
+            return space
+
+        th = TrialHistory('max')
+        improved = []
+        for i, (vectors, reward) in enumerate([([0, 1, 0.1], 0.5), ([1, 2, 0.2], 0.7),
+                                               ([0, 3, 0.3], 0.7), ([1, 4, 0.4], 0.6)]):
+            sample = get_space()
+            sample.assign_by_vectors(vectors)
+            improved.append(th.append(Trial(sample, i + 1, reward, 10)))
+
+        sample = get_space()
+        sample.assign_by_vectors([0, 5, 0.5])
+        th.append(Trial(sample, 5, 0, 10, succeeded=False))
+
+        assert improved == [True, True, False, False]
+        assert [t.trial_no for t in th.get_top()] == [2, 3, 4, 1]
+        assert [t.trial_no for t in th.get_top(2)] == [2, 3]
+        assert th.get_best().trial_no == 2
+        assert th.get_worst().trial_no == 1
+
+        assert th.is_existed(sample)
+        assert th.get_trial(sample).trial_no == 5
+
+        sample = get_space()
+        sample.assign_by_vectors([1, 6, 0.6])
+        assert not th.is_existed(sample)
+        assert th.get_trial(sample) is None
+
+    def test_columns(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']), p2=Int(1, 100), p3=Real(0, 1.0), name='id1')
+            return space
+
+        th = TrialHistory('min')
+        for i, (vectors, reward) in enumerate([([0, 1, 0.1], 0.5), ([1, 2, 0.2], 0.7), ([0, 2, 0.3], 0.6)]):
+            sample = get_space()
+            sample.assign_by_vectors(vectors)
+            th.append(Trial(sample, i + 1, reward, 10))
+
+        columns = th.columns
+        assert len(columns) == 3
+        assert columns.trial_no.tolist() == [1, 2, 3]
+        assert columns.reward.tolist() == [0.5, 0.7, 0.6]
+        assert columns.vectors.tolist() == [[0, 1, 0.1], [1, 2, 0.2], [0, 2, 0.3]]
+
+        diff = th.diff(th.get_top())
+        assert diff == TrialHistory._diff_trials(th.get_top())
+        pv = list(diff.values())[0]
+        assert pv['id1.p1'] == {'a': [0.5, 0.6], 'b': [0.7]}
+        assert pv['id1.p2'] == {'1': [0.5], '2': [0.6, 0.7]}
+
+        df = th.to_df(include_params=True)
+        assert df.shape == (3, 7)
+        assert df['id1.p1'].tolist() == ['a', 'b', 'a']
+        assert df['id1.p2'].tolist() == [1, 2, 2]
+
+    def test_columns_refresh(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']), p2=Int(1, 100))
+            return space
+
+        th = TrialHistory('max')
+        trials = []
+        for i in range(3):
+            sample = get_space()
+            sample.assign_by_vectors([i % 2, i + 1])
+            trials.append(Trial(sample, i + 1, None, None, succeeded=False))
+            th.append(trials[-1])
+        assert np.isnan(th.columns.reward).all()
+        # rewards missing are None in the trajectories, as the trials have them
+        assert th.get_trajectories()[2] == [0.0, None, None, None]
+
+        # the trials finished after they were appended
+        for i, trial in enumerate(trials):
+            trial.reward = 0.5 + i * 0.1
+            trial.elapsed = 10
+            trial.succeeded = i != 1
+        assert th.columns.reward.tolist() == [0.5, 0.6, 0.7]
+        assert th.columns.succeeded.tolist() == [True, False, True]
+        times, best_rewards, rewards, best_trial_no, best_elapsed = th.get_trajectories()
+        assert rewards == [0.0, 0.5, 0.6, 0.7]
+        assert best_trial_no == 3 and best_elapsed == 30
+        assert th.to_df()['reward'].tolist() == [0.5, 0.6, 0.7]
+
+        # rows are of the trials in the history, never of another trial
+        assert [th.columns.row_of(t) for t in trials] == [0, 1, 2]
+        assert th.columns.row_of(Trial(None, 4, 0.9, 1)) is None
+
+    def test_save_load_binary(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']), p2=Int(1, 100), p3=Real(0, 1.0))
+            return space
+
+        th = TrialHistory('min')
+        for i, (vectors, reward) in enumerate([([0, 1, 0.1], 0.99), ([1, 2, 0.2], 0.9), ([0, 3, 0.3], 0.7)]):
+            sample = get_space()
+            sample.assign_by_vectors(vectors)
+            th.append(Trial(sample, i + 1, reward, 100 - i, model_file=f'model_{i}.pkl' if i > 0 else None))
+
+        filepath = f'{test_output_dir}/history.bin'
+        th.save(filepath, binary=True)
+
+        history = TrialHistory.load_history(get_space, filepath)
+        assert history.optimize_direction == 'min'
+        assert len(history.trials) == 3
+        assert history.get_best().trial_no == 3
+        assert history.trials[0].model_file is None
+        assert history.trials[1].model_file == 'model_1.pkl'
+        assert history.is_existed(th.trials[1].space_sample)
+        assert not any(t.materialized for t in history.trials)
+
+        t = history.trials[0]
+        assert t.space_sample.vectors == [0, 1, 0.1]
+        assert t.space_sample.signature == th.trials[0].space_sample.signature
+        assert t.materialized
+
+        # append incrementally, a partial record left by a crash is dropped
+        with open(filepath, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00\x01')
+        with TrialHistoryWriter(filepath, 'min') as writer:
+            sample = get_space()
+            sample.assign_by_vectors([1, 4, 0.4])
+            writer.append(Trial(sample, 4, 0.5, 10))
+
+        history = TrialHistory.load_history(get_space, filepath)
+        assert [t.trial_no for t in history.trials] == [1, 2, 3, 4]
+        assert history.get_best().space_sample.vectors == [1, 4, 0.4]
+
+    def test_save_load_binary_budget(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']), p2=Int(1, 100))
+            return space
+
+        th = TrialHistory('max')
+        for i, budget in enumerate([0.25, 1.0, None]):
+            sample = get_space()
+            sample.assign_by_vectors([0, 1])
+            if budget is not None:
+                sample.budget = budget
+            th.append(Trial(sample, i + 1, 0.5 + i * 0.1, 10))
+
+        filepath = f'{test_output_dir}/history_budget.bin'
+        th.save(filepath, binary=True)
+
+        # trials of the same sample at different budgets are kept apart
+        history = TrialHistory.load_history(get_space, filepath)
+        assert len(history.trials) == 3
+        assert [t.budget for t in history.trials] == [0.25, 1.0, None]
+        assert history.trials[0].space_sample.budget == 0.25
+        assert [t.trial_no for t in history.get_budget_trials(th.trials[2].space_sample)] == [1, 2]
+        assert history.get_trial(th.trials[1].space_sample).trial_no == 2
+
+    def test_append_binary_v1(self):
+        def get_space():
+            space = HyperSpace()
+            with space.as_default():
+                id1 = Identity(p1=Choice(['a', 'b']), p2=Int(1, 100))
+            return space
+
+        # a version 1 file, records without budget
+        filepath = f'{test_output_dir}/history_v1.bin'
+        meta = json.dumps(dict(optimize_direction='min')).encode('utf-8')
+        rec = TrialHistoryWriter.RECORD_V1
+        with open(filepath, 'wb') as f:
+            f.write(TrialHistoryWriter.HEADER.pack(TrialHistoryWriter.MAGIC, 1, len(meta)))
+            f.write(meta)
+            body = np.array([1, 2], dtype='float64').tobytes()
+            f.write(rec.pack(rec.size - 4 + 2 + len(body), 1, 0.3, 10., True, bytes(16), 2, 0))
+            f.write(bytes([0, 0]))
+            f.write(body)
+
+        with TrialHistoryWriter(filepath, 'min') as writer:
+            sample = get_space()
+            sample.assign_by_vectors([1, 2])
+            sample.budget = 0.5
+            writer.append(Trial(sample, 2, 0.2, 10))
+
+        reader = TrialHistoryReader(filepath)
+        assert reader.version == TrialHistoryWriter.VERSION
+        records = list(reader.iter_records())
+        assert [(r[0], r[5], r[7]) for r in records] == [(1, [1, 2], None), (2, [1, 2], 0.5)]
@@ -35,3 +35,93 @@ class Test_TrialStore():
 
         trials = store.get_all(dataset_id, sample.signature)
         assert trials
+
+    def test_budgets(self):
+        for store in [DiskTrialStore(f'{test_output_dir}/trial_store_budgets'),
+                      SqliteTrialStore(f'{test_output_dir}/trial_store_budgets.db', batch_size=1)]:
+            dataset_id = 'test_budgets'
+            low = self.get_space()
+            low.random_sample()
+            low.budget = 1 / 3
+            store.put(dataset_id, Trial(low, 1, 0.8, 10))
+            store.reset()
+
+            # the promoted sample is another trial
+            high = self.get_space()
+            high.assign_by_vectors(low.vectors)
+            high.budget = 1.0
+            assert store.get(dataset_id, high) is None
+            assert store.get(dataset_id, low).reward == 0.8
+
+    def test_sqlite(self):
+        store = SqliteTrialStore(f'{test_output_dir}/trial_store.db', batch_size=3)
+        dataset_id = 'test_dataset'
+        samples = []
+        for i in range(5):
+            sample = self.get_space()
+            sample.assign_by_vectors([i % 2, i + 1, 0.2, 2])
+            store.put(dataset_id, Trial(sample, i + 1, 0.1 * (i + 1), 100, model_file=f'{i}.pkl'))
+            samples.append(sample)
+        store.reset()
+
+        trial_get = store.get(dataset_id, samples[3])
+        assert trial_get.trial_no == 4
+        assert trial_get.elapsed == 100
+        assert trial_get.model_file == '3.pkl'
+        assert trial_get.space_sample_vectors == samples[3].vectors
+        assert store.get('other_dataset', samples[3]) is None
+
+        signature = samples[0].signature
+        assert len(store.get_all(dataset_id, signature)) == 5
+        top = store.query(dataset_id, signature, top_n=2)
+        assert [t.trial_no for t in top] == [5, 4]
+        ranged = store.query(dataset_id, signature, min_reward=0.15, max_reward=0.35)
+        assert sorted([t.trial_no for t in ranged]) == [2, 3]
+        store.close()
+
+    def test_sqlite_import_disk_store(self):
+        disk_store = DiskTrialStore(f'{test_output_dir}/trial_store_to_import')
+        dataset_id = 'test_dataset'
+        sample = self.get_space()
+        sample.random_sample()
+        disk_store.put(dataset_id, Trial(sample, 1, 0.99, 100))
+
+        store = SqliteTrialStore(f'{test_output_dir}/trial_store_imported.db')
+        assert store.import_disk_store(disk_store.home_dir) == 1
+        trial = store.get(dataset_id, sample)
+        assert trial.reward == 0.99
+        assert trial.space_sample_vectors == sample.vectors
+        store.close()
+
+    def test_persist_not_implemented(self):
+        # a store implementing get and put only, written before persist was added
+        class DictTrialStore(TrialStore):
+            def __init__(self):
+                self.trials = {}
+                super(DictTrialStore, self).__init__()
+
+            def reset(self):
+                self._cache = {}
+
+            def load(self):
+                pass
+
+            def _get(self, dataset_id, space_sample):
+                return self.trials.get((dataset_id, self.sample2key(space_sample)))
+
+            def _put(self, dataset_id, trial):
+                self.trials[(dataset_id, self.sample2key(trial.space_sample))] = trial
+
+        from hypernets.examples.plain_model import PlainModel, PlainSearchSpace
+        from hypernets.searchers import make_searcher
+        from hypernets.tabular.datasets import dsutils
+
+        X = dsutils.load_heart_disease_uci()
+        y = X.pop('target')
+        searcher = make_searcher('random', search_space_fn=PlainSearchSpace(enable_dt=True, enable_lr=True,
+                                                                            enable_nn=False),
+                                 optimize_direction='max')
+        store = DictTrialStore()
+        hyper_model = PlainModel(searcher=searcher, reward_metric='auc')
+        hyper_model.search(X, y, X, y, max_trials=2, dataset_id='heart', trial_store=store)
+        assert len(store.trials) == 2
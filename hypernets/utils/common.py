@@ -8,6 +8,8 @@ import hashlib
 import inspect
 import math
 import pickle
+import threading
+import time
 import uuid
 from collections import OrderedDict
 from functools import partial
@@ -192,3 +194,71 @@ def load_data(data, **kwargs):
         df = df.repartition(npartitions=worker_count)
 
     return df
+
+
+class ResourceMonitor(object):
+    """
+    Track the peak RSS (bytes) and the cpu seconds of the current process while the monitor is entered.
+
+    The RSS is polled every `interval` seconds by a daemon thread with psutil. Without psutil, the peak RSS is the
+    lifetime maximum from `resource` (nan on Windows), which overestimates later trials of a long-lived process.
+
+    Both numbers are of the whole process, so they are only valid for the trials running alone in their process,
+    e.g. with backend="process" or "cluster", not with the trials run by threads of a dask worker.
+
+    :param enabled: track nothing if False, the numbers are left nan.
+    """
+
+    def __init__(self, interval=0.1, enabled=True):
+        super(ResourceMonitor, self).__init__()
+
+        self.interval = interval
+        self.enabled = enabled
+        self.peak_rss = math.nan
+        self.cpu_seconds = math.nan
+
+        self._stop = None
+        self._thread = None
+        self._cpu_start = None
+
+    def _poll(self, process):
+        while True:
+            try:
+                self.peak_rss = max(self.peak_rss, process.memory_info().rss)
+            except Exception:
+                break
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        self._cpu_start = time.process_time()
+        try:
+            import psutil
+            process = psutil.Process()
+            self.peak_rss = process.memory_info().rss
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._poll, args=(process,), daemon=True)
+            self._thread.start()
+        except ImportError:
+            pass
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled:
+            return False
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        else:
+            try:
+                import resource
+                import sys
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                self.peak_rss = peak if sys.platform == 'darwin' else peak * 1024
+            except ImportError:
+                pass
+        return False
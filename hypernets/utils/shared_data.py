@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+"""
+Share python objects, e.g. the training data, with local worker processes without copying them.
+
+The object is pickled with protocol 5, the out-of-band buffers (the data of numpy arrays, and so of pandas
+DataFrames) are placed in one block of shared memory and only the small in-band payload is sent to the workers.
+Workers rebuild the object on top of the shared memory, the arrays they get are read-only.
+
+Shared memory and pickle protocol 5 need python 3.8, on older versions the object is pickled as a whole into the
+descriptor, so each worker gets its own copy.
+"""
+import pickle
+import sys
+
+if sys.version_info >= (3, 8):
+    from multiprocessing import shared_memory
+else:
+    shared_memory = None
+
+_ALIGNMENT = 64
+
+
+class SharedData(object):
+    def __init__(self, obj):
+        if shared_memory is None:
+            self.shm = None
+            self.payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+            self.layout = None
+            return
+
+        buffers = []
+        payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        try:
+            raws = [b.raw() for b in buffers]
+        except BufferError:
+            # non-contiguous buffers, pickle all in-band
+            payload, raws = pickle.dumps(obj, protocol=5), []
+
+        layout = []
+        offset = 0
+        for raw in raws:
+            layout.append((offset, raw.nbytes))
+            offset += (raw.nbytes + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for raw, (start, nbytes) in zip(raws, layout):
+            self.shm.buf[start:start + nbytes] = raw.cast('B')
+
+        self.payload = payload
+        self.layout = layout
+
+    @property
+    def nbytes(self):
+        return (self.shm.size if self.shm is not None else 0) + len(self.payload)
+
+    @property
+    def descriptor(self):
+        """A small picklable handle to pass to the workers, see `SharedData.attach`."""
+        return (self.shm.name if self.shm is not None else None), self.payload, self.layout
+
+    @staticmethod
+    def attach(descriptor):
+        """
+        Rebuild the shared object in a worker process.
+
+        :return: tuple of the object and the shared memory, which must be kept open while the object is in use,
+            None if the object is not shared.
+        """
+        name, payload, layout = descriptor
+        if name is None:
+            return pickle.loads(payload), None
+        shm = shared_memory.SharedMemory(name=name)
+        buffers = [shm.buf[start:start + nbytes].toreadonly() for start, nbytes in layout]
+        obj = pickle.loads(payload, buffers=buffers)
+        return obj, shm
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None